@@ -0,0 +1,57 @@
+"""
+Пул подключений asyncpg для Telegram-бота.
+
+Повторяет настройку backend/app/database.py (тот же API init_db / get_pool /
+close_db и те же JSON-кодеки), но берёт параметры из корневого config.py.
+Хэндлеры больше не делят один psycopg2-курсор: каждый запрос берёт
+соединение из пула и не блокирует event loop.
+"""
+import json
+
+import asyncpg
+
+from config import config
+from logger_setup import bot_logger
+
+_pool: asyncpg.Pool | None = None
+
+
+async def get_pool() -> asyncpg.Pool:
+    if _pool is None:
+        raise RuntimeError("Database pool not initialized. Call init_db() first.")
+    return _pool
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Регистрирует кодеки, чтобы JSON/JSONB приходили как dict/list (как в backend)."""
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=json.dumps,
+        decoder=json.loads,
+        schema="pg_catalog",
+    )
+    await conn.set_type_codec(
+        "json",
+        encoder=json.dumps,
+        decoder=json.loads,
+        schema="pg_catalog",
+    )
+
+
+async def init_db() -> asyncpg.Pool:
+    global _pool
+    if _pool is None:
+        pool_config = config.get_pool_config()
+        _pool = await asyncpg.create_pool(init=_init_connection, **pool_config)
+        bot_logger.info(
+            f"Database pool created ({pool_config['min_size']}-{pool_config['max_size']} connections)"
+        )
+    return _pool
+
+
+async def close_db() -> None:
+    global _pool
+    if _pool:
+        await _pool.close()
+        _pool = None
+        bot_logger.info("Database pool closed")
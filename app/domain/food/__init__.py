@@ -0,0 +1 @@
+# Food domain package
@@ -0,0 +1,70 @@
+"""
+Распознавание еды по фото для Telegram-бота.
+
+Фото не касается диска: байты из Telegram остаются в памяти, уменьшаются
+в отдельном потоке (Pillow блокирует CPU) и уходят в Gemini инлайн через
+асинхронный generate_content_async — так же, как в
+backend/app/services/ai_service.recognize_food_photo.
+"""
+import asyncio
+import io
+import time
+from dataclasses import dataclass, field
+
+import google.generativeai as genai
+import PIL.Image
+
+# Gemini всё равно ужимает картинку; больше 1024px по длинной стороне
+# только увеличивает размер запроса и время ответа.
+MAX_SIDE = 1024
+MODEL_NAME = 'gemini-2.5-flash'
+
+
+@dataclass
+class PhotoRecognition:
+    """Ответ модели и замеры этапов (мс)."""
+    text: str
+    timings: dict = field(default_factory=dict)
+
+
+def prepare_photo(image_bytes: bytes, max_side: int = MAX_SIDE) -> PIL.Image.Image:
+    """
+    Декодирует и уменьшает фото (синхронно, вызывать через asyncio.to_thread).
+
+    Args:
+        image_bytes: Содержимое файла из Telegram
+        max_side: Максимальный размер длинной стороны
+
+    Returns:
+        RGB-изображение не больше max_side x max_side
+    """
+    image = PIL.Image.open(io.BytesIO(image_bytes))
+    # draft() позволяет JPEG-декодеру сразу читать уменьшенную версию
+    image.draft('RGB', (max_side, max_side))
+    image = image.convert('RGB')
+    image.thumbnail((max_side, max_side))
+    return image
+
+
+async def recognize_food_photo(image_bytes: bytes, prompt: str) -> PhotoRecognition:
+    """
+    Отправляет фото в Gemini и возвращает текст ответа.
+
+    Args:
+        image_bytes: Содержимое файла из Telegram
+        prompt: Локализованный промпт распознавания
+
+    Returns:
+        PhotoRecognition с текстом ответа и длительностью этапов
+    """
+    timings = {}
+    started = time.perf_counter()
+    image = await asyncio.to_thread(prepare_photo, image_bytes)
+    timings['prepare'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    model = genai.GenerativeModel(MODEL_NAME)
+    response = await model.generate_content_async([prompt, image])
+    timings['gemini'] = (time.perf_counter() - started) * 1000
+
+    return PhotoRecognition(text=response.text if response else '', timings=timings)
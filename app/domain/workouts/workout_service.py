@@ -1,28 +1,72 @@
 """
 Сервис для работы с тренировками
 Отвечает за получение списка тренировок, расчет калорий и сохранение данных
+
+Справочник training_types кэшируется на процесс с TTL. Админка меняет его
+через backend, а триггер в БД шлёт NOTIFY training_types_changed — бот
+слушает канал (listen_for_training_type_changes) и сбрасывает кэш сразу.
 """
-import psycopg2
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime
+import asyncio
+import time
+import asyncpg
+from typing import List, Dict, Optional, Tuple, Union
+from datetime import date as date_type, datetime
 from logger_setup import bot_logger
 
 
+TRAINING_TYPES_CHANNEL = 'training_types_changed'
+
+# Максимальная суммарная длительность тренировок за день (24 часа)
+DAILY_DURATION_LIMIT = 1440
+
+
+class TrainingTypesCache:
+    """Кэш справочника тренировок с TTL, общий для всех экземпляров сервиса"""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._cache = {}
+        self._lock = asyncio.Lock()
+
+    def get(self, key: str):
+        """Получить из кэша (None, если записи нет или она устарела)"""
+        entry = self._cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, key: str, value):
+        """Сохранить в кэш"""
+        self._cache[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        """Очистить кэш"""
+        self._cache.clear()
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Лок загрузки: при промахе в БД идёт только один запрос"""
+        return self._lock
+
+
+# Глобальный экземпляр кэша
+training_types_cache = TrainingTypesCache()
+
+
 class WorkoutService:
     """Сервис управления тренировками"""
     
-    def __init__(self, db_connection):
+    def __init__(self, db_pool: asyncpg.Pool):
         """
         Инициализация сервиса
         
         Args:
-            db_connection: Подключение к PostgreSQL
+            db_pool: Пул подключений asyncpg (каждый запрос берёт своё соединение)
         """
-        self.conn = db_connection
-        self.cursor = db_connection.cursor()
-        self._cache = {}  # Кэш для списка тренировок
+        self.pool = db_pool
+        self._cache = training_types_cache
         
-    def get_training_types(self, language: str = 'ru', active_only: bool = True) -> List[Dict]:
+    async def get_training_types(self, language: str = 'ru', active_only: bool = True) -> List[Dict]:
         """
         Получить список всех типов тренировок
         
@@ -36,10 +80,17 @@ class WorkoutService:
         cache_key = f"trainings_{language}_{active_only}"
         
         # Проверяем кэш
-        if cache_key in self._cache:
-            bot_logger.debug(f"Returning cached training types for {language}")
-            return self._cache[cache_key]
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
         
+        async with self._cache.lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+            return await self._load_training_types(cache_key, language, active_only)
+    
+    async def _load_training_types(self, cache_key: str, language: str, active_only: bool) -> List[Dict]:
         try:
             # Определяем колонку названия по языку
             name_column = f"name_{language}"
@@ -53,12 +104,11 @@ class WorkoutService:
                     {description_column} as description,
                     base_coefficient
                 FROM training_types
-                WHERE is_active = %s
+                WHERE is_active = $1
                 ORDER BY id
             """
             
-            self.cursor.execute(query, (active_only,))
-            rows = self.cursor.fetchall()
+            rows = await self.pool.fetch(query, active_only)
             
             result = []
             for row in rows:
@@ -71,7 +121,7 @@ class WorkoutService:
                 })
             
             # Кэшируем результат
-            self._cache[cache_key] = result
+            self._cache.set(cache_key, result)
             bot_logger.info(f"Loaded {len(result)} training types for language {language}")
             
             return result
@@ -80,7 +130,7 @@ class WorkoutService:
             bot_logger.error(f"Error loading training types: {e}")
             raise
     
-    def get_training_by_id(self, training_id: int, language: str = 'ru') -> Optional[Dict]:
+    async def get_training_by_id(self, training_id: int, language: str = 'ru') -> Optional[Dict]:
         """
         Получить информацию о конкретной тренировке
         
@@ -91,13 +141,13 @@ class WorkoutService:
         Returns:
             Словарь с информацией о тренировке или None
         """
-        trainings = self.get_training_types(language)
+        trainings = await self.get_training_types(language)
         for training in trainings:
             if training['id'] == training_id:
                 return training
         return None
     
-    def get_training_name(self, training_id: int, language: str = 'ru') -> str:
+    async def get_training_name(self, training_id: int, language: str = 'ru') -> str:
         """
         Получить название тренировки на нужном языке
         
@@ -108,13 +158,13 @@ class WorkoutService:
         Returns:
             Название тренировки
         """
-        training = self.get_training_by_id(training_id, language)
+        training = await self.get_training_by_id(training_id, language)
         if training:
             emoji = training['emoji'] + ' ' if training['emoji'] else ''
             return f"{emoji}{training['name']}"
         return "Unknown"
     
-    def get_user_parameters(self, user_id: int) -> Optional[Dict]:
+    async def get_user_parameters(self, user_id: int) -> Optional[Dict]:
         """
         Получить параметры пользователя для расчета калорий
         
@@ -133,13 +183,12 @@ class WorkoutService:
                     um.user_sex as gender
                 FROM user_health uh
                 JOIN user_main um ON um.user_id = uh.user_id
-                WHERE uh.user_id = %s
+                WHERE uh.user_id = $1
                 ORDER BY uh.date DESC
                 LIMIT 1
             """
             
-            self.cursor.execute(query, (user_id,))
-            row = self.cursor.fetchone()
+            row = await self.pool.fetchrow(query, user_id)
             
             if not row:
                 bot_logger.warning(f"No parameters found for user {user_id}")
@@ -159,7 +208,7 @@ class WorkoutService:
             bot_logger.error(f"Error getting user parameters: {e}")
             return None
     
-    def calculate_training_calories(
+    async def calculate_training_calories(
         self, 
         training_id: int, 
         user_id: int, 
@@ -185,11 +234,10 @@ class WorkoutService:
             
             # Вызываем функцию PostgreSQL для расчета
             query = """
-                SELECT calculate_training_calories(%s, %s, %s)
+                SELECT calculate_training_calories($1, $2, $3)
             """
             
-            self.cursor.execute(query, (training_id, user_id, duration_minutes))
-            result = self.cursor.fetchone()
+            result = await self.pool.fetchrow(query, training_id, user_id, duration_minutes)
             
             if result and result[0]:
                 calories = round(float(result[0]), 3)
@@ -206,17 +254,17 @@ class WorkoutService:
             bot_logger.error(f"Error calculating calories: {e}")
             return None
     
-    def save_training(
+    async def save_training(
         self,
         user_id: int,
         training_id: int,
         training_name: str,
         duration_minutes: int,
         calories: float,
-        date: Optional[str] = None
-    ) -> bool:
+        date: Optional[Union[str, date_type]] = None
+    ) -> Optional[Dict]:
         """
-        Сохранить тренировку в БД
+        Сохранить тренировку в БД и вернуть итоги дня одним запросом
         
         Args:
             user_id: ID пользователя
@@ -227,42 +275,143 @@ class WorkoutService:
             date: Дата тренировки (по умолчанию сегодня)
             
         Returns:
-            True если успешно сохранено, False в случае ошибки
+            {'day_calories', 'day_minutes'} с учётом новой тренировки или None в случае ошибки
         """
         if date is None:
-            date = datetime.now().strftime('%Y-%m-%d')
+            date = date_type.today()
+        elif isinstance(date, str):
+            date = datetime.strptime(date, '%Y-%m-%d').date()
         
         try:
+            # Основной запрос CTE не видит вставленную строку (общий снимок),
+            # поэтому новую тренировку прибавляем к сумме явно
             query = """
-                INSERT INTO user_training (
-                    user_id, 
-                    training_type_id, 
-                    training_name, 
-                    date, 
-                    tren_time, 
-                    training_cal
+                WITH ins AS (
+                    INSERT INTO user_training (
+                        user_id, 
+                        training_type_id, 
+                        training_name, 
+                        date, 
+                        tren_time, 
+                        training_cal
+                    )
+                    VALUES ($1, $2, $3, $4, $5, $6)
+                    RETURNING tren_time, training_cal
                 )
-                VALUES (%s, %s, %s, %s, %s, %s)
+                SELECT
+                    COALESCE(SUM(ut.training_cal), 0) + (SELECT training_cal FROM ins),
+                    COALESCE(SUM(ut.tren_time), 0) + (SELECT tren_time FROM ins)
+                FROM user_training ut
+                WHERE ut.user_id = $1 AND ut.date = $4
             """
             
-            self.cursor.execute(
+            row = await self.pool.fetchrow(
                 query,
-                (user_id, training_id, training_name, date, duration_minutes, calories)
+                user_id, training_id, training_name, date, duration_minutes, calories
             )
-            self.conn.commit()
             
             bot_logger.info(
                 f"Training saved: user={user_id}, training={training_name}, "
                 f"duration={duration_minutes}min, calories={calories}kcal"
             )
-            return True
+            return {
+                'day_calories': float(row[0] or 0),
+                'day_minutes': int(row[1] or 0),
+            }
             
         except Exception as e:
             bot_logger.error(f"Error saving training: {e}")
-            self.conn.rollback()
-            return False
+            return None
     
-    def get_today_total_calories(self, user_id: int) -> float:
+    async def log_training(
+        self,
+        user_id: int,
+        training_id: int,
+        training_name: str,
+        duration_minutes: int
+    ) -> Dict:
+        """
+        Шаг ввода длительности за один запрос к БД: проверяет дневной лимит и
+        наличие веса за сегодня, считает калории, сохраняет тренировку и
+        возвращает итоги дня
+        
+        Args:
+            user_id: ID пользователя
+            training_id: ID типа тренировки
+            training_name: Название тренировки (на языке пользователя)
+            duration_minutes: Длительность в минутах
+            
+        Returns:
+            Словарь со статусом: 'saved', 'limit_exceeded', 'weight_required',
+            'calculation_failed' или 'error', а также calories, day_minutes и
+            day_calories (итоги дня с учётом новой тренировки, если она сохранена)
+        """
+        query = """
+            WITH day AS (
+                SELECT
+                    COALESCE(SUM(tren_time), 0) AS minutes,
+                    COALESCE(SUM(training_cal), 0) AS calories
+                FROM user_training
+                WHERE user_id = $1 AND date = CURRENT_DATE
+            ),
+            weight AS (
+                SELECT EXISTS (
+                    SELECT 1 FROM user_health
+                    WHERE user_id = $1 AND date = CURRENT_DATE AND weight IS NOT NULL
+                ) AS present
+            ),
+            calc AS (
+                SELECT CASE WHEN weight.present
+                            THEN calculate_training_calories($2, $1, $4)
+                       END AS calories
+                FROM weight
+            ),
+            ins AS (
+                INSERT INTO user_training (
+                    user_id, training_type_id, training_name, date, tren_time, training_cal
+                )
+                SELECT $1, $2, $3, CURRENT_DATE, $4, calc.calories
+                FROM day, calc
+                WHERE calc.calories IS NOT NULL AND day.minutes + $4 <= $5
+                RETURNING training_cal
+            )
+            SELECT day.minutes, day.calories, weight.present, calc.calories,
+                   (SELECT training_cal FROM ins) AS saved_calories
+            FROM day, weight, calc
+        """
+        try:
+            row = await self.pool.fetchrow(
+                query, user_id, training_id, training_name, duration_minutes, DAILY_DURATION_LIMIT
+            )
+        except Exception as e:
+            bot_logger.error(f"Error logging training: {e}")
+            return {'status': 'error'}
+        
+        day_minutes = int(row[0])
+        day_calories = float(row[1])
+        result = {'day_minutes': day_minutes, 'day_calories': day_calories, 'calories': None}
+        
+        if day_minutes + duration_minutes > DAILY_DURATION_LIMIT:
+            result['status'] = 'limit_exceeded'
+        elif not row[2]:
+            result['status'] = 'weight_required'
+        elif row[3] is None or row[4] is None:
+            result['status'] = 'calculation_failed'
+        else:
+            calories = float(row[4])
+            result.update(
+                status='saved',
+                calories=calories,
+                day_minutes=day_minutes + duration_minutes,
+                day_calories=day_calories + calories,
+            )
+            bot_logger.info(
+                f"Training saved: user={user_id}, training={training_name}, "
+                f"duration={duration_minutes}min, calories={calories}kcal"
+            )
+        return result
+    
+    async def get_today_total_calories(self, user_id: int) -> float:
         """
         Получить суммарные калории за сегодня
         
@@ -276,11 +425,10 @@ class WorkoutService:
             query = """
                 SELECT COALESCE(SUM(training_cal), 0) 
                 FROM user_training 
-                WHERE date = CURRENT_DATE AND user_id = %s
+                WHERE date = CURRENT_DATE AND user_id = $1
             """
             
-            self.cursor.execute(query, (user_id,))
-            result = self.cursor.fetchone()
+            result = await self.pool.fetchrow(query, user_id)
             
             return float(result[0]) if result else 0.0
             
@@ -288,7 +436,7 @@ class WorkoutService:
             bot_logger.error(f"Error getting today's total calories: {e}")
             return 0.0
     
-    def get_today_total_duration(self, user_id: int) -> int:
+    async def get_today_total_duration(self, user_id: int) -> int:
         """
         Получить суммарную длительность тренировок за сегодня
         
@@ -302,11 +450,10 @@ class WorkoutService:
             query = """
                 SELECT COALESCE(SUM(tren_time), 0) 
                 FROM user_training 
-                WHERE date = CURRENT_DATE AND user_id = %s
+                WHERE date = CURRENT_DATE AND user_id = $1
             """
             
-            self.cursor.execute(query, (user_id,))
-            result = self.cursor.fetchone()
+            result = await self.pool.fetchrow(query, user_id)
             
             return int(result[0]) if result else 0
             
@@ -314,11 +461,11 @@ class WorkoutService:
             bot_logger.error(f"Error getting today's total duration: {e}")
             return 0
     
-    def get_trainings_by_period(
+    async def get_trainings_by_period(
         self,
         user_id: int,
-        start_date: str,
-        end_date: str
+        start_date: Union[str, date_type],
+        end_date: Union[str, date_type]
     ) -> List[Dict]:
         """
         Получить список тренировок за период
@@ -339,14 +486,17 @@ class WorkoutService:
                     tren_time,
                     training_cal
                 FROM user_training
-                WHERE user_id = %s 
-                    AND date >= %s 
-                    AND date <= %s
+                WHERE user_id = $1 
+                    AND date >= $2 
+                    AND date <= $3
                 ORDER BY date DESC, id DESC
             """
             
-            self.cursor.execute(query, (user_id, start_date, end_date))
-            rows = self.cursor.fetchall()
+            if isinstance(start_date, str):
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            if isinstance(end_date, str):
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            rows = await self.pool.fetch(query, user_id, start_date, end_date)
             
             result = []
             for row in rows:
@@ -363,7 +513,7 @@ class WorkoutService:
             bot_logger.error(f"Error getting trainings by period: {e}")
             return []
     
-    def get_training_statistics(self, user_id: int, days: int = 30) -> Dict:
+    async def get_training_statistics(self, user_id: int, days: int = 30) -> Dict:
         """
         Получить статистику тренировок пользователя
         
@@ -384,15 +534,14 @@ class WorkoutService:
                     training_name,
                     COUNT(*) as training_count
                 FROM user_training
-                WHERE user_id = %s 
-                    AND date >= CURRENT_DATE - INTERVAL '%s days'
+                WHERE user_id = $1 
+                    AND date >= CURRENT_DATE - $2::int
                 GROUP BY training_name
                 ORDER BY training_count DESC
                 LIMIT 3
             """
             
-            self.cursor.execute(query, (user_id, days))
-            rows = self.cursor.fetchall()
+            rows = await self.pool.fetch(query, user_id, days)
             
             # Также получаем общую статистику
             query_total = """
@@ -401,12 +550,11 @@ class WorkoutService:
                     SUM(tren_time) as total_minutes,
                     SUM(training_cal) as total_calories
                 FROM user_training
-                WHERE user_id = %s 
-                    AND date >= CURRENT_DATE - INTERVAL '%s days'
+                WHERE user_id = $1 
+                    AND date >= CURRENT_DATE - $2::int
             """
             
-            self.cursor.execute(query_total, (user_id, days))
-            total = self.cursor.fetchone()
+            total = await self.pool.fetchrow(query_total, user_id, days)
             
             top_trainings = []
             for row in rows:
@@ -437,6 +585,37 @@ class WorkoutService:
         bot_logger.debug("Training cache cleared")
 
 
+def _on_training_types_changed(connection, pid, channel, payload):
+    training_types_cache.clear()
+    bot_logger.info("training_types changed, training cache cleared")
+
+
+async def listen_for_training_type_changes(db_pool: asyncpg.Pool) -> asyncpg.Connection:
+    """
+    Подписывается на NOTIFY training_types_changed и сбрасывает кэш справочника
+    
+    Держит одно соединение пула до вызова stop_listening_for_training_type_changes.
+    
+    Args:
+        db_pool: Пул подключений к БД
+        
+    Returns:
+        Соединение, на котором висит LISTEN
+    """
+    conn = await db_pool.acquire()
+    await conn.add_listener(TRAINING_TYPES_CHANNEL, _on_training_types_changed)
+    return conn
+
+
+async def stop_listening_for_training_type_changes(db_pool: asyncpg.Pool, conn: asyncpg.Connection) -> None:
+    """Снимает подписку и возвращает соединение в пул"""
+    try:
+        await conn.remove_listener(TRAINING_TYPES_CHANNEL, _on_training_types_changed)
+    except Exception:
+        pass
+    await db_pool.release(conn)
+
+
 # Вспомогательные функции для работы вне класса
 
 def format_training_summary(trainings: List[Dict], language: str = 'ru') -> str:
@@ -468,16 +647,16 @@ def format_training_summary(trainings: List[Dict], language: str = 'ru') -> str:
     return '\n'.join(lines)
 
 
-def get_workout_service(db_connection) -> WorkoutService:
+def get_workout_service(db_pool: asyncpg.Pool) -> WorkoutService:
     """
     Фабричная функция для создания сервиса
     
     Args:
-        db_connection: Подключение к БД
+        db_pool: Пул подключений к БД
         
     Returns:
         Экземпляр WorkoutService
     """
-    return WorkoutService(db_connection)
+    return WorkoutService(db_pool)
 
 
@@ -0,0 +1,64 @@
+"""
+Хранилище FSM для Telegram-бота.
+
+По умолчанию состояние и данные FSM лежат в Redis (config.get_redis_url()),
+поэтому несколько реплик бота видят один и тот же сценарий пользователя, а
+рестарт не обрывает регистрацию/ввод еды посреди шага. Брошенные состояния
+истекают по FSM_STATE_TTL / FSM_DATA_TTL.
+
+Данные сериализуются компактным JSON (без пробелов, кириллица без \\uXXXX).
+В state кладём только простые значения: Decimal из БД приводится к float.
+"""
+import json
+from decimal import Decimal
+
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage, DisabledEventIsolation
+from aiogram.fsm.storage.redis import RedisStorage
+
+from config import config
+from logger_setup import bot_logger
+
+KEY_PREFIX = "bot_fsm"
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable in FSM data")
+
+
+def dumps(data) -> str:
+    """Компактная сериализация данных FSM."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def loads(raw):
+    return json.loads(raw)
+
+
+def create_fsm_storage() -> tuple[BaseStorage, BaseEventIsolation]:
+    """
+    Создаёт хранилище FSM и изоляцию событий согласно config.FSM_STORAGE.
+
+    Returns:
+        (storage, events_isolation) для Dispatcher. Для Redis изоляция —
+        распределённый лок на ключ пользователя, чтобы апдейты одного чата
+        не обрабатывались параллельно на разных репликах.
+    """
+    if config.FSM_STORAGE != "redis":
+        bot_logger.info("FSM storage: memory (state is local to this process)")
+        return MemoryStorage(), DisabledEventIsolation()
+
+    storage = RedisStorage.from_url(
+        config.get_redis_url(),
+        key_builder=DefaultKeyBuilder(prefix=KEY_PREFIX),
+        state_ttl=config.FSM_STATE_TTL,
+        data_ttl=config.FSM_DATA_TTL,
+        json_dumps=dumps,
+        json_loads=loads,
+    )
+    bot_logger.info(
+        f"FSM storage: redis (state_ttl={config.FSM_STATE_TTL}s, data_ttl={config.FSM_DATA_TTL}s)"
+    )
+    return storage, storage.create_isolation()
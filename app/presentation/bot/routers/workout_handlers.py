@@ -8,7 +8,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram import types
 from typing import Optional
-import psycopg2
+import asyncpg
 
 # Импорты из других модулей проекта
 from logger_setup import bot_logger
@@ -40,21 +40,18 @@ workout_router = Router(name='workout_router')
 # Вспомогательные функции
 # ============================================
 
-def get_user_language(user_id: int, cursor) -> str:
+async def get_user_language(user_id: int) -> str:
     """
-    Получить язык пользователя из БД
+    Получить язык пользователя (из общего кэша main_mo)
     
     Args:
         user_id: ID пользователя
-        cursor: Курсор БД
         
     Returns:
         Код языка (ru, en, de, fr, es)
     """
     try:
-        cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (user_id,))
-        result = cursor.fetchone()
-        return result[0] if result else 'ru'
+        return await l.load_user_lang(user_id)
     except Exception as e:
         bot_logger.error(f"Error getting user language: {e}")
         return 'ru'
@@ -64,8 +61,7 @@ async def send_workout_list(
     message: Message,
     user_id: int,
     page: int,
-    workout_service: WorkoutService,
-    cursor
+    workout_service: WorkoutService
 ):
     """
     Отправить пользователю список тренировок
@@ -75,12 +71,11 @@ async def send_workout_list(
         user_id: ID пользователя
         page: Номер страницы
         workout_service: Сервис тренировок
-        cursor: Курсор БД
     """
-    language = get_user_language(user_id, cursor)
+    language = await get_user_language(user_id)
     
     # Получаем список тренировок
-    trainings = workout_service.get_training_types(language=language)
+    trainings = await workout_service.get_training_types(language=language)
     
     if not trainings:
         await message.answer(
@@ -104,8 +99,7 @@ async def edit_workout_list(
     callback: CallbackQuery,
     user_id: int,
     page: int,
-    workout_service: WorkoutService,
-    cursor
+    workout_service: WorkoutService
 ):
     """
     Редактировать сообщение со списком тренировок (при пагинации)
@@ -115,12 +109,11 @@ async def edit_workout_list(
         user_id: ID пользователя
         page: Номер страницы
         workout_service: Сервис тренировок
-        cursor: Курсор БД
     """
-    language = get_user_language(user_id, cursor)
+    language = await get_user_language(user_id)
     
     # Получаем список тренировок
-    trainings = workout_service.get_training_types(language=language)
+    trainings = await workout_service.get_training_types(language=language)
     
     # Создаем клавиатуру
     keyboard_gen = WorkoutKeyboards(language=language)
@@ -138,6 +131,48 @@ async def edit_workout_list(
     await callback.answer()
 
 
+async def send_training_result(
+    message: Message,
+    state: FSMContext,
+    user_id: int,
+    result: dict,
+    workout_display_name: str,
+    duration: int
+):
+    """
+    Отправить итог сохранения тренировки (результат WorkoutService.log_training)
+    
+    Args:
+        message: Сообщение пользователя
+        state: FSM контекст (очищается)
+        user_id: ID пользователя
+        result: Результат log_training
+        workout_display_name: Название тренировки с эмодзи
+        duration: Длительность в минутах
+    """
+    if result['status'] != 'saved':
+        await message.answer("❌ Ошибка сохранения тренировки")
+        await state.clear()
+        return
+    
+    # Отправляем результат
+    result_text = (
+        f"🎉 Отлично!\n\n"
+        f"<b>{workout_display_name}</b>\n"
+        f"⏱ {duration} мин\n"
+        f"🔥 {result['calories']:.1f} ккал\n\n"
+        f"Всего за сегодня: <b>{result['day_calories']:.1f} ккал</b>"
+    )
+    
+    await message.answer(
+        result_text,
+        reply_markup=kb.keyboard(user_id, 'main_menu')
+    )
+    
+    # Очищаем состояние
+    await state.clear()
+
+
 # ============================================
 # Обработчики
 # ============================================
@@ -154,7 +189,7 @@ async def edit_workout_list(
 async def start_workout_selection(
     message: Message, 
     state: FSMContext,
-    db_connection,
+    db_pool: asyncpg.Pool,
     workout_service: WorkoutService
 ):
     """
@@ -162,7 +197,6 @@ async def start_workout_selection(
     Показывает список доступных тренировок
     """
     user_id = message.from_user.id
-    cursor = db_connection.cursor()
     
     # Удаляем предыдущую клавиатуру
     await message.answer("⏳", reply_markup=types.ReplyKeyboardRemove())
@@ -172,8 +206,7 @@ async def start_workout_selection(
         message=message,
         user_id=user_id,
         page=0,
-        workout_service=workout_service,
-        cursor=cursor
+        workout_service=workout_service
     )
     
     # Устанавливаем состояние
@@ -187,14 +220,13 @@ async def start_workout_selection(
 async def handle_page_navigation(
     callback: CallbackQuery,
     state: FSMContext,
-    db_connection,
+    db_pool: asyncpg.Pool,
     workout_service: WorkoutService
 ):
     """
     Обработка навигации по страницам списка тренировок
     """
     user_id = callback.from_user.id
-    cursor = db_connection.cursor()
     
     # Парсим callback_data
     try:
@@ -214,8 +246,7 @@ async def handle_page_navigation(
         callback=callback,
         user_id=user_id,
         page=page,
-        workout_service=workout_service,
-        cursor=cursor
+        workout_service=workout_service
     )
     
     # Сохраняем текущую страницу
@@ -228,7 +259,7 @@ async def handle_page_navigation(
 async def handle_workout_selection(
     callback: CallbackQuery,
     state: FSMContext,
-    db_connection,
+    db_pool: asyncpg.Pool,
     workout_service: WorkoutService
 ):
     """
@@ -236,8 +267,7 @@ async def handle_workout_selection(
     Запрашивает длительность тренировки
     """
     user_id = callback.from_user.id
-    cursor = db_connection.cursor()
-    language = get_user_language(user_id, cursor)
+    language = await get_user_language(user_id)
     
     # Парсим ID тренировки
     try:
@@ -248,7 +278,7 @@ async def handle_workout_selection(
         return
     
     # Получаем информацию о тренировке
-    training = workout_service.get_training_by_id(workout_id, language)
+    training = await workout_service.get_training_by_id(workout_id, language)
     
     if not training:
         await callback.answer("❌ Тренировка не найдена")
@@ -289,7 +319,7 @@ async def handle_workout_selection(
 async def handle_duration_input(
     message: Message,
     state: FSMContext,
-    db_connection,
+    db_pool: asyncpg.Pool,
     workout_service: WorkoutService
 ):
     """
@@ -297,8 +327,7 @@ async def handle_duration_input(
     Рассчитывает калории и сохраняет тренировку
     """
     user_id = message.from_user.id
-    cursor = db_connection.cursor()
-    language = get_user_language(user_id, cursor)
+    language = await get_user_language(user_id)
     
     # Создаем клавиатуру с кнопками отмены
     keyboard_gen = WorkoutKeyboards(language)
@@ -321,15 +350,6 @@ async def handle_duration_input(
         )
         return
     
-    # Проверяем суммарную длительность за день (не более 24 часов)
-    today_total = workout_service.get_today_total_duration(user_id)
-    if today_total + duration > 1440:  # 24 часа = 1440 минут
-        await message.answer(
-            l.printer(user_id, 'validation_daily_limit_exceeded').format(today_total, duration),
-            reply_markup=cancel_keyboard
-        )
-        return
-    
     # Получаем данные о выбранной тренировке
     data = await state.get_data()
     workout_id = data.get('selected_workout_id')
@@ -341,14 +361,24 @@ async def handle_duration_input(
         await state.clear()
         return
     
-    # Проверяем наличие веса пользователя
-    cursor.execute(
-        "SELECT weight FROM user_health WHERE user_id = %s AND date = CURRENT_DATE",
-        (user_id,)
+    # Лимит за день, наличие веса, расчет калорий и сохранение — один запрос к БД
+    workout_display_name = f"{workout_emoji} {workout_name}" if workout_emoji else workout_name
+    result = await workout_service.log_training(
+        user_id=user_id,
+        training_id=workout_id,
+        training_name=workout_display_name,
+        duration_minutes=duration
     )
-    weight_row = cursor.fetchone()
     
-    if not weight_row or weight_row[0] is None:
+    if result['status'] == 'limit_exceeded':
+        # Суммарная длительность за день не более 24 часов
+        await message.answer(
+            l.printer(user_id, 'validation_daily_limit_exceeded').format(result['day_minutes'], duration),
+            reply_markup=cancel_keyboard
+        )
+        return
+    
+    if result['status'] == 'weight_required':
         # Запрашиваем вес
         await message.answer(
             l.printer(user_id, 'weight')
@@ -357,59 +387,18 @@ async def handle_duration_input(
         await state.update_data(duration=duration)
         return
     
-    # Рассчитываем калории
-    calories = workout_service.calculate_training_calories(
-        training_id=workout_id,
-        user_id=user_id,
-        duration_minutes=duration
-    )
-    
-    if calories is None:
+    if result['status'] == 'calculation_failed':
         await message.answer(
             "❌ Ошибка расчета калорий. Проверьте ваши параметры (вес, рост, возраст)."
         )
         await state.clear()
         return
     
-    # Сохраняем тренировку
-    workout_display_name = f"{workout_emoji} {workout_name}" if workout_emoji else workout_name
-    
-    success = workout_service.save_training(
-        user_id=user_id,
-        training_id=workout_id,
-        training_name=workout_display_name,
-        duration_minutes=duration,
-        calories=calories
-    )
-    
-    if not success:
-        await message.answer("❌ Ошибка сохранения тренировки")
-        await state.clear()
-        return
-    
-    # Получаем суммарные калории за день
-    total_calories = workout_service.get_today_total_calories(user_id)
-    
-    # Отправляем результат
-    result_text = (
-        f"🎉 Отлично!\n\n"
-        f"<b>{workout_display_name}</b>\n"
-        f"⏱ {duration} мин\n"
-        f"🔥 {calories:.1f} ккал\n\n"
-        f"Всего за сегодня: <b>{total_calories:.1f} ккал</b>"
-    )
-    
-    await message.answer(
-        result_text,
-        reply_markup=kb.keyboard(user_id, 'main_menu')
-    )
-    
-    # Очищаем состояние
-    await state.clear()
+    await send_training_result(message, state, user_id, result, workout_display_name, duration)
     
     bot_logger.info(
         f"User {user_id} completed workout: {workout_name}, "
-        f"duration={duration}min, calories={calories}kcal"
+        f"duration={duration}min, calories={result.get('calories')}kcal"
     )
 
 
@@ -417,15 +406,14 @@ async def handle_duration_input(
 async def handle_weight_input_for_workout(
     message: Message,
     state: FSMContext,
-    db_connection,
+    db_pool: asyncpg.Pool,
     workout_service: WorkoutService
 ):
     """
     Обработка ввода веса при добавлении тренировки
     """
     user_id = message.from_user.id
-    cursor = db_connection.cursor()
-    language = get_user_language(user_id, cursor)
+    language = await get_user_language(user_id)
     
     # Создаем клавиатуру с кнопками отмены
     keyboard_gen = WorkoutKeyboards(language)
@@ -451,23 +439,17 @@ async def handle_weight_input_for_workout(
     
     # Сохраняем вес
     try:
-        cursor.execute(
-            "SELECT 1 FROM user_health WHERE user_id = %s AND date = CURRENT_DATE",
-            (user_id,)
-        )
-        exists = cursor.fetchone() is not None
-        
-        if exists:
-            cursor.execute(
-                "UPDATE user_health SET weight = %s WHERE user_id = %s AND date = CURRENT_DATE",
-                (weight, user_id)
-            )
-        else:
-            cursor.execute(
-                "INSERT INTO user_health (user_id, date, weight) VALUES (%s, CURRENT_DATE, %s)",
-                (user_id, weight)
-            )
-        db_connection.commit()
+        async with db_pool.acquire() as conn:
+            async with conn.transaction():
+                updated = await conn.execute(
+                    "UPDATE user_health SET weight = $1 WHERE user_id = $2 AND date = CURRENT_DATE",
+                    weight, user_id
+                )
+                if updated == "UPDATE 0":
+                    await conn.execute(
+                        "INSERT INTO user_health (user_id, date, weight) VALUES ($1, CURRENT_DATE, $2)",
+                        user_id, weight
+                    )
     except Exception as e:
         bot_logger.error(f"Error saving weight: {e}")
         await message.answer("❌ Ошибка сохранения веса")
@@ -486,57 +468,33 @@ async def handle_weight_input_for_workout(
         await state.clear()
         return
     
-    # Рассчитываем калории
-    calories = workout_service.calculate_training_calories(
-        training_id=workout_id,
+    # Расчет калорий и сохранение — один запрос к БД
+    workout_display_name = f"{workout_emoji} {workout_name}" if workout_emoji else workout_name
+    result = await workout_service.log_training(
         user_id=user_id,
+        training_id=workout_id,
+        training_name=workout_display_name,
         duration_minutes=duration
     )
     
-    if calories is None:
+    if result['status'] in ('calculation_failed', 'weight_required'):
         await message.answer("❌ Ошибка расчета калорий")
         await state.clear()
         return
     
-    # Сохраняем тренировку
-    workout_display_name = f"{workout_emoji} {workout_name}" if workout_emoji else workout_name
-    
-    success = workout_service.save_training(
-        user_id=user_id,
-        training_id=workout_id,
-        training_name=workout_display_name,
-        duration_minutes=duration,
-        calories=calories
-    )
-    
-    if not success:
-        await message.answer("❌ Ошибка сохранения тренировки")
+    if result['status'] == 'limit_exceeded':
+        await message.answer(
+            l.printer(user_id, 'validation_daily_limit_exceeded').format(result['day_minutes'], duration),
+            reply_markup=kb.keyboard(user_id, 'main_menu')
+        )
         await state.clear()
         return
     
-    # Получаем суммарные калории за день
-    total_calories = workout_service.get_today_total_calories(user_id)
-    
-    # Отправляем результат
-    result_text = (
-        f"🎉 Отлично!\n\n"
-        f"<b>{workout_display_name}</b>\n"
-        f"⏱ {duration} мин\n"
-        f"🔥 {calories:.1f} ккал\n\n"
-        f"Всего за сегодня: <b>{total_calories:.1f} ккал</b>"
-    )
-    
-    await message.answer(
-        result_text,
-        reply_markup=kb.keyboard(user_id, 'main_menu')
-    )
-    
-    # Очищаем состояние
-    await state.clear()
+    await send_training_result(message, state, user_id, result, workout_display_name, duration)
     
     bot_logger.info(
         f"User {user_id} completed workout after weight input: {workout_name}, "
-        f"duration={duration}min, calories={calories}kcal"
+        f"duration={duration}min, calories={result.get('calories')}kcal"
     )
 
 
@@ -0,0 +1,174 @@
+"""
+Webhook-режим Telegram-бота.
+
+При long polling апдейты забирает один процесс (Telegram не отдаёт
+getUpdates двум потребителям одного токена), так что реплики с общим
+Redis-FSM поднять нельзя. В webhook-режиме Telegram сам шлёт апдейты на
+TELEGRAM_WEBHOOK_URL, и их может принимать любая реплика за балансировщиком.
+
+Повторяет backend (telegram_bot/update_queue.py и
+app/routers/telegram_webhook.py), только на aiohttp, потому что у бота нет
+FastAPI-приложения:
+
+* эндпоинт проверяет X-Telegram-Bot-Api-Secret-Token (hmac.compare_digest),
+  разбирает Update и кладёт его в очередь: 401 на чужой секрет, 400 на
+  битое тело (Telegram не будет его повторять), 503 если очередь полна
+  (Telegram повторит позже);
+* UpdateQueue — N воркеров, у каждого своя ограниченная очередь; чат всегда
+  попадает к одному воркеру, поэтому апдейты одного чата обрабатываются по
+  порядку, а разные чаты — параллельно.
+"""
+import asyncio
+import hmac
+import json
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlparse
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+from config import config
+from logger_setup import bot_logger
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+Handler = Callable[[Any], Awaitable[Any]]
+
+
+def chat_key(update: Any) -> int:
+    """Id, по которому упорядочиваются апдейты (чат, потом пользователь, потом апдейт)."""
+    try:
+        event = getattr(update, "event", None)
+    except LookupError:  # UpdateTypeLookupError aiogram: неизвестный тип события
+        event = None
+    if event is not None:
+        chat = getattr(event, "chat", None)
+        if chat is None:
+            message = getattr(event, "message", None)
+            chat = getattr(message, "chat", None)
+        if chat is not None:
+            return chat.id
+        from_user = getattr(event, "from_user", None) or getattr(event, "user", None)
+        if from_user is not None:
+            return from_user.id
+    return getattr(update, "update_id", 0)
+
+
+class UpdateQueue:
+    def __init__(
+        self,
+        handler: Handler,
+        *,
+        workers: int = 8,
+        maxsize: int = 1000,
+        enqueue_timeout: float = 2.0,
+        key: Callable[[Any], int] = chat_key,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self._handler = handler
+        self._key = key
+        self._enqueue_timeout = enqueue_timeout
+        per_worker = max(1, maxsize // workers)
+        self._queues: list[asyncio.Queue] = [asyncio.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(q), name=f"tg-update-worker-{i}")
+            for i, q in enumerate(self._queues)
+        ]
+
+    async def put(self, update: Any) -> bool:
+        """Кладёт апдейт в очередь; False — очередь так и не освободилась."""
+        queue = self._queues[self._key(update) % len(self._queues)]
+        try:
+            await asyncio.wait_for(queue.put(update), timeout=self._enqueue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self._handler(update)
+            except Exception as e:
+                bot_logger.error(f"Update handling failed: {e}")
+            finally:
+                queue.task_done()
+
+    async def stop(self, drain_timeout: Optional[float] = 10.0) -> None:
+        """Даёт воркерам доделать то, что уже в очереди (не дольше drain_timeout)."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.join() for q in self._queues)), timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            bot_logger.warning(f"Update queue drain timed out, {self.depth} updates dropped")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def create_app(bot: Bot, queue: UpdateQueue, secret: str, path: str) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        if not secret or not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+            return web.Response(status=401, text="Invalid secret token")
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except (json.JSONDecodeError, UnicodeDecodeError, ValidationError):
+            return web.Response(status=400, text="Malformed update")
+        if not await queue.put(update):
+            return web.Response(status=503, text="Update queue is full")
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """Принимает апдейты по вебхуку, пока процесс не остановят."""
+    queue = UpdateQueue(
+        lambda update: dp.feed_update(bot, update),
+        workers=config.TELEGRAM_WEBHOOK_WORKERS,
+        maxsize=config.TELEGRAM_WEBHOOK_QUEUE_SIZE,
+        enqueue_timeout=config.TELEGRAM_WEBHOOK_ENQUEUE_TIMEOUT,
+    )
+    path = urlparse(config.TELEGRAM_WEBHOOK_URL).path or "/"
+    runner = web.AppRunner(create_app(bot, queue, config.TELEGRAM_WEBHOOK_SECRET, path))
+
+    await dp.emit_startup(bot=bot)
+    queue.start()
+    await runner.setup()
+    await web.TCPSite(runner, config.TELEGRAM_WEBHOOK_HOST, config.TELEGRAM_WEBHOOK_PORT).start()
+    try:
+        await bot.set_webhook(
+            config.TELEGRAM_WEBHOOK_URL,
+            secret_token=config.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=100,
+        )
+        bot_logger.info(
+            f"Bot started in webhook mode on {config.TELEGRAM_WEBHOOK_HOST}:{config.TELEGRAM_WEBHOOK_PORT}{path} "
+            f"({config.TELEGRAM_WEBHOOK_WORKERS} workers)"
+        )
+        await asyncio.Event().wait()
+    finally:
+        # Вебхук остаётся зарегистрированным: другие реплики продолжают принимать апдейты.
+        await runner.cleanup()
+        await queue.stop()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
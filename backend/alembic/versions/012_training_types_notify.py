@@ -0,0 +1,45 @@
+"""Notify listeners when the training_types catalog changes.
+
+Revision ID: 012_training_types_notify
+Revises: 011_admin_control_plane
+Create Date: 2026-10-17
+
+The Telegram bot caches training_types per process. Admin edits go through
+the backend (or psql), so instead of wiring every write path we fire a
+statement-level trigger that sends ``NOTIFY training_types_changed``; the
+bot LISTENs on that channel and drops its cache immediately.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "012_training_types_notify"
+down_revision: Union[str, None] = "011_admin_control_plane"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_training_types_changed() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('training_types_changed', TG_OP);
+            RETURN NULL;
+        END;
+        $$;
+        """
+    )
+    op.execute("DROP TRIGGER IF EXISTS trg_training_types_notify ON training_types;")
+    op.execute(
+        """
+        CREATE TRIGGER trg_training_types_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON training_types
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_training_types_changed();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_training_types_notify ON training_types;")
+    op.execute("DROP FUNCTION IF EXISTS notify_training_types_changed();")
@@ -0,0 +1,265 @@
+"""Per-user daily rollup (user_daily_stats) maintained by triggers.
+
+Revision ID: 013_user_daily_stats
+Revises: 012_training_types_notify
+Create Date: 2026-10-17
+
+Month/year summaries, the weekly digest, the AI coach snapshot and the
+weight forecast used to re-aggregate the raw food / user_training / water
+rows on every request, which for long-time users means years of rows.
+``user_daily_stats`` keeps one small row per user per day instead.
+
+It is maintained by row-level triggers rather than by the backend
+repositories, because the legacy Telegram bot and admin table edits write
+to the same tables:
+
+* food / user_training apply deltas (subtract OLD, add NEW) with an
+  additive upsert, so concurrent inserts for the same day never lose
+  updates;
+* water has one row per (user_id, date), so its count is copied as is;
+* user_health may hold several rows per day on legacy installs, so the
+  day's weight is re-read (latest non-empty row) for the affected day.
+
+Existing data is loaded by this migration, after the triggers are
+created: CREATE TRIGGER holds a lock that blocks writes to the raw tables
+until the migration commits, so no write can land in both the backfill and
+a trigger. The readers switch to the rollup in this same revision, so it
+must not start empty. ``python -m app.cli.backfill_daily_stats`` rebuilds
+it later if it is ever suspected to have drifted.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "013_user_daily_stats"
+down_revision: Union[str, None] = "012_training_types_notify"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_daily_stats (
+            user_id BIGINT NOT NULL,
+            date DATE NOT NULL,
+            kcal NUMERIC(12, 3) NOT NULL DEFAULT 0,
+            protein NUMERIC(12, 3) NOT NULL DEFAULT 0,
+            fat NUMERIC(12, 3) NOT NULL DEFAULT 0,
+            carbs NUMERIC(12, 3) NOT NULL DEFAULT 0,
+            food_entries INT NOT NULL DEFAULT 0,
+            training_sessions INT NOT NULL DEFAULT 0,
+            training_minutes INT NOT NULL DEFAULT 0,
+            training_kcal NUMERIC(12, 3) NOT NULL DEFAULT 0,
+            water INT NOT NULL DEFAULT 0,
+            weight NUMERIC(5, 2),
+            PRIMARY KEY (user_id, date)
+        );
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION user_daily_stats_food() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND NEW.user_id IS NOT DISTINCT FROM OLD.user_id
+               AND NEW.date IS NOT DISTINCT FROM OLD.date
+               AND NEW.cal IS NOT DISTINCT FROM OLD.cal
+               AND NEW.b IS NOT DISTINCT FROM OLD.b
+               AND NEW.g IS NOT DISTINCT FROM OLD.g
+               AND NEW.u IS NOT DISTINCT FROM OLD.u THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL AND OLD.date IS NOT NULL THEN
+                INSERT INTO user_daily_stats AS s (user_id, date, kcal, protein, fat, carbs, food_entries)
+                VALUES (OLD.user_id, OLD.date, -COALESCE(OLD.cal, 0), -COALESCE(OLD.b, 0),
+                        -COALESCE(OLD.g, 0), -COALESCE(OLD.u, 0), -1)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    kcal = s.kcal + EXCLUDED.kcal,
+                    protein = s.protein + EXCLUDED.protein,
+                    fat = s.fat + EXCLUDED.fat,
+                    carbs = s.carbs + EXCLUDED.carbs,
+                    food_entries = s.food_entries + EXCLUDED.food_entries;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL AND NEW.date IS NOT NULL THEN
+                INSERT INTO user_daily_stats AS s (user_id, date, kcal, protein, fat, carbs, food_entries)
+                VALUES (NEW.user_id, NEW.date, COALESCE(NEW.cal, 0), COALESCE(NEW.b, 0),
+                        COALESCE(NEW.g, 0), COALESCE(NEW.u, 0), 1)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    kcal = s.kcal + EXCLUDED.kcal,
+                    protein = s.protein + EXCLUDED.protein,
+                    fat = s.fat + EXCLUDED.fat,
+                    carbs = s.carbs + EXCLUDED.carbs,
+                    food_entries = s.food_entries + EXCLUDED.food_entries;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION user_daily_stats_training() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND NEW.user_id IS NOT DISTINCT FROM OLD.user_id
+               AND NEW.date IS NOT DISTINCT FROM OLD.date
+               AND NEW.tren_time IS NOT DISTINCT FROM OLD.tren_time
+               AND NEW.training_cal IS NOT DISTINCT FROM OLD.training_cal THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL AND OLD.date IS NOT NULL THEN
+                INSERT INTO user_daily_stats AS s (user_id, date, training_sessions, training_minutes, training_kcal)
+                VALUES (OLD.user_id, OLD.date, -1, -COALESCE(OLD.tren_time, 0), -COALESCE(OLD.training_cal, 0))
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    training_sessions = s.training_sessions + EXCLUDED.training_sessions,
+                    training_minutes = s.training_minutes + EXCLUDED.training_minutes,
+                    training_kcal = s.training_kcal + EXCLUDED.training_kcal;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL AND NEW.date IS NOT NULL THEN
+                INSERT INTO user_daily_stats AS s (user_id, date, training_sessions, training_minutes, training_kcal)
+                VALUES (NEW.user_id, NEW.date, 1, COALESCE(NEW.tren_time, 0), COALESCE(NEW.training_cal, 0))
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    training_sessions = s.training_sessions + EXCLUDED.training_sessions,
+                    training_minutes = s.training_minutes + EXCLUDED.training_minutes,
+                    training_kcal = s.training_kcal + EXCLUDED.training_kcal;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION user_daily_stats_water() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE user_daily_stats SET water = 0
+                WHERE user_id = OLD.user_id AND date = OLD.date;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO user_daily_stats AS s (user_id, date, water)
+                VALUES (NEW.user_id, NEW.date, COALESCE(NEW.count, 0))
+                ON CONFLICT (user_id, date) DO UPDATE SET water = EXCLUDED.water;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION user_daily_stats_refresh_weight(p_user_id BIGINT, p_date DATE)
+            RETURNS void LANGUAGE sql AS $$
+            INSERT INTO user_daily_stats AS s (user_id, date, weight)
+            VALUES (
+                p_user_id, p_date,
+                (SELECT weight FROM user_health
+                 WHERE user_id = p_user_id AND date = p_date AND weight > 0
+                 ORDER BY id DESC LIMIT 1)
+            )
+            ON CONFLICT (user_id, date) DO UPDATE SET weight = EXCLUDED.weight;
+        $$;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION user_daily_stats_weight() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND NEW.user_id IS NOT DISTINCT FROM OLD.user_id
+               AND NEW.date IS NOT DISTINCT FROM OLD.date
+               AND NEW.weight IS NOT DISTINCT FROM OLD.weight THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL AND OLD.date IS NOT NULL THEN
+                PERFORM user_daily_stats_refresh_weight(OLD.user_id, OLD.date);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL AND NEW.date IS NOT NULL
+               AND (TG_OP = 'INSERT' OR NEW.user_id <> OLD.user_id OR NEW.date <> OLD.date
+                    OR OLD.user_id IS NULL OR OLD.date IS NULL) THEN
+                PERFORM user_daily_stats_refresh_weight(NEW.user_id, NEW.date);
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        """
+    )
+
+    for table, function in (
+        ("food", "user_daily_stats_food"),
+        ("user_training", "user_daily_stats_training"),
+        ("water", "user_daily_stats_water"),
+        ("user_health", "user_daily_stats_weight"),
+    ):
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_daily_stats ON {table};")
+        op.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_daily_stats
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {function}();
+            """
+        )
+
+    # Same aggregation as DailyStatsRepository.backfill, for every user.
+    op.execute("DELETE FROM user_daily_stats;")
+    op.execute(
+        """
+        INSERT INTO user_daily_stats (
+            user_id, date, kcal, protein, fat, carbs, food_entries,
+            training_sessions, training_minutes, training_kcal, water, weight
+        )
+        SELECT user_id, date,
+               COALESCE(SUM(kcal), 0), COALESCE(SUM(protein), 0),
+               COALESCE(SUM(fat), 0), COALESCE(SUM(carbs), 0),
+               COALESCE(SUM(food_entries), 0),
+               COALESCE(SUM(training_sessions), 0),
+               COALESCE(SUM(training_minutes), 0),
+               COALESCE(SUM(training_kcal), 0),
+               COALESCE(SUM(water), 0),
+               MAX(weight)
+        FROM (
+            SELECT user_id, date, cal AS kcal, b AS protein, g AS fat, u AS carbs,
+                   1 AS food_entries, NULL::int AS training_sessions,
+                   NULL::int AS training_minutes, NULL::numeric AS training_kcal,
+                   NULL::int AS water, NULL::numeric AS weight
+            FROM food WHERE user_id IS NOT NULL AND date IS NOT NULL
+            UNION ALL
+            SELECT user_id, date, NULL, NULL, NULL, NULL, NULL,
+                   1, tren_time, training_cal, NULL, NULL
+            FROM user_training WHERE user_id IS NOT NULL AND date IS NOT NULL
+            UNION ALL
+            SELECT user_id, date, NULL, NULL, NULL, NULL, NULL,
+                   NULL, NULL, NULL, count, NULL
+            FROM water
+            UNION ALL
+            SELECT user_id, date, NULL, NULL, NULL, NULL, NULL,
+                   NULL, NULL, NULL, NULL, weight
+            FROM (
+                SELECT DISTINCT ON (user_id, date) user_id, date, weight
+                FROM user_health
+                WHERE user_id IS NOT NULL AND date IS NOT NULL AND weight > 0
+                ORDER BY user_id, date, id DESC
+            ) AS latest_weight
+        ) AS src
+        GROUP BY user_id, date;
+        """
+    )
+
+
+def downgrade() -> None:
+    for table in ("food", "user_training", "water", "user_health"):
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_daily_stats ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS user_daily_stats_food();")
+    op.execute("DROP FUNCTION IF EXISTS user_daily_stats_training();")
+    op.execute("DROP FUNCTION IF EXISTS user_daily_stats_water();")
+    op.execute("DROP FUNCTION IF EXISTS user_daily_stats_weight();")
+    op.execute("DROP FUNCTION IF EXISTS user_daily_stats_refresh_weight(BIGINT, DATE);")
+    op.execute("DROP TABLE IF EXISTS user_daily_stats;")
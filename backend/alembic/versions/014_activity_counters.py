@@ -0,0 +1,100 @@
+"""Per-user lifetime activity counters for the badge engine.
+
+Revision ID: 014_activity_counters
+Revises: 013_user_daily_stats
+Create Date: 2026-10-17
+
+Badge rules such as "first food entry" or "first workout" used to run
+``COUNT(*)`` over the user's whole history on every food save, water
+glass and workout. ``user_activity_counters`` keeps those lifetime totals
+in one row per user.
+
+The counters are fed by a trigger on ``user_daily_stats`` rather than on
+the raw tables: the rollup already turns every food / workout / water
+write into a per-day delta, and a rollup backfill (delete + re-insert)
+nets out to zero change here, so the counters stay correct through it.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "014_activity_counters"
+down_revision: Union[str, None] = "013_user_daily_stats"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_activity_counters (
+            user_id BIGINT PRIMARY KEY,
+            food_entries BIGINT NOT NULL DEFAULT 0,
+            workouts BIGINT NOT NULL DEFAULT 0,
+            water_glasses BIGINT NOT NULL DEFAULT 0
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION user_activity_counters_apply() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+        DECLARE
+            d_food BIGINT := 0;
+            d_workouts BIGINT := 0;
+            d_water BIGINT := 0;
+            uid BIGINT;
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                d_food := NEW.food_entries;
+                d_workouts := NEW.training_sessions;
+                d_water := NEW.water;
+                uid := NEW.user_id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                d_food := d_food - OLD.food_entries;
+                d_workouts := d_workouts - OLD.training_sessions;
+                d_water := d_water - OLD.water;
+                uid := OLD.user_id;
+            END IF;
+            IF d_food = 0 AND d_workouts = 0 AND d_water = 0 THEN
+                RETURN NULL;
+            END IF;
+            INSERT INTO user_activity_counters AS c (user_id, food_entries, workouts, water_glasses)
+            VALUES (uid, d_food, d_workouts, d_water)
+            ON CONFLICT (user_id) DO UPDATE SET
+                food_entries = c.food_entries + EXCLUDED.food_entries,
+                workouts = c.workouts + EXCLUDED.workouts,
+                water_glasses = c.water_glasses + EXCLUDED.water_glasses;
+            RETURN NULL;
+        END;
+        $$;
+        """
+    )
+    op.execute("DROP TRIGGER IF EXISTS trg_user_daily_stats_counters ON user_daily_stats;")
+    op.execute(
+        """
+        CREATE TRIGGER trg_user_daily_stats_counters
+            AFTER INSERT OR UPDATE OR DELETE ON user_daily_stats
+            FOR EACH ROW EXECUTE FUNCTION user_activity_counters_apply();
+        """
+    )
+    # Seed from the rollup (loaded by 013); later backfills flow through
+    # the trigger.
+    op.execute(
+        """
+        INSERT INTO user_activity_counters (user_id, food_entries, workouts, water_glasses)
+        SELECT user_id, SUM(food_entries), SUM(training_sessions), SUM(water)
+        FROM user_daily_stats
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            food_entries = EXCLUDED.food_entries,
+            workouts = EXCLUDED.workouts,
+            water_glasses = EXCLUDED.water_glasses;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_user_daily_stats_counters ON user_daily_stats;")
+    op.execute("DROP FUNCTION IF EXISTS user_activity_counters_apply();")
+    op.execute("DROP TABLE IF EXISTS user_activity_counters;")
@@ -0,0 +1,83 @@
+"""Durable background job queue.
+
+Revision ID: 015_jobs
+Revises: 014_activity_counters
+Create Date: 2026-10-17
+
+``jobs`` is claimed with ``FOR UPDATE SKIP LOCKED`` by the workers in
+``app.services.job_queue``. Only ``queued`` rows are ever scanned for work,
+so the claim query runs off a small partial index however many finished
+jobs are kept around. ``idempotency_key`` is unique across all statuses:
+enqueueing the same key again is a no-op until the finished row is pruned.
+An ``AFTER INSERT`` trigger sends ``NOTIFY jobs_enqueued`` so idle workers
+wake up immediately instead of waiting for their next poll.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "015_jobs"
+down_revision: Union[str, None] = "014_activity_counters"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id BIGSERIAL PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+            idempotency_key TEXT,
+            status TEXT NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'done', 'failed')),
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL DEFAULT 5,
+            run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            locked_by TEXT,
+            locked_at TIMESTAMPTZ,
+            last_error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            started_at TIMESTAMPTZ,
+            finished_at TIMESTAMPTZ
+        );
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_idempotency_key ON jobs (idempotency_key);"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (run_at) WHERE status = 'queued';"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs (locked_at) WHERE status = 'running';"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at) "
+        "WHERE status IN ('done', 'failed');"
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION jobs_notify_enqueued() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('jobs_enqueued', '');
+            RETURN NULL;
+        END;
+        $$;
+        """
+    )
+    op.execute("DROP TRIGGER IF EXISTS trg_jobs_notify ON jobs;")
+    op.execute(
+        """
+        CREATE TRIGGER trg_jobs_notify
+            AFTER INSERT ON jobs
+            FOR EACH STATEMENT EXECUTE FUNCTION jobs_notify_enqueued();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_jobs_notify ON jobs;")
+    op.execute("DROP FUNCTION IF EXISTS jobs_notify_enqueued();")
+    op.execute("DROP TABLE IF EXISTS jobs;")
@@ -0,0 +1,42 @@
+"""Indexes for keyset pagination of the social feed.
+
+Revision ID: 016_social_feed_keyset
+Revises: 015_jobs
+Create Date: 2026-10-17
+
+The feed orders visible posts by ``(pinned_at IS NOT NULL) DESC,
+COALESCE(pinned_at, created_at) DESC, id DESC`` and pages with a row
+comparison on the same three expressions. With an index on exactly those
+expressions every page is an index range scan that starts at the cursor,
+so page 50 costs the same as page 1. The second index serves the same
+ordering for one author's posts (profile view, ``?author=``).
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "016_social_feed_keyset"
+down_revision: Union[str, None] = "015_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_social_posts_feed
+        ON social_posts ((pinned_at IS NOT NULL) DESC, (COALESCE(pinned_at, created_at)) DESC, id DESC)
+        WHERE hidden_at IS NULL;
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_social_posts_author_feed
+        ON social_posts (user_id, (pinned_at IS NOT NULL) DESC, (COALESCE(pinned_at, created_at)) DESC, id DESC)
+        WHERE hidden_at IS NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_social_posts_author_feed;")
+    op.execute("DROP INDEX IF EXISTS idx_social_posts_feed;")
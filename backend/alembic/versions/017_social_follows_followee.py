@@ -0,0 +1,28 @@
+"""Index social_follows by followee for timeline fan-out.
+
+Revision ID: 017_social_follows_followee
+Revises: 016_social_feed_keyset
+Create Date: 2026-10-17
+
+The primary key (follower_id, followee_id) answers "whom do I follow";
+fan-out needs the reverse, "who follows this author", paged by
+follower_id.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "017_social_follows_followee"
+down_revision: Union[str, None] = "016_social_feed_keyset"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_social_follows_followee "
+        "ON social_follows (followee_id, follower_id);"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_social_follows_followee;")
@@ -0,0 +1,229 @@
+"""Monthly partitions for audit_log, plus hourly rollups for the admin dashboards.
+
+Revision ID: 018_audit_partitions
+Revises: 017_social_follows_followee
+Create Date: 2026-10-17
+
+``audit_log`` becomes ``PARTITION BY RANGE (created_at)`` with one
+partition per UTC month (``audit_log_pYYYY_MM``) and a default partition
+as a safety net. Retention drops whole partitions instead of deleting
+rows. ``audit_log_create_partition(month)`` creates a month's partition,
+first moving any rows the default partition caught for that month, and is
+called ahead of time by the ``audit.maintain`` job.
+
+Dashboards read two small rollup tables maintained by
+``audit_rollup_refresh(from, to)`` (the ``audit.rollup`` job):
+
+* ``audit_rollup_hourly`` — requests, 4xx/5xx, distinct users and total
+  duration per hour and category;
+* ``audit_user_hourly``  — actions per hour and user, for distinct-user
+  counts and "top users" over arbitrary windows.
+
+Existing rows are copied into the partitioned table (ids are kept, the
+sequence is reused) and rolled up once.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "018_audit_partitions"
+down_revision: Union[str, None] = "017_social_follows_followee"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'audit_log' AND relkind = 'r') THEN
+                ALTER TABLE audit_log RENAME TO audit_log_legacy;
+                ALTER TABLE audit_log_legacy RENAME CONSTRAINT audit_log_pkey TO audit_log_legacy_pkey;
+                DROP INDEX IF EXISTS idx_audit_created;
+                DROP INDEX IF EXISTS idx_audit_user;
+                DROP INDEX IF EXISTS idx_audit_category;
+            END IF;
+        END $$;
+        """
+    )
+    op.execute("CREATE SEQUENCE IF NOT EXISTS audit_log_id_seq;")
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id          BIGINT      NOT NULL DEFAULT nextval('audit_log_id_seq'),
+            user_id     BIGINT NULL,
+            method      VARCHAR(8)  NOT NULL,
+            path        TEXT        NOT NULL,
+            category    VARCHAR(32) NOT NULL,
+            status_code INTEGER     NOT NULL,
+            duration_ms INTEGER     NOT NULL DEFAULT 0,
+            ip          INET        NULL,
+            user_agent  TEXT        NULL,
+            detail      JSONB       NOT NULL DEFAULT '{}'::jsonb,
+            created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+        """
+    )
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id;")
+    op.execute("CREATE TABLE IF NOT EXISTS audit_log_default PARTITION OF audit_log DEFAULT;")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_created  ON audit_log (created_at DESC);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_user     ON audit_log (user_id, created_at DESC);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_category ON audit_log (category, created_at DESC);")
+    # Overview's "recent errors" without walking every partition's index.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_audit_errors ON audit_log (created_at DESC) "
+        "WHERE status_code >= 500;"
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION audit_log_create_partition(p_month DATE) RETURNS TEXT
+            LANGUAGE plpgsql AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', p_month)::date;
+            from_ts TIMESTAMPTZ := month_start::timestamp AT TIME ZONE 'UTC';
+            to_ts TIMESTAMPTZ := (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC';
+            part TEXT := format('audit_log_p%s', to_char(month_start, 'YYYY_MM'));
+        BEGIN
+            IF to_regclass(part) IS NOT NULL THEN
+                RETURN part;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE audit_log INCLUDING DEFAULTS)', part);
+            -- Rows the default partition caught for this month move over,
+            -- otherwise ATTACH would reject the overlapping range.
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM audit_log_default '
+                'WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                from_ts, to_ts, part
+            );
+            EXECUTE format(
+                'ALTER TABLE audit_log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                part, from_ts, to_ts
+            );
+            RETURN part;
+        END;
+        $$;
+        """
+    )
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            first_month DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::date;
+            m DATE;
+        BEGIN
+            IF to_regclass('audit_log_legacy') IS NOT NULL THEN
+                SELECT LEAST(first_month, date_trunc('month', MIN(created_at) AT TIME ZONE 'UTC')::date)
+                  INTO first_month FROM audit_log_legacy;
+            END IF;
+            m := first_month;
+            WHILE m <= (NOW() AT TIME ZONE 'UTC')::date + INTERVAL '2 months' LOOP
+                PERFORM audit_log_create_partition(m);
+                m := (m + INTERVAL '1 month')::date;
+            END LOOP;
+            IF to_regclass('audit_log_legacy') IS NOT NULL THEN
+                INSERT INTO audit_log
+                    (id, user_id, method, path, category, status_code, duration_ms,
+                     ip, user_agent, detail, created_at)
+                SELECT id, user_id, method, path, category, status_code, duration_ms,
+                       ip, user_agent, detail, created_at
+                FROM audit_log_legacy;
+                DROP TABLE audit_log_legacy;
+            END IF;
+        END $$;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS audit_rollup_hourly (
+            hour            TIMESTAMPTZ NOT NULL,
+            category        VARCHAR(32) NOT NULL,
+            requests        INTEGER     NOT NULL,
+            errors_4xx      INTEGER     NOT NULL,
+            errors_5xx      INTEGER     NOT NULL,
+            uniq_users      INTEGER     NOT NULL,
+            duration_ms_sum BIGINT      NOT NULL,
+            PRIMARY KEY (hour, category)
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS audit_user_hourly (
+            hour    TIMESTAMPTZ NOT NULL,
+            user_id BIGINT      NOT NULL,
+            actions INTEGER     NOT NULL,
+            PRIMARY KEY (hour, user_id)
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION audit_rollup_refresh(p_from TIMESTAMPTZ, p_to TIMESTAMPTZ)
+            RETURNS VOID LANGUAGE plpgsql AS $$
+        DECLARE
+            from_hour TIMESTAMPTZ := date_trunc('hour', p_from);
+        BEGIN
+            DELETE FROM audit_rollup_hourly WHERE hour >= from_hour AND hour < p_to;
+            DELETE FROM audit_user_hourly WHERE hour >= from_hour AND hour < p_to;
+            INSERT INTO audit_rollup_hourly
+                (hour, category, requests, errors_4xx, errors_5xx, uniq_users, duration_ms_sum)
+            SELECT date_trunc('hour', created_at), category, COUNT(*),
+                   COUNT(*) FILTER (WHERE status_code BETWEEN 400 AND 499),
+                   COUNT(*) FILTER (WHERE status_code >= 500),
+                   COUNT(DISTINCT user_id),
+                   COALESCE(SUM(duration_ms), 0)
+            FROM audit_log
+            WHERE created_at >= from_hour AND created_at < p_to
+            GROUP BY 1, 2;
+            INSERT INTO audit_user_hourly (hour, user_id, actions)
+            SELECT date_trunc('hour', created_at), user_id, COUNT(*)
+            FROM audit_log
+            WHERE created_at >= from_hour AND created_at < p_to AND user_id IS NOT NULL
+            GROUP BY 1, 2;
+        END;
+        $$;
+        """
+    )
+    op.execute(
+        """
+        SELECT audit_rollup_refresh(
+            COALESCE((SELECT MIN(created_at) FROM audit_log), NOW()),
+            date_trunc('hour', NOW()) + INTERVAL '1 hour'
+        );
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS audit_rollup_refresh(TIMESTAMPTZ, TIMESTAMPTZ);")
+    op.execute("DROP TABLE IF EXISTS audit_user_hourly;")
+    op.execute("DROP TABLE IF EXISTS audit_rollup_hourly;")
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_partitioned;")
+    op.execute(
+        """
+        CREATE TABLE audit_log (
+            id          BIGINT PRIMARY KEY DEFAULT nextval('audit_log_id_seq'),
+            user_id     BIGINT NULL,
+            method      VARCHAR(8)  NOT NULL,
+            path        TEXT        NOT NULL,
+            category    VARCHAR(32) NOT NULL,
+            status_code INTEGER     NOT NULL,
+            duration_ms INTEGER     NOT NULL DEFAULT 0,
+            ip          INET        NULL,
+            user_agent  TEXT        NULL,
+            detail      JSONB       NOT NULL DEFAULT '{}'::jsonb,
+            created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        """
+    )
+    op.execute("INSERT INTO audit_log SELECT * FROM audit_log_partitioned;")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id;")
+    op.execute("DROP TABLE audit_log_partitioned;")
+    op.execute("DROP FUNCTION IF EXISTS audit_log_create_partition(DATE);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_created  ON audit_log (created_at DESC);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_user     ON audit_log (user_id, created_at DESC);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_category ON audit_log (category, created_at DESC);")
@@ -0,0 +1,33 @@
+"""Precomputed admin dashboard snapshots.
+
+Revision ID: 019_admin_snapshots
+Revises: 018_audit_partitions
+Create Date: 2026-10-17
+
+One row per dashboard (``name``), rewritten by ``app.services.admin_overview``
+in the background; the admin endpoints read it by primary key.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "019_admin_snapshots"
+down_revision: Union[str, None] = "018_audit_partitions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS admin_snapshots (
+            name        TEXT        PRIMARY KEY,
+            data        JSONB       NOT NULL,
+            computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            duration_ms INTEGER     NOT NULL DEFAULT 0
+        );
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS admin_snapshots;")
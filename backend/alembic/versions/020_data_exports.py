@@ -0,0 +1,54 @@
+"""Personal data exports requested by users.
+
+Revision ID: 020_data_exports
+Revises: 019_admin_snapshots
+Create Date: 2026-10-17
+
+One row per export, whether it was streamed straight to the client
+(``mode = 'stream'``) or built by the ``user_export.build`` job into a file
+that can be downloaded until ``expires_at``. The recent rows of a user are
+also what ``app.services.user_export`` counts for its rate limit.
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = "020_data_exports"
+down_revision: Union[str, None] = "019_admin_snapshots"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_exports (
+            id          BIGSERIAL   PRIMARY KEY,
+            user_id     BIGINT      NOT NULL REFERENCES user_main(user_id) ON DELETE CASCADE,
+            format      VARCHAR(8)  NOT NULL,
+            mode        VARCHAR(8)  NOT NULL,
+            status      VARCHAR(12) NOT NULL,
+            token       TEXT        NOT NULL UNIQUE,
+            path        TEXT,
+            size_bytes  BIGINT,
+            error       TEXT,
+            created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMPTZ,
+            expires_at  TIMESTAMPTZ,
+            CHECK (format IN ('zip', 'ndjson')),
+            CHECK (mode IN ('stream', 'job')),
+            CHECK (status IN ('streamed', 'queued', 'running', 'ready', 'failed', 'expired'))
+        );
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_data_exports_user "
+        "ON data_exports (user_id, created_at DESC);"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_data_exports_expiring "
+        "ON data_exports (expires_at) WHERE status = 'ready';"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS data_exports;")
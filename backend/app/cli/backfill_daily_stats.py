@@ -0,0 +1,52 @@
+"""Rebuild user_daily_stats from the raw food / training / water / weight tables.
+
+Migration 013_user_daily_stats loads the rollup once; after that the
+triggers keep it current. Run this any time the rollup is suspected to
+have drifted:
+
+    python -m app.cli.backfill_daily_stats             # every user with data
+    python -m app.cli.backfill_daily_stats --user 42   # selected users
+
+Users are processed in small batches, each in its own short transaction,
+so the app keeps serving traffic while the backfill runs.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from app.database import close_db, get_pool, init_db
+from app.repositories.daily_stats_repo import DailyStatsRepository
+
+logger = logging.getLogger("propitashka.backfill")
+
+
+async def backfill(user_ids: list[int] | None, batch_size: int) -> int:
+    await init_db()
+    try:
+        repo = DailyStatsRepository(await get_pool())
+        ids = user_ids or await repo.users_with_data()
+        logger.info("Backfilling user_daily_stats for %d users", len(ids))
+        started = time.perf_counter()
+        rows = 0
+        for offset in range(0, len(ids), batch_size):
+            rows += await repo.backfill(ids[offset:offset + batch_size])
+            logger.info("  %d/%d users, %d rows", min(offset + batch_size, len(ids)), len(ids), rows)
+        logger.info("Done: %d rows in %.1fs", rows, time.perf_counter() - started)
+        return rows
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", type=int, action="append", dest="users", help="only this user id (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=200, help="users per transaction")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    asyncio.run(backfill(args.users, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Run background job workers outside the API process.
+
+    python -m app.cli.worker                  # JOB_WORKERS workers (at least 1)
+    python -m app.cli.worker --concurrency 8
+
+Set ``JOB_WORKERS=0`` on the API replicas when jobs should only run here.
+SIGTERM / SIGINT let in-flight jobs finish (up to ``--drain-timeout``) and
+hand unstarted ones back to the queue.
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.config import get_settings
+from app.database import close_db, get_pool, init_db
+from app.redis import close_redis, init_redis
+from app.services import job_queue
+
+logger = logging.getLogger("propitashka.worker")
+
+
+async def run(concurrency: int, drain_timeout: float, stats_interval: float) -> None:
+    await init_db()
+    await init_redis()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker = job_queue.from_settings(await get_pool(), concurrency=concurrency)
+    await worker.start()
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=stats_interval)
+            except asyncio.TimeoutError:
+                logger.info("jobs: %s", await worker.stats())
+    finally:
+        await worker.stop(drain_timeout=drain_timeout)
+        await close_redis()
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=max(1, get_settings().JOB_WORKERS),
+                        help="parallel workers in this process")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="seconds to let in-flight jobs finish on shutdown")
+    parser.add_argument("--stats-interval", type=float, default=60.0,
+                        help="seconds between stats log lines")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    asyncio.run(run(args.concurrency, args.drain_timeout, args.stats_interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,18 @@ class Settings(BaseSettings):
 
     # Telegram
     TELEGRAM_TOKEN: str = ""
+    # Webhook mode (leave URL blank to keep long polling). URL is the public
+    # address of /api/telegram/webhook; the secret is checked on every call and
+    # is required — without it the bot stays on long polling.
+    TELEGRAM_WEBHOOK_URL: str = ""
+    TELEGRAM_WEBHOOK_SECRET: str = ""
+    TELEGRAM_WEBHOOK_WORKERS: int = 8
+    TELEGRAM_WEBHOOK_QUEUE_SIZE: int = 1000
+    TELEGRAM_WEBHOOK_ENQUEUE_TIMEOUT: float = 2.0
+    # Outbound delivery (telegram_bot.outbox). Rates are per replica.
+    TELEGRAM_SEND_RATE: float = 25.0
+    TELEGRAM_SEND_CHAT_RATE: float = 1.0
+    TELEGRAM_SEND_WORKERS: int = 4
 
     # AI
     GEMINI_API_KEY: str = ""
@@ -53,6 +65,57 @@ class Settings(BaseSettings):
     CACHE_TTL_FOOD_RECOGNITION: int = 604800
     CACHE_TTL_RECIPES: int = 86400
     CACHE_TTL_AI_RESPONSES: int = 3600
+    # AI chat context snapshot; writes invalidate it, the TTL only bounds
+    # staleness from writers that don't (legacy bot, admin edits).
+    CACHE_TTL_COACH_CONTEXT: int = 900
+    # Per-process L1 in front of Redis (app.services.cache_service);
+    # CACHE_L1_MAX_ITEMS=0 turns it off. The TTL bounds staleness if a
+    # cross-replica invalidation message is lost.
+    CACHE_L1_MAX_ITEMS: int = 2048
+    CACHE_L1_MAX_BYTES: int = 16 * 1024 * 1024
+    CACHE_L1_TTL: int = 30
+
+    # Background jobs (app.services.job_queue). JOB_WORKERS is the number of
+    # in-process workers; set it to 0 when running `python -m app.cli.worker`.
+    JOB_WORKERS: int = 2
+    JOB_BATCH_SIZE: int = 5
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_LOCK_TIMEOUT: float = 300.0
+    JOB_RETRY_BASE_DELAY: float = 10.0
+    JOB_RETRY_MAX_DELAY: float = 3600.0
+    JOB_RETENTION_DAYS: int = 7
+
+    # Social following-timeline (app.services.social_timeline)
+    SOCIAL_TIMELINE_MAX: int = 800
+    SOCIAL_TIMELINE_TTL: int = 1209600  # 14 days without reads
+    SOCIAL_FANOUT_MAX_FOLLOWERS: int = 5000
+
+    # Audit log writer (app.services.audit_log)
+    AUDIT_BUFFER_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_MS: int = 500
+    # Months of raw audit_log to keep; older monthly partitions are dropped
+    # by the hourly audit.maintain job. 0 (default) keeps everything.
+    AUDIT_RETENTION_MONTHS: int = 0
+    AUDIT_ROLLUP_INTERVAL: int = 300
+
+    # Admin overview snapshot (app.services.admin_overview), seconds
+    ADMIN_OVERVIEW_INTERVAL: int = 60
+
+    # Leaderboards (app.services.leaderboards): full rebuild from Postgres
+    LEADERBOARD_RECONCILE_INTERVAL: int = 3600
+
+    # Streaming exports (app.services.export): each one holds a pooled
+    # connection while the client downloads; more wait for a free slot.
+    EXPORT_MAX_CONCURRENT: int = 3
+
+    # Personal data export (app.services.user_export). USER_EXPORT_DIR must
+    # be shared by the API and the job workers; empty = exports/ next to
+    # UPLOADS_DIR. Never point it inside the public uploads mount.
+    USER_EXPORT_LIMIT: int = 3  # exports per user per window
+    USER_EXPORT_WINDOW_HOURS: int = 24
+    USER_EXPORT_TTL_HOURS: int = 48
+    USER_EXPORT_DIR: str = ""
 
     # API
     API_TIMEOUT: int = 30
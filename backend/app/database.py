@@ -1,5 +1,6 @@
 import json
 import logging
+from typing import Any, AsyncIterator, Sequence
 
 import asyncpg
 
@@ -62,3 +63,19 @@ async def close_db() -> None:
         await _pool.close()
         _pool = None
         logger.info("Database pool closed")
+
+
+async def stream_records(
+    pool: asyncpg.Pool, sql: str, args: Sequence[Any] = (), *, prefetch: int = 1000,
+) -> AsyncIterator[asyncpg.Record]:
+    """Yield the rows of ``sql`` through a server-side cursor.
+
+    asyncpg fetches ``prefetch`` rows at a time inside a read-only
+    transaction on one pooled connection, so the result set is never held
+    in memory. The connection stays checked out until the iterator is
+    exhausted or closed.
+    """
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            async for record in conn.cursor(sql, *args, prefetch=prefetch):
+                yield record
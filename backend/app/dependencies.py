@@ -41,6 +41,8 @@ async def get_current_user_id(request: Request, settings: SettingsDep) -> int:
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        # Reused by AuditLogMiddleware instead of decoding the token again.
+        request.state.user_id = int(user_id)
         return int(user_id)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -7,7 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from app.config import get_settings
-from app.database import init_db, close_db
+from app.database import init_db, close_db, get_pool
 from app.redis import init_redis, close_redis
 
 logging.basicConfig(
@@ -39,8 +39,17 @@ async def lifespan(app: FastAPI):
     from telegram_bot.bot import start_bot, stop_bot
     await start_bot()
 
+    from app.services import audit_log, cache_service, job_queue
+    from app.redis import get_redis
+    await cache_service.start_listener(await get_redis())
+    await audit_log.start_writer(await get_pool())
+    await job_queue.start_workers(await get_pool())
+
     yield
 
+    await job_queue.stop_workers()
+    await audit_log.stop_writer()
+    await cache_service.stop_listener()
     await stop_bot()
     await close_redis()
     await close_db()
@@ -87,7 +96,7 @@ os.environ["UPLOADS_DIR"] = str(UPLOADS_DIR)
 # Routers
 from app.routers import (
     auth, users, food, workouts, water, summary, ai, settings, admin,
-    streaks, weight, digest, google_auth, social,
+    streaks, weight, digest, google_auth, social, telegram_webhook,
 )
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
@@ -104,6 +113,7 @@ app.include_router(streaks.router, prefix="/api/streaks", tags=["streaks"])
 app.include_router(weight.router, prefix="/api/weight", tags=["weight"])
 app.include_router(digest.router, prefix="/api/digest", tags=["digest"])
 app.include_router(social.router, prefix="/api/social", tags=["social"])
+app.include_router(telegram_webhook.router, prefix="/api/telegram", tags=["telegram"])
 
 # User-uploaded media (currently social post photos). Mounted under
 # /uploads/ so it never collides with API routes; the directory is
@@ -125,3 +135,61 @@ async def ai_health():
     """
     from app.services import ai_service
     return await ai_service.health_check()
+
+
+@app.get("/api/_internal/telegram-queue")
+async def telegram_queue_stats():
+    """Webhook update queue depth and counters (``mode: polling`` when disabled)."""
+    from telegram_bot import bot as tg
+    if tg.update_queue is None:
+        return {"mode": "polling"}
+    return {"mode": "webhook", **tg.update_queue.stats()}
+
+
+@app.get("/api/_internal/coach-context")
+async def coach_context_stats():
+    """AI chat context cache: hit rate and time saved per chat turn (this process)."""
+    from app.services import coach_context
+    return coach_context.stats()
+
+
+@app.get("/api/_internal/cache")
+async def cache_stats():
+    """Two-tier cache: L1 size / evictions and per-namespace hit / miss counters (this process)."""
+    from app.services import cache_service
+    return cache_service.stats()
+
+
+@app.get("/api/_internal/single-flight")
+async def single_flight_stats():
+    """Coalesced AI calls: leaders vs. callers that joined a flight locally or on another replica."""
+    from app.services import single_flight
+    return single_flight.stats()
+
+
+@app.get("/api/_internal/jobs")
+async def job_queue_stats():
+    """Background job queue depth, wait/run latency and worker throughput."""
+    from app.repositories.job_repo import JobRepository
+    from app.services import job_queue
+    if job_queue.worker is None:
+        return {"workers": 0, "depth": await JobRepository(await get_pool()).depth()}
+    return await job_queue.worker.stats()
+
+
+@app.get("/api/_internal/audit")
+async def audit_log_stats():
+    """Audit log buffer depth and written / dropped / failed record counters."""
+    from app.services import audit_log
+    if audit_log.writer is None:
+        return {"running": False}
+    return {"running": True, **audit_log.writer.stats()}
+
+
+@app.get("/api/_internal/telegram-outbox")
+async def telegram_outbox_stats():
+    """Outbound delivery queue depth, throughput and error counters."""
+    from telegram_bot import bot as tg
+    if tg.outbox is None:
+        return {"backend": None}
+    return await tg.outbox.stats()
@@ -4,23 +4,25 @@ We classify calls by URL prefix into a small set of categories the admin UI
 filters on. GET / OPTIONS / HEAD are skipped to keep volume sane (they don't
 change state). Static, health, docs and the audit endpoints themselves are
 also excluded.
+
+This is a plain ASGI middleware (no ``BaseHTTPMiddleware``), so responses
+stream straight through. It doesn't touch the database either: the record
+is handed to ``app.services.audit_log``, which writes in batches. The user
+id is the one ``get_current_user_id`` already decoded (``request.state``).
 """
 
 from __future__ import annotations
 
-import logging
 import re
 import time
+from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import Request, Response
-from jose import jwt
-from starlette.middleware.base import BaseHTTPMiddleware
-
-from app.config import get_settings
-from app.database import get_pool
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-logger = logging.getLogger(__name__)
+from app.services import audit_log
 
 # Order matters — first match wins.
 _CATEGORY_PATTERNS: list[tuple[str, re.Pattern[str]]] = [
@@ -45,6 +47,7 @@ _CATEGORY_PATTERNS: list[tuple[str, re.Pattern[str]]] = [
 _SKIP_EXACT = {
     "/api/health",
     "/api/_internal/ai-health",
+    "/api/telegram/webhook",  # bot traffic, one row per update would swamp the log
     "/api/admin/audit",  # don't log fetches of the log itself
 }
 
@@ -65,56 +68,61 @@ def _classify(path: str) -> str:
     return "other"
 
 
-def _user_id_from_request(request: Request) -> Optional[int]:
-    token = request.cookies.get("access_token")
-    if not token:
-        auth = request.headers.get("authorization") or ""
-        if auth.lower().startswith("bearer "):
-            token = auth[7:]
-    if not token:
-        return None
-    try:
-        settings = get_settings()
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return int(payload.get("sub")) if payload.get("sub") else None
-    except Exception:
-        return None
-
-
-class AuditLogMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        method = request.method.upper()
-
-        if (
-            method in {"GET", "HEAD", "OPTIONS"}
-            or path in _SKIP_EXACT
-            or any(path.startswith(p) for p in _SKIP_PREFIXES)
-            or not path.startswith("/api/")
-        ):
-            return await call_next(request)
+def _skipped(method: str, path: str) -> bool:
+    return (
+        method in {"GET", "HEAD", "OPTIONS"}
+        or path in _SKIP_EXACT
+        or any(path.startswith(p) for p in _SKIP_PREFIXES)
+        or not path.startswith("/api/")
+    )
+
+
+def _token(headers: Headers) -> Optional[str]:
+    token = cookie_parser(headers.get("cookie", "")).get("access_token")
+    if token:
+        return token
+    auth = headers.get("authorization") or ""
+    return auth[7:] if auth.lower().startswith("bearer ") else None
 
+
+class AuditLogMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"].upper()
+        path = scope["path"]
+        if _skipped(method, path):
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
         start = time.perf_counter()
-        response: Response = await call_next(request)
-        duration_ms = int((time.perf_counter() - start) * 1000)
+        status_code = 500
+        duration_ms: Optional[int] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, duration_ms
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = int((time.perf_counter() - start) * 1000)
+            await send(message)
 
         try:
-            user_id = _user_id_from_request(request)
-            ip = request.client.host if request.client else None
-            ua = request.headers.get("user-agent", "")[:500]
-            category = _classify(path)
-            pool = await get_pool()
-            await pool.execute(
-                """
-                INSERT INTO audit_log
-                  (user_id, method, path, category, status_code, duration_ms, ip, user_agent)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                """,
-                user_id, method, path, category,
-                response.status_code, duration_ms, ip, ua,
-            )
-        except Exception as e:
-            # Never fail the request because of logging.
-            logger.warning("audit log insert failed: %s", e)
-
-        return response
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if duration_ms is None:
+                duration_ms = int((time.perf_counter() - start) * 1000)
+            headers = Headers(scope=scope)
+            user_id = state.get("user_id")
+            client = scope.get("client")
+            audit_log.record((
+                user_id, method, path, _classify(path), status_code, duration_ms,
+                client[0] if client else None,
+                headers.get("user-agent", "")[:500],
+                datetime.now(timezone.utc),
+                None if user_id is not None else _token(headers),
+            ))
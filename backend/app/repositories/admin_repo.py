@@ -1,5 +1,16 @@
+import json
+from typing import Any, AsyncIterator, Optional
+
 import asyncpg
 
+from app.database import stream_records
+
+# Column types a keyset cursor can carry (see app.utils.cursor).
+CURSOR_TYPES = {
+    "smallint", "integer", "bigint", "boolean", "text", "character varying",
+    "character", "date", "timestamp without time zone", "timestamp with time zone",
+}
+
 
 class AdminRepository:
     def __init__(self, pool: asyncpg.Pool):
@@ -32,6 +43,140 @@ class AdminRepository:
         row = await self.pool.fetchrow(f'SELECT COUNT(*) as cnt FROM "{table_name}"')
         return int(row["cnt"])
 
+    # ---------- table browser ----------
+    # Table and column names below are validated by the router against
+    # ALLOWED_TABLES / information_schema before they reach the SQL.
+
+    async def primary_key(self, table_name: str) -> list[str]:
+        rows = await self.pool.fetch(
+            """
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = to_regclass($1) AND i.indisprimary
+            ORDER BY array_position(i.indkey::int2[], a.attnum)
+            """,
+            table_name,
+        )
+        return [r["attname"] for r in rows]
+
+    async def indexed_columns(self, table_name: str) -> list[str]:
+        """Columns that lead a full (non-partial) btree index."""
+        rows = await self.pool.fetch(
+            """
+            SELECT DISTINCT a.attname
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = ic.relam
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = to_regclass($1) AND am.amname = 'btree' AND i.indpred IS NULL
+            """,
+            table_name,
+        )
+        return sorted(r["attname"] for r in rows)
+
+    @staticmethod
+    def _where(filters: dict[str, Any], args: list) -> list[str]:
+        where = []
+        for column, value in filters.items():
+            args.append(value)
+            where.append(f'"{column}" = ${len(args)}')
+        return where
+
+    async def page_rows(
+        self,
+        table_name: str,
+        order_by: list[str],
+        descending: bool,
+        after: Optional[list[Any]],
+        filters: dict[str, Any],
+        limit: int,
+    ) -> list[dict]:
+        """One keyset page ordered by ``order_by`` (which must end in the primary key)."""
+        args: list = []
+        where = self._where(filters, args)
+        if after is not None:
+            first = len(args) + 1
+            args.extend(after)
+            cols = ", ".join(f'"{c}"' for c in order_by)
+            params = ", ".join(f"${first + i}" for i in range(len(order_by)))
+            where.append(f"({cols}) {'<' if descending else '>'} ({params})")
+        direction = "DESC" if descending else "ASC"
+        args.append(limit)
+        rows = await self.pool.fetch(
+            f'SELECT * FROM "{table_name}" '
+            + (f"WHERE {' AND '.join(where)} " if where else "")
+            + "ORDER BY " + ", ".join(f'"{c}" {direction}' for c in order_by)
+            + f" LIMIT ${len(args)}",
+            *args,
+        )
+        return [dict(r) for r in rows]
+
+    async def offset_rows(
+        self,
+        table_name: str,
+        order_by: list[str],
+        descending: bool,
+        filters: dict[str, Any],
+        limit: int,
+        offset: int,
+    ) -> list[dict]:
+        """One OFFSET page with the same filters / order as ``page_rows``,
+        for tables whose key a cursor can't carry."""
+        args: list = []
+        where = self._where(filters, args)
+        direction = "DESC" if descending else "ASC"
+        args.extend([limit, offset])
+        rows = await self.pool.fetch(
+            f'SELECT * FROM "{table_name}"'
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + (" ORDER BY " + ", ".join(f'"{c}" {direction}' for c in order_by) if order_by else "")
+            + f" LIMIT ${len(args) - 1} OFFSET ${len(args)}",
+            *args,
+        )
+        return [dict(r) for r in rows]
+
+    def stream_rows(
+        self,
+        table_name: str,
+        order_by: list[str],
+        descending: bool,
+        filters: dict[str, Any],
+    ) -> AsyncIterator[asyncpg.Record]:
+        """Every matching row, in order, through a server-side cursor."""
+        args: list = []
+        where = self._where(filters, args)
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            f'SELECT * FROM "{table_name}"'
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + (" ORDER BY " + ", ".join(f'"{c}" {direction}' for c in order_by) if order_by else "")
+        )
+        return stream_records(self.pool, sql, args)
+
+    async def estimate_rows(self, table_name: str, filters: dict[str, Any]) -> int:
+        """Planner row estimate (pg_class.reltuples scaled to the current
+        table size, times filter selectivity) — no table scan."""
+        args: list = []
+        where = self._where(filters, args)
+        plan = await self.pool.fetchval(
+            f'EXPLAIN (FORMAT JSON) SELECT 1 FROM "{table_name}"'
+            + (f" WHERE {' AND '.join(where)}" if where else ""),
+            *args,
+        )
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    async def count_matching(self, table_name: str, filters: dict[str, Any]) -> int:
+        args: list = []
+        where = self._where(filters, args)
+        return await self.pool.fetchval(
+            f'SELECT COUNT(*) FROM "{table_name}"'
+            + (f" WHERE {' AND '.join(where)}" if where else ""),
+            *args,
+        )
+
     async def delete_row(self, table_name: str, pk_column: str, pk_value) -> bool:
         result = await self.pool.execute(
             f'DELETE FROM "{table_name}" WHERE "{pk_column}" = $1', pk_value
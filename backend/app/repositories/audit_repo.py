@@ -0,0 +1,145 @@
+import asyncpg
+from datetime import date
+
+# Windows are whole hours of the rollup tables: "last N days" is every hour
+# bucket starting at or after NOW() - N days, rounded down to the hour.
+_SINCE_DAYS = "date_trunc('hour', NOW() - (INTERVAL '1 day') * $1)"
+_PARTITION_PREFIX = "audit_log_p"
+
+
+class AuditRepository:
+    """audit_log partition maintenance and the rollups the admin dashboards read."""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    # ---------- maintenance ----------
+
+    async def refresh_rollups(self) -> None:
+        """Recompute rollups from the last rolled-up hour (at most one hour back) to now.
+
+        Re-aggregating the previous hour as well picks up records that were
+        still in a writer's buffer at the last run.
+        """
+        await self.pool.execute(
+            """
+            SELECT audit_rollup_refresh(
+                LEAST(
+                    COALESCE((SELECT MAX(hour) FROM audit_rollup_hourly), NOW()),
+                    date_trunc('hour', NOW()) - INTERVAL '1 hour'
+                ),
+                date_trunc('hour', NOW()) + INTERVAL '1 hour'
+            )
+            """
+        )
+
+    async def ensure_partitions(self, months_ahead: int) -> list[str]:
+        rows = await self.pool.fetch(
+            """
+            SELECT audit_log_create_partition(
+                (date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => g))::date
+            ) AS name
+            FROM generate_series(0, $1) AS g
+            """,
+            months_ahead,
+        )
+        return [r["name"] for r in rows]
+
+    async def partitions(self) -> list[str]:
+        rows = await self.pool.fetch(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'audit_log' AND c.relname LIKE $1
+            ORDER BY c.relname
+            """,
+            _PARTITION_PREFIX + "%",
+        )
+        return [r["relname"] for r in rows]
+
+    async def drop_partitions(self, names: list[str]) -> None:
+        async with self.pool.acquire() as conn:
+            for name in names:
+                # Names come from pg_class and match audit_log_pYYYY_MM.
+                await conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+
+    async def prune_default_partition(self, before: date) -> int:
+        result = await self.pool.execute(
+            "DELETE FROM audit_log_default WHERE created_at < $1::date", before,
+        )
+        return int(result.split()[-1])
+
+    async def prune_user_rollups(self, older_than_days: int) -> None:
+        await self.pool.execute(
+            "DELETE FROM audit_user_hourly WHERE hour < NOW() - (INTERVAL '1 day') * $1",
+            older_than_days,
+        )
+
+    # ---------- dashboard reads ----------
+
+    async def active_users(self, days: float) -> int:
+        return await self.pool.fetchval(
+            f"SELECT COUNT(DISTINCT user_id)::int FROM audit_user_hourly WHERE hour >= {_SINCE_DAYS}",
+            days,
+        )
+
+    async def top_users(self, days: int, limit: int) -> list[dict]:
+        rows = await self.pool.fetch(
+            f"""
+            SELECT a.user_id, um.user_name AS name, um.telegram_username, a.actions
+            FROM (
+                SELECT user_id, SUM(actions)::int AS actions
+                FROM audit_user_hourly
+                WHERE hour >= {_SINCE_DAYS}
+                GROUP BY user_id
+                ORDER BY actions DESC
+                LIMIT $2
+            ) a
+            JOIN user_main um ON um.user_id = a.user_id
+            ORDER BY a.actions DESC
+            """,
+            days, limit,
+        )
+        return [dict(r) for r in rows]
+
+    async def by_category(self, days: int, prefix: str = "") -> list[dict]:
+        rows = await self.pool.fetch(
+            f"""
+            SELECT category, SUM(requests)::int AS cnt, SUM(errors_5xx)::int AS errs
+            FROM audit_rollup_hourly
+            WHERE hour >= {_SINCE_DAYS} AND category LIKE $2
+            GROUP BY category
+            ORDER BY cnt DESC
+            """,
+            days, prefix + "%",
+        )
+        return [dict(r) for r in rows]
+
+    async def by_day(self, days: int) -> list[dict]:
+        rows = await self.pool.fetch(
+            f"""
+            SELECT date_trunc('day', hour) AS day, SUM(requests)::int AS cnt
+            FROM audit_rollup_hourly
+            WHERE hour >= {_SINCE_DAYS}
+            GROUP BY day
+            ORDER BY day
+            """,
+            days,
+        )
+        return [dict(r) for r in rows]
+
+    async def totals(self, days: int) -> dict:
+        row = await self.pool.fetchrow(
+            f"""
+            SELECT COALESCE(SUM(requests), 0)::bigint AS total,
+                   COALESCE(SUM(duration_ms_sum) / NULLIF(SUM(requests), 0), 0)::int AS avg_ms,
+                   COALESCE(SUM(errors_5xx), 0)::bigint AS errors_5xx,
+                   COALESCE(SUM(errors_4xx), 0)::bigint AS errors_4xx
+            FROM audit_rollup_hourly
+            WHERE hour >= {_SINCE_DAYS}
+            """,
+            days,
+        )
+        return {**dict(row), "uniq_users": await self.active_users(days)}
@@ -0,0 +1,154 @@
+import asyncpg
+from datetime import date
+from typing import Iterable, Optional
+
+
+class DailyStatsRepository:
+    """Reads the per-user daily rollup (user_daily_stats).
+
+    The table is kept current by triggers on food, user_training, water and
+    user_health (migration 013), so there are no write methods here apart
+    from `backfill`. Ranges are half-open: `start <= date < end`, which
+    means a year is at most 366 rows per user.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def period_totals(self, user_id: int, start: date, end: date) -> dict:
+        row = await self.pool.fetchrow(
+            """
+            SELECT
+                COALESCE(SUM(kcal), 0) AS kcal,
+                COALESCE(SUM(protein), 0) AS protein,
+                COALESCE(SUM(fat), 0) AS fat,
+                COALESCE(SUM(carbs), 0) AS carbs,
+                COALESCE(SUM(food_entries), 0)::int AS food_entries,
+                COUNT(*) FILTER (WHERE food_entries > 0)::int AS food_days,
+                COALESCE(AVG(kcal) FILTER (WHERE food_entries > 0), 0) AS avg_food_kcal,
+                COALESCE(SUM(training_sessions), 0)::int AS training_sessions,
+                COALESCE(SUM(training_minutes), 0)::int AS training_minutes,
+                COALESCE(SUM(training_kcal), 0) AS training_kcal,
+                COALESCE(SUM(water), 0)::int AS water,
+                COUNT(*) FILTER (WHERE water > 0)::int AS water_days
+            FROM user_daily_stats
+            WHERE user_id = $1 AND date >= $2 AND date < $3
+            """,
+            user_id, start, end,
+        )
+        return dict(row)
+
+    async def monthly_food(self, user_id: int, start: date, end: date) -> list[dict]:
+        rows = await self.pool.fetch(
+            """
+            SELECT EXTRACT(MONTH FROM date)::int AS month,
+                   SUM(kcal) AS cal, SUM(protein) AS protein,
+                   SUM(fat) AS fat, SUM(carbs) AS carbs
+            FROM user_daily_stats
+            WHERE user_id = $1 AND date >= $2 AND date < $3 AND food_entries > 0
+            GROUP BY 1 ORDER BY 1
+            """,
+            user_id, start, end,
+        )
+        return [dict(r) for r in rows]
+
+    async def weights(self, user_id: int, start: date, end: date) -> list[dict]:
+        rows = await self.pool.fetch(
+            "SELECT date, weight FROM user_daily_stats "
+            "WHERE user_id = $1 AND date >= $2 AND date < $3 AND weight IS NOT NULL "
+            "ORDER BY date",
+            user_id, start, end,
+        )
+        return [dict(r) for r in rows]
+
+    async def latest_weight(self, user_id: int, start: date, end: date) -> Optional[dict]:
+        row = await self.pool.fetchrow(
+            "SELECT date, weight FROM user_daily_stats "
+            "WHERE user_id = $1 AND date >= $2 AND date < $3 AND weight IS NOT NULL "
+            "ORDER BY date DESC LIMIT 1",
+            user_id, start, end,
+        )
+        return dict(row) if row else None
+
+    async def avg_daily_kcal(
+        self, user_id: int, start: date, end: date, min_kcal: float = 0,
+    ) -> tuple[Optional[float], int]:
+        """Average intake over days above `min_kcal`; returns (avg, number of days)."""
+        row = await self.pool.fetchrow(
+            "SELECT AVG(kcal) AS avg_kcal, COUNT(*)::int AS n FROM user_daily_stats "
+            "WHERE user_id = $1 AND date >= $2 AND date < $3 AND kcal > $4",
+            user_id, start, end, min_kcal,
+        )
+        avg = float(row["avg_kcal"]) if row and row["avg_kcal"] is not None else None
+        return avg, (row["n"] if row else 0)
+
+    async def backfill(self, user_ids: Iterable[int]) -> int:
+        """Rebuild the rollup for `user_ids` from the raw tables. Returns rows written.
+
+        The table is share-locked for the duration so trigger writes from
+        concurrent inserts wait and land on top of the rebuilt rows instead
+        of being wiped by the DELETE or double-counted by the INSERT.
+        """
+        ids = list(user_ids)
+        if not ids:
+            return 0
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("LOCK TABLE user_daily_stats IN SHARE ROW EXCLUSIVE MODE")
+                await conn.execute("DELETE FROM user_daily_stats WHERE user_id = ANY($1::bigint[])", ids)
+                result = await conn.execute(
+                    """
+                    INSERT INTO user_daily_stats (
+                        user_id, date, kcal, protein, fat, carbs, food_entries,
+                        training_sessions, training_minutes, training_kcal, water, weight
+                    )
+                    SELECT user_id, date,
+                           COALESCE(SUM(kcal), 0), COALESCE(SUM(protein), 0),
+                           COALESCE(SUM(fat), 0), COALESCE(SUM(carbs), 0),
+                           COALESCE(SUM(food_entries), 0),
+                           COALESCE(SUM(training_sessions), 0),
+                           COALESCE(SUM(training_minutes), 0),
+                           COALESCE(SUM(training_kcal), 0),
+                           COALESCE(SUM(water), 0),
+                           MAX(weight)
+                    FROM (
+                        SELECT user_id, date, cal AS kcal, b AS protein, g AS fat, u AS carbs,
+                               1 AS food_entries, NULL::int AS training_sessions,
+                               NULL::int AS training_minutes, NULL::numeric AS training_kcal,
+                               NULL::int AS water, NULL::numeric AS weight
+                        FROM food WHERE user_id = ANY($1::bigint[]) AND date IS NOT NULL
+                        UNION ALL
+                        SELECT user_id, date, NULL, NULL, NULL, NULL, NULL,
+                               1, tren_time, training_cal, NULL, NULL
+                        FROM user_training WHERE user_id = ANY($1::bigint[]) AND date IS NOT NULL
+                        UNION ALL
+                        SELECT user_id, date, NULL, NULL, NULL, NULL, NULL,
+                               NULL, NULL, NULL, count, NULL
+                        FROM water WHERE user_id = ANY($1::bigint[])
+                        UNION ALL
+                        SELECT user_id, date, NULL, NULL, NULL, NULL, NULL,
+                               NULL, NULL, NULL, NULL, weight
+                        FROM (
+                            SELECT DISTINCT ON (user_id, date) user_id, date, weight
+                            FROM user_health
+                            WHERE user_id = ANY($1::bigint[]) AND date IS NOT NULL AND weight > 0
+                            ORDER BY user_id, date, id DESC
+                        ) AS latest_weight
+                    ) AS src
+                    GROUP BY user_id, date
+                    """,
+                    ids,
+                )
+        return int(result.split()[-1])
+
+    async def users_with_data(self) -> list[int]:
+        rows = await self.pool.fetch(
+            """
+            SELECT user_id FROM food WHERE user_id IS NOT NULL
+            UNION SELECT user_id FROM user_training WHERE user_id IS NOT NULL
+            UNION SELECT user_id FROM water
+            UNION SELECT user_id FROM user_health WHERE user_id IS NOT NULL
+            ORDER BY 1
+            """
+        )
+        return [r["user_id"] for r in rows]
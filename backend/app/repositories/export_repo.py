@@ -0,0 +1,134 @@
+import asyncpg
+from typing import Optional
+
+
+class DataExportRepository:
+    """DB access for users' personal data exports (migration 020)."""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def create(
+        self,
+        user_id: int,
+        fmt: str,
+        mode: str,
+        token: str,
+        limit: int,
+        window_hours: int,
+    ) -> tuple[Optional[dict], int]:
+        """Record a new export unless the user already made ``limit`` of them
+        in the last ``window_hours``.
+
+        Returns ``(row, 0)``, or ``(None, retry_after_s)`` when rate limited.
+        The per-user advisory lock makes the check-and-insert atomic.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext('data_exports'), hashtext($1::text))",
+                    user_id,
+                )
+                recent = await conn.fetchrow(
+                    """
+                    SELECT COUNT(*)::int AS n,
+                           EXTRACT(EPOCH FROM MIN(created_at)
+                                   + make_interval(hours => $2) - NOW())::float8 AS wait_s
+                    FROM data_exports
+                    WHERE user_id = $1 AND created_at > NOW() - make_interval(hours => $2)
+                    """,
+                    user_id, window_hours,
+                )
+                if recent["n"] >= limit:
+                    return None, max(1, int(recent["wait_s"] or 0) + 1)
+                row = await conn.fetchrow(
+                    """
+                    INSERT INTO data_exports (user_id, format, mode, status, token)
+                    VALUES ($1, $2, $3, $4, $5)
+                    RETURNING *
+                    """,
+                    user_id, fmt, mode, "streamed" if mode == "stream" else "queued", token,
+                )
+                return dict(row), 0
+
+    async def get(self, export_id: int) -> Optional[dict]:
+        row = await self.pool.fetchrow("SELECT * FROM data_exports WHERE id = $1", export_id)
+        return dict(row) if row else None
+
+    async def by_token(self, user_id: int, token: str) -> Optional[dict]:
+        row = await self.pool.fetchrow(
+            "SELECT * FROM data_exports WHERE token = $1 AND user_id = $2", token, user_id,
+        )
+        return dict(row) if row else None
+
+    async def list_for_user(self, user_id: int, limit: int = 10) -> list[dict]:
+        rows = await self.pool.fetch(
+            """
+            SELECT * FROM data_exports
+            WHERE user_id = $1 AND mode = 'job'
+            ORDER BY created_at DESC
+            LIMIT $2
+            """,
+            user_id, limit,
+        )
+        return [dict(r) for r in rows]
+
+    async def mark_running(self, export_id: int) -> Optional[dict]:
+        """Claim a queued (or previously failed) job export; None if it is
+        already ready, expired or gone."""
+        row = await self.pool.fetchrow(
+            """
+            UPDATE data_exports SET status = 'running', error = NULL
+            WHERE id = $1 AND status IN ('queued', 'running', 'failed')
+            RETURNING *
+            """,
+            export_id,
+        )
+        return dict(row) if row else None
+
+    async def mark_ready(self, export_id: int, path: str, size_bytes: int, ttl_hours: int) -> None:
+        await self.pool.execute(
+            """
+            UPDATE data_exports
+            SET status = 'ready', path = $2, size_bytes = $3, finished_at = NOW(),
+                expires_at = NOW() + make_interval(hours => $4)
+            WHERE id = $1
+            """,
+            export_id, path, size_bytes, ttl_hours,
+        )
+
+    async def discard(self, export_id: int) -> None:
+        """Drop an export that was never queued, giving back its rate-limit slot."""
+        await self.pool.execute(
+            "DELETE FROM data_exports WHERE id = $1 AND status = 'queued'", export_id,
+        )
+
+    async def mark_failed(self, export_id: int, error: str) -> None:
+        await self.pool.execute(
+            "UPDATE data_exports SET status = 'failed', error = $2, finished_at = NOW() WHERE id = $1",
+            export_id, error[:500],
+        )
+
+    async def expired_files(self) -> list[dict]:
+        rows = await self.pool.fetch(
+            "SELECT id, path FROM data_exports WHERE status = 'ready' AND expires_at < NOW()"
+        )
+        return [dict(r) for r in rows]
+
+    async def mark_expired(self, export_ids: list[int]) -> None:
+        await self.pool.execute(
+            "UPDATE data_exports SET status = 'expired', path = NULL WHERE id = ANY($1::bigint[])",
+            export_ids,
+        )
+
+    async def prune(self, days: int) -> int:
+        """Forget finished exports older than ``days``."""
+        result = await self.pool.execute(
+            """
+            DELETE FROM data_exports
+            WHERE created_at < NOW() - make_interval(days => $1)
+              AND status IN ('streamed', 'failed', 'expired')
+            """,
+            days,
+        )
+        return int(result.split()[-1])
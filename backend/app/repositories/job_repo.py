@@ -0,0 +1,134 @@
+import asyncpg
+from typing import Optional
+
+
+class JobRepository:
+    """DB access for the `jobs` queue (migration 015).
+
+    Claiming uses `FOR UPDATE SKIP LOCKED`, so any number of workers, in
+    any number of processes, can poll the table without blocking each
+    other or handing out the same job twice.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        idempotency_key: Optional[str] = None,
+        delay_s: float = 0,
+        max_attempts: int = 5,
+    ) -> Optional[int]:
+        """Insert a job; returns its id, or None if the idempotency key is taken."""
+        return await self.pool.fetchval(
+            """
+            INSERT INTO jobs (kind, payload, idempotency_key, run_at, max_attempts)
+            VALUES ($1, $2, $3, NOW() + make_interval(secs => $4), $5)
+            ON CONFLICT (idempotency_key) DO NOTHING
+            RETURNING id
+            """,
+            kind, payload, idempotency_key, float(delay_s), max_attempts,
+        )
+
+    async def claim(self, worker: str, limit: int) -> list[dict]:
+        rows = await self.pool.fetch(
+            """
+            UPDATE jobs j SET
+                status = 'running',
+                attempts = j.attempts + 1,
+                locked_by = $1,
+                locked_at = NOW(),
+                started_at = NOW()
+            FROM (
+                SELECT id FROM jobs
+                WHERE status = 'queued' AND run_at <= NOW()
+                ORDER BY run_at
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            ) AS ready
+            WHERE j.id = ready.id
+            RETURNING j.id, j.kind, j.payload, j.attempts, j.max_attempts,
+                      EXTRACT(EPOCH FROM NOW() - j.run_at)::float8 AS wait_s
+            """,
+            worker, limit,
+        )
+        return [dict(r) for r in rows]
+
+    async def complete(self, job_id: int) -> None:
+        await self.pool.execute(
+            "UPDATE jobs SET status = 'done', finished_at = NOW(), locked_by = NULL, "
+            "last_error = NULL WHERE id = $1",
+            job_id,
+        )
+
+    async def retry(self, job_id: int, delay_s: float, error: str) -> None:
+        await self.pool.execute(
+            """
+            UPDATE jobs SET status = 'queued', locked_by = NULL, locked_at = NULL,
+                   run_at = NOW() + make_interval(secs => $2), last_error = $3
+            WHERE id = $1
+            """,
+            job_id, float(delay_s), error[:2000],
+        )
+
+    async def fail(self, job_id: int, error: str) -> None:
+        await self.pool.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = NOW(), locked_by = NULL, "
+            "last_error = $2 WHERE id = $1",
+            job_id, error[:2000],
+        )
+
+    async def release(self, job_ids: list[int]) -> None:
+        """Hand claimed-but-unstarted jobs back without counting the attempt."""
+        if job_ids:
+            await self.pool.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1, locked_by = NULL, "
+                "locked_at = NULL WHERE id = ANY($1::bigint[]) AND status = 'running'",
+                job_ids,
+            )
+
+    async def requeue_stale(self, lock_timeout_s: float) -> int:
+        """Put back jobs whose worker died mid-run (locked longer than the timeout)."""
+        result = await self.pool.execute(
+            """
+            UPDATE jobs SET
+                status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+                last_error = 'worker lost (lock timeout)',
+                locked_by = NULL, locked_at = NULL
+            WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => $1)
+            """,
+            float(lock_timeout_s),
+        )
+        return int(result.split()[-1])
+
+    async def prune(self, older_than_days: int) -> int:
+        """Delete finished jobs (and so free their idempotency keys)."""
+        result = await self.pool.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') "
+            "AND finished_at < NOW() - make_interval(days => $1)",
+            older_than_days,
+        )
+        return int(result.split()[-1])
+
+    async def depth(self) -> dict:
+        row = await self.pool.fetchrow(
+            """
+            SELECT
+                COUNT(*) FILTER (WHERE status = 'queued' AND run_at <= NOW())::int AS ready,
+                COUNT(*) FILTER (WHERE status = 'queued' AND run_at > NOW())::int AS scheduled,
+                COUNT(*) FILTER (WHERE status = 'running')::int AS running,
+                COALESCE(EXTRACT(EPOCH FROM NOW() - MIN(run_at)
+                    FILTER (WHERE status = 'queued' AND run_at <= NOW())), 0)::float8
+                    AS oldest_ready_s
+            FROM jobs
+            WHERE status IN ('queued', 'running')
+            """
+        )
+        failed = await self.pool.fetchval(
+            "SELECT COUNT(*)::int FROM jobs WHERE status = 'failed' "
+            "AND finished_at > NOW() - INTERVAL '1 day'"
+        )
+        return {**dict(row), "failed_24h": failed}
@@ -0,0 +1,174 @@
+import asyncpg
+from typing import Optional
+
+# Timeline entries are (score, post_id) with score = created_at in epoch
+# milliseconds, computed in SQL only so every source agrees on it.
+SCORE_SQL = "FLOOR(EXTRACT(EPOCH FROM p.created_at) * 1000)::bigint"
+
+# Leaderboard categories scored straight from a column: (score, join).
+# Ranked in SQL by leaderboard_top without computing every user's scores.
+COLUMN_SCORES = {
+    "overall": ("COALESCE(u.social_score, 0)", ""),
+    "consistency": ("COALESCE(s.current_streak, 0)", "LEFT JOIN user_streaks s ON s.user_id = u.user_id"),
+}
+
+
+class SocialRepository:
+    """Queries behind the following-timeline and the leaderboards."""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def post_for_fanout(self, post_id: int) -> Optional[dict]:
+        row = await self.pool.fetchrow(
+            f"SELECT p.user_id, p.hidden_at IS NOT NULL AS hidden, {SCORE_SQL} AS score "
+            "FROM social_posts p WHERE p.id = $1",
+            post_id,
+        )
+        return dict(row) if row else None
+
+    async def follower_count_upto(self, author_id: int, cap: int) -> int:
+        """Number of followers, counting no further than `cap`."""
+        return await self.pool.fetchval(
+            "SELECT COUNT(*)::int FROM (SELECT 1 FROM social_follows "
+            "WHERE followee_id = $1 LIMIT $2) AS f",
+            author_id, cap,
+        )
+
+    async def followers_after(self, author_id: int, after: int, limit: int) -> list[int]:
+        """One keyset-paged chunk of follower ids, ascending."""
+        rows = await self.pool.fetch(
+            "SELECT follower_id FROM social_follows "
+            "WHERE followee_id = $1 AND follower_id > $2 "
+            "ORDER BY follower_id LIMIT $3",
+            author_id, after, limit,
+        )
+        return [r["follower_id"] for r in rows]
+
+    async def followed_among(self, user_id: int, author_ids: list[int]) -> list[int]:
+        rows = await self.pool.fetch(
+            "SELECT followee_id FROM social_follows "
+            "WHERE follower_id = $1 AND followee_id = ANY($2::bigint[])",
+            user_id, author_ids,
+        )
+        return [r["followee_id"] for r in rows]
+
+    async def following_posts(
+        self, user_id: int, before: Optional[tuple[int, int]], limit: int,
+    ) -> list[tuple[int, int]]:
+        """Fan-out-on-read: newest visible posts by the user and everyone they follow."""
+        return await self._posts(
+            "(p.user_id = $1 OR p.user_id IN "
+            "(SELECT followee_id FROM social_follows WHERE follower_id = $1))",
+            user_id, before, limit,
+        )
+
+    async def posts_by_authors(
+        self, author_ids: list[int], before: Optional[tuple[int, int]], limit: int,
+    ) -> list[tuple[int, int]]:
+        return await self._posts("p.user_id = ANY($1::bigint[])", author_ids, before, limit)
+
+    async def _posts(
+        self, author_filter: str, arg, before: Optional[tuple[int, int]], limit: int,
+    ) -> list[tuple[int, int]]:
+        args = [arg, limit]
+        where = [author_filter, "p.hidden_at IS NULL"]
+        if before is not None:
+            args.extend(before)
+            where.append(f"({SCORE_SQL}, p.id) < ($3, $4)")
+        rows = await self.pool.fetch(
+            f"SELECT {SCORE_SQL} AS score, p.id FROM social_posts p "
+            f"WHERE {' AND '.join(where)} "
+            "ORDER BY p.created_at DESC, p.id DESC LIMIT $2",
+            *args,
+        )
+        return [(r["score"], r["id"]) for r in rows]
+
+    # ---------- leaderboards ----------
+
+    async def leaderboard_rows(
+        self,
+        user_ids: Optional[list[int]] = None,
+        after: int = 0,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Raw inputs of every leaderboard category, per user.
+
+        Either for `user_ids`, or keyset-paged over all users (`after`,
+        `limit`) for reconciliation. Turned into scores by
+        app.services.leaderboards.scores_from_row.
+        """
+        if user_ids is not None:
+            where, args = "u.user_id = ANY($1::bigint[])", [user_ids]
+        else:
+            where, args = "u.user_id > $1", [after]
+        tail = ""
+        if limit is not None:
+            args.append(limit)
+            tail = f"LIMIT ${len(args)}"
+        rows = await self.pool.fetch(
+            f"""
+            SELECT u.user_id, u.public_profile, u.social_score,
+                   COALESCE(s.current_streak, 0) AS current_streak,
+                   tr.kcal AS training_kcal_30d,
+                   w.first_weight, w.last_weight, w.n AS weigh_ins,
+                   (SELECT user_aim FROM user_aims a WHERE a.user_id = u.user_id LIMIT 1) AS aim
+            FROM user_main u
+            LEFT JOIN user_streaks s ON s.user_id = u.user_id
+            LEFT JOIN LATERAL (
+                SELECT SUM(d.training_kcal) AS kcal
+                FROM user_daily_stats d
+                WHERE d.user_id = u.user_id AND d.date > CURRENT_DATE - 30
+            ) tr ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT (array_agg(d.weight ORDER BY d.date))[1] AS first_weight,
+                       (array_agg(d.weight ORDER BY d.date DESC))[1] AS last_weight,
+                       COUNT(*)::int AS n
+                FROM user_daily_stats d
+                WHERE d.user_id = u.user_id AND d.date > CURRENT_DATE - 90
+                  AND d.weight IS NOT NULL
+            ) w ON TRUE
+            WHERE {where}
+            ORDER BY u.user_id
+            {tail}
+            """,
+            *args,
+        )
+        return [dict(r) for r in rows]
+
+    async def public_leaderboard_rows(self, viewer_id: int) -> list[dict]:
+        """Every public user (plus the viewer) — Postgres fallback while Redis is cold."""
+        rows = await self.pool.fetch(
+            "SELECT user_id FROM user_main WHERE public_profile = TRUE OR user_id = $1",
+            viewer_id,
+        )
+        return await self.leaderboard_rows(user_ids=[r["user_id"] for r in rows])
+
+    async def leaderboard_top(
+        self, category: str, viewer_id: int, limit: int,
+    ) -> tuple[list[dict], Optional[dict]]:
+        """Top `limit` public users (plus the viewer) of a COLUMN_SCORES
+        category, and the viewer's `score` and `rank` among public users."""
+        score, join = COLUMN_SCORES[category]
+        board = (
+            f"WITH board AS (SELECT u.user_id, {score}::bigint AS score FROM user_main u {join} "
+            "WHERE u.public_profile = TRUE OR u.user_id = $1) "
+        )
+        rows = await self.pool.fetch(
+            board + "SELECT user_id, score FROM board ORDER BY score DESC, user_id LIMIT $2",
+            viewer_id, limit,
+        )
+        me = await self.pool.fetchrow(
+            board + "SELECT b.score, (SELECT COUNT(*) FROM board o WHERE o.score > b.score)::int + 1 "
+            "AS rank FROM board b WHERE b.user_id = $1",
+            viewer_id,
+        )
+        return [dict(r) for r in rows], dict(me) if me else None
+
+    async def display_names(self, user_ids: list[int]) -> dict[int, str]:
+        rows = await self.pool.fetch(
+            "SELECT user_id, COALESCE(display_name, user_name, telegram_username, 'user') AS name "
+            "FROM user_main WHERE user_id = ANY($1::bigint[])",
+            user_ids,
+        )
+        return {r["user_id"]: r["name"] for r in rows}
@@ -46,100 +46,53 @@ class StreakRepository:
             user_id, current, longest, last_active, freezes, last_freeze_reset,
         )
 
-    # ---------- activity counts (for badge evaluation) ----------
-
-    async def food_entries_count(self, user_id: int) -> int:
-        row = await self.pool.fetchrow(
-            "SELECT COUNT(*) AS c FROM food WHERE user_id = $1",
-            user_id,
-        )
-        return int(row["c"]) if row else 0
-
-    async def water_goal_streak(self, user_id: int, target: int = 8) -> int:
-        """Count consecutive days ending today where water.count >= target."""
-        row = await self.pool.fetchrow(
-            """
-            WITH days AS (
-              SELECT date, count
-              FROM water
-              WHERE user_id = $1 AND count >= $2
-                AND date <= CURRENT_DATE
-              ORDER BY date DESC
-              LIMIT 60
-            ),
-            numbered AS (
-              SELECT date,
-                     CURRENT_DATE - ROW_NUMBER() OVER (ORDER BY date DESC)::int AS expected
-              FROM days
-            )
-            SELECT COUNT(*)::int AS streak
-            FROM numbered
-            WHERE date = expected + 1
-            """,
-            user_id, target,
-        )
-        return int(row["streak"]) if row else 0
-
-    async def workouts_in_week(self, user_id: int, week_start: date) -> int:
-        row = await self.pool.fetchrow(
-            """
-            SELECT COUNT(*) AS c
-            FROM user_training
-            WHERE user_id = $1
-              AND date >= $2
-              AND date < $2 + INTERVAL '7 days'
-            """,
-            user_id, week_start,
-        )
-        return int(row["c"]) if row else 0
-
-    async def workouts_count(self, user_id: int) -> int:
-        row = await self.pool.fetchrow(
-            "SELECT COUNT(*) AS c FROM user_training WHERE user_id = $1",
-            user_id,
-        )
-        return int(row["c"]) if row else 0
-
-    async def water_count_total(self, user_id: int) -> int:
-        row = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(count), 0) AS c FROM water WHERE user_id = $1",
-            user_id,
-        )
-        return int(row["c"]) if row else 0
-
-    async def water_today(self, user_id: int) -> int:
-        row = await self.pool.fetchrow(
-            "SELECT COALESCE(count, 0) AS c FROM water "
-            "WHERE user_id = $1 AND date = CURRENT_DATE",
-            user_id,
-        )
-        return int(row["c"]) if row else 0
-
-    async def food_totals_today(self, user_id: int) -> Optional[dict]:
-        """Return dict(protein, fat, carbs, calories) for today."""
+    # ---------- badge state ----------
+
+    async def badge_state(
+        self, user_id: int, today: date, week_start: date, water_target: int,
+    ) -> dict:
+        """The streak row plus everything the badge rules look at, in one round trip.
+
+        Lifetime totals come from user_activity_counters and the per-day
+        figures from the user_daily_stats rollup (both trigger-maintained),
+        so the cost doesn't grow with the user's history. `water_goal_days`
+        counts goal days in the 7 days ending today; `earned` is the set of
+        badge codes already granted.
+        """
         row = await self.pool.fetchrow(
             """
             SELECT
-              COALESCE(SUM(b), 0) AS protein,
-              COALESCE(SUM(g), 0) AS fat,
-              COALESCE(SUM(u), 0) AS carbs,
-              COALESCE(SUM(cal), 0) AS calories
-            FROM food
-            WHERE user_id = $1 AND date = CURRENT_DATE
+                s.user_id IS NOT NULL AS has_streak,
+                s.current_streak, s.longest_streak, s.last_active_date,
+                s.freezes_available, s.last_freeze_reset,
+                COALESCE(c.food_entries, 0)::int AS food_entries,
+                COALESCE(c.workouts, 0)::int AS workouts,
+                COALESCE(c.water_glasses, 0)::int AS water_glasses,
+                COALESCE(d.water, 0)::int AS water_today,
+                COALESCE(d.kcal, 0) AS kcal_today,
+                COALESCE(d.protein, 0) AS protein_today,
+                COALESCE(d.fat, 0) AS fat_today,
+                COALESCE(d.carbs, 0) AS carbs_today,
+                (SELECT COUNT(*) FROM user_daily_stats g
+                 WHERE g.user_id = $1 AND g.date > $2::date - 7 AND g.date <= $2::date
+                   AND g.water >= $4)::int AS water_goal_days,
+                (SELECT COALESCE(SUM(w.training_sessions), 0) FROM user_daily_stats w
+                 WHERE w.user_id = $1 AND w.date >= $3::date AND w.date < $3::date + 7)::int AS workouts_week,
+                (SELECT daily_cal FROM user_aims a WHERE a.user_id = $1 LIMIT 1) AS daily_cal,
+                ARRAY(
+                    SELECT b.code FROM user_badges ub JOIN badges b ON b.id = ub.badge_id
+                    WHERE ub.user_id = $1
+                ) AS earned
+            FROM (SELECT $1::bigint AS user_id) AS u
+            LEFT JOIN user_streaks s ON s.user_id = u.user_id
+            LEFT JOIN user_activity_counters c ON c.user_id = u.user_id
+            LEFT JOIN user_daily_stats d ON d.user_id = u.user_id AND d.date = $2
             """,
-            user_id,
-        )
-        return dict(row) if row else None
-
-    async def user_daily_cal(self, user_id: int) -> Optional[int]:
-        row = await self.pool.fetchrow(
-            "SELECT daily_cal FROM user_aims WHERE user_id = $1",
-            user_id,
+            user_id, today, week_start, water_target,
         )
-        if not row:
-            return None
-        val = row["daily_cal"]
-        return int(val) if val else None
+        state = dict(row)
+        state["earned"] = set(state["earned"] or ())
+        return state
 
     # ---------- badges ----------
 
@@ -164,22 +117,15 @@ class StreakRepository:
         )
         return [dict(r) for r in rows]
 
-    async def earned_codes(self, user_id: int) -> set[str]:
+    async def grant_badges(self, user_id: int, codes: list[str]) -> list[dict]:
+        """Atomically grant badges by code. Returns only the newly granted ones."""
+        if not codes:
+            return []
         rows = await self.pool.fetch(
-            "SELECT b.code FROM user_badges ub JOIN badges b ON b.id = ub.badge_id "
-            "WHERE ub.user_id = $1",
-            user_id,
-        )
-        return {r["code"] for r in rows}
-
-    async def grant_badge(self, user_id: int, code: str) -> Optional[dict]:
-        """Atomically grant a badge. Returns the badge dict if newly granted, else None."""
-        row = await self.pool.fetchrow(
             """
-            WITH b AS (SELECT id FROM badges WHERE code = $2),
-            inserted AS (
+            WITH inserted AS (
               INSERT INTO user_badges (user_id, badge_id)
-              SELECT $1, id FROM b
+              SELECT $1, id FROM badges WHERE code = ANY($2::text[])
               ON CONFLICT (user_id, badge_id) DO NOTHING
               RETURNING badge_id, earned_at
             )
@@ -187,7 +133,8 @@ class StreakRepository:
                    inserted.earned_at
             FROM inserted
             JOIN badges b ON b.id = inserted.badge_id
+            ORDER BY b.sort_order
             """,
-            user_id, code,
+            user_id, codes,
         )
-        return dict(row) if row else None
+        return [dict(r) for r in rows]
@@ -1,124 +1,110 @@
 import asyncpg
+import json
 from datetime import date
 
+from app.repositories.daily_stats_repo import DailyStatsRepository
+
+DAY_SUMMARY_SQL = """
+WITH f AS (
+    SELECT id, name_of_food, b, g, u, cal
+    FROM food WHERE user_id = $1 AND date = $2
+), t AS (
+    SELECT id, training_name, tren_time, training_cal
+    FROM user_training WHERE user_id = $1 AND date = $2
+)
+SELECT
+    (SELECT json_build_object(
+        'cal', COALESCE(SUM(cal), 0), 'protein', COALESCE(SUM(b), 0),
+        'fat', COALESCE(SUM(g), 0), 'carbs', COALESCE(SUM(u), 0)) FROM f) AS food,
+    (SELECT COALESCE(json_agg(json_build_object(
+        'name_of_food', name_of_food, 'b', b, 'g', g, 'u', u, 'cal', cal) ORDER BY id), '[]')
+     FROM f) AS food_items,
+    (SELECT json_build_object(
+        'cal', COALESCE(SUM(training_cal), 0), 'duration', COALESCE(SUM(tren_time), 0)) FROM t) AS training,
+    (SELECT COALESCE(json_agg(json_build_object(
+        'training_name', training_name, 'tren_time', tren_time, 'training_cal', training_cal) ORDER BY id), '[]')
+     FROM t) AS training_items,
+    (SELECT count FROM water WHERE user_id = $1 AND date = $2) AS water,
+    (SELECT weight FROM user_health
+     WHERE user_id = $1 AND date = $2 AND weight IS NOT NULL
+     ORDER BY id DESC LIMIT 1) AS weight
+"""
+
+
+def _json(value):
+    # The app pool decodes json via a codec; plain connections hand back text.
+    return json.loads(value) if isinstance(value, str) else value
+
 
 class SummaryRepository:
     def __init__(self, pool: asyncpg.Pool):
         self.pool = pool
 
     async def get_day(self, user_id: int, day: date) -> dict:
-        food = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(cal), 0) as cal, COALESCE(SUM(b), 0) as protein, "
-            "COALESCE(SUM(g), 0) as fat, COALESCE(SUM(u), 0) as carbs "
-            "FROM food WHERE user_id = $1 AND date = $2",
-            user_id, day,
-        )
-        food_items = await self.pool.fetch(
-            "SELECT name_of_food, b, g, u, cal FROM food WHERE user_id = $1 AND date = $2",
-            user_id, day,
-        )
-        training = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(training_cal), 0) as cal, COALESCE(SUM(tren_time), 0) as duration "
-            "FROM user_training WHERE user_id = $1 AND date = $2",
-            user_id, day,
-        )
-        training_items = await self.pool.fetch(
-            "SELECT training_name, tren_time, training_cal FROM user_training WHERE user_id = $1 AND date = $2",
-            user_id, day,
-        )
-        water = await self.pool.fetchrow(
-            "SELECT COALESCE(count, 0) as count FROM water WHERE user_id = $1 AND date = $2",
-            user_id, day,
-        )
-        weight = await self.pool.fetchrow(
-            "SELECT weight FROM user_health WHERE user_id = $1 AND date = $2",
-            user_id, day,
-        )
+        """Everything the day view shows, in one round trip.
+
+        Totals and item lists come from the same CTEs, so they always agree
+        with each other; the lists are aggregated server-side with json_agg.
+        """
+        row = await self.pool.fetchrow(DAY_SUMMARY_SQL, user_id, day)
+        weight = row["weight"]
         return {
             "date": day.isoformat(),
-            "food": dict(food),
-            "food_items": [dict(r) for r in food_items],
-            "training": dict(training),
-            "training_items": [dict(r) for r in training_items],
-            "water": water["count"] if water else 0,
-            "weight": float(weight["weight"]) if weight else None,
+            "food": _json(row["food"]),
+            "food_items": _json(row["food_items"]),
+            "training": _json(row["training"]),
+            "training_items": _json(row["training_items"]),
+            "water": row["water"] or 0,
+            "weight": float(weight) if weight is not None else None,
         }
 
     async def get_month(self, user_id: int, year: int, month: int) -> dict:
-        food = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(cal), 0) as cal, COALESCE(SUM(b), 0) as protein, "
-            "COALESCE(SUM(g), 0) as fat, COALESCE(SUM(u), 0) as carbs, "
-            "COUNT(DISTINCT date) as days "
-            "FROM food WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3",
-            user_id, year, month,
-        )
-        training = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(training_cal), 0) as cal, COALESCE(SUM(tren_time), 0) as duration, "
-            "COUNT(*) as count "
-            "FROM user_training WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3",
-            user_id, year, month,
-        )
-        water = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(count), 0) as total FROM water "
-            "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3",
-            user_id, year, month,
-        )
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        stats = DailyStatsRepository(self.pool)
+        totals = await stats.period_totals(user_id, start, end)
         top5 = await self.pool.fetch(
             "SELECT training_name, COUNT(*) as cnt, SUM(training_cal) as total_cal "
-            "FROM user_training WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3 "
+            "FROM user_training WHERE user_id = $1 AND date >= $2 AND date < $3 "
             "GROUP BY training_name ORDER BY total_cal DESC LIMIT 5",
-            user_id, year, month,
-        )
-        weights = await self.pool.fetch(
-            "SELECT date, weight FROM user_health "
-            "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3 "
-            "ORDER BY date",
-            user_id, year, month,
+            user_id, start, end,
         )
+        weights = await stats.weights(user_id, start, end)
         return {
             "year": year, "month": month,
-            "food": dict(food),
-            "training": dict(training),
-            "water_total": water["total"] if water else 0,
+            "food": {
+                "cal": totals["kcal"], "protein": totals["protein"],
+                "fat": totals["fat"], "carbs": totals["carbs"],
+                "days": totals["food_days"],
+            },
+            "training": {
+                "cal": totals["training_kcal"], "duration": totals["training_minutes"],
+                "count": totals["training_sessions"],
+            },
+            "water_total": totals["water"],
             "top5_training": [dict(r) for r in top5],
             "weights": [{"date": r["date"].isoformat(), "weight": float(r["weight"])} for r in weights],
         }
 
     async def get_year(self, user_id: int, year: int) -> dict:
-        food = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(cal), 0) as cal, COALESCE(SUM(b), 0) as protein, "
-            "COALESCE(SUM(g), 0) as fat, COALESCE(SUM(u), 0) as carbs "
-            "FROM food WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2",
-            user_id, year,
-        )
-        monthly_food = await self.pool.fetch(
-            "SELECT EXTRACT(MONTH FROM date)::int as month, "
-            "SUM(cal) as cal, SUM(b) as protein, SUM(g) as fat, SUM(u) as carbs "
-            "FROM food WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 "
-            "GROUP BY EXTRACT(MONTH FROM date) ORDER BY month",
-            user_id, year,
-        )
-        training = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(training_cal), 0) as cal, COALESCE(SUM(tren_time), 0) as duration "
-            "FROM user_training WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2",
-            user_id, year,
-        )
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+        stats = DailyStatsRepository(self.pool)
+        totals = await stats.period_totals(user_id, start, end)
+        monthly_food = await stats.monthly_food(user_id, start, end)
         top5 = await self.pool.fetch(
             "SELECT training_name, COUNT(*) as cnt, SUM(training_cal) as total_cal "
-            "FROM user_training WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 "
+            "FROM user_training WHERE user_id = $1 AND date >= $2 AND date < $3 "
             "GROUP BY training_name ORDER BY total_cal DESC LIMIT 5",
-            user_id, year,
-        )
-        water = await self.pool.fetchrow(
-            "SELECT COALESCE(SUM(count), 0) as total FROM water "
-            "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2",
-            user_id, year,
+            user_id, start, end,
         )
         return {
             "year": year,
-            "food": dict(food),
-            "monthly_food": [dict(r) for r in monthly_food],
-            "training": dict(training),
+            "food": {
+                "cal": totals["kcal"], "protein": totals["protein"],
+                "fat": totals["fat"], "carbs": totals["carbs"],
+            },
+            "monthly_food": monthly_food,
+            "training": {"cal": totals["training_kcal"], "duration": totals["training_minutes"]},
             "top5_training": [dict(r) for r in top5],
-            "water_total": water["total"] if water else 0,
+            "water_total": totals["water"],
         }
@@ -2,12 +2,19 @@ import hashlib
 import hmac
 import json
 import secrets
+from datetime import date, datetime
 from typing import Any, Optional
 
 from fastapi import APIRouter, Body, Cookie, HTTPException, Query, Request, Response
 from app.config import get_settings
+from app.database import stream_records
 from app.dependencies import DbDep, CurrentUserDep
-from app.repositories.admin_repo import AdminRepository
+from app.repositories.admin_repo import CURSOR_TYPES, AdminRepository
+from app.repositories.audit_repo import AuditRepository
+from app.services import admin_overview as admin_overview_service
+from app.services import export
+from app.services import social_timeline
+from app.utils.cursor import decode_cursor, encode_cursor
 
 router = APIRouter()
 
@@ -151,31 +158,150 @@ async def list_tables(request: Request, db: DbDep):
     return {"tables": [t for t in tables if t in ALLOWED_TABLES]}
 
 
+async def _browse_spec(repo: AdminRepository, table_name: str):
+    """Columns, primary key and the indexed columns a browse may filter/sort on."""
+    columns = await repo.get_table_columns(table_name)
+    meta = {c["column_name"]: c for c in columns}
+    pk = await repo.primary_key(table_name)
+    indexed = set(await repo.indexed_columns(table_name))
+    filterable = sorted((indexed | set(pk[:1])) & meta.keys())
+    sortable = [
+        c for c in filterable
+        if meta[c]["data_type"] in CURSOR_TYPES and (c in pk or meta[c]["is_nullable"] == "NO")
+    ]
+    return columns, meta, pk, filterable, sortable
+
+
+def _browse_filters(
+    meta: dict, filterable: list[str], sortable: list[str],
+    filter_column: Optional[str], filter_value: Optional[str], sort: Optional[str],
+) -> dict[str, Any]:
+    filters: dict[str, Any] = {}
+    if filter_column is not None:
+        if filter_column not in filterable:
+            raise HTTPException(status_code=400, detail=f"Cannot filter on column: {filter_column}")
+        filters[filter_column] = _cast_cell_value(filter_value, meta[filter_column])
+    if sort is not None and sort not in sortable:
+        raise HTTPException(status_code=400, detail=f"Cannot sort on column: {sort}")
+    return filters
+
+
+def _browse_order(pk: list[str], sort: Optional[str]) -> list[str]:
+    return ([sort] if sort else []) + [c for c in pk if c != sort]
+
+
+def _cursor_value_ok(value: Any, data_type: str) -> bool:
+    if data_type in ("smallint", "integer", "bigint"):
+        return isinstance(value, int) and not isinstance(value, bool)
+    if data_type == "boolean":
+        return isinstance(value, bool)
+    if data_type == "date":
+        return isinstance(value, date) and not isinstance(value, datetime)
+    if data_type == "timestamp without time zone":
+        return isinstance(value, datetime) and value.tzinfo is None
+    if data_type == "timestamp with time zone":
+        return isinstance(value, datetime) and value.tzinfo is not None
+    return isinstance(value, str)
+
+
+def _browse_cursor(token: str, order_by: list[str], meta: dict) -> list[Any]:
+    """Decode ``token`` and check each value against its column's type."""
+    try:
+        values = decode_cursor(token, len(order_by))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not all(_cursor_value_ok(v, meta[c]["data_type"]) for c, v in zip(order_by, values)):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return values
+
+
 @router.get("/tables/{table_name}")
 async def get_table_data(
     table_name: str, request: Request, db: DbDep,
-    page: int = Query(default=1, ge=1),
     per_page: int = Query(default=20, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    sort: Optional[str] = Query(None, description="one of `sortable`; default: primary key"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    filter_column: Optional[str] = Query(None, description="one of `filterable`"),
+    filter_value: Optional[str] = Query(None),
+    exact: bool = Query(False, description="exact COUNT(*) instead of the estimate"),
+    page: int = Query(default=1, ge=1, description="OFFSET paging, only for tables without a usable primary key"),
 ):
+    """Browse a table a page at a time.
+
+    Pages are keyset-paged on ``(sort, primary key)`` — pass ``next_cursor``
+    back as ``cursor`` — so a deep page costs the same as the first.
+    Sorting and equality filtering are limited to indexed columns
+    (``sortable`` / ``filterable``). ``total`` is the planner's estimate
+    unless ``exact=true`` (``total_exact`` says which).
+    """
     user_id = await _try_user_id(request)
     await _admin_or_password(request, user_id, db)
     if table_name not in ALLOWED_TABLES:
         raise HTTPException(status_code=404, detail="Table not found")
 
     repo = AdminRepository(db)
-    columns = await repo.get_table_columns(table_name)
-    offset = (page - 1) * per_page
-    rows = await repo.get_rows(table_name, per_page, offset)
-    total = await repo.count_rows(table_name)
+    columns, meta, pk, filterable, sortable = await _browse_spec(repo, table_name)
+    filters = _browse_filters(meta, filterable, sortable, filter_column, filter_value, sort)
+
+    next_cursor = None
+    order_by = _browse_order(pk, sort)
+    if pk and all(meta[c]["data_type"] in CURSOR_TYPES for c in pk):
+        after = _browse_cursor(cursor, order_by, meta) if cursor else None
+        rows = await repo.page_rows(table_name, order_by, order == "desc", after, filters, per_page + 1)
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            next_cursor = encode_cursor([rows[-1][c] for c in order_by])
+    else:
+        # No primary key a cursor can carry: fall back to OFFSET paging,
+        # with the same filters (so rows match `total`) and sort.
+        rows = await repo.offset_rows(
+            table_name, order_by, order == "desc", filters, per_page, (page - 1) * per_page,
+        )
+
+    if exact:
+        total = await repo.count_matching(table_name, filters)
+    else:
+        total = await repo.estimate_rows(table_name, filters)
     return {
         "columns": columns,
         "rows": rows,
         "total": total,
-        "page": page,
+        "total_exact": exact,
         "per_page": per_page,
+        "next_cursor": next_cursor,
+        "pk": pk,
+        "sortable": sortable,
+        "filterable": filterable,
     }
 
 
+@router.get("/tables/{table_name}/export")
+async def export_table(
+    table_name: str, request: Request, db: DbDep,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="gzip the file on the fly"),
+    sort: Optional[str] = Query(None, description="one of `sortable`; default: primary key"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    filter_column: Optional[str] = Query(None, description="one of `filterable`"),
+    filter_value: Optional[str] = Query(None),
+):
+    """Stream the whole table (same filter/sort as the browser) as a download."""
+    user_id = await _try_user_id(request)
+    await _admin_or_password(request, user_id, db)
+    if table_name not in ALLOWED_TABLES:
+        raise HTTPException(status_code=404, detail="Table not found")
+
+    repo = AdminRepository(db)
+    columns, meta, pk, filterable, sortable = await _browse_spec(repo, table_name)
+    filters = _browse_filters(meta, filterable, sortable, filter_column, filter_value, sort)
+    rows = repo.stream_rows(table_name, _browse_order(pk, sort), order == "desc", filters)
+    return export.response(
+        rows, table_name, format,
+        columns=[c["column_name"] for c in columns], compress=gzip,
+    )
+
+
 @router.delete("/tables/{table_name}/{pk_column}/{pk_value}")
 async def delete_row(
     table_name: str, pk_column: str, pk_value: str,
@@ -545,138 +671,26 @@ async def update_table_row(
 
 @router.get("/overview")
 async def admin_overview(request: Request, db: DbDep):
+    """Dashboard numbers from the background snapshot; ``snapshot.age_s`` is its age."""
     me_id = await _try_user_id(request)
     await _admin_or_password(request, me_id, db)
+    return _overview_response(await admin_overview_service.get(db))
 
-    # --- users -------------------------------------------------------------
-    users_total = await db.fetchval("SELECT COUNT(*) FROM user_main")
-    users_today = await db.fetchval(
-        "SELECT COUNT(*) FROM user_main WHERE created_at >= NOW() - INTERVAL '1 day'"
-    )
-    users_week = await db.fetchval(
-        "SELECT COUNT(*) FROM user_main WHERE created_at >= NOW() - INTERVAL '7 days'"
-    )
-    # active = at least one audit-log entry in window
-    active_24h = await db.fetchval(
-        "SELECT COUNT(DISTINCT user_id) FROM audit_log "
-        "WHERE user_id IS NOT NULL AND created_at >= NOW() - INTERVAL '1 day'"
-    )
-    active_7d = await db.fetchval(
-        "SELECT COUNT(DISTINCT user_id) FROM audit_log "
-        "WHERE user_id IS NOT NULL AND created_at >= NOW() - INTERVAL '7 days'"
-    )
 
-    # --- food / water / training (today) -----------------------------------
-    food_today = await db.fetchrow(
-        "SELECT COUNT(*) AS rows, COALESCE(SUM(cal),0)::int AS cal "
-        "FROM food WHERE date = CURRENT_DATE"
-    )
-    water_today = await db.fetchval(
-        "SELECT COALESCE(SUM(count),0)::int FROM water WHERE date = CURRENT_DATE"
-    )
-    training_today = await db.fetchrow(
-        "SELECT COUNT(*) AS rows, COALESCE(SUM(training_cal),0)::int AS cal "
-        "FROM user_training WHERE date = CURRENT_DATE"
-    )
-
-    # --- AI usage (last 7 days) -------------------------------------------
-    ai_rows = await db.fetch(
-        """
-        SELECT category, COUNT(*) AS cnt,
-               SUM(CASE WHEN status_code >= 500 THEN 1 ELSE 0 END) AS errs
-        FROM audit_log
-        WHERE created_at >= NOW() - INTERVAL '7 days'
-          AND category LIKE 'ai_%'
-        GROUP BY category
-        ORDER BY cnt DESC
-        """
-    )
+@router.post("/overview/refresh")
+async def admin_overview_refresh(request: Request, db: DbDep):
+    """Recompute the snapshot now (coalesced with any refresh already running)."""
+    me_id = await _try_user_id(request)
+    await _admin_or_password(request, me_id, db)
+    return _overview_response(await admin_overview_service.refresh(db))
 
-    # --- social ------------------------------------------------------------
-    social_posts = await db.fetchval("SELECT COUNT(*) FROM social_posts")
-    social_posts_week = await db.fetchval(
-        "SELECT COUNT(*) FROM social_posts WHERE created_at >= NOW() - INTERVAL '7 days'"
-    )
-    social_likes = await db.fetchval("SELECT COUNT(*) FROM social_likes")
 
-    # --- top users by recent activity -------------------------------------
-    top_users = await db.fetch(
-        """
-        SELECT al.user_id,
-               um.user_name AS name,
-               um.telegram_username,
-               COUNT(*) AS actions
-        FROM audit_log al
-        JOIN user_main um ON um.user_id = al.user_id
-        WHERE al.created_at >= NOW() - INTERVAL '7 days'
-          AND al.user_id IS NOT NULL
-        GROUP BY al.user_id, um.user_name, um.telegram_username
-        ORDER BY actions DESC
-        LIMIT 10
-        """
-    )
-
-    # --- recent errors -----------------------------------------------------
-    recent_errors = await db.fetch(
-        """
-        SELECT id, user_id, method, path, status_code, created_at, detail
-        FROM audit_log
-        WHERE status_code >= 500
-        ORDER BY created_at DESC
-        LIMIT 10
-        """
-    )
-
-    return {
-        "users": {
-            "total": int(users_total or 0),
-            "new_today": int(users_today or 0),
-            "new_week": int(users_week or 0),
-            "active_24h": int(active_24h or 0),
-            "active_7d": int(active_7d or 0),
-        },
-        "today": {
-            "food_entries": int(food_today["rows"] or 0),
-            "food_calories": int(food_today["cal"] or 0),
-            "water_glasses": int(water_today or 0),
-            "training_entries": int(training_today["rows"] or 0),
-            "training_calories": int(training_today["cal"] or 0),
-        },
-        "ai_7d": [
-            {
-                "category": r["category"],
-                "count": int(r["cnt"]),
-                "errors": int(r["errs"] or 0),
-            }
-            for r in ai_rows
-        ],
-        "social": {
-            "posts": int(social_posts or 0),
-            "posts_week": int(social_posts_week or 0),
-            "likes": int(social_likes or 0),
-        },
-        "top_users": [
-            {
-                "user_id": r["user_id"],
-                "name": r["name"],
-                "telegram_username": r["telegram_username"],
-                "actions": int(r["actions"]),
-            }
-            for r in top_users
-        ],
-        "recent_errors": [
-            {
-                "id": r["id"],
-                "user_id": r["user_id"],
-                "method": r["method"],
-                "path": r["path"],
-                "status_code": r["status_code"],
-                "detail": _safe_detail(r["detail"]),
-                "created_at": r["created_at"].isoformat(),
-            }
-            for r in recent_errors
-        ],
-    }
+def _overview_response(snapshot: dict) -> dict:
+    body = admin_overview_service.with_age(snapshot)
+    body["recent_errors"] = [
+        {**e, "detail": _safe_detail(e["detail"])} for e in body["recent_errors"]
+    ]
+    return body
 
 
 # ---------------------------------------------------------------------------
@@ -691,22 +705,17 @@ AUDIT_CATEGORIES = [
 ]
 
 
-@router.get("/audit")
-async def audit_list(
-    request: Request,
-    db: DbDep,
-    category: Optional[str] = Query(None),
-    user_id_filter: Optional[int] = Query(None, alias="user_id"),
-    method: Optional[str] = Query(None),
-    status_min: int = Query(0, ge=0, le=599),
-    status_max: int = Query(599, ge=0, le=599),
-    search: Optional[str] = Query(None, description="Substring of path"),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-):
-    me_id = await _try_user_id(request)
-    await _admin_or_password(request, me_id, db)
+_AUDIT_COLUMNS = [
+    "id", "user_id", "method", "path", "category", "status_code",
+    "duration_ms", "ip", "user_agent", "detail", "created_at",
+]
+_AUDIT_SELECT = f"SELECT {', '.join(_AUDIT_COLUMNS)} FROM audit_log"
 
+
+def _audit_where(
+    category: Optional[str], user_id_filter: Optional[int], method: Optional[str],
+    status_min: int, status_max: int, search: Optional[str],
+) -> tuple[list[str], list]:
     where = ["status_code >= $1", "status_code <= $2"]
     args: list = [status_min, status_max]
     if category:
@@ -721,13 +730,46 @@ async def audit_list(
     if search:
         args.append(f"%{search}%")
         where.append(f"path ILIKE ${len(args)}")
+    return where, args
+
 
+def _audit_item(r) -> dict:
+    return {
+        "id": r["id"],
+        "user_id": r["user_id"],
+        "method": r["method"],
+        "path": r["path"],
+        "category": r["category"],
+        "status_code": r["status_code"],
+        "duration_ms": r["duration_ms"],
+        "ip": str(r["ip"]) if r["ip"] else None,
+        "user_agent": r["user_agent"],
+        "detail": _safe_detail(r["detail"]),
+        "created_at": r["created_at"].isoformat(),
+    }
+
+
+@router.get("/audit")
+async def audit_list(
+    request: Request,
+    db: DbDep,
+    category: Optional[str] = Query(None),
+    user_id_filter: Optional[int] = Query(None, alias="user_id"),
+    method: Optional[str] = Query(None),
+    status_min: int = Query(0, ge=0, le=599),
+    status_max: int = Query(599, ge=0, le=599),
+    search: Optional[str] = Query(None, description="Substring of path"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    me_id = await _try_user_id(request)
+    await _admin_or_password(request, me_id, db)
+
+    where, args = _audit_where(category, user_id_filter, method, status_min, status_max, search)
     args.extend([limit, offset])
     rows = await db.fetch(
         f"""
-        SELECT id, user_id, method, path, category, status_code,
-               duration_ms, ip, user_agent, detail, created_at
-        FROM audit_log
+        {_AUDIT_SELECT}
         WHERE {' AND '.join(where)}
         ORDER BY created_at DESC
         LIMIT ${len(args) - 1} OFFSET ${len(args)}
@@ -739,66 +781,47 @@ async def audit_list(
         *args[:-2],
     )
     return {
-        "items": [
-            {
-                "id": r["id"],
-                "user_id": r["user_id"],
-                "method": r["method"],
-                "path": r["path"],
-                "category": r["category"],
-                "status_code": r["status_code"],
-                "duration_ms": r["duration_ms"],
-                "ip": str(r["ip"]) if r["ip"] else None,
-                "user_agent": r["user_agent"],
-                "detail": _safe_detail(r["detail"]),
-                "created_at": r["created_at"].isoformat(),
-            }
-            for r in rows
-        ],
+        "items": [_audit_item(r) for r in rows],
         "total": int(total or 0),
         "categories": AUDIT_CATEGORIES,
     }
 
 
-@router.get("/audit/stats")
-async def audit_stats(request: Request, db: DbDep, days: int = Query(7, ge=1, le=90)):
+@router.get("/audit/export")
+async def audit_export(
+    request: Request,
+    db: DbDep,
+    category: Optional[str] = Query(None),
+    user_id_filter: Optional[int] = Query(None, alias="user_id"),
+    method: Optional[str] = Query(None),
+    status_min: int = Query(0, ge=0, le=599),
+    status_max: int = Query(599, ge=0, le=599),
+    search: Optional[str] = Query(None, description="Substring of path"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="gzip the file on the fly"),
+):
+    """Stream every audit entry matching the list-view filters, newest first."""
     me_id = await _try_user_id(request)
     await _admin_or_password(request, me_id, db)
-    # `INTERVAL '1 day' * $1` avoids brittle text concat that some pg versions
-    # rejected with "operator does not exist: integer || unknown".
-    rows = await db.fetch(
-        """
-        SELECT category, COUNT(*) AS cnt
-        FROM audit_log
-        WHERE created_at >= NOW() - (INTERVAL '1 day') * $1
-        GROUP BY category
-        ORDER BY cnt DESC
-        """,
-        days,
+
+    where, args = _audit_where(category, user_id_filter, method, status_min, status_max, search)
+    records = stream_records(
+        db, f"{_AUDIT_SELECT} WHERE {' AND '.join(where)} ORDER BY created_at DESC", args,
     )
-    daily = await db.fetch(
-        """
-        SELECT date_trunc('day', created_at) AS day, COUNT(*) AS cnt
-        FROM audit_log
-        WHERE created_at >= NOW() - (INTERVAL '1 day') * $1
-        GROUP BY day
-        ORDER BY day
-        """,
-        days,
-    )
-    totals = await db.fetchrow(
-        """
-        SELECT
-          COUNT(*)                               AS total,
-          COUNT(DISTINCT user_id)                AS uniq_users,
-          COALESCE(AVG(duration_ms), 0)::int     AS avg_ms,
-          SUM(CASE WHEN status_code >= 500 THEN 1 ELSE 0 END) AS errors_5xx,
-          SUM(CASE WHEN status_code BETWEEN 400 AND 499 THEN 1 ELSE 0 END) AS errors_4xx
-        FROM audit_log
-        WHERE created_at >= NOW() - (INTERVAL '1 day') * $1
-        """,
-        days,
+    return export.response(
+        records, "audit_log", format, columns=_AUDIT_COLUMNS, compress=gzip, row=_audit_item,
     )
+
+
+@router.get("/audit/stats")
+async def audit_stats(request: Request, db: DbDep, days: int = Query(7, ge=1, le=90)):
+    me_id = await _try_user_id(request)
+    await _admin_or_password(request, me_id, db)
+    # Hourly rollups (migration 018), refreshed every AUDIT_ROLLUP_INTERVAL.
+    audit = AuditRepository(db)
+    rows = await audit.by_category(days)
+    daily = await audit.by_day(days)
+    totals = await audit.totals(days)
     return {
         "by_category": [{"category": r["category"], "count": int(r["cnt"])} for r in rows],
         "by_day": [
@@ -868,32 +891,17 @@ async def admin_users_list(
 # ---------------------------------------------------------------------------
 
 
-@router.get("/ai/log")
-async def admin_ai_log(
-    request: Request,
-    db: DbDep,
-    search: Optional[str] = Query(None, description="Substring of either side of the dialog"),
-    target_user: Optional[int] = Query(None, alias="user_id"),
-    days: int = Query(7, ge=1, le=365),
-    only_negative: bool = Query(False, description="Only assistant replies thumbed-down"),
-    has_attach: Optional[str] = Query(None, pattern=r"^(meal_plan|workout_plan|any)$"),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-):
-    """Return paired (user → assistant) turns, newest first.
+_AI_LOG_FROM = """
+        FROM paired h
+        LEFT JOIN user_main um ON um.user_id = h.user_id
+"""
 
-    Pairing strategy: walk chat_history ordered by ``(user_id, created_at)``
-    with ``LAG()`` so each assistant row sees the user message that came right
-    before it from the same user. Then we filter to assistant rows only and
-    keep the lagged ``user_message`` alongside.
-
-    This is robust against gaps (system messages, deleted rows) because we
-    only require that the previous message of the same user was a user turn —
-    if it wasn't, the pair is dropped.
-    """
-    me_id = await _try_user_id(request)
-    await _admin_or_password(request, me_id, db)
 
+def _ai_log_query(
+    search: Optional[str], target_user: Optional[int], days: int,
+    only_negative: bool, has_attach: Optional[str],
+) -> tuple[str, str, list[Any]]:
+    """The pairing CTE, WHERE clause and args shared by the AI log list and export."""
     where = ["h.message_type = 'assistant'", "h.created_at >= NOW() - (INTERVAL '1 day') * $1"]
     args: list[Any] = [days]
     if target_user is not None:
@@ -931,15 +939,62 @@ async def admin_ai_log(
             WINDOW w AS (PARTITION BY ch.user_id ORDER BY ch.created_at)
         )
     """
-    common_where = " AND ".join(where) + " AND h.prev_type = 'user'"
+    return base_cte, " AND ".join(where) + " AND h.prev_type = 'user'", args
+
+
+def _ai_log_item(r) -> dict:
+    return {
+        "id": r["id"],
+        "user_id": r["user_id"],
+        "user_name": r["user_name"],
+        "telegram_username": r["telegram_username"],
+        "user_message": r["prev_user"] or "",
+        "user_message_id": r["prev_user_id"],
+        "assistant_message": r["message_text"] or "",
+        "feedback": r["feedback"],
+        "attach_kind": r["attach_kind"],
+        "latency_ms": r["latency_ms"],
+        "model": r["model"],
+        "created_at": r["created_at"].isoformat(),
+    }
+
+
+@router.get("/ai/log")
+async def admin_ai_log(
+    request: Request,
+    db: DbDep,
+    search: Optional[str] = Query(None, description="Substring of either side of the dialog"),
+    target_user: Optional[int] = Query(None, alias="user_id"),
+    days: int = Query(7, ge=1, le=365),
+    only_negative: bool = Query(False, description="Only assistant replies thumbed-down"),
+    has_attach: Optional[str] = Query(None, pattern=r"^(meal_plan|workout_plan|any)$"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """Return paired (user → assistant) turns, newest first.
+
+    Pairing strategy: walk chat_history ordered by ``(user_id, created_at)``
+    with ``LAG()`` so each assistant row sees the user message that came right
+    before it from the same user. Then we filter to assistant rows only and
+    keep the lagged ``user_message`` alongside.
+
+    This is robust against gaps (system messages, deleted rows) because we
+    only require that the previous message of the same user was a user turn —
+    if it wasn't, the pair is dropped.
+    """
+    me_id = await _try_user_id(request)
+    await _admin_or_password(request, me_id, db)
+
+    base_cte, common_where, args = _ai_log_query(
+        search, target_user, days, only_negative, has_attach,
+    )
 
     args_with_paging = [*args, limit, offset]
     rows = await db.fetch(
         f"""
         {base_cte}
         SELECT h.*, um.user_name, um.telegram_username
-        FROM paired h
-        LEFT JOIN user_main um ON um.user_id = h.user_id
+        {_AI_LOG_FROM}
         WHERE {common_where}
         ORDER BY h.created_at DESC
         LIMIT ${len(args_with_paging) - 1} OFFSET ${len(args_with_paging)}
@@ -954,23 +1009,40 @@ async def admin_ai_log(
         *args,
     )
 
-    items = []
-    for r in rows:
-        items.append({
-            "id": r["id"],
-            "user_id": r["user_id"],
-            "user_name": r["user_name"],
-            "telegram_username": r["telegram_username"],
-            "user_message": r["prev_user"] or "",
-            "user_message_id": r["prev_user_id"],
-            "assistant_message": r["message_text"] or "",
-            "feedback": r["feedback"],
-            "attach_kind": r["attach_kind"],
-            "latency_ms": r["latency_ms"],
-            "model": r["model"],
-            "created_at": r["created_at"].isoformat(),
-        })
-    return {"items": items, "total": int(total or 0)}
+    return {"items": [_ai_log_item(r) for r in rows], "total": int(total or 0)}
+
+
+@router.get("/ai/log/export")
+async def admin_ai_log_export(
+    request: Request,
+    db: DbDep,
+    search: Optional[str] = Query(None, description="Substring of either side of the dialog"),
+    target_user: Optional[int] = Query(None, alias="user_id"),
+    days: int = Query(7, ge=1, le=365),
+    only_negative: bool = Query(False, description="Only assistant replies thumbed-down"),
+    has_attach: Optional[str] = Query(None, pattern=r"^(meal_plan|workout_plan|any)$"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="gzip the file on the fly"),
+):
+    """Stream every paired turn matching the list-view filters, newest first."""
+    me_id = await _try_user_id(request)
+    await _admin_or_password(request, me_id, db)
+
+    base_cte, common_where, args = _ai_log_query(
+        search, target_user, days, only_negative, has_attach,
+    )
+    records = stream_records(
+        db,
+        f"""
+        {base_cte}
+        SELECT h.*, um.user_name, um.telegram_username
+        {_AI_LOG_FROM}
+        WHERE {common_where}
+        ORDER BY h.created_at DESC
+        """,
+        args,
+    )
+    return export.response(records, "ai_log", format, compress=gzip, row=_ai_log_item)
 
 
 @router.get("/ai/stats")
@@ -1496,8 +1568,8 @@ async def admin_social_post_patch(
     if reason and len(reason) > 280:
         reason = reason[:280]
 
-    exists = await db.fetchval("SELECT 1 FROM social_posts WHERE id = $1", post_id)
-    if not exists:
+    author_id = await db.fetchval("SELECT user_id FROM social_posts WHERE id = $1", post_id)
+    if author_id is None:
         raise HTTPException(status_code=404, detail="post not found")
 
     if action == "hide":
@@ -1505,11 +1577,13 @@ async def admin_social_post_patch(
             "UPDATE social_posts SET hidden_at = NOW(), hidden_reason = $2 WHERE id = $1",
             post_id, reason,
         )
+        await social_timeline.schedule_remove(db, post_id, author_id)
     elif action == "unhide":
         await db.execute(
             "UPDATE social_posts SET hidden_at = NULL, hidden_reason = NULL WHERE id = $1",
             post_id,
         )
+        await social_timeline.schedule_fanout(db, post_id, dedupe=False)
     elif action == "pin":
         await db.execute(
             "UPDATE social_posts SET pinned_at = NOW() WHERE id = $1", post_id,
@@ -1540,6 +1614,7 @@ async def admin_social_post_delete(post_id: int, request: Request, db: DbDep):
     if not row:
         raise HTTPException(status_code=404, detail="post not found")
     await db.execute("DELETE FROM social_posts WHERE id = $1", post_id)
+    await social_timeline.schedule_remove(db, post_id, row["user_id"])
     await db.execute(
         """
         INSERT INTO audit_log (user_id, method, path, category, status_code, detail)
@@ -1,6 +1,7 @@
 import logging
 import time
 from datetime import date, timedelta
+from typing import Any
 
 from fastapi import APIRouter, HTTPException
 
@@ -18,8 +19,9 @@ from app.models.ai import (
     RegenerateResponse,
 )
 from app.repositories.chat_repo import ChatRepository
+from app.repositories.daily_stats_repo import DailyStatsRepository
 from app.repositories.user_repo import UserRepository
-from app.services import ai_service
+from app.services import ai_service, coach_context
 from app.services.ai_service import (
     AIConfigError,
     AIQuotaError,
@@ -78,95 +80,39 @@ def _ai_http_error(exc: Exception) -> HTTPException:
 async def _today_snapshot(db, user_id: int) -> dict:
     """Lightweight 'what did the user log today' summary for chat context."""
     today = date.today()
-    food = await db.fetchrow(
-        """
-        SELECT COALESCE(SUM(cal), 0) AS cal,
-               COALESCE(SUM(b), 0)   AS protein,
-               COALESCE(SUM(g), 0)   AS fat,
-               COALESCE(SUM(u), 0)   AS carbs,
-               COUNT(*)              AS items
-        FROM food WHERE user_id = $1 AND date = $2
-        """,
-        user_id, today,
-    )
-    water_count = await db.fetchval(
-        "SELECT COALESCE(SUM(count), 0) FROM water WHERE user_id = $1 AND date = $2",
-        user_id, today,
-    )
-    workout = await db.fetchrow(
-        """
-        SELECT COALESCE(SUM(training_cal), 0) AS burned,
-               COALESCE(SUM(tren_time), 0)    AS minutes,
-               COUNT(*)                       AS sessions
-        FROM user_training WHERE user_id = $1 AND date = $2
-        """,
-        user_id, today,
-    )
+    # One primary-key lookup on the daily rollup instead of three aggregates.
+    totals = await DailyStatsRepository(db).period_totals(user_id, today, today + timedelta(days=1))
     return {
         "date": today.isoformat(),
-        "calories_in": int(food["cal"] or 0),
-        "protein_g": float(food["protein"] or 0),
-        "fat_g": float(food["fat"] or 0),
-        "carbs_g": float(food["carbs"] or 0),
-        "food_items_logged": int(food["items"] or 0),
-        "water_glasses": int(water_count or 0),
-        "water_ml_estimate": int((water_count or 0) * 250),
-        "calories_burned": int(workout["burned"] or 0),
-        "active_minutes": int(workout["minutes"] or 0),
-        "workout_sessions": int(workout["sessions"] or 0),
+        "calories_in": int(totals["kcal"]),
+        "protein_g": float(totals["protein"]),
+        "fat_g": float(totals["fat"]),
+        "carbs_g": float(totals["carbs"]),
+        "food_items_logged": totals["food_entries"],
+        "water_glasses": totals["water"],
+        "water_ml_estimate": totals["water"] * 250,
+        "calories_burned": int(totals["training_kcal"]),
+        "active_minutes": totals["training_minutes"],
+        "workout_sessions": totals["training_sessions"],
     }
 
 
 async def _week_snapshot(db, user_id: int) -> dict:
     today = date.today()
     week_ago = today - timedelta(days=6)
-    food = await db.fetchrow(
-        """
-        SELECT COALESCE(SUM(daily_cal), 0) AS total_cal,
-               COALESCE(AVG(daily_cal), 0) AS avg_cal,
-               COUNT(*)                    AS days_logged
-        FROM (
-          SELECT date, SUM(cal) AS daily_cal
-          FROM food
-          WHERE user_id = $1 AND date BETWEEN $2 AND $3
-          GROUP BY date
-        ) AS d
-        """,
-        user_id, week_ago, today,
-    )
-    water_count = await db.fetchval(
-        "SELECT COALESCE(SUM(count), 0) FROM water "
-        "WHERE user_id = $1 AND date BETWEEN $2 AND $3",
-        user_id, week_ago, today,
-    )
-    workout = await db.fetchrow(
-        """
-        SELECT COUNT(*)                       AS sessions,
-               COALESCE(SUM(training_cal), 0) AS burned,
-               COALESCE(SUM(tren_time), 0)    AS minutes
-        FROM user_training
-        WHERE user_id = $1 AND date BETWEEN $2 AND $3
-        """,
-        user_id, week_ago, today,
-    )
-    weight = await db.fetchrow(
-        """
-        SELECT weight, date FROM user_health
-        WHERE user_id = $1 AND date BETWEEN $2 AND $3
-        ORDER BY date DESC LIMIT 1
-        """,
-        user_id, week_ago, today,
-    )
+    stats = DailyStatsRepository(db)
+    totals = await stats.period_totals(user_id, week_ago, today + timedelta(days=1))
+    weight = await stats.latest_weight(user_id, week_ago, today + timedelta(days=1))
     return {
         "from": week_ago.isoformat(),
         "to": today.isoformat(),
-        "calories_in_total": int(food["total_cal"] or 0),
-        "calories_in_avg_per_day": int(food["avg_cal"] or 0),
-        "days_with_food_logged": int(food["days_logged"] or 0),
-        "water_glasses_total": int(water_count or 0),
-        "workout_sessions": int(workout["sessions"] or 0),
-        "calories_burned_total": int(workout["burned"] or 0),
-        "active_minutes_total": int(workout["minutes"] or 0),
+        "calories_in_total": int(totals["kcal"]),
+        "calories_in_avg_per_day": int(totals["avg_food_kcal"]),
+        "days_with_food_logged": totals["food_days"],
+        "water_glasses_total": totals["water"],
+        "workout_sessions": totals["training_sessions"],
+        "calories_burned_total": int(totals["training_kcal"]),
+        "active_minutes_total": totals["training_minutes"],
         "latest_weight_kg": float(weight["weight"]) if weight else None,
     }
 
@@ -176,13 +122,7 @@ async def _week_snapshot(db, user_id: int) -> dict:
 # ---------------------------------------------------------------------------
 
 
-async def _resolve_chat_context(
-    db, redis, user_id: int, attach: str | None
-) -> tuple[list[dict], dict, str, dict, dict, str | None, str | None]:
-    """Gather everything the chat() service needs.
-
-    Pulled into a helper because both ``/chat`` and ``/chat/regenerate`` need
-    the *exact same* context window — easy to drift apart otherwise."""
+async def _build_chat_context(db, redis, user_id: int) -> coach_context.CoachContext:
     settings = get_settings()
     cache = CacheService(redis, settings.CACHE_ENABLED)
 
@@ -196,12 +136,31 @@ async def _resolve_chat_context(
 
     meal_plan = None
     workout_plan = None
-    cached_meal = await cache.get(f"meal_plan:{lang}:{user_id}") if cache else None
-    cached_workout = await cache.get(f"workout_plan:{lang}:{user_id}") if cache else None
+    cached_meal, cached_workout = await _cached_plans(cache, lang, user_id)
     if isinstance(cached_meal, dict):
         meal_plan = cached_meal.get("plan")
     if isinstance(cached_workout, dict):
         workout_plan = cached_workout.get("plan")
+    return coach_context.CoachContext(
+        history=history, user_info=user_info, lang=lang, today=today, week=week,
+        meal_plan=meal_plan, workout_plan=workout_plan,
+    )
+
+
+async def _resolve_chat_context(
+    db, redis, user_id: int, attach: str | None
+) -> tuple[list[dict], dict, str, dict, dict, str | None, str | None]:
+    """Gather everything the chat() service needs.
+
+    Pulled into a helper because both ``/chat`` and ``/chat/regenerate`` need
+    the *exact same* context window — easy to drift apart otherwise. Served
+    from the per-user coach context snapshot when it is warm."""
+    ctx = await coach_context.get_or_build(
+        redis, user_id, lambda: _build_chat_context(db, redis, user_id)
+    )
+    history, user_info, lang = ctx.history, ctx.user_info, ctx.lang
+    today, week = ctx.today, ctx.week
+    meal_plan, workout_plan = ctx.meal_plan, ctx.workout_plan
 
     if attach == "meal_plan" and not meal_plan:
         raise HTTPException(
@@ -305,6 +264,13 @@ async def _run_chat_and_persist(
     except Exception as e:
         logger.error("AI chat: failed to persist conversation: %s", e)
 
+    if inserted_id is not None:
+        await coach_context.record_turn(
+            redis, user_id, user_message if persist_user else None, response_text
+        )
+    else:
+        await coach_context.invalidate(user_id, redis)
+
     return response_text, inserted_id, latency_ms, model_name
 
 
@@ -336,6 +302,8 @@ async def ai_chat_regenerate(user_id: CurrentUserDep, db: DbDep, redis: RedisDep
     """
     chat_repo = ChatRepository(db)
     deleted_id, prev_text = await chat_repo.delete_last_assistant(user_id)
+    if deleted_id is not None:
+        await coach_context.drop_last_reply(redis, user_id)
     if not prev_text:
         raise HTTPException(
             status_code=409,
@@ -499,8 +467,7 @@ async def chat_snapshot(user_id: CurrentUserDep, db: DbDep, redis: RedisDep):
     lang = await UserRepository(db).get_lang(user_id) or "ru"
     today = await _today_snapshot(db, user_id)
     week = await _week_snapshot(db, user_id)
-    cached_meal = await cache.get(f"meal_plan:{lang}:{user_id}") if cache else None
-    cached_workout = await cache.get(f"workout_plan:{lang}:{user_id}") if cache else None
+    cached_meal, cached_workout = await _cached_plans(cache, lang, user_id)
     return {
         "today": today,
         "week": week,
@@ -517,8 +484,7 @@ async def chat_quick_prompts(user_id: CurrentUserDep, db: DbDep, redis: RedisDep
     lang = await UserRepository(db).get_lang(user_id) or "ru"
     today = await _today_snapshot(db, user_id)
     week = await _week_snapshot(db, user_id)
-    cached_meal = await cache.get(f"meal_plan:{lang}:{user_id}") if cache else None
-    cached_workout = await cache.get(f"workout_plan:{lang}:{user_id}") if cache else None
+    cached_meal, cached_workout = await _cached_plans(cache, lang, user_id)
     has_meal = isinstance(cached_meal, dict) and bool(cached_meal.get("plan"))
     has_workout = isinstance(cached_workout, dict) and bool(cached_workout.get("plan"))
     return QuickPromptsResponse(
@@ -547,9 +513,10 @@ async def chat_history(user_id: CurrentUserDep, db: DbDep, limit: int = 100):
 
 
 @router.delete("/chat/history")
-async def clear_chat_history(user_id: CurrentUserDep, db: DbDep):
+async def clear_chat_history(user_id: CurrentUserDep, db: DbDep, redis: RedisDep):
     chat_repo = ChatRepository(db)
     deleted = await chat_repo.clear_history(user_id)
+    await coach_context.invalidate(user_id, redis)
     return {"deleted": deleted}
 
 
@@ -562,14 +529,23 @@ def _plan_cache_key(kind: str, lang: str, user_id: int) -> str:
     return f"{kind}:{lang}:{user_id}"
 
 
+async def _cached_plans(cache: CacheService, lang: str, user_id: int) -> tuple[Any, Any]:
+    """Cached (meal plan, workout plan) payloads, read with one MGET."""
+    keys = [
+        _plan_cache_key("meal_plan", lang, user_id),
+        _plan_cache_key("workout_plan", lang, user_id),
+    ]
+    found = await cache.get_many(keys)
+    return found.get(keys[0]), found.get(keys[1])
+
+
 @router.get("/plans")
 async def get_active_plans(user_id: CurrentUserDep, db: DbDep, redis: RedisDep):
     """Return whatever plans are currently cached for this user."""
     settings = get_settings()
     cache = CacheService(redis, settings.CACHE_ENABLED)
     lang = await UserRepository(db).get_lang(user_id) or "ru"
-    meal = await cache.get(_plan_cache_key("meal_plan", lang, user_id))
-    workout = await cache.get(_plan_cache_key("workout_plan", lang, user_id))
+    meal, workout = await _cached_plans(cache, lang, user_id)
     return {
         "lang": lang,
         "meal_plan": meal.get("plan") if isinstance(meal, dict) else None,
@@ -594,12 +570,15 @@ async def generate_meal_plan(
     chat_repo = ChatRepository(db)
     user_info = await chat_repo.get_user_info_for_ai(user_id)
     try:
-        plan = await ai_service.generate_meal_plan(user_info, lang)
+        plan = await ai_service.coalesced(
+            cache_key, lambda: ai_service.generate_meal_plan(user_info, lang), redis,
+        )
     except Exception as e:
         logger.warning("AI meal plan failed: %s", e)
         raise _ai_http_error(e)
     result = {"plan": plan, "lang": lang}
     await cache.set(cache_key, result, settings.CACHE_TTL_RECIPES)
+    await coach_context.invalidate(user_id, redis)
     return result
 
 
@@ -620,12 +599,15 @@ async def generate_workout_plan(
     chat_repo = ChatRepository(db)
     user_info = await chat_repo.get_user_info_for_ai(user_id)
     try:
-        plan = await ai_service.generate_workout_plan(user_info, lang)
+        plan = await ai_service.coalesced(
+            cache_key, lambda: ai_service.generate_workout_plan(user_info, lang), redis,
+        )
     except Exception as e:
         logger.warning("AI workout plan failed: %s", e)
         raise _ai_http_error(e)
     result = {"plan": plan, "lang": lang}
     await cache.set(cache_key, result, settings.CACHE_TTL_RECIPES)
+    await coach_context.invalidate(user_id, redis)
     return result
 
 
@@ -645,7 +627,9 @@ async def generate_recipe(
     chat_repo = ChatRepository(db)
     user_info = await chat_repo.get_user_info_for_ai(user_id)
     try:
-        recipe = await ai_service.generate_recipe(body.meal_type, user_info, lang)
+        recipe = await ai_service.coalesced(
+            cache_key, lambda: ai_service.generate_recipe(body.meal_type, user_info, lang), redis,
+        )
     except Exception as e:
         logger.warning("AI recipe failed: %s", e)
         raise _ai_http_error(e)
@@ -12,6 +12,7 @@ from app.services.ai_service import (
 )
 from app.services.cache_service import CacheService
 from app.config import get_settings
+from app.repositories.daily_stats_repo import DailyStatsRepository
 from app.repositories.weight_repo import WeightRepository
 
 logger = logging.getLogger(__name__)
@@ -22,42 +23,8 @@ async def _collect_week_stats(db, user_id: int) -> dict:
     today = date.today()
     week_start = today - timedelta(days=6)
 
-    food_row = await db.fetchrow(
-        """
-        SELECT
-            COALESCE(SUM(cal), 0) AS cal,
-            COALESCE(SUM(b), 0) AS protein,
-            COALESCE(SUM(g), 0) AS fat,
-            COALESCE(SUM(u), 0) AS carbs,
-            COUNT(DISTINCT date)::int AS days_logged,
-            COUNT(*)::int AS entries
-        FROM food
-        WHERE user_id = $1 AND date BETWEEN $2 AND $3
-        """,
-        user_id, week_start, today,
-    )
-
-    water_row = await db.fetchrow(
-        """
-        SELECT
-            COALESCE(SUM(count), 0)::int AS glasses,
-            COUNT(*)::int AS days_logged
-        FROM water
-        WHERE user_id = $1 AND date BETWEEN $2 AND $3
-        """,
-        user_id, week_start, today,
-    )
-
-    workout_row = await db.fetchrow(
-        """
-        SELECT
-            COUNT(*)::int AS sessions,
-            COALESCE(SUM(tren_time), 0)::int AS minutes,
-            COALESCE(SUM(training_cal), 0)::int AS cal_burned
-        FROM user_training
-        WHERE user_id = $1 AND date BETWEEN $2 AND $3
-        """,
-        user_id, week_start, today,
+    totals = await DailyStatsRepository(db).period_totals(
+        user_id, week_start, today + timedelta(days=1)
     )
 
     aims_row = await db.fetchrow(
@@ -72,23 +39,23 @@ async def _collect_week_stats(db, user_id: int) -> dict:
         "goal": (aims_row["user_aim"] if aims_row else None),
         "daily_cal_target": (int(aims_row["daily_cal"]) if aims_row and aims_row["daily_cal"] else None),
         "food": {
-            "total_cal": int(food_row["cal"] or 0),
-            "avg_daily_cal": int((food_row["cal"] or 0) / 7),
-            "days_logged": food_row["days_logged"],
-            "entries": food_row["entries"],
-            "protein_g": float(food_row["protein"] or 0),
-            "fat_g": float(food_row["fat"] or 0),
-            "carbs_g": float(food_row["carbs"] or 0),
+            "total_cal": int(totals["kcal"]),
+            "avg_daily_cal": int(totals["kcal"] / 7),
+            "days_logged": totals["food_days"],
+            "entries": totals["food_entries"],
+            "protein_g": float(totals["protein"]),
+            "fat_g": float(totals["fat"]),
+            "carbs_g": float(totals["carbs"]),
         },
         "water": {
-            "glasses_total": water_row["glasses"],
-            "days_logged": water_row["days_logged"],
-            "avg_daily": round((water_row["glasses"] or 0) / 7, 1),
+            "glasses_total": totals["water"],
+            "days_logged": totals["water_days"],
+            "avg_daily": round(totals["water"] / 7, 1),
         },
         "workouts": {
-            "sessions": workout_row["sessions"],
-            "minutes": workout_row["minutes"],
-            "cal_burned": workout_row["cal_burned"],
+            "sessions": totals["training_sessions"],
+            "minutes": totals["training_minutes"],
+            "cal_burned": int(totals["training_kcal"]),
         },
         "weight_recent": weight_hist[-5:],
     }
@@ -124,7 +91,9 @@ async def weekly(
     source: str
     ai_error: str | None = None
     try:
-        digest = await ai_service.weekly_digest(stats, lang=lang)
+        digest = await ai_service.coalesced(
+            cache_key, lambda: ai_service.weekly_digest(stats, lang=lang), redis,
+        )
         source = "ai"
     except AIConfigError as e:
         logger.warning("weekly_digest: AI misconfigured (%s)", e)
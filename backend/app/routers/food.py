@@ -4,7 +4,7 @@ from fastapi import APIRouter, HTTPException, UploadFile, File, Query
 from app.dependencies import DbDep, CurrentUserDep, RedisDep
 from app.models.food import FoodManualRequest
 from app.repositories.food_repo import FoodRepository
-from app.services import ai_service, streak_service
+from app.services import ai_service, coach_context, streak_service
 from app.services.cache_service import CacheService
 from app.repositories.user_repo import UserRepository
 from app.config import get_settings
@@ -48,7 +48,11 @@ async def add_food_manual(body: FoodManualRequest, user_id: CurrentUserDep, db:
 
         if ai_needed_foods:
             try:
-                ai_items = await ai_service.analyze_food_text(ai_needed_foods, ai_needed_grams, lang=lang)
+                ai_items = await ai_service.coalesced(
+                    cache_key,
+                    lambda: ai_service.analyze_food_text(ai_needed_foods, ai_needed_grams, lang=lang),
+                    redis,
+                )
                 items.extend(ai_items)
             except Exception as e:
                 logger.warning("AI food analysis failed: %s", e)
@@ -67,6 +71,8 @@ async def add_food_manual(body: FoodManualRequest, user_id: CurrentUserDep, db:
             carbs=item.get("u", 0), calories=item.get("cal", 0),
         )
         saved.append(row)
+    if saved:
+        await coach_context.invalidate(user_id, redis)
 
     streak = None
     new_badges: list = []
@@ -105,6 +111,8 @@ async def add_food_photo(
             protein=item.get("b", 0), fat=item.get("g", 0),
             carbs=item.get("u", 0), calories=item.get("cal", 0),
         )
+    if items:
+        await coach_context.invalidate(user_id)
 
     streak = None
     new_badges: list = []
@@ -184,6 +192,7 @@ async def repeat_day(
     copied = await repo.copy_day(user_id, src, target_date)
     if copied == 0:
         raise HTTPException(status_code=404, detail="Нечего копировать")
+    await coach_context.invalidate(user_id)
 
     update = None
     new_badges: list = []
@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from app.dependencies import DbDep, CurrentUserDep
 from app.models.user import SettingsRequest
 from app.repositories.user_repo import UserRepository
+from app.services import coach_context
 
 router = APIRouter()
 
@@ -25,6 +26,7 @@ async def update_settings(body: SettingsRequest, user_id: CurrentUserDep, db: Db
     repo = UserRepository(db)
     if body.language:
         await repo.set_lang(user_id, body.language)
+        await coach_context.invalidate(user_id)
     if body.theme is not None or body.notifications is not None:
         await repo.update_settings(user_id, body.theme, body.notifications)
     return {"message": "Settings updated"}
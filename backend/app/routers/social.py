@@ -5,12 +5,15 @@ from __future__ import annotations
 import io
 import os
 import secrets
+from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional
 
 from fastapi import APIRouter, Body, File, HTTPException, Query, UploadFile
 
-from app.dependencies import CurrentUserDep, DbDep
+from app.dependencies import CurrentUserDep, DbDep, RedisDep
+from app.services import leaderboards, social_timeline
+from app.utils.cursor import decode_cursor, encode_cursor
 
 router = APIRouter()
 
@@ -42,20 +45,34 @@ def _normalize_tags(raw: list[str] | None) -> list[str]:
     return out
 
 
-async def _post_row(db, user_id: int, row) -> dict[str, Any]:
-    """Convert asyncpg Record to API dict, including liked_by_me flag."""
-    liked = await db.fetchval(
-        "SELECT 1 FROM social_likes WHERE user_id = $1 AND post_id = $2",
-        user_id, row["id"],
-    )
-    author = await db.fetchrow(
-        """
-        SELECT user_id, COALESCE(display_name, user_name, telegram_username, 'user') AS name,
-               telegram_username, gender, social_score
-        FROM user_main WHERE user_id = $1
-        """,
-        row["user_id"],
-    )
+# Post columns plus everything the card needs, so a page is hydrated by the
+# same statement that selects it: the author comes from a join and
+# liked_by_me from an index probe on social_likes' (user_id, post_id) key.
+# `$1` must be the viewer's user_id; `{source}` is social_posts or a CTE
+# with the same columns.
+_POST_SELECT = """
+    SELECT p.id, p.user_id, p.kind, p.title, p.body, p.tags, p.payload,
+           p.likes_count, p.created_at,
+           (p.pinned_at IS NOT NULL) AS pinned,
+           COALESCE(p.pinned_at, p.created_at) AS sort_at,
+           a.user_id AS author_id,
+           COALESCE(a.display_name, a.user_name, a.telegram_username, 'user') AS author_name,
+           a.telegram_username AS author_username,
+           a.gender AS author_gender,
+           a.social_score AS author_score,
+           EXISTS (
+               SELECT 1 FROM social_likes l WHERE l.user_id = $1 AND l.post_id = p.id
+           ) AS liked_by_me
+    FROM {source} p
+    LEFT JOIN user_main a ON a.user_id = p.user_id
+"""
+
+FEED_ORDER = "(p.pinned_at IS NOT NULL) DESC, COALESCE(p.pinned_at, p.created_at) DESC, p.id DESC"
+FEED_KEY = "((p.pinned_at IS NOT NULL), COALESCE(p.pinned_at, p.created_at), p.id)"
+
+
+def _post_row(row) -> dict[str, Any]:
+    """Convert a `_POST_SELECT` record to the API dict."""
     return {
         "id": row["id"],
         "kind": row["kind"],
@@ -64,18 +81,28 @@ async def _post_row(db, user_id: int, row) -> dict[str, Any]:
         "tags": list(row["tags"] or []),
         "payload": dict(row["payload"] or {}),
         "likes_count": row["likes_count"],
-        "liked_by_me": bool(liked),
+        "liked_by_me": bool(row["liked_by_me"]),
         "created_at": row["created_at"].isoformat(),
         "author": {
-            "user_id": author["user_id"],
-            "name": author["name"],
-            "telegram_username": author["telegram_username"],
-            "gender": author["gender"],
-            "score": author["social_score"],
-        } if author else None,
+            "user_id": row["author_id"],
+            "name": row["author_name"],
+            "telegram_username": row["author_username"],
+            "gender": row["author_gender"],
+            "score": row["author_score"],
+        } if row["author_id"] is not None else None,
     }
 
 
+def _feed_cursor(token: str) -> list[Any]:
+    try:
+        pinned, sort_at, post_id = decode_cursor(token, 3)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not (isinstance(pinned, bool) and isinstance(sort_at, datetime) and isinstance(post_id, int)):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return [pinned, sort_at, post_id]
+
+
 @router.get("/feed")
 async def feed(
     user_id: CurrentUserDep,
@@ -84,37 +111,79 @@ async def feed(
     tag: Optional[str] = Query(None),
     author: Optional[int] = Query(None),
     limit: int = Query(30, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
 ):
-    # Admin-hidden posts never appear in the public feed. Pinned posts bubble
-    # up to the top regardless of their created_at timestamp.
-    where = ["hidden_at IS NULL"]
-    args: list[Any] = []
+    """One page of the feed; pass `next_cursor` back as `cursor` for the next.
+
+    Admin-hidden posts never appear in the public feed. Pinned posts bubble
+    up to the top regardless of their created_at timestamp.
+    """
+    where = ["p.hidden_at IS NULL"]
+    args: list[Any] = [user_id]
     if kind:
         if kind not in VALID_KINDS:
             raise HTTPException(status_code=400, detail="invalid kind")
         args.append(kind)
-        where.append(f"kind = ${len(args)}")
+        where.append(f"p.kind = ${len(args)}")
     if tag:
         args.append(tag.lower().lstrip("#"))
-        where.append(f"${len(args)} = ANY(tags)")
+        where.append(f"${len(args)} = ANY(p.tags)")
     if author:
         args.append(author)
-        where.append(f"user_id = ${len(args)}")
-    where_sql = "WHERE " + " AND ".join(where)
-    args.extend([limit, offset])
+        where.append(f"p.user_id = ${len(args)}")
+    if cursor:
+        args.extend(_feed_cursor(cursor))
+        where.append(f"{FEED_KEY} < (${len(args) - 2}, ${len(args) - 1}, ${len(args)})")
+    args.append(limit + 1)
     rows = await db.fetch(
-        f"""
-        SELECT id, user_id, kind, title, body, tags, payload, likes_count, created_at
-        FROM social_posts
-        {where_sql}
-        ORDER BY (pinned_at IS NOT NULL) DESC,
-                 COALESCE(pinned_at, created_at) DESC
-        LIMIT ${len(args) - 1} OFFSET ${len(args)}
-        """,
+        _POST_SELECT.format(source="social_posts")
+        + f"WHERE {' AND '.join(where)}\nORDER BY {FEED_ORDER}\nLIMIT ${len(args)}",
         *args,
     )
-    return {"items": [await _post_row(db, user_id, r) for r in rows]}
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor([last["pinned"], last["sort_at"], last["id"]])
+    return {"items": [_post_row(r) for r in page], "next_cursor": next_cursor}
+
+
+@router.get("/timeline")
+async def timeline(
+    user_id: CurrentUserDep,
+    db: DbDep,
+    redis: RedisDep,
+    limit: int = Query(30, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """Posts by the user and everyone they follow, newest first.
+
+    Entries come from the user's Redis timeline (see
+    app.services.social_timeline); hidden or deleted posts are dropped
+    during hydration, so a page may be a little short of `limit`.
+    """
+    after = None
+    if cursor:
+        try:
+            score, post_id = decode_cursor(cursor, 2)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        if not (isinstance(score, int) and isinstance(post_id, int)):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        after = (score, post_id)
+    entries = await social_timeline.page(db, redis, user_id, limit, after)
+    page = entries[:limit]
+    rows = await db.fetch(
+        _POST_SELECT.format(source="social_posts")
+        + "WHERE p.id = ANY($2::bigint[]) AND p.hidden_at IS NULL",
+        user_id, [post_id for _, post_id in page],
+    ) if page else []
+    by_id = {r["id"]: r for r in rows}
+    next_cursor = encode_cursor(list(page[-1])) if len(entries) > limit else None
+    return {
+        "items": [_post_row(by_id[post_id]) for _, post_id in page if post_id in by_id],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.post("/posts")
@@ -154,19 +223,28 @@ async def create_post(
     if not bool(await _get_setting("social_posting_enabled")):
         raise HTTPException(status_code=503, detail="Публикация временно недоступна")
 
-    row = await db.fetchrow(
-        """
-        INSERT INTO social_posts (user_id, kind, title, body, tags, payload)
-        VALUES ($1, $2, $3, $4, $5, $6::jsonb)
-        RETURNING id, user_id, kind, title, body, tags, payload, likes_count, created_at
-        """,
-        user_id, kind, title, text, tags, _to_jsonb(payload),
-    )
-    await db.execute(
-        "UPDATE user_main SET social_score = social_score + 2 WHERE user_id = $1",
-        user_id,
-    )
-    return await _post_row(db, user_id, row)
+    # One transaction: the score bump is undone if the insert fails, and the
+    # returned author card already includes it.
+    async with db.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "UPDATE user_main SET social_score = social_score + 2 WHERE user_id = $1",
+                user_id,
+            )
+            row = await conn.fetchrow(
+                """
+                WITH inserted AS (
+                    INSERT INTO social_posts (user_id, kind, title, body, tags, payload)
+                    VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+                    RETURNING *
+                )
+                """
+                + _POST_SELECT.format(source="inserted"),
+                user_id, kind, title, text, tags, _to_jsonb(payload),
+            )
+    await social_timeline.schedule_fanout(db, row["id"])
+    await leaderboards.refresh_user(db, user_id)
+    return _post_row(row)
 
 
 def _to_jsonb(d: dict) -> str:
@@ -239,6 +317,7 @@ async def delete_post(post_id: int, user_id: CurrentUserDep, db: DbDep):
     if row["user_id"] != user_id:
         raise HTTPException(status_code=403, detail="not your post")
     await db.execute("DELETE FROM social_posts WHERE id = $1", post_id)
+    await social_timeline.schedule_remove(db, post_id, user_id)
     return {"deleted": True}
 
 
@@ -279,6 +358,7 @@ async def toggle_like(post_id: int, user_id: CurrentUserDep, db: DbDep):
                 "UPDATE user_main SET social_score = social_score + 1 WHERE user_id = $1",
                 author_id,
             )
+            await leaderboards.refresh_user(db, author_id)
         liked = True
     count = await db.fetchval("SELECT likes_count FROM social_posts WHERE id = $1", post_id) or 0
     return {"liked": liked, "likes_count": int(count)}
@@ -297,11 +377,13 @@ async def toggle_follow(target_id: int, user_id: CurrentUserDep, db: DbDep):
             "DELETE FROM social_follows WHERE follower_id = $1 AND followee_id = $2",
             user_id, target_id,
         )
+        await social_timeline.invalidate(user_id)
         return {"following": False}
     await db.execute(
         "INSERT INTO social_follows (follower_id, followee_id) VALUES ($1, $2) ON CONFLICT DO NOTHING",
         user_id, target_id,
     )
+    await social_timeline.invalidate(user_id)
     return {"following": True}
 
 
@@ -309,49 +391,23 @@ async def toggle_follow(target_id: int, user_id: CurrentUserDep, db: DbDep):
 async def leaderboard(
     user_id: CurrentUserDep,
     db: DbDep,
+    redis: RedisDep,
     category: str = Query("overall"),
     limit: int = Query(10, ge=1, le=50),
 ):
-    """Top-N rankings.
+    """Top-N rankings plus the caller's own rank (``me``, null if unranked).
 
     Categories:
-      overall  — by social_score (likes received + posts authored)
-      strength — by total weight lifted in last 30d (workouts.kg * sets * reps)
+      overall     — by social_score (likes received + posts authored)
+      strength    — by training kcal burned in the last 30d
       consistency — by current streak length
-      weight   — by absolute weight delta over last 90d (positive = closest to goal)
-    """
-    if category == "overall":
-        rows = await db.fetch(
-            """
-            SELECT user_id,
-                   COALESCE(display_name, user_name, telegram_username, 'user') AS name,
-                   social_score AS score
-            FROM user_main
-            WHERE public_profile = TRUE OR user_id = $1
-            ORDER BY social_score DESC
-            LIMIT $2
-            """,
-            user_id, limit,
-        )
-        return {"category": category, "items": [dict(r) for r in rows]}
-
-    if category == "consistency":
-        rows = await db.fetch(
-            """
-            SELECT u.user_id,
-                   COALESCE(u.display_name, u.user_name, u.telegram_username, 'user') AS name,
-                   COALESCE(s.current_streak, 0) AS score
-            FROM user_main u
-            LEFT JOIN user_streaks s ON s.user_id = u.user_id
-            WHERE u.public_profile = TRUE OR u.user_id = $1
-            ORDER BY score DESC
-            LIMIT $2
-            """,
-            user_id, limit,
-        )
-        return {"category": category, "items": [dict(r) for r in rows]}
+      weight      — by kg moved towards the goal over the last 90d
 
-    raise HTTPException(status_code=400, detail=f"unknown category: {category}")
+    Served from Redis sorted sets (app.services.leaderboards).
+    """
+    if category not in leaderboards.CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"unknown category: {category}")
+    return await leaderboards.top(db, redis, category, user_id, limit)
 
 
 @router.get("/me")
@@ -414,4 +470,6 @@ async def update_my_social_profile(
         f"UPDATE user_main SET {', '.join(fields)} WHERE user_id = ${len(values)}",
         *values,
     )
+    if "public_profile" in body:
+        await leaderboards.refresh_user(db, user_id)
     return await my_social_profile(user_id, db)
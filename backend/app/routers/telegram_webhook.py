@@ -0,0 +1,42 @@
+"""Telegram webhook endpoint (active only when TELEGRAM_WEBHOOK_URL is set).
+
+The handler does the minimum on the request path — secret check, parse,
+enqueue — and returns. Handling happens in ``telegram_bot.update_queue``
+workers. A full queue answers 503 so Telegram retries the delivery later;
+a body that isn't a valid update answers 400 so it doesn't.
+"""
+
+import hmac
+import json
+
+from aiogram.types import Update
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from pydantic import ValidationError
+
+from app.config import get_settings
+
+router = APIRouter()
+
+
+@router.post("/webhook", include_in_schema=False)
+async def telegram_webhook(
+    request: Request,
+    secret: str | None = Header(default=None, alias="X-Telegram-Bot-Api-Secret-Token"),
+):
+    from telegram_bot import bot as tg
+
+    if tg.update_queue is None or tg.bot is None:
+        raise HTTPException(status_code=404, detail="Webhook mode is disabled")
+
+    expected = get_settings().TELEGRAM_WEBHOOK_SECRET
+    if not expected or not hmac.compare_digest(secret or "", expected):
+        raise HTTPException(status_code=401, detail="Invalid secret token")
+
+    try:
+        update = Update.model_validate(await request.json(), context={"bot": tg.bot})
+    except (json.JSONDecodeError, UnicodeDecodeError, ValidationError):
+        raise HTTPException(status_code=400, detail="Malformed update")
+    if not await tg.update_queue.put(update):
+        raise HTTPException(status_code=503, detail="Update queue is full")
+    return Response(status_code=200)
+
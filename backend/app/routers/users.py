@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
 from app.dependencies import DbDep, CurrentUserDep
 from app.models.user import OnboardingRequest, OnboardingResponse, ProfileResponse, UpdateProfileRequest
+from app.repositories.export_repo import DataExportRepository
+from app.services import coach_context, leaderboards, user_export
 from app.services.user_service import UserService
 
 router = APIRouter()
@@ -39,6 +44,7 @@ async def onboarding(body: OnboardingRequest, user_id: CurrentUserDep, db: DbDep
         date_of_birth=body.date_of_birth,
         sex=body.sex, aim=body.aim,
     )
+    await coach_context.invalidate(user_id)
     return OnboardingResponse(**result)
 
 
@@ -46,10 +52,68 @@ async def onboarding(body: OnboardingRequest, user_id: CurrentUserDep, db: DbDep
 async def update_profile(body: UpdateProfileRequest, user_id: CurrentUserDep, db: DbDep):
     svc = UserService(db)
     if body.weight is not None or body.height is not None or body.aim is not None:
-        return await svc.update_profile_data(
+        result = await svc.update_profile_data(
             user_id,
             weight=body.weight,
             height=body.height,
             aim=body.aim,
         )
+        await coach_context.invalidate(user_id)
+        await leaderboards.refresh_user(db, user_id)
+        return result
     return {"message": "No changes"}
+
+
+def _export_limited(exc: user_export.ExportRateLimited) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"code": "export_rate_limited",
+                "message": "Слишком много выгрузок данных. Попробуй позже."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@router.get("/me/export")
+async def export_my_data(
+    user_id: CurrentUserDep,
+    db: DbDep,
+    format: str = Query("zip", pattern="^(zip|ndjson)$"),
+    gzip: bool = Query(False, description="gzip the NDJSON stream (zip is compressed already)"),
+):
+    """Stream all of the user's data as a zip of per-table NDJSON files or one NDJSON stream."""
+    try:
+        return await user_export.download(db, user_id, format, compress=gzip and format == "ndjson")
+    except user_export.ExportRateLimited as exc:
+        raise _export_limited(exc)
+
+
+@router.post("/me/export", status_code=202)
+async def request_my_data_export(
+    user_id: CurrentUserDep,
+    db: DbDep,
+    format: str = Query("zip", pattern="^(zip|ndjson)$"),
+):
+    """Build the export in the background; poll ``/me/exports`` for the link."""
+    try:
+        row = await user_export.request(db, user_id, format)
+    except user_export.ExportRateLimited as exc:
+        raise _export_limited(exc)
+    return user_export.describe(row)
+
+
+@router.get("/me/exports")
+async def list_my_data_exports(user_id: CurrentUserDep, db: DbDep):
+    rows = await DataExportRepository(db).list_for_user(user_id)
+    return {"items": [user_export.describe(r) for r in rows]}
+
+
+@router.get("/me/export/{token}")
+async def download_my_data_export(token: str, user_id: CurrentUserDep, db: DbDep):
+    row = await DataExportRepository(db).by_token(user_id, token)
+    if not row or row["status"] != "ready" or not row["path"] or not Path(row["path"]).is_file():
+        raise HTTPException(status_code=404, detail="Export not found or expired")
+    return FileResponse(
+        row["path"],
+        filename=user_export.download_name(row),
+        headers={"Cache-Control": "no-store"},
+    )
@@ -3,7 +3,7 @@ from fastapi import APIRouter, Query
 from app.dependencies import DbDep, CurrentUserDep
 from app.models.water import WaterResponse
 from app.repositories.water_repo import WaterRepository
-from app.services import streak_service
+from app.services import coach_context, streak_service
 
 router = APIRouter()
 
@@ -14,6 +14,7 @@ GLASS_ML = 300
 async def add_water(user_id: CurrentUserDep, db: DbDep):
     repo = WaterRepository(db)
     count = await repo.add_glass(user_id)
+    await coach_context.invalidate(user_id)
     update = await streak_service.safe_touch_activity(db, user_id)
     return {
         "count": count,
@@ -26,7 +26,9 @@ from typing import Optional
 from fastapi import APIRouter, Body, HTTPException, Path, Query
 
 from app.dependencies import DbDep, CurrentUserDep
+from app.repositories.daily_stats_repo import DailyStatsRepository
 from app.repositories.weight_repo import WeightRepository
+from app.services import coach_context, leaderboards
 
 router = APIRouter()
 
@@ -91,6 +93,8 @@ async def add_weight(
 
     repo = WeightRepository(db)
     saved = await repo.add_or_update(user_id, float(weight), on_date=on_date)
+    await coach_context.invalidate(user_id)
+    await leaderboards.refresh_user(db, user_id)
     return saved
 
 
@@ -106,6 +110,8 @@ async def delete_entry(
     ok = await repo.delete(user_id, parsed)
     if not ok:
         raise HTTPException(status_code=404, detail="entry not found")
+    await coach_context.invalidate(user_id)
+    await leaderboards.refresh_user(db, user_id)
     return {"deleted": True, "date": parsed.isoformat()}
 
 
@@ -170,24 +176,14 @@ async def _user_profile(db, user_id: int) -> dict:
 
 async def _avg_daily_kcal(db, user_id: int, days: int = 14) -> float | None:
     """Average kcal intake over the last `days` days. Skips zero-intake days."""
-    row = await db.fetchrow(
-        """
-        SELECT AVG(daily_total) AS avg_kcal, COUNT(*) AS n
-        FROM (
-            SELECT date, SUM(cal) AS daily_total
-            FROM food
-            WHERE user_id = $1
-              AND date >= CURRENT_DATE - ($2::int - 1) * INTERVAL '1 day'
-              AND cal > 0
-            GROUP BY date
-            HAVING SUM(cal) > 200  -- ignore "tasted a cracker" days
-        ) days_with_food
-        """,
-        user_id, days,
+    today = date.today()
+    avg_kcal, n = await DailyStatsRepository(db).avg_daily_kcal(
+        user_id, today - timedelta(days=days - 1), today + timedelta(days=1),
+        min_kcal=200,  # ignore "tasted a cracker" days
     )
-    if not row or not row["avg_kcal"] or row["n"] < 3:
+    if avg_kcal is None or n < 3:
         return None
-    return float(row["avg_kcal"])
+    return avg_kcal
 
 
 def _energy_slope_kg_per_day(avg_kcal: float, tdee: float) -> float:
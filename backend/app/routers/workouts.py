@@ -4,7 +4,7 @@ from app.dependencies import DbDep, CurrentUserDep
 from app.models.workout import WorkoutSaveRequest, WorkoutSaveResponse, WorkoutType
 from app.repositories.workout_repo import WorkoutRepository
 from app.repositories.user_repo import UserRepository
-from app.services import streak_service
+from app.services import coach_context, leaderboards, streak_service
 
 router = APIRouter()
 
@@ -40,6 +40,8 @@ async def save_workout(body: WorkoutSaveRequest, user_id: CurrentUserDep, db: Db
         duration=body.duration_minutes,
         calories=calories,
     )
+    await coach_context.invalidate(user_id)
+    await leaderboards.refresh_user(db, user_id)
 
     total_cal = await repo.get_total_calories(user_id, body.workout_date)
     total_dur = await repo.get_total_duration(user_id, body.workout_date)
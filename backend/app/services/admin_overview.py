@@ -0,0 +1,209 @@
+"""Admin overview dashboard, computed in the background and served as a snapshot.
+
+The overview is a dozen aggregate queries (row counts, today's logs,
+audit rollups, recent errors). Running them on every dashboard load let a
+few admins refreshing the page compete with user traffic for the pool, so
+instead:
+
+* the ``admin.overview`` job recomputes it every
+  ``ADMIN_OVERVIEW_INTERVAL`` seconds and stores it in ``admin_snapshots``
+  (migration 019) with ``computed_at``;
+* ``GET /api/admin/overview`` reads that one row and reports its age;
+  ``POST /api/admin/overview/refresh`` recomputes on demand.
+
+Refreshes are coalesced: within a process concurrent callers await the
+same computation, and across processes a transaction-level advisory lock
+serialises them — whoever waited on the lock finds a snapshot newer than
+its request and returns it instead of recomputing. The computation uses a
+single connection, so it never holds more than one pool slot.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import asyncpg
+
+from app.config import get_settings
+from app.database import get_pool
+from app.repositories.audit_repo import AuditRepository
+from app.services import job_queue
+
+SNAPSHOT = "overview"
+_LOCK_KEY = 0x0AD_0001  # pg_advisory_xact_lock key for overview refreshes
+
+_inflight: Optional[asyncio.Task] = None
+
+
+async def compute(conn: asyncpg.Connection) -> dict[str, Any]:
+    """All overview numbers, read on one connection."""
+    users = await conn.fetchrow(
+        """
+        SELECT COUNT(*)::int AS total,
+               COUNT(*) FILTER (WHERE created_at >= NOW() - INTERVAL '1 day')::int AS new_today,
+               COUNT(*) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days')::int AS new_week
+        FROM user_main
+        """
+    )
+    # active = at least one audit-log entry in window (hourly rollups)
+    audit = AuditRepository(conn)
+    active_24h = await audit.active_users(1)
+    active_7d = await audit.active_users(7)
+
+    # --- food / water / training (today) -----------------------------------
+    food_today = await conn.fetchrow(
+        "SELECT COUNT(*) AS rows, COALESCE(SUM(cal),0)::int AS cal "
+        "FROM food WHERE date = CURRENT_DATE"
+    )
+    water_today = await conn.fetchval(
+        "SELECT COALESCE(SUM(count),0)::int FROM water WHERE date = CURRENT_DATE"
+    )
+    training_today = await conn.fetchrow(
+        "SELECT COUNT(*) AS rows, COALESCE(SUM(training_cal),0)::int AS cal "
+        "FROM user_training WHERE date = CURRENT_DATE"
+    )
+
+    ai_rows = await audit.by_category(7, prefix="ai_")
+
+    social = await conn.fetchrow(
+        """
+        SELECT (SELECT COUNT(*) FROM social_posts)::int AS posts,
+               (SELECT COUNT(*) FROM social_posts
+                 WHERE created_at >= NOW() - INTERVAL '7 days')::int AS posts_week,
+               (SELECT COUNT(*) FROM social_likes)::int AS likes
+        """
+    )
+
+    top_users = await audit.top_users(7, limit=10)
+
+    recent_errors = await conn.fetch(
+        """
+        SELECT id, user_id, method, path, status_code, created_at, detail
+        FROM audit_log
+        WHERE status_code >= 500
+        ORDER BY created_at DESC
+        LIMIT 10
+        """
+    )
+
+    return {
+        "users": {
+            **dict(users),
+            "active_24h": int(active_24h or 0),
+            "active_7d": int(active_7d or 0),
+        },
+        "today": {
+            "food_entries": int(food_today["rows"] or 0),
+            "food_calories": int(food_today["cal"] or 0),
+            "water_glasses": int(water_today or 0),
+            "training_entries": int(training_today["rows"] or 0),
+            "training_calories": int(training_today["cal"] or 0),
+        },
+        "ai_7d": [
+            {
+                "category": r["category"],
+                "count": int(r["cnt"]),
+                "errors": int(r["errs"] or 0),
+            }
+            for r in ai_rows
+        ],
+        "social": dict(social),
+        "top_users": [
+            {
+                "user_id": r["user_id"],
+                "name": r["name"],
+                "telegram_username": r["telegram_username"],
+                "actions": int(r["actions"]),
+            }
+            for r in top_users
+        ],
+        # `detail` is already decoded by the pool's JSONB codec; the endpoint
+        # still coerces legacy string / NULL values into a dict.
+        "recent_errors": [
+            {
+                "id": r["id"],
+                "user_id": r["user_id"],
+                "method": r["method"],
+                "path": r["path"],
+                "status_code": r["status_code"],
+                "detail": r["detail"],
+                "created_at": r["created_at"].isoformat(),
+            }
+            for r in recent_errors
+        ],
+    }
+
+
+async def _load(conn) -> Optional[dict[str, Any]]:
+    row = await conn.fetchrow(
+        "SELECT data, computed_at, duration_ms FROM admin_snapshots WHERE name = $1", SNAPSHOT,
+    )
+    if row is None or not isinstance(row["data"], dict):
+        return None  # none yet, or a string stored before the JSONB codec was relied on
+    return {"data": row["data"], "computed_at": row["computed_at"], "duration_ms": row["duration_ms"]}
+
+
+async def _refresh(pool: asyncpg.Pool) -> dict[str, Any]:
+    async with pool.acquire() as conn:
+        requested_at = await conn.fetchval("SELECT clock_timestamp()")
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _LOCK_KEY)
+            current = await _load(conn)
+            if current is not None and current["computed_at"] >= requested_at:
+                return current  # another process refreshed while we waited
+            started = time.perf_counter()
+            data = await compute(conn)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            computed_at = await conn.fetchval(
+                """
+                INSERT INTO admin_snapshots (name, data, computed_at, duration_ms)
+                VALUES ($1, $2::jsonb, clock_timestamp(), $3)
+                ON CONFLICT (name) DO UPDATE
+                SET data = EXCLUDED.data, computed_at = EXCLUDED.computed_at,
+                    duration_ms = EXCLUDED.duration_ms
+                RETURNING computed_at
+                """,
+                SNAPSHOT, data, duration_ms,
+            )
+    return {"data": data, "computed_at": computed_at, "duration_ms": duration_ms}
+
+
+async def refresh(pool: asyncpg.Pool) -> dict[str, Any]:
+    """Recompute the snapshot; concurrent callers share one computation."""
+    global _inflight
+    if _inflight is None or _inflight.done():
+        _inflight = asyncio.create_task(_refresh(pool))
+    return await asyncio.shield(_inflight)
+
+
+async def get(pool: asyncpg.Pool) -> dict[str, Any]:
+    """The stored snapshot (computed now if there is none yet)."""
+    snapshot = await _load(pool)
+    if snapshot is None:
+        snapshot = await refresh(pool)
+    return snapshot
+
+
+def with_age(snapshot: dict[str, Any]) -> dict[str, Any]:
+    computed_at: datetime = snapshot["computed_at"]
+    age = (datetime.now(timezone.utc) - computed_at).total_seconds()
+    return {
+        **snapshot["data"],
+        "snapshot": {
+            "computed_at": computed_at.isoformat(),
+            "age_s": max(0, int(age)),
+            "duration_ms": snapshot["duration_ms"],
+            "interval_s": get_settings().ADMIN_OVERVIEW_INTERVAL,
+        },
+    }
+
+
+@job_queue.handler("admin.overview")
+async def _refresh_job(payload: dict) -> None:
+    await refresh(await get_pool())
+
+
+job_queue.periodic("admin.overview", get_settings().ADMIN_OVERVIEW_INTERVAL)
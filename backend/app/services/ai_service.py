@@ -32,7 +32,7 @@ from typing import Any
 import google.generativeai as genai
 
 from app.config import get_settings
-from app.services import prompts
+from app.services import prompts, single_flight
 from app.utils.retry import async_retry, is_retryable_exception
 
 logger = logging.getLogger(__name__)
@@ -394,6 +394,27 @@ async def generate_recipe(meal_type: str, user_info: dict, lang: str = "ru") ->
     return (response.text or "").strip()
 
 
+# ---------------------------------------------------------------------------
+# Request coalescing
+# ---------------------------------------------------------------------------
+
+_ERRORS = {cls.__name__: cls for cls in (AIConfigError, AIQuotaError, AIUpstreamError, AITimeoutError)}
+
+
+async def coalesced(key: str, fn, redis=None) -> Any:
+    """Run ``fn()`` (an entry point above) once for all concurrent callers
+    with the same ``key`` — the router's cache key — in this process and,
+    with ``redis``, across replicas. Everyone gets the leader's result or
+    its typed AI error."""
+    return await single_flight.do(
+        f"ai:{key}", fn,
+        redis=redis,
+        lock_ttl=_GEMINI_RETRY["total_budget"] + 30,
+        errors=_ERRORS,
+        default_error=AIUpstreamError,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Chat
 # ---------------------------------------------------------------------------
@@ -0,0 +1,226 @@
+"""Batched, off-request-path writer for ``audit_log``.
+
+``AuditLogMiddleware`` only calls ``record()``, which appends a tuple to a
+bounded in-memory buffer and returns. A single flusher task writes the
+buffer with ``COPY`` whenever ``AUDIT_BATCH_SIZE`` records are waiting or
+``AUDIT_FLUSH_INTERVAL_MS`` has passed, so audit logging costs the request
+no database round trip.
+
+Backpressure: when Postgres can't keep up and the buffer holds
+``AUDIT_BUFFER_SIZE`` records, new ones are dropped and counted
+(``dropped``) instead of slowing requests down. A failed ``COPY`` drops its
+batch (``failed``). On shutdown the buffer is drained, bounded by
+``drain_timeout``. Counters are exposed at ``/api/_internal/audit``.
+
+Requests that did not authenticate through ``CurrentUserDep`` carry their
+raw token; the flusher decodes it, off the request path.
+
+Storage (migration 018): ``audit_log`` is partitioned by month. Two
+periodic jobs keep it in shape:
+
+* ``audit.rollup`` (every ``AUDIT_ROLLUP_INTERVAL``) refreshes the hourly
+  rollups the admin dashboards read, so they lag the log by at most that;
+* ``audit.maintain`` (hourly) creates the next months' partitions and, if
+  ``AUDIT_RETENTION_MONTHS`` is set, drops those older than that. It
+  defaults to 0, which keeps everything; retention is opt-in.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from datetime import date, datetime
+from typing import Any, Optional
+
+import asyncpg
+from jose import jwt
+
+from app.config import get_settings
+from app.database import get_pool
+from app.repositories.audit_repo import AuditRepository
+from app.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "user_id", "method", "path", "category", "status_code",
+    "duration_ms", "ip", "user_agent", "created_at",
+)
+
+PARTITIONS_AHEAD = 2
+USER_ROLLUP_DAYS = 90  # longest window the admin stats offer
+
+# (user_id, method, path, category, status_code, duration_ms, ip,
+#  user_agent, created_at, token) — token is only set when user_id is None.
+AuditRecord = tuple[Optional[int], str, str, str, int, int, Optional[str], str, datetime, Optional[str]]
+
+
+def user_id_from_token(token: Optional[str]) -> Optional[int]:
+    if not token:
+        return None
+    try:
+        settings = get_settings()
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        return int(payload.get("sub")) if payload.get("sub") else None
+    except Exception:
+        return None
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        maxsize: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self._pool = pool
+        self._maxsize = maxsize
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._buffer: deque[AuditRecord] = deque()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "depth": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    def put(self, record: AuditRecord) -> bool:
+        """Buffer one record; False when the buffer is full and it was dropped."""
+        if len(self._buffer) >= self._maxsize:
+            self.dropped += 1
+            return False
+        self._buffer.append(record)
+        self.recorded += 1
+        if len(self._buffer) >= self._batch_size:
+            self._wake.set()
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="audit-log-flusher")
+
+    async def _run(self) -> None:
+        while not (self._stopping and not self._buffer):
+            if len(self._buffer) < self._batch_size and not self._stopping:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            n = min(len(self._buffer), self._batch_size)
+            if n:
+                await self._flush([self._buffer.popleft() for _ in range(n)])
+
+    async def _flush(self, batch: list[AuditRecord]) -> None:
+        rows = [
+            (r[0] if r[0] is not None else user_id_from_token(r[9]), *r[1:9])
+            for r in batch
+        ]
+        try:
+            async with self._pool.acquire() as conn:
+                await conn.copy_records_to_table("audit_log", records=rows, columns=COLUMNS)
+        except Exception as e:
+            self.failed += len(rows)
+            logger.warning("audit log write of %d records failed: %s", len(rows), e)
+            return
+        self.written += len(rows)
+        self.batches += 1
+
+    async def stop(self, drain_timeout: Optional[float] = 5.0) -> None:
+        """Write what is buffered (bounded by ``drain_timeout``), then stop."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Audit log drain timed out, %d records dropped", len(self._buffer))
+            self.dropped += len(self._buffer)
+            self._buffer.clear()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+writer: Optional[AuditWriter] = None
+
+
+def record(rec: AuditRecord) -> None:
+    """Hand a record to the running writer (no-op before startup)."""
+    if writer is not None:
+        writer.put(rec)
+
+
+async def start_writer(pool: asyncpg.Pool) -> None:
+    global writer
+    settings = get_settings()
+    writer = AuditWriter(
+        pool,
+        maxsize=settings.AUDIT_BUFFER_SIZE,
+        batch_size=settings.AUDIT_BATCH_SIZE,
+        flush_interval=settings.AUDIT_FLUSH_INTERVAL_MS / 1000,
+    )
+    writer.start()
+
+
+async def stop_writer() -> None:
+    global writer
+    if writer is not None:
+        await writer.stop()
+        writer = None
+
+
+def retention_start(today: date, retention_months: int) -> date:
+    """First day of the oldest month kept."""
+    months = today.year * 12 + today.month - 1 - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def expired_partitions(names: list[str], today: date, retention_months: int) -> list[str]:
+    """Monthly partitions (``audit_log_pYYYY_MM``) entirely older than the retention."""
+    if retention_months <= 0:
+        return []
+    cutoff = f"audit_log_p{retention_start(today, retention_months):%Y_%m}"
+    return [n for n in names if n < cutoff]
+
+
+@job_queue.handler("audit.rollup")
+async def _rollup_job(payload: dict) -> None:
+    await AuditRepository(await get_pool()).refresh_rollups()
+
+
+@job_queue.handler("audit.maintain")
+async def _maintain_job(payload: dict) -> None:
+    repo = AuditRepository(await get_pool())
+    await repo.ensure_partitions(PARTITIONS_AHEAD)
+    retention = get_settings().AUDIT_RETENTION_MONTHS
+    if retention > 0:
+        today = date.today()
+        expired = expired_partitions(await repo.partitions(), today, retention)
+        if expired:
+            await repo.drop_partitions(expired)
+            logger.info("Dropped audit partitions past retention: %s", ", ".join(expired))
+        await repo.prune_default_partition(retention_start(today, retention))
+    await repo.prune_user_rollups(USER_ROLLUP_DAYS)
+
+
+job_queue.periodic("audit.rollup", get_settings().AUDIT_ROLLUP_INTERVAL)
+job_queue.periodic("audit.maintain", 3600)
@@ -1,37 +1,270 @@
-import json
+"""Two-tier cache: a per-process LRU (L1) in front of Redis (L2).
+
+Values are serialised once with orjson and kept as bytes in both tiers, so
+an L1 hit is a dict lookup plus ``orjson.loads`` — no network hop — and
+callers can't mutate what is cached. L1 is bounded by
+``CACHE_L1_MAX_ITEMS``, ``CACHE_L1_MAX_BYTES`` and ``CACHE_L1_TTL``
+(entries never outlive the Redis TTL they were set with).
+
+Writes and deletes publish the key on ``cache:invalidate``; every process
+runs a listener (``start_listener``, from the lifespan) that drops the key
+from its L1. L1 is only used while that listener is subscribed — after a
+reconnect it starts empty, and without Redis nothing is cached at all, as
+before — so a replica can serve a stale value for at most the L1 TTL if a
+message is lost.
+
+``get_many`` reads several keys with one ``MGET``. Hits/misses are counted
+per namespace (the key prefix before the first ``:``) and exposed at
+``/api/_internal/cache``.
+"""
+
+from __future__ import annotations
+
+import asyncio
 import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Optional
+
+import orjson
 import redis.asyncio as aioredis
 
+from app.config import get_settings
+
 logger = logging.getLogger(__name__)
 
+CHANNEL = "cache:invalidate"
+_ORIGIN = uuid.uuid4().hex[:12]  # this process, to skip our own messages
+_DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str, option=_DUMPS_OPTIONS)
+
+
+def loads(raw: bytes | str) -> Any:
+    return orjson.loads(raw)
+
+
+class LRU:
+    """Bytes values with per-entry expiry, bounded by count and total size."""
+
+    def __init__(self, max_items: int, max_bytes: int) -> None:
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self.pop(key)
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, raw: bytes, ttl: float) -> None:
+        if self.max_items <= 0 or ttl <= 0 or len(raw) > self.max_bytes:
+            return
+        self.pop(key)
+        self._data[key] = (time.monotonic() + ttl, raw)
+        self.bytes += len(raw)
+        while len(self._data) > self.max_items or self.bytes > self.max_bytes:
+            _, (_, old) = self._data.popitem(last=False)
+            self.bytes -= len(old)
+            self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+
+def _new_l1() -> LRU:
+    settings = get_settings()
+    return LRU(settings.CACHE_L1_MAX_ITEMS, settings.CACHE_L1_MAX_BYTES)
+
+
+_l1 = _new_l1()
+_l1_active = False  # True while the invalidation listener is subscribed
+_listener: Optional[asyncio.Task] = None
+_counters: dict[str, dict[str, int]] = defaultdict(
+    lambda: {"l1_hits": 0, "l2_hits": 0, "misses": 0, "sets": 0}
+)
+_invalidations = {"received": 0, "published": 0}
+
+
+def _namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
 
 class CacheService:
     def __init__(self, redis_client: aioredis.Redis | None, enabled: bool = True):
         self.redis = redis_client
         self.enabled = enabled and redis_client is not None
 
+    def _l1_ttl(self, ttl: Optional[int] = None) -> float:
+        l1_ttl = get_settings().CACHE_L1_TTL
+        return min(l1_ttl, ttl) if ttl is not None else l1_ttl
+
+    def _from_l1(self, key: str) -> Optional[bytes]:
+        if not _l1_active:
+            return None
+        return _l1.get(key)
+
     async def get(self, key: str) -> dict | list | None:
         if not self.enabled or not self.redis:
             return None
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        """Values of the keys that are cached (L1 first, the rest in one MGET)."""
+        if not self.enabled or not self.redis or not keys:
+            return {}
+        found: dict[str, Any] = {}
+        remote: list[str] = []
+        for key in keys:
+            raw = self._from_l1(key)
+            if raw is None:
+                remote.append(key)
+                continue
+            _counters[_namespace(key)]["l1_hits"] += 1
+            found[key] = loads(raw)
+        if not remote:
+            return found
         try:
-            data = await self.redis.get(key)
-            return json.loads(data) if data else None
+            values = await self.redis.mget(remote)
         except Exception as e:
-            logger.warning("Cache get error for key %s: %s", key, e)
-            return None
+            logger.warning("Cache get error for keys %s: %s", remote, e)
+            return found
+        for key, raw in zip(remote, values):
+            counters = _counters[_namespace(key)]
+            if raw is None:
+                counters["misses"] += 1
+                continue
+            try:
+                value = loads(raw)
+            except orjson.JSONDecodeError as e:
+                logger.warning("Cache value for key %s is not JSON: %s", key, e)
+                counters["misses"] += 1
+                continue
+            counters["l2_hits"] += 1
+            found[key] = value
+            if _l1_active:
+                _l1.put(key, raw.encode() if isinstance(raw, str) else raw, self._l1_ttl())
+        return found
 
     async def set(self, key: str, value, ttl: int = 3600) -> None:
         if not self.enabled or not self.redis:
             return
+        raw = dumps(value)
         try:
-            await self.redis.set(key, json.dumps(value, default=str), ex=ttl)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, raw, ex=ttl)
+                pipe.publish(CHANNEL, f"{_ORIGIN} {key}")
+                await pipe.execute()
         except Exception as e:
             logger.warning("Cache set error for key %s: %s", key, e)
+            _l1.pop(key)
+            return
+        _counters[_namespace(key)]["sets"] += 1
+        _invalidations["published"] += 1
+        if _l1_active:
+            _l1.put(key, raw, self._l1_ttl(ttl))
 
     async def delete(self, key: str) -> None:
+        _l1.pop(key)
         if not self.enabled or not self.redis:
             return
         try:
-            await self.redis.delete(key)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                pipe.publish(CHANNEL, f"{_ORIGIN} {key}")
+                await pipe.execute()
+            _invalidations["published"] += 1
         except Exception:
             pass
+
+
+# -- cross-replica invalidation ----------------------------------------------
+
+
+def _on_message(data: str) -> None:
+    origin, _, key = data.partition(" ")
+    if origin != _ORIGIN and key:
+        _l1.pop(key)
+        _invalidations["received"] += 1
+
+
+async def _listen(redis: aioredis.Redis) -> None:
+    global _l1_active
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(CHANNEL)
+            # Anything cached before (re)subscribing may have missed messages.
+            _l1.clear()
+            _l1_active = True
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _on_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Cache invalidation listener lost (%s), L1 off until it reconnects", e)
+        finally:
+            _l1_active = False
+            _l1.clear()
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+        await asyncio.sleep(1.0)
+
+
+async def start_listener(redis: aioredis.Redis | None) -> None:
+    """Subscribe to invalidations and enable L1 (no-op without Redis or L1)."""
+    global _listener
+    if redis is None or get_settings().CACHE_L1_MAX_ITEMS <= 0 or _listener is not None:
+        return
+    _listener = asyncio.create_task(_listen(redis), name="cache-invalidation")
+
+
+async def stop_listener() -> None:
+    global _listener
+    if _listener is None:
+        return
+    _listener.cancel()
+    await asyncio.gather(_listener, return_exceptions=True)
+    _listener = None
+
+
+def stats() -> dict:
+    namespaces = {}
+    for name, c in sorted(_counters.items()):
+        reads = c["l1_hits"] + c["l2_hits"] + c["misses"]
+        namespaces[name] = {
+            **c,
+            "hit_rate": round((c["l1_hits"] + c["l2_hits"]) / reads, 3) if reads else 0.0,
+        }
+    return {
+        "l1": {
+            "active": _l1_active,
+            "items": len(_l1),
+            "bytes": _l1.bytes,
+            "evictions": _l1.evictions,
+        },
+        "invalidations": dict(_invalidations),
+        "namespaces": namespaces,
+    }
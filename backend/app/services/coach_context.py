@@ -0,0 +1,188 @@
+"""Per-user "coach context" snapshot for the AI chat, cached in Redis.
+
+Building the chat prompt context takes about a dozen queries (history,
+profile, language, today/week snapshots) plus two plan-cache reads, and
+a user typically sends several messages in a row while nothing about
+their data changes. The whole context is therefore stored as one JSON
+value under ``coach_ctx:{user_id}``, so a follow-up or regenerate turn
+costs a single Redis GET.
+
+Freshness:
+
+* every write endpoint that changes what the coach sees (food, water,
+  workouts, weight, profile/settings, plan generation, clearing the chat)
+  calls ``invalidate``;
+* a finished chat turn *patches* the stored history in place instead of
+  dropping the snapshot (WATCH/MULTI, so a concurrent invalidation wins);
+* the snapshot carries its date, so "today" never leaks past midnight, and
+  ``CACHE_TTL_COACH_CONTEXT`` bounds staleness from writers that bypass
+  the backend (legacy bot, admin table edits).
+
+Without Redis every turn just builds the context from the database.
+Hit rate and the time saved by hits are tracked per process (see
+``stats``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Awaitable, Callable, Optional
+
+from redis.exceptions import WatchError
+
+from app.config import get_settings
+from app.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "coach_ctx"
+HISTORY_LIMIT = 20
+
+
+@dataclass
+class CoachContext:
+    history: list[dict]
+    user_info: dict
+    lang: str
+    today: dict
+    week: dict
+    meal_plan: Optional[str] = None
+    workout_plan: Optional[str] = None
+
+
+Builder = Callable[[], Awaitable[CoachContext]]
+
+_counters = {"hits": 0, "misses": 0, "bypass": 0, "invalidations": 0, "patches": 0}
+_timings = {"build_ms": 0.0, "hit_ms": 0.0}
+
+
+def _key(user_id: int) -> str:
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def _enabled(redis) -> bool:
+    return redis is not None and get_settings().CACHE_ENABLED
+
+
+def _dumps(ctx: CoachContext, day: date) -> str:
+    return json.dumps({"date": day.isoformat(), **asdict(ctx)}, ensure_ascii=False, default=str)
+
+
+def _trim_history(history: list[dict]) -> list[dict]:
+    # Only what the prompt renderer reads; created_at etc. would just bloat the value.
+    return [
+        {"message_type": m["message_type"], "message_text": m["message_text"]}
+        for m in history[-HISTORY_LIMIT:]
+    ]
+
+
+async def get_or_build(redis, user_id: int, build: Builder) -> CoachContext:
+    """Return the cached context, or build it with ``build`` and cache it."""
+    if not _enabled(redis):
+        _counters["bypass"] += 1
+        return await build()
+
+    started = time.perf_counter()
+    today = date.today()
+    try:
+        raw = await redis.get(_key(user_id))
+    except Exception as e:
+        logger.warning("Coach context read failed for %s: %s", user_id, e)
+        raw = None
+    if raw:
+        data = json.loads(raw)
+        if data.pop("date", None) == today.isoformat():
+            _counters["hits"] += 1
+            _timings["hit_ms"] += (time.perf_counter() - started) * 1000
+            return CoachContext(**data)
+
+    ctx = await build()
+    ctx.history = _trim_history(ctx.history)
+    _counters["misses"] += 1
+    _timings["build_ms"] += (time.perf_counter() - started) * 1000
+    try:
+        await redis.set(_key(user_id), _dumps(ctx, today), ex=get_settings().CACHE_TTL_COACH_CONTEXT)
+    except Exception as e:
+        logger.warning("Coach context write failed for %s: %s", user_id, e)
+    return ctx
+
+
+async def invalidate(user_id: int, redis=None) -> None:
+    """Drop the snapshot after a write that changes what the coach sees."""
+    redis = redis if redis is not None else await get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.delete(_key(user_id))
+        _counters["invalidations"] += 1
+    except Exception as e:
+        logger.warning("Coach context invalidation failed for %s: %s", user_id, e)
+
+
+async def _patch_history(redis, user_id: int, mutate: Callable[[list[dict]], None]) -> None:
+    """Apply ``mutate`` to the cached history atomically (WATCH/MULTI).
+
+    If the snapshot is gone nothing is written; if it changes underneath
+    us it is dropped, and either way the next turn rebuilds it.
+    """
+    if not _enabled(redis):
+        return
+    key = _key(user_id)
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            raw = await pipe.get(key)
+            if not raw:
+                return
+            data = json.loads(raw)
+            mutate(data["history"])
+            data["history"] = data["history"][-HISTORY_LIMIT:]
+            pipe.multi()
+            pipe.set(key, json.dumps(data, ensure_ascii=False), keepttl=True)
+            await pipe.execute()
+        _counters["patches"] += 1
+    except WatchError:
+        await invalidate(user_id, redis)
+    except Exception as e:
+        logger.warning("Coach context patch failed for %s: %s", user_id, e)
+        await invalidate(user_id, redis)
+
+
+async def record_turn(redis, user_id: int, user_message: Optional[str], reply: str) -> None:
+    """Append a finished chat turn (``user_message=None`` for regenerate)."""
+    def mutate(history: list[dict]) -> None:
+        if user_message is not None:
+            history.append({"message_type": "user", "message_text": user_message})
+        history.append({"message_type": "assistant", "message_text": reply})
+
+    await _patch_history(redis, user_id, mutate)
+
+
+async def drop_last_reply(redis, user_id: int) -> None:
+    """Mirror ChatRepository.delete_last_assistant in the cached history."""
+    def mutate(history: list[dict]) -> None:
+        for i in range(len(history) - 1, -1, -1):
+            if history[i]["message_type"] == "assistant":
+                del history[i]
+                return
+
+    await _patch_history(redis, user_id, mutate)
+
+
+def stats() -> dict:
+    hits, misses = _counters["hits"], _counters["misses"]
+    avg_build = _timings["build_ms"] / misses if misses else 0.0
+    avg_hit = _timings["hit_ms"] / hits if hits else 0.0
+    saved_per_hit = max(avg_build - avg_hit, 0.0) if misses else 0.0
+    return {
+        **_counters,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "avg_build_ms": round(avg_build, 2),
+        "avg_hit_ms": round(avg_hit, 2),
+        "saved_ms_per_hit": round(saved_per_hit, 2),
+        "saved_ms_total": round(saved_per_hit * hits, 1),
+    }
@@ -0,0 +1,170 @@
+"""Streaming CSV / NDJSON exports in constant memory.
+
+Rows come from a server-side cursor (``app.database.stream_records``), so
+the result set is never materialised in Python. They are encoded as they
+arrive and handed to the client in ~``CHUNK_BYTES`` pieces, optionally
+through a streaming gzip compressor, so memory is bounded by one fetch
+batch plus one chunk whatever the export size.
+
+The connection stays checked out for as long as the client keeps
+reading; a client that disconnects cancels the response, which closes
+the cursor and releases the connection. At most ``EXPORT_MAX_CONCURRENT``
+exports read from the database at once per process (``slot``); the rest
+wait before taking a connection, so downloads can't drain the pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import csv
+import datetime as _dt
+import decimal
+import io
+import json
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Mapping, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from app.config import get_settings
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+CHUNK_BYTES = 64 * 1024
+
+_slots: Optional[asyncio.Semaphore] = None
+
+
+@contextlib.asynccontextmanager
+async def slot() -> AsyncIterator[None]:
+    """Hold one of the ``EXPORT_MAX_CONCURRENT`` export slots."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(max(1, get_settings().EXPORT_MAX_CONCURRENT))
+    async with _slots:
+        yield
+
+
+async def aclose(source: Any) -> None:
+    """Close an async generator now (cursor, transaction, connection) rather
+    than when it is garbage-collected."""
+    close = getattr(source, "aclose", None)
+    if close is not None:
+        await close()
+
+
+def jsonable(value: Any) -> Any:
+    """JSON-compatible form of a column value."""
+    if isinstance(value, (_dt.datetime, _dt.date, _dt.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, (dict, list, str, int, float, bool)) or value is None:
+        return value
+    return str(value)  # inet, uuid, interval, ...
+
+
+def json_line(record: Mapping[str, Any]) -> bytes:
+    """One NDJSON line for a row."""
+    row = {k: jsonable(v) for k, v in record.items()}
+    return (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _csv_cell(value: Any) -> Any:
+    value = jsonable(value)
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+async def encode(
+    records: AsyncIterable[Mapping[str, Any]],
+    fmt: str,
+    *,
+    columns: Optional[Sequence[str]] = None,
+    compress: bool = False,
+    chunk_bytes: int = CHUNK_BYTES,
+    row: Optional[Callable[[Any], Mapping[str, Any]]] = None,
+) -> AsyncIterator[bytes]:
+    """Encode rows as CSV (header from ``columns`` or the first row) or NDJSON.
+
+    ``row`` maps each item of ``records`` to the row to write; pass it
+    instead of wrapping ``records`` in another generator, so that ``records``
+    itself is the one closed on disconnect.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    header = list(columns) if columns is not None else None
+    if fmt == "csv" and header is not None:
+        writer.writerow(header)
+
+    def take() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return gz.compress(data) if gz else data
+
+    try:
+        async with slot():
+            async for item in records:
+                record = row(item) if row is not None else item
+                if fmt == "csv":
+                    if header is None:
+                        header = list(record.keys())
+                        writer.writerow(header)
+                    writer.writerow([_csv_cell(record[c]) for c in header])
+                else:
+                    line = record if header is None else {c: record[c] for c in header}
+                    buf.write(json_line(line).decode("utf-8"))
+                if buf.tell() >= chunk_bytes:
+                    chunk = take()
+                    if chunk:
+                        yield chunk
+    finally:
+        # Close the cursor (and release its connection) now, not at GC time,
+        # when the client goes away mid-download.
+        await aclose(records)
+
+    tail = take()
+    if gz:
+        tail += gz.flush()
+    if tail:
+        yield tail
+
+
+def response(
+    records: AsyncIterable[Mapping[str, Any]],
+    filename: str,
+    fmt: str,
+    *,
+    columns: Optional[Sequence[str]] = None,
+    compress: bool = False,
+    row: Optional[Callable[[Any], Mapping[str, Any]]] = None,
+) -> StreamingResponse:
+    """A download response streaming ``records`` as ``filename.<fmt>[.gz]``."""
+    return attachment(
+        encode(records, fmt, columns=columns, compress=compress, row=row),
+        f"{filename}.{fmt}" + (".gz" if compress else ""),
+        "application/gzip" if compress else FORMATS[fmt],
+    )
+
+
+def attachment(chunks: AsyncIterable[bytes], name: str, media_type: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}"',
+            "Cache-Control": "no-store",
+        },
+    )
@@ -0,0 +1,346 @@
+"""Durable background jobs on Postgres (``jobs`` table, migration 015).
+
+Request handlers call ``enqueue`` and return; a ``JobWorker`` picks the
+job up, either inside the API process (``JOB_WORKERS`` > 0, started from
+the lifespan) or in a dedicated process::
+
+    python -m app.cli.worker --concurrency 4
+
+Semantics:
+
+* **Claiming** — ``FOR UPDATE SKIP LOCKED``, so workers in any number of
+  processes share the table without double-processing. Idle workers are
+  woken by ``NOTIFY jobs_enqueued`` and fall back to polling every
+  ``JOB_POLL_INTERVAL`` seconds if LISTEN isn't available.
+* **Retries** — a handler that raises is retried with exponential backoff
+  (``JOB_RETRY_BASE_DELAY`` doubling, capped at ``JOB_RETRY_MAX_DELAY``,
+  with jitter) until ``max_attempts``; then the job is marked ``failed``.
+  ``PermanentJobError`` skips the remaining attempts.
+* **At-least-once** — a job whose worker dies stays ``running`` until its
+  lock is older than ``JOB_LOCK_TIMEOUT`` and is then re-queued, so
+  handlers must be idempotent.
+* **Idempotency keys** — ``enqueue(..., key=...)`` is a no-op while a job
+  with the same key exists; finished jobs (and their keys) are pruned after
+  ``JOB_RETENTION_DAYS``.
+
+Handlers register with ``@handler("kind")`` in their own module; the
+module must be listed in ``HANDLER_MODULES`` so workers import it.
+``periodic(kind, every_s)`` additionally has every worker's housekeeping
+loop enqueue the job once per ``every_s`` slot; the slot number is the
+idempotency key, so only one replica's enqueue wins.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+import asyncpg
+
+from app.config import get_settings
+from app.repositories.job_repo import JobRepository
+from app.utils.retry import _compute_delay
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "jobs_enqueued"
+HANDLER_MODULES = (
+    "app.services.streak_service",
+    "app.services.social_timeline",
+    "app.services.leaderboards",
+    "app.services.audit_log",
+    "app.services.admin_overview",
+    "app.services.user_export",
+)
+_METRICS_WINDOW = 60.0
+_LATENCY_SAMPLES = 500
+_HOUSEKEEPING_INTERVAL = 60.0
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+
+_handlers: dict[str, JobHandler] = {}
+_periodic: dict[str, float] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (bad payload, missing row)."""
+
+
+def handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register ``fn(payload)`` as the handler for jobs of ``kind``."""
+    def decorator(fn: JobHandler) -> JobHandler:
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def periodic(kind: str, every_s: float) -> None:
+    """Run jobs of ``kind`` (empty payload) about every ``every_s`` seconds."""
+    _periodic[kind] = every_s
+
+
+def load_handlers() -> dict[str, JobHandler]:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    return dict(_handlers)
+
+
+async def enqueue(
+    pool: asyncpg.Pool,
+    kind: str,
+    payload: Optional[dict] = None,
+    *,
+    key: Optional[str] = None,
+    delay: float = 0,
+    max_attempts: int = 5,
+) -> Optional[int]:
+    """Queue a job; returns its id, or None when ``key`` is already queued/recent."""
+    job_id = await JobRepository(pool).enqueue(kind, payload or {}, key, delay, max_attempts)
+    if job_id is None:
+        logger.debug("Job %s with key %s already exists, skipped", kind, key)
+    return job_id
+
+
+def retry_delay(attempt: int) -> float:
+    """Seconds to wait before retrying after the ``attempt``-th failure."""
+    settings = get_settings()
+    return _compute_delay(
+        attempt,
+        base_delay=settings.JOB_RETRY_BASE_DELAY,
+        factor=2.0,
+        max_delay=settings.JOB_RETRY_MAX_DELAY,
+        jitter=0.25,
+    )
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class JobWorker:
+    """A pool of ``concurrency`` async workers claiming jobs from Postgres."""
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        concurrency: int = 2,
+        batch_size: int = 10,
+        poll_interval: float = 1.0,
+        lock_timeout: float = 300.0,
+        retention_days: int = 7,
+        name: Optional[str] = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self._repo = JobRepository(pool)
+        self._pool = pool
+        self._concurrency = concurrency
+        self._batch_size = max(1, batch_size)
+        self._poll_interval = poll_interval
+        self._lock_timeout = lock_timeout
+        self._retention_days = retention_days
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._handlers: dict[str, JobHandler] = {}
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._tasks: list[asyncio.Task] = []
+        self._listen_conn: Optional[asyncpg.Connection] = None
+        self.counters = {"processed": 0, "retried": 0, "failed": 0, "requeued_stale": 0}
+        self._finished_at: deque[float] = deque()
+        self._wait_ms: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._run_ms: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._handlers = load_handlers()
+        self._stopping = False
+        try:
+            self._listen_conn = await self._pool.acquire()
+            await self._listen_conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        except Exception as e:
+            logger.warning("Job LISTEN unavailable, polling every %.1fs: %s", self._poll_interval, e)
+            await self._release_listener()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"job-worker-{i}")
+            for i in range(self._concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._housekeeping(), name="job-housekeeping"))
+        logger.info("Job worker %s started (%d workers, kinds: %s)",
+                    self.name, self._concurrency, ", ".join(sorted(self._handlers)) or "-")
+
+    def _on_notify(self, *_args) -> None:
+        self._wake.set()
+
+    async def _release_listener(self) -> None:
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is None:
+            return
+        try:
+            await conn.remove_listener(NOTIFY_CHANNEL, self._on_notify)
+        except Exception:
+            pass
+        await self._pool.release(conn)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                jobs = await self._repo.claim(self.name, self._batch_size)
+            except Exception as e:
+                logger.warning("Job claim failed: %s", e)
+                jobs = []
+            if not jobs:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for i, job in enumerate(jobs):
+                if self._stopping:
+                    await self._repo.release([j["id"] for j in jobs[i:]])
+                    break
+                try:
+                    await self._execute(job)
+                except Exception as e:
+                    # The job stays 'running'; requeue_stale hands it back
+                    # once its lock times out.
+                    logger.error("Job %s (%s) bookkeeping failed: %s", job["id"], job["kind"], e)
+
+    async def _execute(self, job: dict) -> None:
+        self._wait_ms.append(max(job["wait_s"], 0.0) * 1000)
+        fn = self._handlers.get(job["kind"])
+        started = time.perf_counter()
+        try:
+            if fn is None:
+                raise PermanentJobError(f"no handler for job kind {job['kind']!r}")
+            await fn(job["payload"])
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+            if isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+                self.counters["failed"] += 1
+                logger.error("Job %s (%s) failed after %d attempt(s): %s",
+                             job["id"], job["kind"], job["attempts"], error)
+                await self._repo.fail(job["id"], error)
+            else:
+                delay = retry_delay(job["attempts"])
+                self.counters["retried"] += 1
+                logger.warning("Job %s (%s) attempt %d failed, retrying in %.0fs: %s",
+                               job["id"], job["kind"], job["attempts"], delay, error)
+                await self._repo.retry(job["id"], delay, error)
+        else:
+            await self._repo.complete(job["id"])
+            self.counters["processed"] += 1
+        finally:
+            self._run_ms.append((time.perf_counter() - started) * 1000)
+            self._finished_at.append(time.monotonic())
+
+    async def _housekeeping(self) -> None:
+        while not self._stopping:
+            try:
+                requeued = await self._repo.requeue_stale(self._lock_timeout)
+                if requeued:
+                    self.counters["requeued_stale"] += requeued
+                    logger.warning("Re-queued %d jobs from lost workers", requeued)
+                    self._wake.set()
+                await self._repo.prune(self._retention_days)
+                await self._schedule_periodic()
+            except Exception as e:
+                logger.warning("Job housekeeping failed: %s", e)
+            await asyncio.sleep(_HOUSEKEEPING_INTERVAL)
+
+    async def _schedule_periodic(self) -> None:
+        now = time.time()
+        for kind, every in _periodic.items():
+            slot = int(now // every)
+            if await self._repo.enqueue(kind, {}, f"{kind}:{slot}", 0, 3) is not None:
+                logger.info("Scheduled periodic job %s (slot %d)", kind, slot)
+
+    async def stop(self, drain_timeout: Optional[float] = 10.0) -> None:
+        """Finish in-flight jobs (bounded), hand unstarted ones back, stop."""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wake.set()
+        workers, housekeeping = self._tasks[:-1], self._tasks[-1]
+        housekeeping.cancel()
+        done, pending = await asyncio.wait(workers, timeout=drain_timeout)
+        if pending:
+            logger.warning("Job worker drain timed out, %d job(s) left to the lock timeout", len(pending))
+            for task in pending:
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._release_listener()
+
+    # -- metrics ---------------------------------------------------------------
+
+    def throughput(self) -> float:
+        """Jobs finished (any outcome) per second over the last minute."""
+        cutoff = time.monotonic() - _METRICS_WINDOW
+        while self._finished_at and self._finished_at[0] < cutoff:
+            self._finished_at.popleft()
+        return len(self._finished_at) / _METRICS_WINDOW
+
+    async def stats(self) -> dict[str, Any]:
+        try:
+            depth = await self._repo.depth()
+        except Exception as e:
+            logger.warning("Job queue depth unavailable: %s", e)
+            depth = {}
+        wait, run = list(self._wait_ms), list(self._run_ms)
+        return {
+            "worker": self.name,
+            "workers": self._concurrency if self._tasks else 0,
+            "listening": self._listen_conn is not None,
+            "depth": depth,
+            "throughput_per_s": round(self.throughput(), 2),
+            "wait_ms_p50": round(_percentile(wait, 0.5), 1),
+            "wait_ms_p95": round(_percentile(wait, 0.95), 1),
+            "run_ms_p50": round(_percentile(run, 0.5), 1),
+            "run_ms_p95": round(_percentile(run, 0.95), 1),
+            **self.counters,
+        }
+
+
+worker: Optional[JobWorker] = None
+
+
+def from_settings(pool: asyncpg.Pool, concurrency: Optional[int] = None) -> JobWorker:
+    settings = get_settings()
+    return JobWorker(
+        pool,
+        concurrency=concurrency if concurrency is not None else settings.JOB_WORKERS,
+        batch_size=settings.JOB_BATCH_SIZE,
+        poll_interval=settings.JOB_POLL_INTERVAL,
+        lock_timeout=settings.JOB_LOCK_TIMEOUT,
+        retention_days=settings.JOB_RETENTION_DAYS,
+    )
+
+
+async def start_workers(pool: asyncpg.Pool) -> None:
+    """Start the in-process workers unless ``JOB_WORKERS`` is 0."""
+    global worker
+    if get_settings().JOB_WORKERS <= 0:
+        logger.info("In-process job workers disabled (JOB_WORKERS=0)")
+        return
+    worker = from_settings(pool)
+    await worker.start()
+
+
+async def stop_workers() -> None:
+    global worker
+    if worker is not None:
+        await worker.stop()
+        worker = None
@@ -0,0 +1,244 @@
+"""Social leaderboards kept in Redis sorted sets.
+
+Categories (``CATEGORIES``):
+
+* ``overall``     — ``user_main.social_score`` (likes received + posts);
+* ``consistency`` — current streak length;
+* ``strength``    — training kcal burned over the last 30 days (the
+  workout log has no weights/sets/reps, so burned energy is the measure
+  of work done);
+* ``weight``      — kg moved towards the user's goal over the last 90 days
+  (lost for a loss goal, gained for a gain goal, minus the drift either
+  way for maintenance); needs at least two weigh-ins.
+
+Keys: ``lb:{category}`` holds public profiles, ``lb:{category}:private``
+the others, so a private user can still see their own rank. The top N is
+one ``ZREVRANGE`` and "my rank" a ``ZSCORE`` + ``ZCOUNT`` — O(log N + N)
+and O(log N), however many users there are.
+
+Maintenance:
+
+* ``refresh_user`` recomputes one user's scores (one indexed query) and
+  rewrites their members; it is called after posts, likes, streak changes,
+  workouts, weigh-ins and profile visibility changes;
+* ``leaderboards.reconcile`` (job queue, every
+  ``LEADERBOARD_RECONCILE_INTERVAL``) walks all users in keyset-paged
+  batches, upserts their scores and drops members of deleted users. It
+  also moves the rolling windows (a workout falling out of the 30 days
+  changes no row), and sets ``lb:ready``; until then reads are served from
+  Postgres.
+
+Reads also go to Postgres with ``CACHE_ENABLED`` off or Redis failing.
+``overall`` and ``consistency`` are ranked there with ``ORDER BY ...
+LIMIT``; the windowed categories score every public user.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+import asyncpg
+
+from app.config import get_settings
+from app.database import get_pool
+from app.redis import get_redis
+from app.repositories.social_repo import COLUMN_SCORES, SocialRepository
+from app.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("overall", "consistency", "strength", "weight")
+READY_KEY = "lb:ready"
+RECONCILE_BATCH = 500
+
+_LOSS_HINTS = ("loss", "похуд", "сброс")
+_GAIN_HINTS = ("gain", "набор")
+
+
+def _key(category: str, public: bool = True) -> str:
+    return f"lb:{category}" if public else f"lb:{category}:private"
+
+
+def _enabled(redis) -> bool:
+    return redis is not None and get_settings().CACHE_ENABLED
+
+
+def weight_progress(aim: Optional[str], first: float, last: float) -> float:
+    """Kg moved towards the goal between two weigh-ins (higher is better)."""
+    aim = (aim or "").lower()
+    delta = last - first
+    if any(h in aim for h in _LOSS_HINTS):
+        return round(-delta, 1)
+    if any(h in aim for h in _GAIN_HINTS):
+        return round(delta, 1)
+    return round(-abs(delta), 1)
+
+
+def scores_from_row(row: dict) -> dict[str, float]:
+    """Scores per category for one ``SocialRepository.leaderboard_rows`` row.
+
+    A category is missing when the user has nothing to rank on there.
+    """
+    scores: dict[str, float] = {
+        "overall": int(row["social_score"] or 0),
+        "consistency": int(row["current_streak"] or 0),
+    }
+    if row["training_kcal_30d"]:
+        scores["strength"] = round(float(row["training_kcal_30d"]))
+    if (row["weigh_ins"] or 0) >= 2:
+        scores["weight"] = weight_progress(row["aim"], float(row["first_weight"]), float(row["last_weight"]))
+    return scores
+
+
+def _apply_row(pipe, row: dict) -> None:
+    user_id, public = row["user_id"], bool(row["public_profile"])
+    scores = scores_from_row(row)
+    for category in CATEGORIES:
+        pipe.zrem(_key(category, not public), user_id)
+        if category in scores:
+            pipe.zadd(_key(category, public), {str(user_id): scores[category]})
+        else:
+            pipe.zrem(_key(category, public), user_id)
+
+
+async def refresh_user(pool: asyncpg.Pool, user_id: int, redis=None) -> None:
+    """Recompute one user's scores in every category. Never raises."""
+    redis = redis if redis is not None else await get_redis()
+    if redis is None:
+        return
+    try:
+        rows = await SocialRepository(pool).leaderboard_rows(user_ids=[user_id])
+        async with redis.pipeline(transaction=True) as pipe:
+            if rows:
+                _apply_row(pipe, rows[0])
+            else:
+                for category in CATEGORIES:
+                    pipe.zrem(_key(category), user_id)
+                    pipe.zrem(_key(category, False), user_id)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Leaderboard refresh failed for %s: %s", user_id, e)
+
+
+async def reconcile(pool: asyncpg.Pool, redis) -> int:
+    """Rewrite every user's scores from Postgres; returns users processed."""
+    repo = SocialRepository(pool)
+    seen: set[str] = set()
+    after = 0
+    while True:
+        rows = await repo.leaderboard_rows(after=after, limit=RECONCILE_BATCH)
+        if not rows:
+            break
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in rows:
+                _apply_row(pipe, row)
+            await pipe.execute()
+        seen.update(str(r["user_id"]) for r in rows)
+        after = rows[-1]["user_id"]
+
+    # Members of users that no longer exist.
+    for category in CATEGORIES:
+        for public in (True, False):
+            key = _key(category, public)
+            stale = [m async for m in _members(redis, key) if m not in seen]
+            if stale:
+                await redis.zrem(key, *stale)
+    await redis.set(READY_KEY, "1")
+    return len(seen)
+
+
+async def _members(redis, key: str):
+    async for member, _score in redis.zscan_iter(key, count=1000):
+        yield member
+
+
+def _score_out(category: str, score: float):
+    return round(score, 1) if category == "weight" else int(score)
+
+
+async def top(
+    pool: asyncpg.Pool, redis, category: str, viewer_id: int, limit: int,
+) -> dict:
+    """Top ``limit`` public users plus the viewer's own rank and score."""
+    if not _enabled(redis):
+        return await _top_from_postgres(pool, category, viewer_id, limit)
+    try:
+        if await redis.exists(READY_KEY):
+            ranked, me = await _top_from_redis(redis, category, viewer_id, limit)
+            return await _with_names(pool, category, ranked, me)
+    except Exception as e:
+        logger.warning("Leaderboard read failed, using Postgres: %s", e)
+        return await _top_from_postgres(pool, category, viewer_id, limit)
+    await schedule_reconcile(pool)
+    return await _top_from_postgres(pool, category, viewer_id, limit)
+
+
+async def _top_from_redis(
+    redis, category: str, viewer_id: int, limit: int,
+) -> tuple[list[tuple[int, float]], Optional[dict]]:
+    public_key = _key(category)
+    ranked = [(int(m), s) for m, s in await redis.zrevrange(public_key, 0, limit - 1, withscores=True)]
+    my_score = await redis.zscore(public_key, viewer_id)
+    if my_score is None:
+        my_score = await redis.zscore(_key(category, False), viewer_id)
+    me = None
+    if my_score is not None:
+        rank = await redis.zcount(public_key, f"({my_score}", "+inf") + 1
+        me = {"rank": rank, "score": _score_out(category, my_score)}
+        # Private profiles still see themselves in the list.
+        if rank <= limit and viewer_id not in {uid for uid, _ in ranked}:
+            ranked.insert(rank - 1, (viewer_id, my_score))
+            ranked = ranked[:limit]
+    return ranked, me
+
+
+async def _top_from_postgres(pool: asyncpg.Pool, category: str, viewer_id: int, limit: int) -> dict:
+    repo = SocialRepository(pool)
+    if category in COLUMN_SCORES:
+        rows, mine = await repo.leaderboard_top(category, viewer_id, limit)
+        me = {"rank": mine["rank"], "score": _score_out(category, mine["score"])} if mine else None
+        return await _with_names(pool, category, [(r["user_id"], r["score"]) for r in rows], me)
+    rows = await repo.public_leaderboard_rows(viewer_id)
+    scored = []
+    for row in rows:
+        scores = scores_from_row(row)
+        if category in scores:
+            scored.append((row["user_id"], scores[category]))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    me = None
+    for uid, score in scored:
+        if uid == viewer_id:
+            rank = sum(1 for _, s in scored if s > score) + 1
+            me = {"rank": rank, "score": _score_out(category, score)}
+    return await _with_names(pool, category, scored[:limit], me)
+
+
+async def _with_names(pool, category: str, ranked: list[tuple[int, float]], me: Optional[dict]) -> dict:
+    names = await SocialRepository(pool).display_names([uid for uid, _ in ranked]) if ranked else {}
+    return {
+        "category": category,
+        "items": [
+            {"user_id": uid, "name": names.get(uid, "user"), "score": _score_out(category, score)}
+            for uid, score in ranked
+        ],
+        "me": me,
+    }
+
+
+async def schedule_reconcile(pool: asyncpg.Pool) -> None:
+    try:
+        await job_queue.enqueue(pool, "leaderboards.reconcile", key="leaderboards.reconcile:cold")
+    except Exception as e:
+        logger.warning("Could not queue leaderboard reconciliation: %s", e)
+
+
+@job_queue.handler("leaderboards.reconcile")
+async def _reconcile_job(payload: dict) -> None:
+    redis = await get_redis()
+    if redis is not None:
+        n = await reconcile(await get_pool(), redis)
+        logger.info("Leaderboards reconciled for %d users", n)
+
+
+job_queue.periodic("leaderboards.reconcile", get_settings().LEADERBOARD_RECONCILE_INTERVAL)
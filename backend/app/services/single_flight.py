@@ -0,0 +1,149 @@
+"""Single-flight: concurrent identical calls share one execution.
+
+``do(key, fn)`` runs ``fn()`` once per key at a time and hands every
+concurrent caller the same result (or exception):
+
+* **In-process** — the first caller starts a task; the rest await it
+  (shielded, so the leader's client disconnecting doesn't cancel it for
+  everyone else).
+* **Across replicas** (when Redis is given) — the task takes
+  ``sf:lock:{key}`` with ``SET NX PX``. A replica that finds the lock taken
+  subscribes to ``sf:result:{key}`` and waits for the leader to publish its
+  result there; the result is also stored under the same name for a few
+  seconds so a waiter that subscribes just after the publish still finds it.
+  If the lock disappears without a result (the leader died) or the wait
+  exceeds ``lock_ttl``, the waiter runs ``fn()`` itself.
+
+Remote results travel as JSON, so ``fn`` must return JSON-serialisable
+values. A leader's exception is re-raised in remote waiters as the class
+of the same name from ``errors``, or as ``default_error``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+import orjson
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+RESULT_TTL_MS = 10_000
+_LOCK_POLL_S = 1.0
+# Delete the lock only if we still own it (it may have expired and been retaken).
+_UNLOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+
+_inflight: dict[str, asyncio.Task] = {}
+_counters = {"leader": 0, "joined_local": 0, "joined_remote": 0, "fallback": 0}
+
+
+async def do(
+    key: str,
+    fn: Callable[[], Awaitable[Any]],
+    *,
+    redis: aioredis.Redis | None = None,
+    lock_ttl: float = 180.0,
+    errors: Optional[Mapping[str, type[Exception]]] = None,
+    default_error: type[Exception] = RuntimeError,
+) -> Any:
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_run(key, fn, redis, lock_ttl, errors or {}, default_error))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget(key, t))
+    else:
+        _counters["joined_local"] += 1
+    return await asyncio.shield(task)
+
+
+def _forget(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+
+
+async def _run(key, fn, redis, lock_ttl, errors, default_error) -> Any:
+    if redis is None:
+        _counters["leader"] += 1
+        return await fn()
+    lock_key, result_key = f"sf:lock:{key}", f"sf:result:{key}"
+    token = uuid.uuid4().hex
+    try:
+        leader = await redis.set(lock_key, token, nx=True, px=int(lock_ttl * 1000))
+    except Exception as e:
+        logger.warning("single-flight lock for %s unavailable: %s", key, e)
+        leader = True
+        token = None
+    if not leader:
+        payload = await _wait_remote(redis, lock_key, result_key, lock_ttl)
+        if payload is not None:
+            _counters["joined_remote"] += 1
+            if "ok" in payload:
+                return payload["ok"]
+            raise errors.get(payload.get("error"), default_error)(payload.get("message", ""))
+        _counters["fallback"] += 1
+        return await fn()
+
+    _counters["leader"] += 1
+    if token is not None:
+        try:
+            await redis.delete(result_key)  # a previous flight's result
+        except Exception:
+            pass
+    try:
+        value = await fn()
+    except Exception as e:
+        await _publish(redis, lock_key, result_key, token, {"error": type(e).__name__, "message": str(e)})
+        raise
+    await _publish(redis, lock_key, result_key, token, {"ok": value})
+    return value
+
+
+async def _publish(redis, lock_key: str, result_key: str, token: Optional[str], payload: dict) -> None:
+    if token is None:
+        return  # we never held the lock, nobody is waiting on us
+    try:
+        raw = orjson.dumps(payload, default=str)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.set(result_key, raw, px=RESULT_TTL_MS)
+            pipe.publish(result_key, raw)
+            pipe.eval(_UNLOCK, 1, lock_key, token)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("single-flight publish for %s failed: %s", result_key, e)
+
+
+async def _wait_remote(redis, lock_key: str, result_key: str, timeout: float) -> Optional[dict]:
+    """The leader's payload, or None if it went away without one."""
+    pubsub = redis.pubsub()
+    try:
+        await pubsub.subscribe(result_key)
+        # The leader may have finished between our SET NX and SUBSCRIBE.
+        raw = await redis.get(result_key)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while raw is None and loop.time() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=_LOCK_POLL_S)
+            if message is not None and message.get("type") == "message":
+                raw = message["data"]
+            elif not await redis.exists(lock_key):
+                raw = await redis.get(result_key)
+                break
+        return orjson.loads(raw) if raw is not None else None
+    except Exception as e:
+        logger.warning("single-flight wait for %s failed: %s", result_key, e)
+        return None
+    finally:
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
+
+
+def stats() -> dict:
+    return {**_counters, "inflight": len(_inflight)}
@@ -0,0 +1,241 @@
+"""Following timeline: fan-out on write into per-user Redis sorted sets.
+
+``tl:{user_id}`` is a ZSET of post ids scored by ``created_at`` in epoch
+milliseconds, capped at ``SOCIAL_TIMELINE_MAX`` entries. A page is one
+``ZREVRANGEBYSCORE ... LIMIT`` plus a single hydration query, so reading
+costs O(page size) no matter how many people the user follows.
+
+Write side (all through the job queue, so ``create_post`` returns at once):
+
+* ``timeline.fanout`` — after a post is created (or un-hidden) its id is
+  added to the author's and every follower's timeline. Only timelines that
+  exist are touched; the rest are built from Postgres on first read, so
+  inactive users cost no Redis memory (timelines expire after
+  ``SOCIAL_TIMELINE_TTL`` without reads).
+* Authors with more than ``SOCIAL_FANOUT_MAX_FOLLOWERS`` followers are not
+  fanned out at all; they are recorded in ``tl:celebs`` and their posts are
+  merged in at read time (fan-out on read for the few, on write for the
+  many). An author who drops back under the threshold leaves ``tl:celebs``
+  and their followers' timelines are dropped, to be rebuilt with the
+  posts that were never fanned out.
+* ``timeline.remove`` — deleting or hiding a post removes it from the same
+  timelines. Reads also filter hidden/deleted posts during hydration, so a
+  removal that hasn't run yet never shows.
+
+Following or unfollowing someone drops the follower's timeline; it is
+rebuilt on the next read. Without Redis, reads fall back to a Postgres
+fan-out-on-read query.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+import asyncpg
+
+from app.config import get_settings
+from app.database import get_pool
+from app.redis import get_redis
+from app.repositories.social_repo import SocialRepository
+from app.services import job_queue
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "tl"
+CELEBS_KEY = "tl:celebs"
+# Highest-scored member of every built timeline: tells "built but empty"
+# apart from "never built / expired", and survives rank-based trimming.
+SENTINEL = "built"
+FANOUT_CHUNK = 500
+# Extra ids read past the page to absorb ties on the cursor score.
+_TIE_SLACK = 10
+
+Entry = tuple[int, int]  # (score, post_id)
+
+
+def _key(user_id: int) -> str:
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def _enabled(redis) -> bool:
+    return redis is not None and get_settings().CACHE_ENABLED
+
+
+def _before(entry: Entry, cursor: Optional[Entry]) -> bool:
+    return cursor is None or entry < cursor
+
+
+# ---------------------------------------------------------------------------
+# Read side
+# ---------------------------------------------------------------------------
+
+async def rebuild(pool: asyncpg.Pool, redis, user_id: int) -> None:
+    """(Re)create a user's timeline from Postgres."""
+    settings = get_settings()
+    entries = await SocialRepository(pool).following_posts(user_id, None, settings.SOCIAL_TIMELINE_MAX)
+    key = _key(user_id)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.zadd(key, {SENTINEL: float("inf"), **{str(post_id): score for score, post_id in entries}})
+        pipe.expire(key, settings.SOCIAL_TIMELINE_TTL)
+        await pipe.execute()
+
+
+async def page(
+    pool: asyncpg.Pool, redis, user_id: int, limit: int, cursor: Optional[Entry] = None,
+) -> list[Entry]:
+    """Up to ``limit + 1`` timeline entries older than ``cursor``, newest first.
+
+    The extra entry only tells the caller whether there is a next page.
+    """
+    repo = SocialRepository(pool)
+    want = limit + 1
+    if not _enabled(redis):
+        return await repo.following_posts(user_id, cursor, want)
+
+    key = _key(user_id)
+    try:
+        if await redis.zscore(key, SENTINEL) is None:
+            await rebuild(pool, redis, user_id)
+        raw = await redis.zrevrangebyscore(
+            key, cursor[0] if cursor else "+inf", "-inf",
+            start=0, num=want + _TIE_SLACK, withscores=True,
+        )
+        await redis.expire(key, get_settings().SOCIAL_TIMELINE_TTL)
+        celebs = [int(c) for c in await redis.smembers(CELEBS_KEY)]
+    except Exception as e:
+        logger.warning("Timeline read failed for %s, using Postgres: %s", user_id, e)
+        return await repo.following_posts(user_id, cursor, want)
+
+    merged: dict[int, int] = {}
+    for member, score in raw:
+        if member == SENTINEL:
+            continue
+        entry = (int(score), int(member))
+        if _before(entry, cursor):
+            merged[entry[1]] = entry[0]
+
+    if celebs:
+        followed = await repo.followed_among(user_id, celebs)
+        if user_id in celebs:
+            followed.append(user_id)
+        if followed:
+            for score, post_id in await repo.posts_by_authors(followed, cursor, want):
+                merged[post_id] = score
+
+    entries = sorted(((score, post_id) for post_id, score in merged.items()), reverse=True)
+    return entries[:want]
+
+
+async def invalidate(user_id: int, redis=None) -> None:
+    """Drop a timeline after the user's follow list changed."""
+    redis = redis if redis is not None else await get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.delete(_key(user_id))
+    except Exception as e:
+        logger.warning("Timeline invalidation failed for %s: %s", user_id, e)
+
+
+# ---------------------------------------------------------------------------
+# Write side
+# ---------------------------------------------------------------------------
+
+async def _for_built_timelines(pool, redis, author_id: int, apply) -> int:
+    """Run ``apply(pipe, key)`` for the author's and each follower's built timeline."""
+    repo = SocialRepository(pool)
+    touched = 0
+    after = 0
+    batch = [author_id]
+    while True:
+        followers = await repo.followers_after(author_id, after, FANOUT_CHUNK)
+        batch.extend(followers)
+        if batch:
+            async with redis.pipeline(transaction=False) as pipe:
+                for uid in batch:
+                    pipe.zscore(_key(uid), SENTINEL)
+                built = [uid for uid, s in zip(batch, await pipe.execute()) if s is not None]
+            if built:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for uid in built:
+                        apply(pipe, _key(uid))
+                    await pipe.execute()
+                touched += len(built)
+        if len(followers) < FANOUT_CHUNK:
+            return touched
+        after = followers[-1]
+        batch = []
+
+
+async def fan_out(pool: asyncpg.Pool, redis, post_id: int) -> int:
+    """Push a post into its followers' timelines; returns timelines touched."""
+    settings = get_settings()
+    post = await SocialRepository(pool).post_for_fanout(post_id)
+    if post is None or post["hidden"]:
+        return 0
+    author_id = post["user_id"]
+    threshold = settings.SOCIAL_FANOUT_MAX_FOLLOWERS
+    count = await SocialRepository(pool).follower_count_upto(author_id, threshold + 1)
+    if count > threshold:
+        await redis.sadd(CELEBS_KEY, author_id)
+        return 0
+    if await redis.srem(CELEBS_KEY, author_id):
+        # Their earlier posts were only merged in on read and are in no
+        # timeline: drop the built ones so they are rebuilt with them
+        # (the rebuild picks up this post too).
+        def drop(pipe, key: str) -> None:
+            pipe.delete(key)
+
+        return await _for_built_timelines(pool, redis, author_id, drop)
+    cap = settings.SOCIAL_TIMELINE_MAX
+
+    def apply(pipe, key: str) -> None:
+        pipe.zadd(key, {str(post_id): post["score"]})
+        # Keep the newest `cap` posts plus the sentinel (highest rank).
+        pipe.zremrangebyrank(key, 0, -(cap + 2))
+
+    return await _for_built_timelines(pool, redis, author_id, apply)
+
+
+async def remove(pool: asyncpg.Pool, redis, post_id: int, author_id: int) -> int:
+    """Remove a deleted / hidden post from the timelines it was fanned out to."""
+    def apply(pipe, key: str) -> None:
+        pipe.zrem(key, str(post_id))
+
+    return await _for_built_timelines(pool, redis, author_id, apply)
+
+
+async def schedule_fanout(pool: asyncpg.Pool, post_id: int, *, dedupe: bool = True) -> None:
+    """Queue ``timeline.fanout``; ``dedupe=False`` for re-publishing (un-hide)."""
+    try:
+        await job_queue.enqueue(
+            pool, "timeline.fanout", {"post_id": post_id},
+            key=f"timeline.fanout:{post_id}" if dedupe else None,
+        )
+    except Exception as e:
+        logger.warning("Could not queue timeline fan-out for post %s: %s", post_id, e)
+
+
+async def schedule_remove(pool: asyncpg.Pool, post_id: int, author_id: int) -> None:
+    try:
+        await job_queue.enqueue(
+            pool, "timeline.remove", {"post_id": post_id, "author_id": author_id},
+        )
+    except Exception as e:
+        logger.warning("Could not queue timeline removal for post %s: %s", post_id, e)
+
+
+@job_queue.handler("timeline.fanout")
+async def _fanout_job(payload: dict) -> None:
+    redis = await get_redis()
+    if _enabled(redis):
+        await fan_out(await get_pool(), redis, int(payload["post_id"]))
+
+
+@job_queue.handler("timeline.remove")
+async def _remove_job(payload: dict) -> None:
+    redis = await get_redis()
+    if _enabled(redis):
+        await remove(await get_pool(), redis, int(payload["post_id"]), int(payload["author_id"]))
@@ -6,19 +6,28 @@ a meaningful daily action (adding food, water, workout, weight).
 
 - Recomputes current/longest streak based on last_active_date.
 - One automatic freeze per week covers a single missed day.
-- Evaluates all badge conditions and grants newly-earned ones atomically.
+- Evaluates the badge rules and grants newly-earned ones atomically.
 - Returns a small DTO the client can use for toasts.
+
+Badges are declared in BADGE_RULES as (code, predicate) pairs over a single
+state row (StreakRepository.badge_state) built from trigger-maintained
+counters and the daily rollup. Rules for badges the user already holds are
+skipped, so a touch costs a constant three queries at most: read the state,
+upsert the streak, and grant — the last one only when something new was
+earned.
 """
 from __future__ import annotations
 
 import logging
 from dataclasses import dataclass
 from datetime import date, timedelta
-from typing import Optional
+from typing import Callable, Optional
 
 import asyncpg
 
+from app.database import get_pool
 from app.repositories.streak_repo import StreakRepository
+from app.services import job_queue, leaderboards
 
 logger = logging.getLogger(__name__)
 
@@ -94,55 +103,114 @@ async def get_streak_dto(pool: asyncpg.Pool, user_id: int) -> dict:
     }
 
 
-async def touch_activity(pool: asyncpg.Pool, user_id: int) -> StreakUpdate:
+def _macros_balanced(state: dict) -> bool:
+    daily_cal = state.get("daily_cal")
+    if not daily_cal or not state["kcal_today"] or state["kcal_today"] <= 0:
+        return False
+    daily_cal = float(daily_cal)
+    targets = (
+        (state["protein_today"], daily_cal * 0.30 / 4),
+        (state["fat_today"], daily_cal * 0.25 / 9),
+        (state["carbs_today"], daily_cal * 0.45 / 4),
+    )
+    return all(
+        target > 0 and abs(float(value) - target) / target <= MACRO_BALANCE_TOLERANCE
+        for value, target in targets
+    )
+
+
+BadgeRule = Callable[[dict], bool]
+
+# Evaluated in order against the state dict from StreakRepository.badge_state,
+# with "current_streak" set to the streak after today's touch.
+BADGE_RULES: list[tuple[str, BadgeRule]] = [
+    ("streak_3", lambda s: s["current_streak"] >= 3),
+    ("streak_7", lambda s: s["current_streak"] >= 7),
+    ("streak_30", lambda s: s["current_streak"] >= 30),
+    ("streak_100", lambda s: s["current_streak"] >= 100),
+    ("water_first", lambda s: s["water_glasses"] >= 1),
+    ("water_goal", lambda s: s["water_today"] >= WATER_DAILY_TARGET),
+    ("water_7", lambda s: s["water_goal_days"] >= 7),
+    ("food_first", lambda s: s["food_entries"] >= 1),
+    ("food_balance", _macros_balanced),
+    ("workout_first", lambda s: s["workouts"] >= 1),
+    ("workout_5wk", lambda s: s["workouts_week"] >= 5),
+]
+
+
+def badges_to_grant(state: dict, earned: set[str]) -> list[str]:
+    """Codes of rules that pass for `state`, skipping badges already earned."""
+    return [code for code, rule in BADGE_RULES if code not in earned and rule(state)]
+
+
+def _badge_dto(badge: dict) -> dict:
+    return {
+        "id": badge["id"],
+        "code": badge["code"],
+        "title": badge["title"],
+        "description": badge["description"],
+        "icon": badge["icon"],
+        "tier": badge["tier"],
+        "category": badge["category"],
+        "earned_at": badge["earned_at"].isoformat() if badge.get("earned_at") else None,
+    }
+
+
+def _advance_streak(state: dict, today: date, user_id: int) -> tuple[int, int, int, date]:
+    """Return (current, longest, freezes, last_freeze_reset) after activity today."""
+    this_week_monday = _monday(today)
+    if not state["has_streak"]:
+        return 1, 1, 1, this_week_monday
+
+    current = int(state["current_streak"])
+    longest = int(state["longest_streak"])
+    freezes = int(state["freezes_available"])
+    last_active: Optional[date] = state["last_active_date"]
+    last_freeze_reset: Optional[date] = state["last_freeze_reset"]
+
+    # Weekly freeze refill (every Monday)
+    if last_freeze_reset is None or last_freeze_reset < this_week_monday:
+        freezes = 1
+        last_freeze_reset = this_week_monday
+
+    if last_active is None:
+        current = 1
+    else:
+        delta = (today - last_active).days
+        if delta == 0:
+            pass
+        elif delta == 1:
+            current += 1
+        elif delta == 2 and freezes >= 1:
+            freezes -= 1
+            current += 1
+            logger.info("User %s: freeze auto-applied, streak kept at %d", user_id, current)
+        else:
+            current = 1
+
+    return current, max(longest, current), freezes, last_freeze_reset
+
+
+async def touch_activity(
+    pool: asyncpg.Pool, user_id: int, today: Optional[date] = None,
+) -> StreakUpdate:
     """
-    Update the streak for today and evaluate badges.
-    Idempotent — calling it 10 times today still leaves the streak unchanged
-    on subsequent calls.
+    Update the streak for today (or `today`, for a retried job) and evaluate
+    badges. Idempotent — calling it 10 times today still leaves the streak
+    unchanged on subsequent calls.
 
     Any failure here MUST NOT break the calling business action (food save,
     water add etc). The caller should wrap this in a try/except and degrade
     gracefully — or use `safe_touch_activity` below.
     """
     repo = StreakRepository(pool)
-    today = date.today()
-    row = await repo.get_streak(user_id)
-
-    if row is None:
-        current = 1
-        longest = 1
-        freezes = 1
-        last_freeze_reset = _monday(today)
-    else:
-        current = int(row["current_streak"])
-        longest = int(row["longest_streak"])
-        freezes = int(row["freezes_available"])
-        last_active: Optional[date] = row["last_active_date"]
-        last_freeze_reset: Optional[date] = row["last_freeze_reset"]
-
-        # Weekly freeze refill (every Monday)
-        this_week_monday = _monday(today)
-        if last_freeze_reset is None or last_freeze_reset < this_week_monday:
-            freezes = 1
-            last_freeze_reset = this_week_monday
-
-        if last_active is None:
-            current = 1
-        else:
-            delta = (today - last_active).days
-            if delta == 0:
-                pass
-            elif delta == 1:
-                current += 1
-            elif delta == 2 and freezes >= 1:
-                freezes -= 1
-                current += 1
-                logger.info("User %s: freeze auto-applied, streak kept at %d", user_id, current)
-            else:
-                current = 1
-
-        longest = max(longest, current)
+    today = today or date.today()
+    state = await repo.badge_state(user_id, today, _monday(today), WATER_DAILY_TARGET)
+    if state["has_streak"] and state["last_active_date"] and state["last_active_date"] > today:
+        # A late retry for a day the streak has already moved past.
+        return empty_update()
 
+    current, longest, freezes, last_freeze_reset = _advance_streak(state, today, user_id)
     await repo.upsert_streak(
         user_id=user_id,
         current=current,
@@ -152,7 +220,11 @@ async def touch_activity(pool: asyncpg.Pool, user_id: int) -> StreakUpdate:
         last_freeze_reset=last_freeze_reset,
     )
 
-    newly_earned = await _evaluate_badges(repo, user_id, current)
+    if current != state["current_streak"]:
+        await leaderboards.refresh_user(pool, user_id)
+    state["current_streak"] = current
+    codes = badges_to_grant(state, state["earned"])
+    granted = await repo.grant_badges(user_id, codes) if codes else []
 
     status = _compute_status(current, today, today)
     return StreakUpdate(
@@ -161,88 +233,33 @@ async def touch_activity(pool: asyncpg.Pool, user_id: int) -> StreakUpdate:
         status=status,
         freezes_available=freezes,
         last_active_date=today,
-        newly_earned_badges=newly_earned,
+        newly_earned_badges=[_badge_dto(b) for b in granted],
     )
 
 
-async def _evaluate_badges(
-    repo: StreakRepository, user_id: int, current_streak: int
-) -> list[dict]:
-    """Check every badge condition, grant new ones, return the newly-earned list."""
-    earned = await repo.earned_codes(user_id)
-    newly: list[dict] = []
-
-    async def try_grant(code: str) -> None:
-        if code in earned:
-            return
-        granted = await repo.grant_badge(user_id, code)
-        if granted:
-            newly.append({
-                "id": granted["id"],
-                "code": granted["code"],
-                "title": granted["title"],
-                "description": granted["description"],
-                "icon": granted["icon"],
-                "tier": granted["tier"],
-                "category": granted["category"],
-                "earned_at": granted["earned_at"].isoformat() if granted.get("earned_at") else None,
-            })
-
-    # --- streak tiers ---
-    if current_streak >= 3:
-        await try_grant("streak_3")
-    if current_streak >= 7:
-        await try_grant("streak_7")
-    if current_streak >= 30:
-        await try_grant("streak_30")
-    if current_streak >= 100:
-        await try_grant("streak_100")
-
-    # --- water ---
-    if await repo.water_count_total(user_id) >= 1:
-        await try_grant("water_first")
-    if await repo.water_today(user_id) >= WATER_DAILY_TARGET:
-        await try_grant("water_goal")
-    if await repo.water_goal_streak(user_id, WATER_DAILY_TARGET) >= 7:
-        await try_grant("water_7")
-
-    # --- food ---
-    if await repo.food_entries_count(user_id) >= 1:
-        await try_grant("food_first")
-
-    totals = await repo.food_totals_today(user_id)
-    daily_cal = await repo.user_daily_cal(user_id)
-    if totals and daily_cal and totals["calories"] and totals["calories"] > 0:
-        target_protein = (daily_cal * 0.30) / 4
-        target_fat = (daily_cal * 0.25) / 9
-        target_carbs = (daily_cal * 0.45) / 4
-
-        def in_band(value: float, target: float) -> bool:
-            if target <= 0:
-                return False
-            return abs(value - target) / target <= MACRO_BALANCE_TOLERANCE
-
-        if (
-            in_band(float(totals["protein"]), target_protein)
-            and in_band(float(totals["fat"]), target_fat)
-            and in_band(float(totals["carbs"]), target_carbs)
-        ):
-            await try_grant("food_balance")
-
-    # --- workouts ---
-    if await repo.workouts_count(user_id) >= 1:
-        await try_grant("workout_first")
-
-    if await repo.workouts_in_week(user_id, _monday(date.today())) >= 5:
-        await try_grant("workout_5wk")
-
-    return newly
-
-
 async def safe_touch_activity(pool: asyncpg.Pool, user_id: int) -> StreakUpdate:
-    """Never raises. Returns empty_update() on any internal error."""
+    """Never raises. Returns empty_update() on any internal error.
+
+    The activity isn't lost on failure: a `streak.touch` job for the same
+    day is queued (once per user and day) and the worker retries it.
+    """
+    today = date.today()
     try:
-        return await touch_activity(pool, user_id)
+        return await touch_activity(pool, user_id, today)
     except Exception as e:
         logger.warning("streak touch_activity failed for user %s: %s", user_id, e)
+        try:
+            await job_queue.enqueue(
+                pool, "streak.touch", {"user_id": user_id, "date": today.isoformat()},
+                key=f"streak.touch:{user_id}:{today.isoformat()}",
+            )
+        except Exception as qe:
+            logger.warning("could not queue streak retry for user %s: %s", user_id, qe)
         return empty_update()
+
+
+@job_queue.handler("streak.touch")
+async def _touch_job(payload: dict) -> None:
+    await touch_activity(
+        await get_pool(), int(payload["user_id"]), date.fromisoformat(payload["date"]),
+    )
@@ -0,0 +1,290 @@
+"""Personal data export (the privacy policy's right of access).
+
+Everything stored about a user — profile, health, food, training, water,
+AI chat and social activity — is read table by table through server-side
+cursors inside one read-only ``REPEATABLE READ`` transaction, so the
+archive is a consistent snapshot and no table's history is ever held in
+memory. Two formats:
+
+* ``zip`` — one ``<table>.ndjson`` member per table plus ``manifest.json``
+  with row counts, compressed and emitted as it is written (members use
+  data descriptors, so nothing needs to seek);
+* ``ndjson`` — a single stream of ``{"table": ..., "row": {...}}`` lines,
+  optionally gzipped.
+
+``GET /api/users/me/export`` streams the archive directly. For very large
+accounts ``POST /api/users/me/export`` queues a ``user_export.build`` job
+that writes it under ``USER_EXPORT_DIR`` (a private directory, not the
+public uploads mount) and ``GET /api/users/me/exports`` lists the download
+links; files are deleted after ``USER_EXPORT_TTL_HOURS``.
+
+Both ways count against ``USER_EXPORT_LIMIT`` exports per
+``USER_EXPORT_WINDOW_HOURS`` per user (rows of ``data_exports``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Mapping
+
+import asyncpg
+from fastapi.responses import StreamingResponse
+
+from app.config import get_settings
+from app.database import get_pool
+from app.repositories.export_repo import DataExportRepository
+from app.services import export, job_queue
+
+logger = logging.getLogger(__name__)
+
+# (table, query) in archive order; every query takes the user id as $1.
+SECTIONS: tuple[tuple[str, str], ...] = (
+    ("user_main", "SELECT * FROM user_main WHERE user_id = $1"),
+    ("user_aims", "SELECT * FROM user_aims WHERE user_id = $1"),
+    ("user_settings", "SELECT * FROM user_settings WHERE user_id = $1"),
+    ("user_health", "SELECT * FROM user_health WHERE user_id = $1 ORDER BY date"),
+    ("food", "SELECT * FROM food WHERE user_id = $1 ORDER BY date"),
+    ("user_training", "SELECT * FROM user_training WHERE user_id = $1 ORDER BY date"),
+    ("water", "SELECT * FROM water WHERE user_id = $1 ORDER BY date"),
+    ("chat_history", "SELECT * FROM chat_history WHERE user_id = $1 ORDER BY created_at"),
+    ("social_posts", "SELECT * FROM social_posts WHERE user_id = $1 ORDER BY created_at"),
+    ("social_likes",
+     "SELECT post_id, created_at FROM social_likes WHERE user_id = $1 ORDER BY created_at"),
+    ("social_follows",
+     "SELECT followee_id, created_at FROM social_follows WHERE follower_id = $1 ORDER BY created_at"),
+)
+FETCH_ROWS = 500
+_HISTORY_DAYS = 30  # data_exports rows kept for the user's export list / rate limit
+
+
+class ExportRateLimited(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"export limit reached, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+async def rows(pool: asyncpg.Pool, user_id: int) -> AsyncIterator[tuple[str, asyncpg.Record]]:
+    """``(table, record)`` for every row of the user, section by section."""
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            for table, sql in SECTIONS:
+                async for record in conn.cursor(sql, user_id, prefetch=FETCH_ROWS):
+                    yield table, record
+
+
+class _Sink:
+    """Write-only file object collecting what ``zipfile`` emits."""
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        self.size = 0
+        return data
+
+
+def _member(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+async def zip_stream(
+    records: AsyncIterable[tuple[str, Mapping[str, Any]]],
+    user_id: int,
+    chunk_bytes: int = export.CHUNK_BYTES,
+) -> AsyncIterator[bytes]:
+    """Zip ``(table, row)`` pairs into ``<table>.ndjson`` members as they arrive."""
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED)
+    counts = {table: 0 for table, _ in SECTIONS}
+    current, member = None, None
+    try:
+        async with export.slot():
+            async for table, record in records:
+                if table != current:
+                    if member is not None:
+                        member.close()
+                    current = table
+                    member = archive.open(_member(f"{table}.ndjson"), "w", force_zip64=True)
+                member.write(export.json_line(record))
+                counts[table] = counts.get(table, 0) + 1
+                if sink.size >= chunk_bytes:
+                    yield sink.take()
+    finally:
+        await export.aclose(records)
+    if member is not None:
+        member.close()
+    manifest = {
+        "user_id": user_id,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "tables": counts,
+    }
+    archive.writestr(_member("manifest.json"), json.dumps(manifest, indent=2))
+    archive.close()
+    yield sink.take()
+
+
+def stream(pool: asyncpg.Pool, user_id: int, fmt: str, compress: bool = False) -> AsyncIterator[bytes]:
+    if fmt == "zip":
+        return zip_stream(rows(pool, user_id), user_id)
+
+    def line(item: tuple[str, Mapping[str, Any]]) -> dict:
+        table, record = item
+        return {"table": table, "row": {k: export.jsonable(v) for k, v in record.items()}}
+
+    return export.encode(rows(pool, user_id), "ndjson", compress=compress, row=line)
+
+
+def _suffix(fmt: str, compress: bool) -> str:
+    if fmt == "zip":
+        return ".zip"
+    return ".ndjson" + (".gz" if compress else "")
+
+
+def _filename(user_id: int, fmt: str, compress: bool, day: datetime | None = None) -> str:
+    day = day or datetime.now(timezone.utc)
+    return f"fitness-data-{user_id}-{day:%Y%m%d}{_suffix(fmt, compress)}"
+
+
+def download_name(row: dict) -> str:
+    """Attachment name for a background-built export."""
+    return _filename(row["user_id"], row["format"], row["format"] == "ndjson", row["created_at"])
+
+
+def _media_type(fmt: str, compress: bool) -> str:
+    if fmt == "zip":
+        return "application/zip"
+    return "application/gzip" if compress else export.FORMATS["ndjson"]
+
+
+async def _reserve(pool: asyncpg.Pool, user_id: int, fmt: str, mode: str) -> dict:
+    settings = get_settings()
+    row, retry_after = await DataExportRepository(pool).create(
+        user_id, fmt, mode, secrets.token_urlsafe(24),
+        settings.USER_EXPORT_LIMIT, settings.USER_EXPORT_WINDOW_HOURS,
+    )
+    if row is None:
+        raise ExportRateLimited(retry_after)
+    return row
+
+
+async def download(pool: asyncpg.Pool, user_id: int, fmt: str, compress: bool = False) -> StreamingResponse:
+    """Stream the archive now; raises ``ExportRateLimited``."""
+    await _reserve(pool, user_id, fmt, "stream")
+    return export.attachment(
+        stream(pool, user_id, fmt, compress),
+        _filename(user_id, fmt, compress),
+        _media_type(fmt, compress),
+    )
+
+
+async def request(pool: asyncpg.Pool, user_id: int, fmt: str) -> dict:
+    """Queue a background build; raises ``ExportRateLimited``."""
+    row = await _reserve(pool, user_id, fmt, "job")
+    try:
+        await job_queue.enqueue(
+            pool, "user_export.build", {"export_id": row["id"]}, key=f"user_export:{row['id']}",
+        )
+    except Exception:
+        # Without a job the row would sit in 'queued' forever and hold a slot.
+        await DataExportRepository(pool).discard(row["id"])
+        raise
+    return row
+
+
+def export_dir() -> Path:
+    """``USER_EXPORT_DIR``, or ``exports/`` next to the uploads directory."""
+    configured = get_settings().USER_EXPORT_DIR
+    if configured:
+        path = Path(configured)
+    else:
+        path = Path(os.environ.get("UPLOADS_DIR", "/data/uploads")).parent / "exports"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+async def build(pool: asyncpg.Pool, export_id: int) -> None:
+    """Write a queued export to ``export_dir()`` and mark it ready."""
+    repo = DataExportRepository(pool)
+    row = await repo.mark_running(export_id)
+    if row is None:
+        return  # already built, expired, or deleted with the user
+    # Stored NDJSON is always gzipped; the zip is compressed already.
+    fmt, compress = row["format"], row["format"] == "ndjson"
+    path = export_dir() / f"{row['token']}{_suffix(fmt, compress)}"
+    partial = path.with_name(path.name + ".part")
+    size = 0
+    try:
+        with open(partial, "wb") as f:
+            async for chunk in stream(pool, row["user_id"], fmt, compress):
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(partial, path)
+    except Exception as e:
+        partial.unlink(missing_ok=True)
+        await repo.mark_failed(export_id, f"{e.__class__.__name__}: {e}")
+        raise
+    await repo.mark_ready(export_id, str(path), size, get_settings().USER_EXPORT_TTL_HOURS)
+    logger.info("Data export %s for user %s ready (%d bytes)", export_id, row["user_id"], size)
+
+
+async def prune(pool: asyncpg.Pool) -> int:
+    """Delete expired export files; returns how many were removed."""
+    repo = DataExportRepository(pool)
+    expired = await repo.expired_files()
+    for row in expired:
+        if row["path"]:
+            Path(row["path"]).unlink(missing_ok=True)
+    if expired:
+        await repo.mark_expired([r["id"] for r in expired])
+    await repo.prune(_HISTORY_DAYS)
+    return len(expired)
+
+
+def describe(row: dict) -> dict:
+    """Public view of a ``data_exports`` row."""
+    ready = row["status"] == "ready"
+    return {
+        "id": row["id"],
+        "format": row["format"],
+        "status": row["status"],
+        "size_bytes": row["size_bytes"],
+        "created_at": row["created_at"].isoformat(),
+        "finished_at": row["finished_at"].isoformat() if row["finished_at"] else None,
+        "expires_at": row["expires_at"].isoformat() if row["expires_at"] else None,
+        "download_url": f"/api/users/me/export/{row['token']}" if ready else None,
+    }
+
+
+@job_queue.handler("user_export.build")
+async def _build_job(payload: dict) -> None:
+    await build(await get_pool(), int(payload["export_id"]))
+
+
+@job_queue.handler("user_export.prune")
+async def _prune_job(payload: dict) -> None:
+    removed = await prune(await get_pool())
+    if removed:
+        logger.info("Removed %d expired data export(s)", removed)
+
+
+job_queue.periodic("user_export.prune", 3600)
@@ -0,0 +1,58 @@
+"""Opaque cursors for keyset ("seek") pagination.
+
+A cursor is the sort key of the last row on a page, serialised as
+URL-safe base64 JSON. The next page is then ``WHERE (k1, k2, ...) < ($1,
+$2, ...)`` over the same columns the query orders by, so its cost doesn't
+depend on how far the client has scrolled — unlike ``OFFSET``, which
+reads and throws away every earlier row.
+
+Clients must treat the token as opaque; ``decode_cursor`` raises
+``ValueError`` for anything it didn't produce.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Sequence
+
+_DATETIME_TAG = "$dt"
+_DATE_TAG = "$d"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    if isinstance(value, date):
+        return {_DATE_TAG: value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if _DATETIME_TAG in value:
+            return datetime.fromisoformat(value[_DATETIME_TAG])
+        if _DATE_TAG in value:
+            return date.fromisoformat(value[_DATE_TAG])
+        raise ValueError("unknown cursor value")
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise ValueError("unknown cursor value")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, arity: int) -> list[Any]:
+    """Decode a cursor produced by ``encode_cursor`` with ``arity`` key columns."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("malformed cursor") from e
+    if not isinstance(values, list) or len(values) != arity:
+        raise ValueError("malformed cursor")
+    return [_decode_value(v) for v in values]
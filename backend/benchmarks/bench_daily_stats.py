@@ -0,0 +1,216 @@
+"""Benchmark: summary reads from raw tables vs. the user_daily_stats rollup.
+
+Seeds synthetic long-time users (``--years`` of history, several food
+entries and a workout most days, water and weight) into the real tables,
+so the migration 013 triggers build the rollup as they would in
+production. Then it times the month/year/week/forecast read paths both
+ways — the legacy queries that aggregate food / user_training / water
+directly, and the rollup reads the backend uses now — under concurrency.
+
+Run from backend/ against a migrated database (alembic upgrade head):
+
+    python -m benchmarks.bench_daily_stats --users 20 --years 4 --requests 500
+
+Synthetic users get ids from --base-user-id (default 900000000) and all
+their rows are deleted at the end.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+
+from app.database import close_db, get_pool, init_db
+from app.repositories.daily_stats_repo import DailyStatsRepository
+
+LEGACY = {
+    "month": [
+        "SELECT COALESCE(SUM(cal), 0), COALESCE(SUM(b), 0), COALESCE(SUM(g), 0), COALESCE(SUM(u), 0), "
+        "COUNT(DISTINCT date) FROM food "
+        "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3",
+        "SELECT COALESCE(SUM(training_cal), 0), COALESCE(SUM(tren_time), 0), COUNT(*) FROM user_training "
+        "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3",
+        "SELECT COALESCE(SUM(count), 0) FROM water "
+        "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3",
+        "SELECT date, weight FROM user_health "
+        "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 AND EXTRACT(MONTH FROM date) = $3 ORDER BY date",
+    ],
+    "year": [
+        "SELECT COALESCE(SUM(cal), 0), COALESCE(SUM(b), 0), COALESCE(SUM(g), 0), COALESCE(SUM(u), 0) "
+        "FROM food WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2",
+        "SELECT EXTRACT(MONTH FROM date)::int, SUM(cal), SUM(b), SUM(g), SUM(u) FROM food "
+        "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2 GROUP BY 1 ORDER BY 1",
+        "SELECT COALESCE(SUM(training_cal), 0), COALESCE(SUM(tren_time), 0) FROM user_training "
+        "WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2",
+        "SELECT COALESCE(SUM(count), 0) FROM water WHERE user_id = $1 AND EXTRACT(YEAR FROM date) = $2",
+    ],
+    "week": [
+        "SELECT COALESCE(SUM(cal), 0), COUNT(DISTINCT date), COUNT(*) FROM food "
+        "WHERE user_id = $1 AND date BETWEEN $2 AND $3",
+        "SELECT COALESCE(SUM(count), 0), COUNT(*) FROM water WHERE user_id = $1 AND date BETWEEN $2 AND $3",
+        "SELECT COUNT(*), COALESCE(SUM(tren_time), 0), COALESCE(SUM(training_cal), 0) FROM user_training "
+        "WHERE user_id = $1 AND date BETWEEN $2 AND $3",
+    ],
+    "forecast_kcal": [
+        "SELECT AVG(t), COUNT(*) FROM (SELECT date, SUM(cal) AS t FROM food "
+        "WHERE user_id = $1 AND date >= CURRENT_DATE - 13 AND cal > 0 GROUP BY date "
+        "HAVING SUM(cal) > 200) d",
+    ],
+}
+
+
+async def seed(pool, user_ids: list[int], years: int) -> None:
+    start = date.today() - timedelta(days=365 * years)
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO food (user_id, date, name_of_food, b, g, u, cal)
+            SELECT u, d::date, 'bench', 20, 15, 60, 300 + (random() * 300)::int
+            FROM unnest($1::bigint[]) AS u,
+                 generate_series($2::date, CURRENT_DATE, '1 day') AS d,
+                 generate_series(1, 5) AS n
+            """,
+            user_ids, start,
+        )
+        await conn.execute(
+            """
+            INSERT INTO user_training (user_id, date, training_name, tren_time, training_cal)
+            SELECT u, d::date, 'bench', 45, 350
+            FROM unnest($1::bigint[]) AS u,
+                 generate_series($2::date, CURRENT_DATE, '1 day') AS d
+            WHERE random() < 0.6
+            """,
+            user_ids, start,
+        )
+        await conn.execute(
+            """
+            INSERT INTO water (user_id, date, count)
+            SELECT u, d::date, 6 FROM unnest($1::bigint[]) AS u,
+                 generate_series($2::date, CURRENT_DATE, '1 day') AS d
+            """,
+            user_ids, start,
+        )
+        await conn.execute(
+            """
+            INSERT INTO user_health (user_id, imt, imt_str, cal, date, weight, height)
+            SELECT u, 24, '', 0, d::date, 75 + random() * 3, 175
+            FROM unnest($1::bigint[]) AS u,
+                 generate_series($2::date, CURRENT_DATE, '3 days') AS d
+            """,
+            user_ids, start,
+        )
+        await conn.execute("ANALYZE food; ANALYZE user_training; ANALYZE water; ANALYZE user_health; "
+                           "ANALYZE user_daily_stats")
+
+
+async def cleanup(pool, user_ids: list[int]) -> None:
+    async with pool.acquire() as conn:
+        for table in ("food", "user_training", "water", "user_health", "user_daily_stats"):
+            await conn.execute(f"DELETE FROM {table} WHERE user_id = ANY($1::bigint[])", user_ids)
+
+
+def legacy_reader(pool, path: str):
+    today = date.today()
+
+    async def read(user_id: int) -> None:
+        for sql in LEGACY[path]:
+            if path == "month":
+                await pool.fetch(sql, user_id, today.year, today.month)
+            elif path == "year":
+                await pool.fetch(sql, user_id, today.year)
+            elif path == "week":
+                await pool.fetch(sql, user_id, today - timedelta(days=6), today)
+            else:
+                await pool.fetch(sql, user_id)
+    return read
+
+
+def rollup_reader(pool, path: str):
+    repo = DailyStatsRepository(pool)
+    today = date.today()
+    tomorrow = today + timedelta(days=1)
+    month_start = today.replace(day=1)
+    year_start = today.replace(month=1, day=1)
+
+    async def read(user_id: int) -> None:
+        if path == "month":
+            await repo.period_totals(user_id, month_start, tomorrow)
+            await repo.weights(user_id, month_start, tomorrow)
+        elif path == "year":
+            await repo.period_totals(user_id, year_start, tomorrow)
+            await repo.monthly_food(user_id, year_start, tomorrow)
+        elif path == "week":
+            await repo.period_totals(user_id, today - timedelta(days=6), tomorrow)
+        else:
+            await repo.avg_daily_kcal(user_id, today - timedelta(days=13), tomorrow, min_kcal=200)
+    return read
+
+
+async def measure(read, user_ids: list[int], requests: int, concurrency: int) -> tuple[float, float, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await read(user_ids[i % len(user_ids)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return requests / elapsed, statistics.median(latencies) * 1000, p95 * 1000
+
+
+async def run(args) -> None:
+    await init_db()
+    pool = await get_pool()
+    user_ids = list(range(args.base_user_id, args.base_user_id + args.users))
+    try:
+        await cleanup(pool, user_ids)
+        started = time.perf_counter()
+        await seed(pool, user_ids, args.years)
+        rows = await pool.fetchval("SELECT COUNT(*) FROM food WHERE user_id = ANY($1::bigint[])", user_ids)
+        print(f"seeded {args.users} users x {args.years} years ({rows} food rows) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        for path in LEGACY:
+            for name, factory in (("raw", legacy_reader), ("rollup", rollup_reader)):
+                rps, p50, p95 = await measure(factory(pool, path), user_ids, args.requests, args.concurrency)
+                print(f"{path:<14} {name:<7} {rps:8.0f} req/s  p50={p50:7.2f}ms  p95={p95:7.2f}ms")
+
+        if args.check_backfill:
+            before = await pool.fetch(
+                "SELECT * FROM user_daily_stats WHERE user_id = ANY($1::bigint[]) ORDER BY user_id, date",
+                user_ids,
+            )
+            await DailyStatsRepository(pool).backfill(user_ids)
+            after = await pool.fetch(
+                "SELECT * FROM user_daily_stats WHERE user_id = ANY($1::bigint[]) ORDER BY user_id, date",
+                user_ids,
+            )
+            same = [dict(r) for r in before] == [dict(r) for r in after]
+            print(f"trigger-maintained rollup matches backfill: {same}")
+    finally:
+        await cleanup(pool, user_ids)
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=500, help="reads per path and variant")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--base-user-id", type=int, default=900_000_000)
+    parser.add_argument("--check-backfill", action="store_true",
+                        help="also verify that a backfill reproduces the trigger-built rows")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
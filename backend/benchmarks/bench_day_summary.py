@@ -0,0 +1,165 @@
+"""Benchmark: day summary as six sequential queries vs. fan-out vs. one statement.
+
+* ``sequential`` — the old ``SummaryRepository.get_day``: six awaits, each
+  waiting for the previous one (six round trips on one connection).
+* ``fanout`` — the same six queries started together with
+  ``asyncio.gather``; each one acquires its own pool connection, so latency
+  is one round trip but a request holds up to six connections.
+* ``single`` — the current ``get_day``: one CTE + json_agg statement, one
+  round trip, one connection.
+
+Seeds today's food/workouts/water/weight for ``--users`` synthetic users,
+runs ``--requests`` day views per variant at each ``--concurrency`` level
+and prints throughput and latency. Run from backend/:
+
+    python -m benchmarks.bench_day_summary --concurrency 1 10 50 --requests 2000
+
+Synthetic users get ids from --base-user-id (default 900000000) and their
+rows are deleted at the end.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+
+from app.database import close_db, get_pool, init_db
+from app.repositories.summary_repo import SummaryRepository
+
+
+def sequential(pool):
+    async def read(user_id: int, day: date) -> None:
+        await pool.fetchrow(
+            "SELECT COALESCE(SUM(cal), 0), COALESCE(SUM(b), 0), COALESCE(SUM(g), 0), COALESCE(SUM(u), 0) "
+            "FROM food WHERE user_id = $1 AND date = $2", user_id, day)
+        await pool.fetch(
+            "SELECT name_of_food, b, g, u, cal FROM food WHERE user_id = $1 AND date = $2", user_id, day)
+        await pool.fetchrow(
+            "SELECT COALESCE(SUM(training_cal), 0), COALESCE(SUM(tren_time), 0) "
+            "FROM user_training WHERE user_id = $1 AND date = $2", user_id, day)
+        await pool.fetch(
+            "SELECT training_name, tren_time, training_cal FROM user_training "
+            "WHERE user_id = $1 AND date = $2", user_id, day)
+        await pool.fetchrow(
+            "SELECT COALESCE(count, 0) FROM water WHERE user_id = $1 AND date = $2", user_id, day)
+        await pool.fetchrow(
+            "SELECT weight FROM user_health WHERE user_id = $1 AND date = $2", user_id, day)
+    return read
+
+
+def fanout(pool):
+    async def read(user_id: int, day: date) -> None:
+        await asyncio.gather(
+            pool.fetchrow(
+                "SELECT COALESCE(SUM(cal), 0), COALESCE(SUM(b), 0), COALESCE(SUM(g), 0), COALESCE(SUM(u), 0) "
+                "FROM food WHERE user_id = $1 AND date = $2", user_id, day),
+            pool.fetch(
+                "SELECT name_of_food, b, g, u, cal FROM food WHERE user_id = $1 AND date = $2", user_id, day),
+            pool.fetchrow(
+                "SELECT COALESCE(SUM(training_cal), 0), COALESCE(SUM(tren_time), 0) "
+                "FROM user_training WHERE user_id = $1 AND date = $2", user_id, day),
+            pool.fetch(
+                "SELECT training_name, tren_time, training_cal FROM user_training "
+                "WHERE user_id = $1 AND date = $2", user_id, day),
+            pool.fetchrow(
+                "SELECT COALESCE(count, 0) FROM water WHERE user_id = $1 AND date = $2", user_id, day),
+            pool.fetchrow(
+                "SELECT weight FROM user_health WHERE user_id = $1 AND date = $2", user_id, day),
+        )
+    return read
+
+
+def single(pool):
+    repo = SummaryRepository(pool)
+
+    async def read(user_id: int, day: date) -> None:
+        await repo.get_day(user_id, day)
+    return read
+
+
+VARIANTS = {"sequential": sequential, "fanout": fanout, "single": single}
+
+
+async def seed(pool, user_ids: list[int]) -> None:
+    await pool.execute(
+        """
+        INSERT INTO food (user_id, date, name_of_food, b, g, u, cal)
+        SELECT u, CURRENT_DATE, 'bench ' || n, 20, 15, 60, 400
+        FROM unnest($1::bigint[]) AS u, generate_series(1, 8) AS n
+        """,
+        user_ids,
+    )
+    await pool.execute(
+        """
+        INSERT INTO user_training (user_id, date, training_name, tren_time, training_cal)
+        SELECT u, CURRENT_DATE, 'bench ' || n, 30, 250
+        FROM unnest($1::bigint[]) AS u, generate_series(1, 2) AS n
+        """,
+        user_ids,
+    )
+    await pool.execute(
+        "INSERT INTO water (user_id, date, count) SELECT u, CURRENT_DATE, 6 FROM unnest($1::bigint[]) AS u",
+        user_ids,
+    )
+    await pool.execute(
+        "INSERT INTO user_health (user_id, imt, imt_str, cal, date, weight, height) "
+        "SELECT u, 24, '', 0, CURRENT_DATE, 75, 176 FROM unnest($1::bigint[]) AS u",
+        user_ids,
+    )
+
+
+async def cleanup(pool, user_ids: list[int]) -> None:
+    for table in ("food", "user_training", "water", "user_health", "user_daily_stats"):
+        await pool.execute(f"DELETE FROM {table} WHERE user_id = ANY($1::bigint[])", user_ids)
+
+
+async def measure(read, user_ids: list[int], requests: int, concurrency: int) -> tuple[float, float, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    today = date.today()
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await read(user_ids[i % len(user_ids)], today)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return requests / elapsed, statistics.median(latencies) * 1000, p95 * 1000
+
+
+async def run(args) -> None:
+    await init_db()
+    pool = await get_pool()
+    user_ids = list(range(args.base_user_id, args.base_user_id + args.users))
+    try:
+        await cleanup(pool, user_ids)
+        await seed(pool, user_ids)
+        print(f"pool size {pool.get_max_size()}, {args.requests} day views per run")
+        for concurrency in args.concurrency:
+            for name, factory in VARIANTS.items():
+                rps, p50, p95 = await measure(factory(pool), user_ids, args.requests, concurrency)
+                print(f"concurrency={concurrency:<4} {name:<10} {rps:8.0f} req/s  "
+                      f"p50={p50:7.2f}ms  p95={p95:7.2f}ms")
+    finally:
+        await cleanup(pool, user_ids)
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--base-user-id", type=int, default=900_000_000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
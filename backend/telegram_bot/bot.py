@@ -2,12 +2,16 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 from app.config import get_settings
+from telegram_bot.outbox import Outbox
+from telegram_bot.update_queue import UpdateQueue
 
 logger = logging.getLogger(__name__)
 
 bot: Bot | None = None
 dp: Dispatcher | None = None
 _task: asyncio.Task | None = None
+update_queue: UpdateQueue | None = None
+outbox: Outbox | None = None
 
 
 async def _save_username_middleware(handler, event, data):
@@ -34,7 +38,7 @@ async def _save_username_middleware(handler, event, data):
 
 
 async def start_bot() -> None:
-    global bot, dp, _task
+    global bot, dp, _task, outbox
     settings = get_settings()
 
     if not settings.TELEGRAM_TOKEN:
@@ -51,10 +55,51 @@ async def start_bot() -> None:
     dp.include_router(otp_router)
     dp.include_router(notifications_router)
 
+    from app.redis import get_redis
+    outbox = Outbox(
+        _send_message,
+        redis=await get_redis(),
+        workers=settings.TELEGRAM_SEND_WORKERS,
+        rate=settings.TELEGRAM_SEND_RATE,
+        chat_rate=settings.TELEGRAM_SEND_CHAT_RATE,
+    )
+    await outbox.start()
+
+    if settings.TELEGRAM_WEBHOOK_URL:
+        if settings.TELEGRAM_WEBHOOK_SECRET:
+            await _start_webhook(settings)
+            return
+        # Without a secret anyone could post forged updates to the endpoint.
+        logger.error("TELEGRAM_WEBHOOK_SECRET is not set, falling back to long polling")
+
     _task = asyncio.create_task(_run_polling())
     logger.info("Telegram bot started (OTP + notifications mode)")
 
 
+async def _start_webhook(settings) -> None:
+    global update_queue
+    update_queue = UpdateQueue(
+        lambda update: dp.feed_update(bot, update),
+        workers=settings.TELEGRAM_WEBHOOK_WORKERS,
+        maxsize=settings.TELEGRAM_WEBHOOK_QUEUE_SIZE,
+        enqueue_timeout=settings.TELEGRAM_WEBHOOK_ENQUEUE_TIMEOUT,
+    )
+    update_queue.start()
+    try:
+        await bot.set_webhook(
+            settings.TELEGRAM_WEBHOOK_URL,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=100,
+        )
+    except Exception as e:
+        logger.error("Failed to register Telegram webhook: %s", e)
+    logger.info(
+        "Telegram bot started in webhook mode (%d workers, queue %d)",
+        settings.TELEGRAM_WEBHOOK_WORKERS, settings.TELEGRAM_WEBHOOK_QUEUE_SIZE,
+    )
+
+
 async def _run_polling() -> None:
     try:
         await dp.start_polling(bot)
@@ -65,7 +110,14 @@ async def _run_polling() -> None:
 
 
 async def stop_bot() -> None:
-    global _task, bot, dp
+    global _task, bot, dp, update_queue, outbox
+    if update_queue:
+        # The webhook stays registered: other replicas keep receiving updates.
+        await update_queue.stop()
+        update_queue = None
+    if outbox:
+        await outbox.stop()
+        outbox = None
     if _task:
         _task.cancel()
         try:
@@ -77,29 +129,33 @@ async def stop_bot() -> None:
     logger.info("Telegram bot stopped")
 
 
+async def _send_message(message: dict) -> None:
+    await bot.send_message(
+        chat_id=message["chat_id"], text=message["text"], parse_mode=message["parse_mode"],
+    )
+
+
 async def send_otp_message(chat_id: int, code: str) -> bool:
-    if not bot:
+    """Queue an OTP on the priority lane; True means it was accepted for delivery."""
+    if not outbox:
         logger.error("Bot not initialized, cannot send OTP")
         return False
-    try:
-        await bot.send_message(
-            chat_id=chat_id,
-            text=f"🔐 Ваш код для входа на PROpitashka: <b>{code}</b>\n\n"
-                 f"Код действителен 5 минут. Не сообщайте его никому.",
-            parse_mode="HTML",
-        )
-        return True
-    except Exception as e:
-        logger.error("Failed to send OTP to %s: %s", chat_id, e)
-        return False
+    return await outbox.enqueue(
+        chat_id,
+        f"🔐 Ваш код для входа на PROpitashka: <b>{code}</b>\n\n"
+        f"Код действителен 5 минут. Не сообщайте его никому.",
+        lane="otp",
+    )
 
 
 async def send_notification(chat_id: int, text: str) -> bool:
-    if not bot:
-        return False
-    try:
-        await bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
-        return True
-    except Exception as e:
-        logger.error("Failed to send notification to %s: %s", chat_id, e)
+    if not outbox:
         return False
+    return await outbox.enqueue(chat_id, text, lane="bulk")
+
+
+async def broadcast(chat_ids, text: str) -> int:
+    """Queue the same bulk message for many chats; returns how many were accepted."""
+    if not outbox:
+        return 0
+    return await outbox.enqueue_many(chat_ids, text)
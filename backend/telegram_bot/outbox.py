@@ -0,0 +1,409 @@
+"""Outbound Telegram delivery: durable queue + rate limits + priority lane.
+
+Everything the backend sends to users (OTP codes, notifications,
+broadcasts) goes through ``Outbox.enqueue`` instead of calling
+``bot.send_message`` inline. Workers then deliver it under:
+
+* a global token bucket (``TELEGRAM_SEND_RATE`` msg/s per replica) and a
+  per-chat bucket (``TELEGRAM_SEND_CHAT_RATE``), so broadcasts run at the
+  highest rate Telegram tolerates instead of being 429-banned;
+* two lanes — ``otp`` is always drained before ``bulk``, so a login code
+  never waits behind a digest broadcast;
+* ``TelegramRetryAfter`` handling: the global bucket is paused for the
+  ``retry_after`` Telegram asked for and the message goes back to the
+  head of its lane; transient network/5xx errors are retried with backoff
+  (the message waits in a delayed set until it is due, so the worker moves
+  on instead of sleeping); blocked bots / bad chats are dropped.
+
+Durability: with Redis available, lanes are Redis lists and a message is
+moved into a per-replica processing list while in flight (LMOVE). Every
+replica refreshes a heartbeat key; when one stops (crash, redeploy — the
+replica id is new on every start) the others move its processing list
+back into the lanes. Without Redis we fall back to bounded in-memory
+queues (lost on restart), the same way the rest of the backend degrades
+when Redis is down.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from telegram_bot.rate_limit import ChatLimiter, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+LANES = ("otp", "bulk")  # priority order
+KEY_PREFIX = "tg:outbox"
+MAX_ATTEMPTS = 5
+MAX_RETRY_DELAY_S = 30.0
+HEARTBEAT_S = 10.0
+HEARTBEAT_TTL_S = 30
+_THROUGHPUT_WINDOW = 60.0
+_PROMOTE_EVERY_S = 0.5
+# Move up to 100 due messages from a delayed set to the head of their lane.
+_PROMOTE = """
+local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, raw in ipairs(due) do
+    redis.call('zrem', KEYS[1], raw)
+    redis.call('rpush', KEYS[2], raw)
+end
+return #due
+"""
+
+Sender = Callable[[dict], Awaitable[Any]]
+
+
+class _MemoryLanes:
+    def __init__(self, maxsize: int) -> None:
+        self._queues = {lane: deque() for lane in LANES}
+        self._delayed: list[tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        self._maxsize = maxsize
+
+    async def push(self, lane: str, raw: str, front: bool = False) -> bool:
+        queue = self._queues[lane]
+        if front:
+            queue.appendleft(raw)
+            return True
+        if len(queue) >= self._maxsize:
+            return False
+        queue.append(raw)
+        return True
+
+    async def claim(self) -> Optional[tuple[str, str]]:
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, lane, raw = heapq.heappop(self._delayed)
+            self._queues[lane].appendleft(raw)
+        for lane in LANES:
+            if self._queues[lane]:
+                return lane, self._queues[lane].popleft()
+        return None
+
+    async def ack(self, raw: str) -> None:
+        return None
+
+    async def requeue(self, lane: str, raw: str, new_raw: str, delay: float = 0.0) -> None:
+        if delay > 0:
+            heapq.heappush(self._delayed, (time.time() + delay, next(self._seq), lane, new_raw))
+        else:
+            self._queues[lane].appendleft(new_raw)
+
+    async def heartbeat(self) -> int:
+        return 0
+
+    async def leave(self) -> None:
+        return None
+
+    async def depth(self) -> dict[str, int]:
+        depth = {lane: len(q) for lane, q in self._queues.items()}
+        depth["delayed"] = len(self._delayed)
+        return depth
+
+
+class _RedisLanes:
+    """Lanes are Redis lists: LPUSH to enqueue, LMOVE from the right to claim.
+
+    Retries wait in a sorted set per lane (``{lane}:delayed``, scored by due
+    time) and are moved to the head of the lane once due. Each replica
+    keeps an expiring ``alive:{id}`` key; a ``processing:{id}`` list without
+    one belongs to a dead replica.
+    """
+
+    def __init__(self, redis, replica_id: str) -> None:
+        self._redis = redis
+        self._replica_id = replica_id
+        self._processing = self._processing_key(replica_id)
+        self._promoted_at = 0.0
+
+    @staticmethod
+    def _key(lane: str) -> str:
+        return f"{KEY_PREFIX}:{lane}"
+
+    @staticmethod
+    def _delayed_key(lane: str) -> str:
+        return f"{KEY_PREFIX}:{lane}:delayed"
+
+    @staticmethod
+    def _processing_key(replica_id: str) -> str:
+        return f"{KEY_PREFIX}:processing:{replica_id}"
+
+    async def _promote(self) -> None:
+        now = time.time()
+        if now - self._promoted_at < _PROMOTE_EVERY_S:
+            return
+        self._promoted_at = now
+        for lane in LANES:
+            await self._redis.eval(_PROMOTE, 2, self._delayed_key(lane), self._key(lane), now)
+
+    async def push(self, lane: str, raw: str, front: bool = False) -> bool:
+        if front:
+            await self._redis.rpush(self._key(lane), raw)
+        else:
+            await self._redis.lpush(self._key(lane), raw)
+        return True
+
+    async def claim(self) -> Optional[tuple[str, str]]:
+        await self._promote()
+        for lane in LANES:
+            raw = await self._redis.lmove(self._key(lane), self._processing, "RIGHT", "LEFT")
+            if raw is not None:
+                return lane, raw
+        return None
+
+    async def ack(self, raw: str) -> None:
+        await self._redis.lrem(self._processing, 1, raw)
+
+    async def requeue(self, lane: str, raw: str, new_raw: str, delay: float = 0.0) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self._processing, 1, raw)
+            if delay > 0:
+                pipe.zadd(self._delayed_key(lane), {new_raw: time.time() + delay})
+            else:
+                pipe.rpush(self._key(lane), new_raw)
+            await pipe.execute()
+
+    async def heartbeat(self) -> int:
+        """Mark this replica alive and re-queue what dead replicas left in flight."""
+        await self._redis.set(f"{KEY_PREFIX}:alive:{self._replica_id}", 1, ex=HEARTBEAT_TTL_S)
+        recovered = 0
+        prefix = self._processing_key("")
+        async for key in self._redis.scan_iter(match=f"{prefix}*"):
+            replica_id = key[len(prefix):]
+            if replica_id == self._replica_id:
+                continue
+            if not await self._redis.exists(f"{KEY_PREFIX}:alive:{replica_id}"):
+                recovered += await self._reclaim(key)
+        return recovered
+
+    async def leave(self) -> None:
+        """Clean shutdown: hand back anything in flight and drop the heartbeat."""
+        await self._reclaim(self._processing)
+        await self._redis.delete(f"{KEY_PREFIX}:alive:{self._replica_id}")
+
+    async def _reclaim(self, processing: str) -> int:
+        """Move every message in ``processing`` back to the head of its lane."""
+        recovered = 0
+        while True:
+            raw = await self._redis.lmove(processing, self._key("bulk"), "RIGHT", "RIGHT")
+            if raw is None:
+                return recovered
+            try:
+                lane = json.loads(raw).get("lane", "bulk")
+            except ValueError:
+                lane = "bulk"
+            if lane != "bulk":
+                await self._redis.lrem(self._key("bulk"), -1, raw)
+                await self._redis.rpush(self._key(lane), raw)
+            recovered += 1
+
+    async def depth(self) -> dict[str, int]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                pipe.llen(self._key(lane))
+            for lane in LANES:
+                pipe.zcard(self._delayed_key(lane))
+            pipe.llen(self._processing)
+            counts = await pipe.execute()
+        depth = dict(zip(LANES, counts))
+        depth["delayed"] = sum(counts[len(LANES):-1])
+        depth["in_flight"] = counts[-1]
+        return depth
+
+
+class Outbox:
+    def __init__(
+        self,
+        send: Sender,
+        *,
+        redis=None,
+        workers: int = 4,
+        rate: float = 25.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_memory_queue: int = 10_000,
+        replica_id: Optional[str] = None,
+    ) -> None:
+        self._send = send
+        self._lanes = (
+            _RedisLanes(redis, replica_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}")
+            if redis is not None else _MemoryLanes(max_memory_queue)
+        )
+        self.durable = redis is not None
+        self._workers = workers
+        self.global_bucket = TokenBucket(rate, capacity=rate)
+        self.chat_limiter = ChatLimiter(chat_rate, capacity=chat_burst)
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._sent_at: deque[float] = deque()
+        self.counters = {
+            "enqueued": 0, "sent": 0, "retried": 0, "rate_limited": 0,
+            "dropped": 0, "rejected": 0,
+        }
+        self.sent_by_lane = {lane: 0 for lane in LANES}
+
+    # -- producer side -------------------------------------------------------
+
+    async def enqueue(
+        self, chat_id: int, text: str, *, lane: str = "bulk", parse_mode: Optional[str] = "HTML",
+    ) -> bool:
+        if lane not in LANES:
+            raise ValueError(f"unknown lane {lane!r}")
+        message = {
+            "id": uuid.uuid4().hex, "lane": lane, "chat_id": chat_id,
+            "text": text, "parse_mode": parse_mode, "attempts": 0,
+        }
+        try:
+            accepted = await self._lanes.push(lane, json.dumps(message, ensure_ascii=False))
+        except Exception as e:
+            logger.error("Outbox enqueue failed for chat %s: %s", chat_id, e)
+            accepted = False
+        if not accepted:
+            self.counters["rejected"] += 1
+            return False
+        self.counters["enqueued"] += 1
+        self._wakeup.set()
+        return True
+
+    async def enqueue_many(self, chat_ids, text: str, *, parse_mode: Optional[str] = "HTML") -> int:
+        """Queue one bulk message per chat; returns how many were accepted."""
+        accepted = 0
+        for chat_id in chat_ids:
+            accepted += await self.enqueue(chat_id, text, lane="bulk", parse_mode=parse_mode)
+        return accepted
+
+    # -- workers ---------------------------------------------------------------
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"tg-outbox-{i}") for i in range(self._workers)
+        ]
+        if self.durable:
+            self._tasks.append(asyncio.create_task(self._heartbeat(), name="tg-outbox-heartbeat"))
+        logger.info(
+            "Telegram outbox started (%s, %d workers, %.0f msg/s)",
+            "redis" if self.durable else "memory", self._workers, self.global_bucket.rate,
+        )
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            await self._lanes.leave()
+        except Exception as e:
+            logger.warning("Outbox could not hand back in-flight messages: %s", e)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            try:
+                recovered = await self._lanes.heartbeat()
+                if recovered:
+                    logger.info("Outbox re-queued %d messages left in flight by a dead replica", recovered)
+                    self._wakeup.set()
+            except Exception as e:
+                logger.warning("Outbox heartbeat failed: %s", e)
+            await asyncio.sleep(HEARTBEAT_S)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                claimed = await self._lanes.claim()
+            except Exception as e:
+                logger.warning("Outbox claim failed: %s", e)
+                await asyncio.sleep(1.0)
+                continue
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    # Other replicas may enqueue too, so poll even without a local wakeup.
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._deliver(*claimed)
+            except Exception as e:
+                # The message stays in the processing list; with Redis lanes
+                # the heartbeat hands it back if this replica dies.
+                logger.error("Outbox delivery bookkeeping failed: %s", e)
+
+    async def _deliver(self, lane: str, raw: str) -> None:
+        message = json.loads(raw)
+        await self.chat_limiter.acquire(message["chat_id"])
+        await self.global_bucket.acquire()
+        try:
+            await self._send(message)
+        except TelegramRetryAfter as e:
+            self.counters["rate_limited"] += 1
+            self.global_bucket.pause(e.retry_after)
+            logger.warning("Telegram flood control: pausing sends for %ss", e.retry_after)
+            await self._lanes.requeue(lane, raw, raw)
+            return
+        except (TelegramNetworkError, TelegramServerError) as e:
+            message["attempts"] += 1
+            if message["attempts"] < MAX_ATTEMPTS:
+                self.counters["retried"] += 1
+                await self._lanes.requeue(
+                    lane, raw, json.dumps(message, ensure_ascii=False),
+                    delay=min(2 ** message["attempts"], MAX_RETRY_DELAY_S),
+                )
+                return
+            logger.error("Giving up on message to %s after %d attempts: %s",
+                         message["chat_id"], message["attempts"], e)
+            self.counters["dropped"] += 1
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            logger.info("Dropping message to %s: %s", message["chat_id"], e)
+            self.counters["dropped"] += 1
+        except Exception as e:
+            logger.error("Failed to send message to %s: %s", message["chat_id"], e)
+            self.counters["dropped"] += 1
+        else:
+            self.counters["sent"] += 1
+            self.sent_by_lane[lane] += 1
+            self._sent_at.append(time.monotonic())
+        await self._lanes.ack(raw)
+
+    # -- metrics ---------------------------------------------------------------
+
+    def throughput(self) -> float:
+        """Messages delivered per second over the last minute."""
+        cutoff = time.monotonic() - _THROUGHPUT_WINDOW
+        while self._sent_at and self._sent_at[0] < cutoff:
+            self._sent_at.popleft()
+        return len(self._sent_at) / _THROUGHPUT_WINDOW
+
+    async def stats(self) -> dict[str, Any]:
+        try:
+            depth = await self._lanes.depth()
+        except Exception as e:
+            logger.warning("Outbox depth unavailable: %s", e)
+            depth = {}
+        return {
+            "backend": "redis" if self.durable else "memory",
+            "workers": self._workers if self._tasks else 0,
+            "depth": depth,
+            "throughput_per_s": round(self.throughput(), 2),
+            "sent_by_lane": dict(self.sent_by_lane),
+            **self.counters,
+        }
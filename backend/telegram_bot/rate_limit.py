@@ -0,0 +1,78 @@
+"""Token buckets for outbound Telegram traffic.
+
+Telegram enforces roughly 30 messages/s per bot and about 1 message/s per
+chat (short bursts are tolerated). ``TokenBucket`` models one limit;
+``ChatLimiter`` keeps a bounded set of per-chat buckets. Both are
+process-local and rely on the event loop being single-threaded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token if available; otherwise return how long to wait (seconds)."""
+        now = self._clock()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (used on 429 retry_after)."""
+        now = self._clock()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = self._paused_until
+
+
+class ChatLimiter:
+    """Per-chat buckets; the least recently used chats are forgotten first."""
+
+    def __init__(
+        self, rate: float, capacity: float, max_chats: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.max_chats = max_chats
+        self._clock = clock
+        self._buckets: OrderedDict[int, TokenBucket] = OrderedDict()
+
+    def bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity, clock=self._clock)
+            self._buckets[chat_id] = bucket
+            while len(self._buckets) > self.max_chats:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(chat_id)
+        return bucket
+
+    async def acquire(self, chat_id: int) -> None:
+        await self.bucket(chat_id).acquire()
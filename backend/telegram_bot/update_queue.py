@@ -0,0 +1,130 @@
+"""Bounded, per-chat ordered update queue for webhook mode.
+
+With long polling one loop both fetches and handles updates, so a slow
+handler stalls everyone. In webhook mode Telegram pushes updates to
+``/api/telegram/webhook``; the endpoint only parses and enqueues, and a
+fixed pool of workers feeds them to the dispatcher.
+
+Ordering: each worker owns its own bounded queue and a chat is always
+routed to the same worker (``chat_id % workers``), so updates of one chat
+are handled strictly in arrival order while different chats run in
+parallel.
+
+Backpressure: ``put`` waits up to ``enqueue_timeout`` for room in the
+worker's queue. If the queue is still full it returns False and the
+endpoint answers 503, which makes Telegram redeliver the update later
+instead of us buffering without bound.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Awaitable[Any]]
+
+
+def chat_key(update: Any) -> int:
+    """Return the id updates must be ordered by (chat, then user, then update)."""
+    try:
+        event = getattr(update, "event", None)
+    except LookupError:  # aiogram's UpdateTypeLookupError: no known event type
+        event = None
+    if event is not None:
+        chat = getattr(event, "chat", None)
+        if chat is None:
+            message = getattr(event, "message", None)
+            chat = getattr(message, "chat", None)
+        if chat is not None:
+            return chat.id
+        from_user = getattr(event, "from_user", None) or getattr(event, "user", None)
+        if from_user is not None:
+            return from_user.id
+    return getattr(update, "update_id", 0)
+
+
+class UpdateQueue:
+    def __init__(
+        self,
+        handler: Handler,
+        *,
+        workers: int = 8,
+        maxsize: int = 1000,
+        enqueue_timeout: float = 2.0,
+        key: Callable[[Any], int] = chat_key,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self._handler = handler
+        self._key = key
+        self._enqueue_timeout = enqueue_timeout
+        per_worker = max(1, maxsize // workers)
+        self._queues: list[asyncio.Queue] = [asyncio.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._tasks: list[asyncio.Task] = []
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": len(self._queues),
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(q), name=f"tg-update-worker-{i}")
+            for i, q in enumerate(self._queues)
+        ]
+
+    async def put(self, update: Any) -> bool:
+        """Enqueue an update; False means the queue stayed full (caller should reject)."""
+        queue = self._queues[self._key(update) % len(self._queues)]
+        try:
+            await asyncio.wait_for(queue.put(update), timeout=self._enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self._handler(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("Update handling failed: %s", e)
+            finally:
+                queue.task_done()
+
+    async def stop(self, drain_timeout: Optional[float] = 10.0) -> None:
+        """Let workers finish what is already queued (bounded), then cancel them."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.join() for q in self._queues)), timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Update queue drain timed out, %d updates dropped", self.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -1,8 +1,511 @@
-"""Shared pytest config: make ``app`` importable without installing the package."""
+"""Shared pytest config: make ``app`` importable without installing the package.
 
+Also home to the in-memory fakes the service tests share — ``FakeRedis``
+(a ``decode_responses=True`` client: strings, lists, sets, sorted sets,
+pipelines with WATCH, pub/sub, expiry) and ``FakePool``/``FakeConn`` for
+asyncpg — exposed as the ``fake_redis`` fixture or imported from
+``tests.conftest`` when a test needs to subclass them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import functools
 import os
 import sys
+import time
+from collections import defaultdict
+
+import pytest
+from redis.exceptions import WatchError
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+
+def _str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _score_bound(value) -> tuple[float, bool]:
+    """Parse a ZRANGEBYSCORE bound: number, ``(number``, ``+inf``/``-inf``."""
+    if value in ("+inf", "-inf"):
+        return float(value), False
+    raw = _str(value)
+    if raw.startswith("("):
+        return float(raw[1:]), True
+    return float(raw), False
+
+
+def _command(fn):
+    """Count a call as one round trip (a pipeline counts as one in total)."""
+    @functools.wraps(fn)
+    async def wrapper(self, *args, **kwargs):
+        self.round_trips += 1
+        return await fn(self, *args, **kwargs)
+    return wrapper
+
+
+class FakePipeline:
+    """Queues commands until ``execute``; after ``watch`` (until ``multi``)
+    commands run immediately, and ``execute`` raises ``WatchError`` if a
+    watched key was written in between."""
+
+    def __init__(self, redis: "FakeRedis") -> None:
+        self._redis = redis
+        self._calls: list = []
+        self._watched: dict[str, int] = {}
+        self._immediate = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def watch(self, *keys) -> None:
+        self._immediate = True
+        for key in keys:
+            self._watched[key] = self._redis.versions[key]
+
+    def multi(self) -> None:
+        self._immediate = False
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        command = getattr(self._redis, name)
+        if self._immediate:
+            return command
+
+        def queue(*args, **kwargs):
+            self._calls.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        for key, version in self._watched.items():
+            if self._redis.versions[key] != version:
+                raise WatchError("watched key changed")
+        trips = self._redis.round_trips
+        try:
+            return [await command(*args, **kwargs) for command, args, kwargs in self._calls]
+        finally:
+            self._redis.round_trips = trips + 1
+            self._calls, self._watched = [], {}
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self._redis = redis
+        self._messages: asyncio.Queue = asyncio.Queue()
+        self.channels: set[str] = set()
+
+    async def subscribe(self, *channels) -> None:
+        for channel in channels:
+            self.channels.add(channel)
+            self._redis.subscribers[channel].append(self)
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        try:
+            return await asyncio.wait_for(self._messages.get(), timeout=timeout or 0.001)
+        except asyncio.TimeoutError:
+            return None
+
+    async def listen(self):
+        while True:
+            yield await self._messages.get()
+
+    async def aclose(self) -> None:
+        for channel in self.channels:
+            self._redis.subscribers[channel].remove(self)
+        self.channels.clear()
+
+
+class FakeRedis:
+    """In-memory ``redis.asyncio.Redis(decode_responses=True)``: values come
+    back as ``str``. Only the commands the services use are implemented.
+
+    ``eval`` runs the Python function registered for the script text in
+    ``scripts`` as ``fn(redis, keys, args)``.
+    """
+
+    def __init__(self) -> None:
+        self.strings: dict[str, str] = {}
+        self.lists: dict[str, list[str]] = {}
+        self.sets: dict[str, set[str]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.versions: defaultdict[str, int] = defaultdict(int)
+        self.published: list[tuple[str, str]] = []
+        self.subscribers: defaultdict[str, list[FakePubSub]] = defaultdict(list)
+        self.scripts: dict[str, object] = {}
+        self.round_trips = 0
+        self._expires: dict[str, float] = {}
+
+    # -- keyspace ------------------------------------------------------------
+
+    def _stores(self):
+        return (self.strings, self.lists, self.sets, self.zsets)
+
+    def _expire_if_due(self, key: str) -> None:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._drop(key)
+
+    def _drop(self, key: str) -> bool:
+        self._expires.pop(key, None)
+        found = False
+        for store in self._stores():
+            found = store.pop(key, None) is not None or found
+        if found:
+            self.versions[key] += 1
+        return found
+
+    def _keys(self) -> list[str]:
+        for key in list(self._expires):
+            self._expire_if_due(key)
+        return [key for store in self._stores() for key in store]
+
+    def _write(self, key: str) -> None:
+        self.versions[key] += 1
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self)
+
+    @_command
+    async def exists(self, *keys) -> int:
+        existing = set(self._keys())
+        return sum(key in existing for key in keys)
+
+    @_command
+    async def delete(self, *keys) -> int:
+        return sum(self._drop(key) for key in keys)
+
+    @_command
+    async def expire(self, key: str, seconds) -> bool:
+        if key not in self._keys():
+            return False
+        self._expires[key] = time.monotonic() + float(seconds)
+        return True
+
+    async def scan_iter(self, match: str = "*", count=None):
+        for key in self._keys():
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    @_command
+    async def eval(self, script: str, numkeys: int, *keys_and_args):
+        fn = self.scripts[script]
+        return fn(self, list(keys_and_args[:numkeys]), list(keys_and_args[numkeys:]))
+
+    @_command
+    async def publish(self, channel: str, message) -> int:
+        message = _str(message)
+        self.published.append((channel, message))
+        for pubsub in self.subscribers[channel]:
+            pubsub._messages.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(self.subscribers[channel])
+
+    # -- strings -------------------------------------------------------------
+
+    @_command
+    async def get(self, key: str):
+        self._expire_if_due(key)
+        return self.strings.get(key)
+
+    @_command
+    async def mget(self, keys) -> list:
+        for key in keys:
+            self._expire_if_due(key)
+        return [self.strings.get(key) for key in keys]
+
+    @_command
+    async def set(self, key: str, value, ex=None, px=None, nx=False, keepttl=False):
+        self._expire_if_due(key)
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = _str(value)
+        self._write(key)
+        if ex is not None or px is not None:
+            self._expires[key] = time.monotonic() + (float(ex) if ex is not None else px / 1000)
+        elif not keepttl:
+            self._expires.pop(key, None)
+        return True
+
+    # -- lists (index 0 is the left end) -------------------------------------
+
+    @_command
+    async def lpush(self, key: str, *values) -> int:
+        items = self.lists.setdefault(key, [])
+        for value in values:
+            items.insert(0, _str(value))
+        self._write(key)
+        return len(items)
+
+    @_command
+    async def rpush(self, key: str, *values) -> int:
+        items = self.lists.setdefault(key, [])
+        items.extend(_str(v) for v in values)
+        self._write(key)
+        return len(items)
+
+    @_command
+    async def lmove(self, source: str, destination: str, src: str = "LEFT", dest: str = "RIGHT"):
+        items = self.lists.get(source)
+        if not items:
+            return None
+        value = items.pop(0 if src == "LEFT" else -1)
+        if not items:
+            del self.lists[source]
+        self._write(source)
+        target = self.lists.setdefault(destination, [])
+        if dest == "LEFT":
+            target.insert(0, value)
+        else:
+            target.append(value)
+        self._write(destination)
+        return value
+
+    @_command
+    async def lrem(self, key: str, count: int, value) -> int:
+        items = self.lists.get(key, [])
+        value, removed = _str(value), 0
+        order = range(len(items) - 1, -1, -1) if count < 0 else range(len(items))
+        for i in list(order):
+            if items[i] == value and (count == 0 or removed < abs(count)):
+                items[i] = None
+                removed += 1
+        self.lists[key] = [item for item in items if item is not None]
+        if not self.lists[key]:
+            del self.lists[key]
+        self._write(key)
+        return removed
+
+    @_command
+    async def llen(self, key: str) -> int:
+        return len(self.lists.get(key, []))
+
+    # -- sets ----------------------------------------------------------------
+
+    @_command
+    async def sadd(self, key: str, *members) -> int:
+        items = self.sets.setdefault(key, set())
+        before = len(items)
+        items.update(_str(m) for m in members)
+        self._write(key)
+        return len(items) - before
+
+    @_command
+    async def srem(self, key: str, *members) -> int:
+        items = self.sets.get(key, set())
+        removed = sum(_str(m) in items for m in members)
+        items.difference_update(_str(m) for m in members)
+        self._write(key)
+        return removed
+
+    @_command
+    async def smembers(self, key: str) -> set[str]:
+        return set(self.sets.get(key, set()))
+
+    # -- sorted sets ---------------------------------------------------------
+
+    def _ordered(self, key: str, reverse: bool = False) -> list[tuple[str, float]]:
+        self._expire_if_due(key)
+        return sorted(self.zsets.get(key, {}).items(), key=lambda kv: (kv[1], kv[0]), reverse=reverse)
+
+    @staticmethod
+    def _in_range(score: float, low, high) -> bool:
+        (lo, lo_open), (hi, hi_open) = _score_bound(low), _score_bound(high)
+        return (score > lo if lo_open else score >= lo) and (score < hi if hi_open else score <= hi)
+
+    @staticmethod
+    def _page(items: list, start, num, withscores: bool) -> list:
+        if num is not None:
+            items = items[start:start + num]
+        return items if withscores else [member for member, _ in items]
+
+    @_command
+    async def zadd(self, key: str, mapping: dict) -> int:
+        items = self.zsets.setdefault(key, {})
+        added = sum(_str(m) not in items for m in mapping)
+        items.update({_str(m): float(s) for m, s in mapping.items()})
+        self._write(key)
+        return added
+
+    @_command
+    async def zrem(self, key: str, *members) -> int:
+        items = self.zsets.get(key, {})
+        removed = sum(items.pop(_str(m), None) is not None for m in members)
+        self._write(key)
+        return removed
+
+    @_command
+    async def zscore(self, key: str, member):
+        self._expire_if_due(key)
+        return self.zsets.get(key, {}).get(_str(member))
+
+    @_command
+    async def zcard(self, key: str) -> int:
+        return len(self._ordered(key))
+
+    @_command
+    async def zcount(self, key: str, min, max) -> int:
+        return sum(self._in_range(s, min, max) for _, s in self._ordered(key))
+
+    @_command
+    async def zrevrange(self, key: str, start: int, stop: int, withscores: bool = False) -> list:
+        items = self._ordered(key, reverse=True)
+        items = items[start:] if stop == -1 else items[start:stop + 1]
+        return self._page(items, 0, None, withscores)
+
+    @_command
+    async def zrangebyscore(self, key: str, min, max, start=None, num=None, withscores=False) -> list:
+        items = [(m, s) for m, s in self._ordered(key) if self._in_range(s, min, max)]
+        return self._page(items, start or 0, num, withscores)
+
+    @_command
+    async def zrevrangebyscore(self, key: str, max, min, start=None, num=None, withscores=False) -> list:
+        items = [(m, s) for m, s in self._ordered(key, reverse=True) if self._in_range(s, min, max)]
+        return self._page(items, start or 0, num, withscores)
+
+    @_command
+    async def zremrangebyrank(self, key: str, start: int, stop: int) -> int:
+        ordered = self._ordered(key)
+        stop = len(ordered) + stop if stop < 0 else stop
+        doomed = ordered[start:stop + 1]
+        for member, _ in doomed:
+            del self.zsets[key][member]
+        self._write(key)
+        return len(doomed)
+
+    async def zscan_iter(self, key: str, count=None):
+        for item in self._ordered(key):
+            yield item
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    return FakeRedis()
+
+
+class _Context:
+    def __init__(self, value=None) -> None:
+        self._value = value
+
+    async def __aenter__(self):
+        return self._value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    """Base for asyncpg connection fakes: ``transaction(**kw)`` is recorded
+    in ``transactions`` and yields the connection; tests add the queries."""
+
+    def __init__(self) -> None:
+        self.transactions: list[dict] = []
+
+    def transaction(self, **kwargs):
+        self.transactions.append(kwargs)
+        return _Context(self)
+
+
+class FakePool:
+    """``asyncpg.Pool`` whose ``acquire()`` hands out ``conn``; other
+    attributes (``fetchrow``, ``execute`` …) are the connection's."""
+
+    def __init__(self, conn: FakeConn) -> None:
+        self.conn = conn
+
+    def acquire(self):
+        return _Context(self.conn)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+class FakeSocialRepository:
+    """In-memory ``SocialRepository`` for the timeline and leaderboard tests.
+
+    posts: id -> (author, score); follows: set of (follower, followee);
+    rows: leaderboard rows as ``leaderboard_rows`` returns them.
+    """
+
+    def __init__(
+        self,
+        posts: dict[int, tuple[int, int]] | None = None,
+        follows: set[tuple[int, int]] | None = None,
+        rows: list[dict] | None = None,
+    ) -> None:
+        self.posts = posts or {}
+        self.follows = follows or set()
+        self.rows = {r["user_id"]: r for r in rows or []}
+        self.following_posts_calls = 0
+
+    # -- timeline ------------------------------------------------------------
+
+    async def post_for_fanout(self, post_id):
+        if post_id not in self.posts:
+            return None
+        author, score = self.posts[post_id]
+        return {"user_id": author, "hidden": False, "score": score}
+
+    async def follower_count_upto(self, author_id, cap):
+        return min(cap, sum(1 for _, f in self.follows if f == author_id))
+
+    async def followers_after(self, author_id, after, limit):
+        ids = sorted(u for u, f in self.follows if f == author_id and u > after)
+        return ids[:limit]
+
+    async def followed_among(self, user_id, author_ids):
+        return [a for a in author_ids if (user_id, a) in self.follows]
+
+    def _select(self, authors, before, limit):
+        entries = sorted(
+            ((score, pid) for pid, (author, score) in self.posts.items() if author in authors),
+            reverse=True,
+        )
+        return [e for e in entries if before is None or e < before][:limit]
+
+    async def following_posts(self, user_id, before, limit):
+        self.following_posts_calls += 1
+        authors = {user_id} | {f for u, f in self.follows if u == user_id}
+        return self._select(authors, before, limit)
+
+    async def posts_by_authors(self, author_ids, before, limit):
+        return self._select(set(author_ids), before, limit)
+
+    # -- leaderboards --------------------------------------------------------
+
+    async def leaderboard_rows(self, user_ids=None, after=0, limit=None):
+        ids = sorted(self.rows)
+        if user_ids is not None:
+            ids = [i for i in ids if i in user_ids]
+        else:
+            ids = [i for i in ids if i > after][:limit]
+        return [self.rows[i] for i in ids]
+
+    async def public_leaderboard_rows(self, viewer_id):
+        return [r for r in self.rows.values() if r["public_profile"] or r["user_id"] == viewer_id]
+
+    async def leaderboard_top(self, category, viewer_id, limit):
+        column = {"overall": "social_score", "consistency": "current_streak"}[category]
+        board = sorted(
+            ((r["user_id"], r[column] or 0) for r in self.rows.values()
+             if r["public_profile"] or r["user_id"] == viewer_id),
+            key=lambda kv: (-kv[1], kv[0]),
+        )
+        me = next(
+            ({"score": s, "rank": sum(o > s for _, o in board) + 1} for u, s in board if u == viewer_id),
+            None,
+        )
+        return [{"user_id": u, "score": s} for u, s in board[:limit]], me
+
+    async def display_names(self, user_ids):
+        return {i: f"u{i}" for i in user_ids}
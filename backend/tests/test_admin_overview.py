@@ -0,0 +1,97 @@
+"""Tests for ``app.services.admin_overview`` — the background dashboard snapshot."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import admin_overview
+from tests.conftest import FakeConn, FakePool
+
+
+class _SnapshotConn(FakeConn):
+    def __init__(self) -> None:
+        super().__init__()
+        self.row = None
+
+    async def execute(self, sql, *args):
+        return "SELECT 1"
+
+    async def fetchrow(self, sql, *args):
+        return self.row
+
+    async def fetchval(self, sql, *args):
+        now = datetime.now(timezone.utc)
+        if "INSERT INTO admin_snapshots" in sql:
+            self.row = {"data": args[1], "computed_at": now, "duration_ms": args[2]}
+        return now
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    calls = []
+
+    async def compute(conn):
+        calls.append(conn)
+        await asyncio.sleep(0.01)
+        return {"users": {"total": len(calls)}, "recent_errors": []}
+
+    monkeypatch.setattr(admin_overview, "compute", compute)
+    monkeypatch.setattr(admin_overview, "_inflight", None)
+    return calls
+
+
+async def test_concurrent_refreshes_share_one_computation(computed):
+    pool = FakePool(_SnapshotConn())
+    results = await asyncio.gather(*(admin_overview.refresh(pool) for _ in range(5)))
+    assert len(computed) == 1
+    assert {r["data"]["users"]["total"] for r in results} == {1}
+
+
+async def test_get_serves_stored_snapshot_without_computing(computed):
+    pool = FakePool(_SnapshotConn())
+    pool.conn.row = {
+        "data": {"users": {"total": 7}, "recent_errors": []},
+        "computed_at": datetime.now(timezone.utc) - timedelta(seconds=90),
+        "duration_ms": 12,
+    }
+    snapshot = await admin_overview.get(pool)
+    assert computed == []
+    body = admin_overview.with_age(snapshot)
+    assert body["users"]["total"] == 7
+    assert 89 <= body["snapshot"]["age_s"] <= 91
+    assert body["snapshot"]["duration_ms"] == 12
+
+
+async def test_missing_snapshot_is_computed_and_stored(computed):
+    pool = FakePool(_SnapshotConn())
+    snapshot = await admin_overview.get(pool)
+    assert len(computed) == 1
+    assert pool.conn.row["data"] == snapshot["data"]
+
+
+async def test_waiter_reuses_snapshot_refreshed_by_another_process(computed):
+    pool = FakePool(_SnapshotConn())
+    # Someone else's refresh committed after our request started.
+    pool.conn.row = {
+        "data": {"users": {"total": 3}, "recent_errors": []},
+        "computed_at": datetime.now(timezone.utc) + timedelta(seconds=1),
+        "duration_ms": 5,
+    }
+    snapshot = await admin_overview.refresh(pool)
+    assert computed == []
+    assert snapshot["data"]["users"]["total"] == 3
+
+
+async def test_double_encoded_legacy_snapshot_is_recomputed(computed):
+    pool = FakePool(_SnapshotConn())
+    pool.conn.row = {
+        "data": '{"users": {"total": 3}, "recent_errors": []}',
+        "computed_at": datetime.now(timezone.utc),
+        "duration_ms": 5,
+    }
+    snapshot = await admin_overview.get(pool)
+    assert len(computed) == 1
+    assert isinstance(pool.conn.row["data"], dict) and snapshot["data"] == pool.conn.row["data"]
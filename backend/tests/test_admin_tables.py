@@ -0,0 +1,73 @@
+"""Tests for the admin table browser's keyset paging, cursors and row estimates."""
+
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from app.repositories.admin_repo import AdminRepository
+from app.routers.admin import _browse_cursor
+from app.utils.cursor import encode_cursor
+
+
+class _RecordingPool:
+    def __init__(self, result=None) -> None:
+        self.calls: list[tuple[str, tuple]] = []
+        self.result = result
+
+    async def fetch(self, sql, *args):
+        self.calls.append((sql, args))
+        return self.result or []
+
+    async def fetchval(self, sql, *args):
+        self.calls.append((sql, args))
+        return self.result
+
+
+async def test_first_page_has_no_keyset_predicate():
+    pool = _RecordingPool()
+    await AdminRepository(pool).page_rows("food", ["id"], False, None, {}, 21)
+    ((sql, args),) = pool.calls
+    assert sql == 'SELECT * FROM "food" ORDER BY "id" ASC LIMIT $1'
+    assert args == (21,)
+
+
+async def test_next_page_compares_the_whole_sort_key_after_filters():
+    pool = _RecordingPool()
+    await AdminRepository(pool).page_rows(
+        "food", ["date", "id"], True, ["2026-10-01", 40], {"user_id": 7}, 21,
+    )
+    ((sql, args),) = pool.calls
+    assert sql == (
+        'SELECT * FROM "food" WHERE "user_id" = $1 AND ("date", "id") < ($2, $3) '
+        'ORDER BY "date" DESC, "id" DESC LIMIT $4'
+    )
+    assert args == (7, "2026-10-01", 40, 21)
+
+
+async def test_offset_fallback_applies_filters_and_sort():
+    pool = _RecordingPool()
+    await AdminRepository(pool).offset_rows("water", ["date"], True, {"user_id": 7}, 20, 40)
+    ((sql, args),) = pool.calls
+    assert sql == 'SELECT * FROM "water" WHERE "user_id" = $1 ORDER BY "date" DESC LIMIT $2 OFFSET $3'
+    assert args == (7, 20, 40)
+
+
+async def test_estimate_reads_plan_rows_without_counting():
+    pool = _RecordingPool('[{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 1234}}]')
+    assert await AdminRepository(pool).estimate_rows("food", {"user_id": 7}) == 1234
+    ((sql, args),) = pool.calls
+    assert sql == 'EXPLAIN (FORMAT JSON) SELECT 1 FROM "food" WHERE "user_id" = $1'
+    assert args == (7,)
+
+
+def test_cursor_values_must_match_the_column_types():
+    meta = {"date": {"data_type": "date"}, "id": {"data_type": "integer"}}
+    token = encode_cursor([date(2026, 10, 1), 40])
+    assert _browse_cursor(token, ["date", "id"], meta) == [date(2026, 10, 1), 40]
+    for values in (["2026-10-01", 40], [date(2026, 10, 1), "40"], [date(2026, 10, 1), True]):
+        with pytest.raises(HTTPException) as e:
+            _browse_cursor(encode_cursor(values), ["date", "id"], meta)
+        assert e.value.status_code == 400
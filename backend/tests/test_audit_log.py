@@ -0,0 +1,163 @@
+"""Tests for the batched audit-log writer and the ASGI audit middleware."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.middleware.audit import AuditLogMiddleware
+from app.services import audit_log
+from app.services.audit_log import AuditWriter
+from tests.conftest import FakeConn, FakePool
+
+
+class _CopyConn(FakeConn):
+    def __init__(self, delay: float = 0.0) -> None:
+        super().__init__()
+        self.batches: list[list[tuple]] = []
+        self.delay = delay
+        self.fail = False
+
+    async def copy_records_to_table(self, table, *, records, columns):
+        if self.fail:
+            raise ConnectionError("db went away")
+        await asyncio.sleep(self.delay)
+        self.batches.append(list(records))
+
+
+def _pool(delay: float = 0.0) -> FakePool:
+    return FakePool(_CopyConn(delay))
+
+
+def _rec(user_id=1, path="/api/food/save", token=None):
+    return (user_id, "POST", path, "food", 200, 5, "127.0.0.1", "ua",
+            datetime.now(timezone.utc), token)
+
+
+async def test_full_batch_is_written_without_waiting_for_the_interval():
+    pool = _pool()
+    writer = AuditWriter(pool, batch_size=3, flush_interval=10)
+    writer.start()
+    for _ in range(3):
+        writer.put(_rec())
+    for _ in range(100):
+        if pool.batches:
+            break
+        await asyncio.sleep(0.01)
+    assert [len(b) for b in pool.batches] == [3]
+    await writer.stop()
+
+
+async def test_stop_drains_the_buffer():
+    pool = _pool()
+    writer = AuditWriter(pool, batch_size=100, flush_interval=10)
+    writer.start()
+    for _ in range(5):
+        writer.put(_rec())
+    await writer.stop()
+    assert sum(len(b) for b in pool.batches) == 5
+    assert writer.stats()["written"] == 5
+
+
+async def test_full_buffer_drops_and_counts():
+    writer = AuditWriter(_pool(), maxsize=2)
+    assert writer.put(_rec()) and writer.put(_rec())
+    assert not writer.put(_rec())
+    assert writer.stats()["dropped"] == 1
+
+
+async def test_failed_write_is_counted():
+    pool = _pool()
+    pool.conn.fail = True
+    writer = AuditWriter(pool, flush_interval=0.01)
+    writer.start()
+    writer.put(_rec())
+    await writer.stop()
+    assert writer.stats()["failed"] == 1
+
+
+async def test_token_is_decoded_only_when_user_id_is_missing(monkeypatch):
+    monkeypatch.setattr(audit_log, "user_id_from_token", lambda token: 42 if token else None)
+    pool = _pool()
+    writer = AuditWriter(pool, flush_interval=0.01)
+    writer.start()
+    writer.put(_rec(user_id=None, token="t"))
+    writer.put(_rec(user_id=7))
+    await writer.stop()
+    rows = pool.batches[0]
+    assert [r[0] for r in rows] == [42, 7]
+    assert all(len(r) == len(audit_log.COLUMNS) for r in rows)
+
+
+def test_expired_partitions_keep_whole_retention_months():
+    names = [f"audit_log_p2026_{m:02d}" for m in range(1, 13)] + ["audit_log_p2025_12"]
+    expired = audit_log.expired_partitions(names, date(2026, 10, 17), retention_months=6)
+    assert expired == ["audit_log_p2026_01", "audit_log_p2026_02", "audit_log_p2026_03", "audit_log_p2025_12"]
+    assert audit_log.retention_start(date(2026, 2, 1), 3) == date(2025, 11, 1)
+    assert audit_log.expired_partitions(names, date(2026, 10, 17), retention_months=0) == []
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    records: list[tuple] = []
+    monkeypatch.setattr(audit_log, "record", records.append)
+    return records
+
+
+def _scope(method: str, path: str, headers=()):
+    return {
+        "type": "http", "method": method, "path": path,
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "client": ("10.0.0.1", 1234),
+    }
+
+
+async def _call(app, scope):
+    sent: list[dict] = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await AuditLogMiddleware(app)(scope, receive, send)
+    return sent
+
+
+async def _streaming_app(scope, receive, send):
+    scope["state"]["user_id"] = 9
+    await send({"type": "http.response.start", "status": 201, "headers": []})
+    for chunk in (b"a", b"b"):
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def test_middleware_records_state_user_and_streams_through(recorded):
+    sent = await _call(_streaming_app, _scope("POST", "/api/social/posts", [("user-agent", "x")]))
+    assert [m.get("body") for m in sent[1:]] == [b"a", b"b", b""]
+    (rec,) = recorded
+    assert rec[0] == 9 and rec[9] is None
+    assert rec[1:5] == ("POST", "/api/social/posts", "social", 201)
+    assert rec[6:8] == ("10.0.0.1", "x")
+
+
+async def test_middleware_passes_token_when_unauthenticated(recorded):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    await _call(app, _scope("POST", "/api/auth/logout", [("cookie", "access_token=abc; x=1")]))
+    assert recorded[0][0] is None and recorded[0][9] == "abc"
+
+
+async def test_middleware_skips_reads_and_excluded_paths(recorded):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    await _call(app, _scope("GET", "/api/food/today"))
+    await _call(app, _scope("POST", "/api/health"))
+    assert recorded == []
@@ -0,0 +1,81 @@
+"""Tests for the two-tier (L1 LRU + Redis) ``CacheService``."""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import defaultdict
+
+import pytest
+
+from app.services import cache_service
+from app.services.cache_service import LRU, CacheService
+
+
+@pytest.fixture
+def l1(monkeypatch):
+    monkeypatch.setattr(cache_service, "_l1", LRU(100, 1 << 20))
+    monkeypatch.setattr(cache_service, "_l1_active", True)
+    monkeypatch.setattr(cache_service, "_counters", defaultdict(
+        lambda: {"l1_hits": 0, "l2_hits": 0, "misses": 0, "sets": 0}
+    ))
+    return cache_service._l1
+
+
+async def test_hot_key_is_served_from_l1(l1, fake_redis):
+    redis = fake_redis
+    cache = CacheService(redis)
+    await cache.set("meal_plan:ru:1", {"plan": "oats"}, ttl=60)
+    trips = redis.round_trips
+    for _ in range(5):
+        assert await cache.get("meal_plan:ru:1") == {"plan": "oats"}
+    assert redis.round_trips == trips
+    assert cache_service.stats()["namespaces"]["meal_plan"]["l1_hits"] == 5
+
+
+async def test_l1_is_bypassed_while_the_listener_is_down(l1, monkeypatch, fake_redis):
+    monkeypatch.setattr(cache_service, "_l1_active", False)
+    redis = fake_redis
+    cache = CacheService(redis)
+    await cache.set("recipe:ru:1:lunch", {"recipe": "soup"})
+    assert await cache.get("recipe:ru:1:lunch") == {"recipe": "soup"}
+    assert await cache.get("recipe:ru:1:lunch") == {"recipe": "soup"}
+    assert redis.round_trips == 3
+    assert len(l1) == 0
+
+
+async def test_get_many_uses_one_mget_and_reads_legacy_json(l1, fake_redis):
+    redis = fake_redis
+    redis.strings["meal_plan:ru:1"] = json.dumps({"plan": "legacy"})
+    found = await CacheService(redis).get_many(["meal_plan:ru:1", "workout_plan:ru:1"])
+    assert found == {"meal_plan:ru:1": {"plan": "legacy"}}
+    assert redis.round_trips == 1
+    ns = cache_service.stats()["namespaces"]
+    assert ns["meal_plan"]["l2_hits"] == 1 and ns["workout_plan"]["misses"] == 1
+
+
+async def test_invalidation_from_another_replica_drops_the_key(l1, fake_redis):
+    redis = fake_redis
+    cache = CacheService(redis)
+    await cache.set("digest:weekly:ru:1:2026-10-17", {"text": "v1"})
+    ((_, own),) = redis.published
+    cache_service._on_message(own)  # our own write: keep it
+    assert "digest:weekly:ru:1:2026-10-17" in l1._data
+    cache_service._on_message("otherreplica digest:weekly:ru:1:2026-10-17")
+    assert "digest:weekly:ru:1:2026-10-17" not in l1._data
+
+
+def test_lru_bounds_count_bytes_and_ttl():
+    lru = LRU(max_items=2, max_bytes=10)
+    lru.put("a", b"1234", 60)
+    lru.put("b", b"1234", 60)
+    lru.get("a")  # a is now most recent
+    lru.put("c", b"1234", 60)
+    assert lru.get("b") is None and lru.get("a") == b"1234"
+    lru.put("d", b"123456789", 60)  # over max_bytes together with the rest
+    assert lru.bytes <= 10 and lru.get("d") == b"123456789"
+    lru.put("e", b"12345678901", 60)  # larger than the whole cache
+    assert lru.get("e") is None
+    lru.put("f", b"1", 0.01)
+    time.sleep(0.02)
+    assert lru.get("f") is None
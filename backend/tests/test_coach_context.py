@@ -0,0 +1,135 @@
+"""Tests for ``app.services.coach_context`` — cached AI chat context."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.services import coach_context
+from app.services.coach_context import CoachContext
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def _context(history=None) -> CoachContext:
+    return CoachContext(
+        history=history if history is not None else [
+            {"message_type": "user", "message_text": "hi", "created_at": "2026-10-17T08:00:00"},
+            {"message_type": "assistant", "message_text": "hello"},
+        ],
+        user_info={"aim": "loss"},
+        lang="ru",
+        today={"calories_in": 1200},
+        week={"workout_sessions": 3},
+    )
+
+
+@pytest.fixture(autouse=True)
+def _reset_counters():
+    for key in coach_context._counters:  # noqa: SLF001
+        coach_context._counters[key] = 0  # noqa: SLF001
+    for key in coach_context._timings:  # noqa: SLF001
+        coach_context._timings[key] = 0.0  # noqa: SLF001
+
+
+def _builder(calls: list):
+    async def build() -> CoachContext:
+        calls.append(1)
+        return _context()
+    return build
+
+
+async def test_second_turn_is_served_from_cache(fake_redis):
+    redis, calls = fake_redis, []
+    first = await coach_context.get_or_build(redis, 7, _builder(calls))
+    second = await coach_context.get_or_build(redis, 7, _builder(calls))
+    assert len(calls) == 1
+    assert second == first
+    stats = coach_context.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+async def test_cached_history_keeps_only_prompt_fields(fake_redis):
+    redis = fake_redis
+    ctx = await coach_context.get_or_build(redis, 7, _builder([]))
+    assert ctx.history[0] == {"message_type": "user", "message_text": "hi"}
+
+
+async def test_invalidate_forces_rebuild(fake_redis):
+    redis, calls = fake_redis, []
+    await coach_context.get_or_build(redis, 7, _builder(calls))
+    await coach_context.invalidate(7, redis)
+    await coach_context.get_or_build(redis, 7, _builder(calls))
+    assert len(calls) == 2
+
+
+async def test_snapshot_from_another_day_is_ignored(fake_redis):
+    redis, calls = fake_redis, []
+    await coach_context.get_or_build(redis, 7, _builder(calls))
+    key = "coach_ctx:7"
+    data = json.loads(redis.strings[key])
+    data["date"] = "2000-01-01"
+    redis.strings[key] = json.dumps(data)
+    await coach_context.get_or_build(redis, 7, _builder(calls))
+    assert len(calls) == 2
+
+
+async def test_record_turn_appends_to_cached_history(fake_redis):
+    redis, calls = fake_redis, []
+    await coach_context.get_or_build(redis, 7, _builder(calls))
+    await coach_context.record_turn(redis, 7, "what now?", "eat protein")
+    ctx = await coach_context.get_or_build(redis, 7, _builder(calls))
+    assert len(calls) == 1
+    assert [m["message_text"] for m in ctx.history] == ["hi", "hello", "what now?", "eat protein"]
+
+
+async def test_regenerate_replaces_last_reply(fake_redis):
+    redis = fake_redis
+    await coach_context.get_or_build(redis, 7, _builder([]))
+    await coach_context.drop_last_reply(redis, 7)
+    await coach_context.record_turn(redis, 7, None, "hello again")
+    ctx = await coach_context.get_or_build(redis, 7, _builder([]))
+    assert [m["message_text"] for m in ctx.history] == ["hi", "hello again"]
+
+
+async def test_history_is_capped(fake_redis):
+    redis = fake_redis
+    await coach_context.get_or_build(redis, 7, _builder([]))
+    for i in range(30):
+        await coach_context.record_turn(redis, 7, f"q{i}", f"a{i}")
+    ctx = await coach_context.get_or_build(redis, 7, _builder([]))
+    assert len(ctx.history) == coach_context.HISTORY_LIMIT
+    assert ctx.history[-1]["message_text"] == "a29"
+
+
+async def test_record_turn_without_snapshot_writes_nothing(fake_redis):
+    redis = fake_redis
+    await coach_context.record_turn(redis, 7, "q", "a")
+    assert redis.strings == {}
+
+
+async def test_concurrent_change_drops_snapshot_instead_of_overwriting(monkeypatch, fake_redis):
+    redis = fake_redis
+    await coach_context.get_or_build(redis, 7, _builder([]))
+
+    original_get = redis.get
+
+    async def racing_get(key):
+        raw = await original_get(key)
+        await redis.set(key, raw)  # someone else rewrote it after our WATCH
+        return raw
+
+    monkeypatch.setattr(redis, "get", racing_get)
+    await coach_context.record_turn(redis, 7, "q", "a")
+    assert "coach_ctx:7" not in redis.strings
+
+
+async def test_without_redis_context_is_always_built():
+    calls = []
+    await coach_context.get_or_build(None, 7, _builder(calls))
+    await coach_context.get_or_build(None, 7, _builder(calls))
+    assert len(calls) == 2
+    assert coach_context.stats()["bypass"] == 2
@@ -0,0 +1,32 @@
+"""Tests for ``app.utils.cursor`` — opaque keyset-pagination cursors."""
+
+from __future__ import annotations
+
+import base64
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.utils.cursor import decode_cursor, encode_cursor
+
+
+def test_round_trip_keeps_types():
+    values = [True, datetime(2026, 10, 17, 8, 30, 12, 345678, tzinfo=timezone.utc), 912345, date(2026, 1, 2)]
+    assert decode_cursor(encode_cursor(values), 4) == values
+
+
+def test_cursor_is_url_safe():
+    token = encode_cursor(["a/b+c?d=e", 10 ** 12])
+    assert all(c.isalnum() or c in "-_" for c in token)
+
+
+@pytest.mark.parametrize("token", ["", "not-base64!!", "e30", encode_cursor([1, 2])])
+def test_malformed_or_wrong_arity_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, 3)
+
+
+def test_unknown_tagged_value_is_rejected():
+    token = base64.urlsafe_b64encode(b'[{"$x":1},2,3]').decode()
+    with pytest.raises(ValueError):
+        decode_cursor(token, 3)
@@ -0,0 +1,208 @@
+"""Tests for ``app.services.job_queue`` — Postgres-backed background jobs."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services import job_queue
+from app.services.job_queue import JobWorker, PermanentJobError
+
+
+class _FakeRepo:
+    """In-memory stand-in for JobRepository with the same state transitions."""
+
+    def __init__(self) -> None:
+        self.jobs: dict[int, dict] = {}
+        self.keys: set[str] = set()
+        self._next_id = 1
+
+    async def enqueue(self, kind, payload, idempotency_key=None, delay_s=0, max_attempts=5):
+        if idempotency_key is not None:
+            if idempotency_key in self.keys:
+                return None
+            self.keys.add(idempotency_key)
+        job_id, self._next_id = self._next_id, self._next_id + 1
+        self.jobs[job_id] = {
+            "id": job_id, "kind": kind, "payload": payload, "status": "queued",
+            "attempts": 0, "max_attempts": max_attempts, "delay": delay_s, "error": None,
+        }
+        return job_id
+
+    async def claim(self, worker, limit):
+        ready = [j for j in self.jobs.values() if j["status"] == "queued" and j["delay"] == 0][:limit]
+        for job in ready:
+            job["status"] = "running"
+            job["attempts"] += 1
+        return [{**j, "wait_s": 0.0} for j in ready]
+
+    async def complete(self, job_id):
+        self.jobs[job_id]["status"] = "done"
+
+    async def retry(self, job_id, delay_s, error):
+        self.jobs[job_id].update(status="queued", delay=delay_s, error=error)
+
+    async def fail(self, job_id, error):
+        self.jobs[job_id].update(status="failed", error=error)
+
+    async def release(self, job_ids):
+        for job_id in job_ids:
+            self.jobs[job_id]["status"] = "queued"
+            self.jobs[job_id]["attempts"] -= 1
+
+    async def requeue_stale(self, lock_timeout_s):
+        return 0
+
+    async def prune(self, older_than_days):
+        return 0
+
+    async def depth(self):
+        return {"ready": sum(j["status"] == "queued" for j in self.jobs.values())}
+
+
+class _NoListenPool:
+    async def acquire(self):
+        raise OSError("no LISTEN in tests")
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    fake = _FakeRepo()
+    monkeypatch.setattr(job_queue, "JobRepository", lambda pool: fake)
+    monkeypatch.setattr(job_queue, "HANDLER_MODULES", ())
+    monkeypatch.setattr(job_queue, "_handlers", {})
+    monkeypatch.setattr(job_queue, "_periodic", {})
+    return fake
+
+
+async def _run_until(repo: _FakeRepo, predicate, **kwargs) -> JobWorker:
+    worker = JobWorker(_NoListenPool(), poll_interval=0.01, **kwargs)
+    await worker.start()
+    for _ in range(200):
+        if predicate():
+            break
+        await asyncio.sleep(0.01)
+    await worker.stop(drain_timeout=1)
+    return worker
+
+
+async def test_enqueued_job_runs_and_completes(repo):
+    seen = []
+
+    @job_queue.handler("demo")
+    async def demo(payload):
+        seen.append(payload["n"])
+
+    await job_queue.enqueue(None, "demo", {"n": 1})
+    await job_queue.enqueue(None, "demo", {"n": 2})
+    worker = await _run_until(repo, lambda: len(seen) == 2, concurrency=2)
+    assert sorted(seen) == [1, 2]
+    assert {j["status"] for j in repo.jobs.values()} == {"done"}
+    assert worker.counters["processed"] == 2
+
+
+async def test_idempotency_key_deduplicates(repo):
+    assert await job_queue.enqueue(None, "demo", key="k") == 1
+    assert await job_queue.enqueue(None, "demo", key="k") is None
+    assert len(repo.jobs) == 1
+
+
+async def test_failure_is_retried_with_backoff(repo):
+    @job_queue.handler("flaky")
+    async def flaky(payload):
+        raise ConnectionError("db went away")
+
+    job_id = await job_queue.enqueue(None, "flaky")
+    worker = await _run_until(repo, lambda: repo.jobs[job_id]["error"] is not None)
+    job = repo.jobs[job_id]
+    assert job["status"] == "queued" and job["attempts"] == 1
+    assert job["delay"] > 0
+    assert "ConnectionError" in job["error"]
+    assert worker.counters["retried"] == 1
+
+
+async def test_last_attempt_marks_job_failed(repo):
+    @job_queue.handler("flaky")
+    async def flaky(payload):
+        raise RuntimeError("still broken")
+
+    job_id = await job_queue.enqueue(None, "flaky", max_attempts=1)
+    await _run_until(repo, lambda: repo.jobs[job_id]["status"] == "failed")
+    assert repo.jobs[job_id]["status"] == "failed"
+
+
+async def test_permanent_error_skips_retries(repo):
+    @job_queue.handler("bad")
+    async def bad(payload):
+        raise PermanentJobError("user is gone")
+
+    job_id = await job_queue.enqueue(None, "bad", max_attempts=5)
+    await _run_until(repo, lambda: repo.jobs[job_id]["status"] == "failed")
+    assert repo.jobs[job_id]["attempts"] == 1
+
+
+async def test_unknown_kind_fails_without_retry(repo):
+    job_id = await job_queue.enqueue(None, "nobody-handles-this")
+    await _run_until(repo, lambda: repo.jobs[job_id]["status"] == "failed")
+    assert "no handler" in repo.jobs[job_id]["error"]
+
+
+async def test_worker_survives_a_failing_repo_call(repo, monkeypatch):
+    seen = []
+
+    @job_queue.handler("demo")
+    async def demo(payload):
+        seen.append(payload["n"])
+
+    complete = repo.complete
+
+    async def flaky_complete(job_id):
+        if job_id == 1:
+            raise ConnectionError("db went away")
+        await complete(job_id)
+
+    monkeypatch.setattr(repo, "complete", flaky_complete)
+    await job_queue.enqueue(None, "demo", {"n": 1})
+    await job_queue.enqueue(None, "demo", {"n": 2})
+    await _run_until(repo, lambda: repo.jobs[2]["status"] == "done", concurrency=1)
+    assert seen == [1, 2]
+    assert repo.jobs[1]["status"] == "running"
+    assert repo.jobs[2]["status"] == "done"
+
+
+async def test_stop_hands_back_unstarted_jobs(repo):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    @job_queue.handler("slow")
+    async def slow(payload):
+        started.set()
+        await release.wait()
+
+    for _ in range(3):
+        await job_queue.enqueue(None, "slow")
+    worker = JobWorker(_NoListenPool(), concurrency=1, batch_size=3, poll_interval=0.01)
+    await worker.start()
+    await asyncio.wait_for(started.wait(), 1)
+    stopping = asyncio.create_task(worker.stop(drain_timeout=1))
+    await asyncio.sleep(0.01)
+    release.set()
+    await stopping
+    statuses = sorted(j["status"] for j in repo.jobs.values())
+    assert statuses == ["done", "queued", "queued"]
+    assert all(j["attempts"] == 0 for j in repo.jobs.values() if j["status"] == "queued")
+
+
+async def test_periodic_job_is_enqueued_once_per_slot(repo):
+    job_queue.periodic("tick", 3600)
+    worker = JobWorker(_NoListenPool())
+    await worker._schedule_periodic()
+    await worker._schedule_periodic()
+    assert [j["kind"] for j in repo.jobs.values()] == ["tick"]
+
+
+def test_retry_delay_grows_and_is_capped():
+    first, third = job_queue.retry_delay(1), job_queue.retry_delay(3)
+    assert first < third
+    assert job_queue.retry_delay(50) <= job_queue.get_settings().JOB_RETRY_MAX_DELAY * 1.25
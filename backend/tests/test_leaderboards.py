@@ -0,0 +1,124 @@
+"""Tests for ``app.services.leaderboards`` — Redis sorted-set rankings."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.services import leaderboards
+from tests.conftest import FakeSocialRepository
+
+
+def _row(user_id, public=True, score=0, streak=0, kcal=None, weights=None, aim=None):
+    weights = weights or []
+    return {
+        "user_id": user_id,
+        "public_profile": public,
+        "social_score": score,
+        "current_streak": streak,
+        "training_kcal_30d": kcal,
+        "first_weight": weights[0] if weights else None,
+        "last_weight": weights[-1] if weights else None,
+        "weigh_ins": len(weights),
+        "aim": aim,
+    }
+
+
+@pytest.fixture
+def world(monkeypatch, fake_redis):
+    repo = FakeSocialRepository(rows=[
+        _row(1, score=10, streak=3, kcal=1200.4, weights=[90.0, 86.5], aim="weight loss"),
+        _row(2, score=30, streak=9),
+        _row(3, score=20, streak=1, kcal=300),
+        _row(4, public=False, score=25, streak=5),
+    ])
+    monkeypatch.setattr(leaderboards, "SocialRepository", lambda pool: repo)
+    return repo, fake_redis
+
+
+def test_weight_progress_follows_the_goal():
+    assert leaderboards.weight_progress("Weight loss", 90.0, 87.5) == 2.5
+    assert leaderboards.weight_progress("Набор массы", 70.0, 72.0) == 2.0
+    assert leaderboards.weight_progress("похудение", 80.0, 81.0) == -1.0
+    assert leaderboards.weight_progress(None, 80.0, 81.5) == -1.5
+
+
+def test_categories_without_data_are_left_out():
+    scores = leaderboards.scores_from_row(_row(5, score=2, weights=[80.0]))
+    assert set(scores) == {"overall", "consistency"}
+
+
+async def test_reconcile_then_top_and_my_rank(world):
+    repo, redis = world
+    assert await leaderboards.reconcile(None, redis) == 4
+    board = await leaderboards.top(None, redis, "overall", 1, limit=2)
+    assert [i["user_id"] for i in board["items"]] == [2, 3]
+    assert board["me"] == {"rank": 3, "score": 10}
+
+
+async def test_private_user_sees_own_rank(world):
+    repo, redis = world
+    await leaderboards.reconcile(None, redis)
+    assert "4" not in redis.zsets["lb:overall"]
+    board = await leaderboards.top(None, redis, "overall", 4, limit=3)
+    assert [i["user_id"] for i in board["items"]] == [2, 4, 3]
+    assert board["me"] == {"rank": 2, "score": 25}
+    other = await leaderboards.top(None, redis, "overall", 1, limit=3)
+    assert 4 not in [i["user_id"] for i in other["items"]]
+
+
+async def test_refresh_user_moves_between_public_and_private(world):
+    repo, redis = world
+    await leaderboards.reconcile(None, redis)
+    repo.rows[1] = _row(1, public=False, score=50)
+    await leaderboards.refresh_user(None, 1, redis)
+    assert "1" not in redis.zsets["lb:overall"]
+    assert redis.zsets["lb:overall:private"]["1"] == 50
+    assert "1" not in redis.zsets["lb:weight"]
+
+
+async def test_reconcile_drops_deleted_users(world):
+    repo, redis = world
+    await leaderboards.reconcile(None, redis)
+    del repo.rows[3]
+    await leaderboards.reconcile(None, redis)
+    assert "3" not in redis.zsets["lb:overall"]
+    assert "3" not in redis.zsets["lb:strength"]
+
+
+async def test_cold_cache_reads_postgres(world, monkeypatch):
+    scheduled = []
+
+    async def schedule(pool):
+        scheduled.append(True)
+
+    monkeypatch.setattr(leaderboards, "schedule_reconcile", schedule)
+    repo, redis = world
+    board = await leaderboards.top(None, redis, "consistency", 3, limit=10)
+    assert [i["user_id"] for i in board["items"]] == [2, 1, 3]
+    assert board["me"] == {"rank": 3, "score": 1}
+    assert scheduled == [True]
+
+
+async def test_redis_errors_fall_back_to_postgres(world, monkeypatch):
+    repo, redis = world
+    await leaderboards.reconcile(None, redis)
+
+    async def broken(*args, **kwargs):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(redis, "zrevrange", broken)
+    board = await leaderboards.top(None, redis, "strength", 1, limit=10)
+    assert [i["user_id"] for i in board["items"]] == [1, 3]
+    assert board["me"] == {"rank": 1, "score": 1200}
+
+
+async def test_disabled_cache_reads_postgres_without_reconciling(world, monkeypatch):
+    async def schedule(pool):
+        raise AssertionError("no reconcile with the cache off")
+
+    monkeypatch.setattr(leaderboards, "schedule_reconcile", schedule)
+    monkeypatch.setattr(leaderboards.get_settings(), "CACHE_ENABLED", False)
+    repo, redis = world
+    board = await leaderboards.top(None, redis, "overall", 4, limit=2)
+    assert [i["user_id"] for i in board["items"]] == [2, 4]
+    assert board["me"] == {"rank": 2, "score": 25}
@@ -0,0 +1,245 @@
+"""Tests for ``telegram_bot.outbox`` and ``telegram_bot.rate_limit``."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from telegram_bot import outbox as outbox_module
+from telegram_bot.outbox import Outbox
+from telegram_bot.rate_limit import ChatLimiter, TokenBucket
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# ---------------------------------------------------------------------------
+# TokenBucket / ChatLimiter
+# ---------------------------------------------------------------------------
+
+async def test_bucket_allows_burst_then_refills_at_rate():
+    clock = _Clock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.reserve() == 0
+
+
+async def test_bucket_pause_blocks_until_retry_after():
+    clock = _Clock()
+    bucket = TokenBucket(rate=10.0, capacity=10, clock=clock)
+    bucket.pause(3)
+    assert bucket.reserve() == pytest.approx(3)
+    clock.now += 3.5
+    assert bucket.reserve() == 0
+
+
+async def test_chat_limiter_forgets_least_recent_chats():
+    limiter = ChatLimiter(rate=1, capacity=1, max_chats=2)
+    first = limiter.bucket(1)
+    limiter.bucket(2)
+    limiter.bucket(1)
+    limiter.bucket(3)
+    assert limiter.bucket(1) is first
+    assert 2 not in limiter._buckets
+
+
+# ---------------------------------------------------------------------------
+# Outbox (in-memory lanes)
+# ---------------------------------------------------------------------------
+
+def _outbox(send, **kwargs) -> Outbox:
+    kwargs.setdefault("rate", 1000.0)
+    kwargs.setdefault("chat_rate", 1000.0)
+    return Outbox(send, workers=1, **kwargs)
+
+
+async def _drain(outbox: Outbox, expected: int) -> None:
+    for _ in range(200):
+        if outbox.counters["sent"] + outbox.counters["dropped"] >= expected:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"outbox did not drain: {outbox.counters}")
+
+
+async def test_otp_lane_overtakes_bulk():
+    delivered = []
+
+    async def send(message):
+        delivered.append(message["text"])
+
+    outbox = _outbox(send)
+    for i in range(3):
+        await outbox.enqueue(i, f"bulk-{i}")
+    await outbox.enqueue(99, "otp", lane="otp")
+    await outbox.start()
+    await _drain(outbox, 4)
+    await outbox.stop()
+
+    assert delivered[0] == "otp"
+    assert outbox.sent_by_lane == {"otp": 1, "bulk": 3}
+
+
+async def test_retry_after_pauses_and_redelivers():
+    calls = []
+
+    async def send(message):
+        calls.append(message["chat_id"])
+        if len(calls) == 1:
+            raise TelegramRetryAfter(
+                method=SendMessage(chat_id=1, text="x"), message="flood", retry_after=0,
+            )
+
+    outbox = _outbox(send)
+    await outbox.enqueue(1, "hello")
+    await outbox.start()
+    await _drain(outbox, 1)
+    await outbox.stop()
+
+    assert calls == [1, 1]
+    assert outbox.counters["rate_limited"] == 1
+    assert outbox.counters["sent"] == 1
+
+
+async def test_blocked_chat_is_dropped_without_retry():
+    async def send(message):
+        raise TelegramForbiddenError(method=SendMessage(chat_id=1, text="x"), message="blocked")
+
+    outbox = _outbox(send)
+    await outbox.enqueue(1, "hello")
+    await outbox.start()
+    await _drain(outbox, 1)
+    await outbox.stop()
+
+    assert outbox.counters["dropped"] == 1
+    assert (await outbox.stats())["depth"] == {"otp": 0, "bulk": 0, "delayed": 0}
+
+
+async def test_memory_lane_rejects_when_full():
+    async def send(message):
+        pass
+
+    outbox = _outbox(send, max_memory_queue=1)
+    assert await outbox.enqueue(1, "a")
+    assert await outbox.enqueue(2, "b") is False
+    assert outbox.counters["rejected"] == 1
+
+
+async def test_retry_waits_without_stalling_the_lane(monkeypatch):
+    monkeypatch.setattr(outbox_module, "MAX_RETRY_DELAY_S", 0.05)
+    delivered = []
+
+    async def send(message):
+        if message["chat_id"] == 1 and message["attempts"] == 0:
+            raise TelegramNetworkError(method=SendMessage(chat_id=1, text="x"), message="reset")
+        delivered.append(message["chat_id"])
+
+    outbox = _outbox(send)
+    await outbox.enqueue(1, "first")
+    await outbox.enqueue(2, "second")
+    await outbox.start()
+    await _drain(outbox, 2)
+    await outbox.stop()
+
+    assert delivered == [2, 1]
+    assert outbox.counters["retried"] == 1
+
+
+async def test_worker_survives_a_failing_ack():
+    delivered = []
+
+    async def send(message):
+        delivered.append(message["chat_id"])
+
+    outbox = _outbox(send)
+    ack, failed = outbox._lanes.ack, []
+
+    async def flaky_ack(raw):
+        if not failed:
+            failed.append(raw)
+            raise ConnectionError("redis went away")
+        await ack(raw)
+
+    outbox._lanes.ack = flaky_ack
+    await outbox.enqueue(1, "first")
+    await outbox.enqueue(2, "second")
+    await outbox.start()
+    await _drain(outbox, 2)
+    await outbox.stop()
+
+    assert delivered == [1, 2]
+
+
+# ---------------------------------------------------------------------------
+# Outbox (Redis lanes)
+# ---------------------------------------------------------------------------
+
+def _promote(redis, keys, args):
+    due = [m for m, s in sorted(redis.zsets.get(keys[0], {}).items(), key=lambda kv: kv[1])
+           if s <= float(args[0])]
+    for raw in due:
+        del redis.zsets[keys[0]][raw]
+        redis.lists.setdefault(keys[1], []).append(raw)
+    return len(due)
+
+
+def _message(chat_id: int, lane: str = "bulk") -> str:
+    return json.dumps({"id": str(chat_id), "lane": lane, "chat_id": chat_id,
+                       "text": "hi", "parse_mode": None, "attempts": 0})
+
+
+async def test_dead_replicas_in_flight_messages_are_reclaimed(fake_redis):
+    fake_redis.scripts[outbox_module._PROMOTE] = _promote
+    fake_redis.lists["tg:outbox:processing:gone"] = [_message(1, "otp")]
+    fake_redis.lists["tg:outbox:processing:busy"] = [_message(2)]
+    await fake_redis.set("tg:outbox:alive:busy", 1, ex=30)
+    delivered = []
+
+    async def send(message):
+        delivered.append(message["chat_id"])
+
+    outbox = _outbox(send, redis=fake_redis, replica_id="new")
+    await outbox.start()
+    await _drain(outbox, 1)
+    await outbox.stop()
+
+    assert delivered == [1]
+    assert "tg:outbox:processing:gone" not in fake_redis.lists
+    assert fake_redis.lists["tg:outbox:processing:busy"] == [_message(2)]
+    assert not await fake_redis.exists("tg:outbox:alive:new")
+
+
+async def test_redis_retry_is_parked_in_the_delayed_set(fake_redis, monkeypatch):
+    monkeypatch.setattr(outbox_module, "MAX_RETRY_DELAY_S", 0.05)
+    monkeypatch.setattr(outbox_module, "_PROMOTE_EVERY_S", 0.0)
+    fake_redis.scripts[outbox_module._PROMOTE] = _promote
+    attempts = []
+
+    async def send(message):
+        attempts.append(message["attempts"])
+        if len(attempts) == 1:
+            raise TelegramNetworkError(method=SendMessage(chat_id=1, text="x"), message="reset")
+
+    outbox = _outbox(send, redis=fake_redis, replica_id="r1")
+    await outbox.enqueue(1, "hello")
+    await outbox.start()
+    await _drain(outbox, 1)
+    depth = (await outbox.stats())["depth"]
+    await outbox.stop()
+
+    assert attempts == [0, 1]
+    assert depth == {"otp": 0, "bulk": 0, "delayed": 0, "in_flight": 0}
@@ -0,0 +1,264 @@
+"""Query-plan regression tests for the per-user repository reads.
+
+Every read a repository issues is re-run under ``EXPLAIN (ANALYZE, FORMAT
+JSON)`` against a seeded database, and the plan is rejected if
+
+* a per-user table is read with a sequential scan (no usable index), or
+* a scan throws away far more rows than it keeps — the signature of a
+  filter such as ``EXTRACT(MONTH FROM date) = $3`` that the
+  ``(user_id, date)`` index can't serve, so every row the user has is
+  read and discarded.
+
+The plan checks themselves are unit-tested below. The database part needs
+a migrated Postgres (``alembic upgrade head``) and only runs when
+``TEST_DATABASE_URL`` is set; all seeding happens in one transaction
+that is rolled back. ``enable_seqscan`` is switched off for the session,
+so the small seed can't make a sequential scan look cheaper than an index
+— a Seq Scan that still shows up means no index applies.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, timedelta
+
+import pytest
+
+PER_USER_TABLES = {"food", "user_training", "water", "user_health", "user_daily_stats"}
+MAX_REMOVED_RATIO = 4.0
+REMOVED_SLACK = 50
+
+
+def plan_problems(
+    plan: dict,
+    tables: set[str] = PER_USER_TABLES,
+    max_removed_ratio: float = MAX_REMOVED_RATIO,
+    slack: int = REMOVED_SLACK,
+) -> list[str]:
+    """Return a description of every offending scan node in an EXPLAIN ANALYZE plan."""
+    problems: list[str] = []
+
+    def walk(node: dict) -> None:
+        relation = node.get("Relation Name")
+        if relation in tables:
+            node_type = node.get("Node Type", "")
+            if node_type == "Seq Scan":
+                problems.append(f"Seq Scan on {relation}")
+            loops = node.get("Actual Loops", 1) or 1
+            kept = node.get("Actual Rows", 0) * loops
+            removed = (
+                node.get("Rows Removed by Filter", 0) + node.get("Rows Removed by Index Recheck", 0)
+            ) * loops
+            if removed > slack and removed > kept * max_removed_ratio:
+                problems.append(f"{node_type} on {relation} kept {kept} rows but discarded {removed}")
+        for child in node.get("Plans", ()):
+            walk(child)
+
+    walk(plan["Plan"] if "Plan" in plan else plan)
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# plan_problems
+# ---------------------------------------------------------------------------
+
+def test_seq_scan_on_per_user_table_is_reported():
+    plan = {"Plan": {"Node Type": "Aggregate", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "food", "Actual Rows": 3, "Actual Loops": 1},
+    ]}}
+    assert plan_problems(plan) == ["Seq Scan on food"]
+
+
+def test_seq_scan_on_catalog_table_is_allowed():
+    plan = {"Plan": {"Node Type": "Seq Scan", "Relation Name": "training_types", "Actual Rows": 40}}
+    assert plan_problems(plan) == []
+
+
+def test_index_scan_with_large_residual_filter_is_reported():
+    plan = {"Plan": {
+        "Node Type": "Index Scan", "Relation Name": "user_training",
+        "Actual Rows": 30, "Actual Loops": 1, "Rows Removed by Filter": 1400,
+    }}
+    problems = plan_problems(plan)
+    assert len(problems) == 1
+    assert "discarded 1400" in problems[0]
+
+
+def test_small_residual_filter_is_tolerated():
+    plan = {"Plan": {
+        "Node Type": "Bitmap Heap Scan", "Relation Name": "food",
+        "Actual Rows": 20, "Actual Loops": 1, "Rows Removed by Filter": 12,
+    }}
+    assert plan_problems(plan) == []
+
+
+def test_rows_are_scaled_by_loops():
+    plan = {"Plan": {"Node Type": "Nested Loop", "Plans": [
+        {"Node Type": "Index Scan", "Relation Name": "water",
+         "Actual Rows": 1, "Actual Loops": 100, "Rows Removed by Filter": 9},
+    ]}}
+    assert plan_problems(plan) == ["Index Scan on water kept 100 rows but discarded 900"]
+
+
+# ---------------------------------------------------------------------------
+# Repository queries against a seeded database
+# ---------------------------------------------------------------------------
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+USER_ID = 910_000_001
+OTHER_USERS = list(range(910_000_100, 910_000_160))
+
+
+class ExplainingConnection:
+    """Stands in for the pool: EXPLAINs every read statement, then runs it for real."""
+
+    def __init__(self, conn) -> None:
+        self._conn = conn
+        self.plans: list[tuple[str, dict]] = []
+
+    @staticmethod
+    def _is_read(sql: str) -> bool:
+        text = sql.lstrip().upper()
+        if text.startswith("SELECT"):
+            return True
+        return text.startswith("WITH") and not any(
+            verb in text for verb in ("INSERT ", "UPDATE ", "DELETE ")
+        )
+
+    async def _explain(self, sql: str, args) -> None:
+        if self._is_read(sql):
+            raw = await self._conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", *args)
+            plan = json.loads(raw) if isinstance(raw, str) else raw
+            self.plans.append((" ".join(sql.split()), plan[0]))
+
+    async def fetch(self, sql, *args):
+        await self._explain(sql, args)
+        return await self._conn.fetch(sql, *args)
+
+    async def fetchrow(self, sql, *args):
+        await self._explain(sql, args)
+        return await self._conn.fetchrow(sql, *args)
+
+    async def fetchval(self, sql, *args):
+        await self._explain(sql, args)
+        return await self._conn.fetchval(sql, *args)
+
+    async def execute(self, sql, *args):
+        return await self._conn.execute(sql, *args)
+
+
+async def _seed(conn) -> None:
+    start = date.today() - timedelta(days=730)
+    users = [USER_ID, *OTHER_USERS]
+    await conn.execute(
+        """
+        INSERT INTO food (user_id, date, name_of_food, b, g, u, cal)
+        SELECT u, d::date, 'seed ' || n, 20, 15, 60, 450
+        FROM unnest($1::bigint[]) AS u,
+             generate_series($2::date, CURRENT_DATE, '1 day') AS d,
+             generate_series(1, 4) AS n
+        """,
+        users, start,
+    )
+    await conn.execute(
+        """
+        INSERT INTO user_training (user_id, date, training_name, tren_time, training_cal)
+        SELECT u, d::date, 'seed', 40, 300
+        FROM unnest($1::bigint[]) AS u, generate_series($2::date, CURRENT_DATE, '1 day') AS d
+        """,
+        users, start,
+    )
+    await conn.execute(
+        """
+        INSERT INTO water (user_id, date, count)
+        SELECT u, d::date, 5
+        FROM unnest($1::bigint[]) AS u, generate_series($2::date, CURRENT_DATE, '1 day') AS d
+        """,
+        users, start,
+    )
+    await conn.execute(
+        """
+        INSERT INTO user_health (user_id, imt, imt_str, cal, date, weight, height)
+        SELECT u, 24, '', 0, d::date, 76, 176
+        FROM unnest($1::bigint[]) AS u, generate_series($2::date, CURRENT_DATE, '2 days') AS d
+        """,
+        users, start,
+    )
+    for table in sorted(PER_USER_TABLES):
+        await conn.execute(f"ANALYZE {table}")
+
+
+async def _exercise_repositories(db) -> None:
+    from app.repositories.daily_stats_repo import DailyStatsRepository
+    from app.repositories.food_repo import FoodRepository
+    from app.repositories.social_repo import SocialRepository
+    from app.repositories.streak_repo import StreakRepository
+    from app.repositories.summary_repo import SummaryRepository
+    from app.repositories.water_repo import WaterRepository
+    from app.repositories.weight_repo import WeightRepository
+    from app.repositories.workout_repo import WorkoutRepository
+
+    today = date.today()
+    week_ago = today - timedelta(days=6)
+    tomorrow = today + timedelta(days=1)
+
+    summary = SummaryRepository(db)
+    await summary.get_day(USER_ID, today)
+    await summary.get_month(USER_ID, today.year, today.month)
+    await summary.get_year(USER_ID, today.year)
+
+    stats = DailyStatsRepository(db)
+    await stats.period_totals(USER_ID, week_ago, tomorrow)
+    await stats.latest_weight(USER_ID, week_ago, tomorrow)
+    await stats.avg_daily_kcal(USER_ID, today - timedelta(days=13), tomorrow, min_kcal=200)
+
+    await StreakRepository(db).badge_state(USER_ID, today, today - timedelta(days=today.weekday()), 8)
+
+    food = FoodRepository(db)
+    await food.get_by_date(USER_ID, today)
+    await food.get_daily_totals(USER_ID, today)
+    await food.get_last_day_with_food(USER_ID, today)
+
+    workouts = WorkoutRepository(db)
+    await workouts.get_by_date(USER_ID, today)
+    await workouts.get_by_period(USER_ID, week_ago, today)
+    await workouts.get_top5_period(USER_ID, week_ago, today)
+    await workouts.get_total_calories(USER_ID, today)
+    await workouts.get_total_duration(USER_ID, today)
+
+    water = WaterRepository(db)
+    await water.get_by_date(USER_ID, today)
+    await water.get_by_period(USER_ID, week_ago, today)
+
+    weight = WeightRepository(db)
+    await weight.history(USER_ID, days=90)
+    await weight.latest(USER_ID)
+    await weight.list_entries(USER_ID, limit=50)
+
+    await SocialRepository(db).leaderboard_rows(user_ids=[USER_ID])
+
+
+@pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL not set")
+async def test_repository_queries_use_per_user_indexes():
+    import asyncpg
+
+    conn = await asyncpg.connect(DATABASE_URL)
+    tx = conn.transaction()
+    await tx.start()
+    try:
+        await _seed(conn)
+        await conn.execute("SET LOCAL enable_seqscan = off")
+        db = ExplainingConnection(conn)
+        await _exercise_repositories(db)
+    finally:
+        await tx.rollback()
+        await conn.close()
+
+    assert db.plans, "no SELECT statements were captured"
+    failures = [
+        f"{problem}\n    {sql}"
+        for sql, plan in db.plans
+        for problem in plan_problems(plan)
+    ]
+    assert not failures, "Per-user queries with bad plans:\n" + "\n".join(failures)
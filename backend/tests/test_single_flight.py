@@ -0,0 +1,104 @@
+"""Tests for ``app.services.single_flight`` and ``ai_service.coalesced``."""
+
+from __future__ import annotations
+
+import asyncio
+
+import orjson
+import pytest
+
+from app.services import ai_service, single_flight
+from app.services.ai_service import AIQuotaError
+
+
+@pytest.fixture(autouse=True)
+def counters(monkeypatch):
+    monkeypatch.setattr(single_flight, "_inflight", {})
+    monkeypatch.setattr(single_flight, "_counters", dict.fromkeys(single_flight._counters, 0))
+    monkeypatch.setattr(single_flight, "_LOCK_POLL_S", 0.01)
+
+
+async def test_concurrent_callers_share_one_call():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"plan": "oats"}
+
+    results = await asyncio.gather(*(single_flight.do("meal_plan:ru:1", work) for _ in range(5)))
+    assert calls == 1
+    assert results == [{"plan": "oats"}] * 5
+    assert single_flight.stats() == {
+        "leader": 1, "joined_local": 4, "joined_remote": 0, "fallback": 0, "inflight": 0,
+    }
+
+
+async def test_leader_error_reaches_every_caller():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise AIQuotaError("quota")
+
+    results = await asyncio.gather(
+        *(ai_service.coalesced("recipe:ru:1:lunch", work) for _ in range(3)),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, AIQuotaError) for r in results)
+
+
+def _unlock(redis, keys, args):
+    if redis.strings.get(keys[0]) != args[0]:
+        return 0
+    del redis.strings[keys[0]]
+    return 1
+
+
+async def test_leader_publishes_its_result_and_releases_the_lock(fake_redis):
+    fake_redis.scripts[single_flight._UNLOCK] = _unlock
+
+    async def work():
+        return {"plan": "oats"}
+
+    assert await single_flight.do("meal_plan:ru:1", work, redis=fake_redis) == {"plan": "oats"}
+    assert "sf:lock:meal_plan:ru:1" not in fake_redis.strings
+    assert fake_redis.published == [("sf:result:meal_plan:ru:1", '{"ok":{"plan":"oats"}}')]
+
+
+async def _held_elsewhere(redis, key: str, ttl_ms: int = 60_000) -> None:
+    await redis.set(f"sf:lock:{key}", "other-replica", px=ttl_ms)
+
+
+async def test_waiter_gets_result_published_by_another_replica(fake_redis):
+    await _held_elsewhere(fake_redis, "food:ru:borsch:300")
+
+    async def work():
+        raise AssertionError("the other replica is already on it")
+
+    waiter = asyncio.create_task(single_flight.do("food:ru:borsch:300", work, redis=fake_redis))
+    await asyncio.sleep(0.02)
+    await fake_redis.publish("sf:result:food:ru:borsch:300", orjson.dumps({"ok": [{"name": "borsch"}]}))
+    assert await waiter == [{"name": "borsch"}]
+    assert single_flight.stats()["joined_remote"] == 1
+
+
+async def test_remote_error_is_rebuilt_as_the_same_ai_error(fake_redis):
+    key = "ai:digest:weekly:ru:1:2026-10-17"
+    await _held_elsewhere(fake_redis, key)
+    await fake_redis.set(f"sf:result:{key}", orjson.dumps({"error": "AIQuotaError", "message": "quota"}))
+
+    async def work():
+        raise AssertionError("not called")
+
+    with pytest.raises(AIQuotaError, match="quota"):
+        await ai_service.coalesced("digest:weekly:ru:1:2026-10-17", work, fake_redis)
+
+
+async def test_waiter_runs_the_call_itself_when_the_leader_vanishes(fake_redis):
+    await _held_elsewhere(fake_redis, "digest:weekly:ru:1:2026-10-17", ttl_ms=30)
+
+    async def work():
+        return {"text": "mine"}
+
+    assert await single_flight.do("digest:weekly:ru:1:2026-10-17", work, redis=fake_redis) == {"text": "mine"}
+    assert single_flight.stats()["fallback"] == 1
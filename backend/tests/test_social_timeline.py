@@ -0,0 +1,100 @@
+"""Tests for ``app.services.social_timeline`` — Redis fan-out-on-write timelines."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.services import social_timeline
+from tests.conftest import FakeSocialRepository
+
+
+@pytest.fixture
+def world(monkeypatch, fake_redis):
+    repo = FakeSocialRepository(
+        posts={1: (10, 1000), 2: (20, 2000), 3: (30, 3000)},
+        follows={(1, 10), (1, 20), (2, 10)},
+    )
+    monkeypatch.setattr(social_timeline, "SocialRepository", lambda pool: repo)
+    return repo, fake_redis
+
+
+async def test_first_read_builds_timeline_from_postgres(world):
+    repo, redis = world
+    entries = await social_timeline.page(None, redis, 1, limit=10)
+    assert [pid for _, pid in entries] == [2, 1]
+    await social_timeline.page(None, redis, 1, limit=10)
+    assert repo.following_posts_calls == 1
+
+
+async def test_fan_out_reaches_built_timelines_only(world):
+    repo, redis = world
+    await social_timeline.page(None, redis, 1, limit=10)  # user 1 has a timeline, user 2 doesn't
+    repo.posts[4] = (10, 4000)
+    touched = await social_timeline.fan_out(None, redis, 4)
+    assert touched == 1
+    assert "4" in redis.zsets["tl:1"]
+    assert "tl:2" not in redis.zsets
+
+
+async def test_keyset_pages_do_not_overlap(world):
+    repo, redis = world
+    for pid in range(100, 125):
+        repo.posts[pid] = (20, 5000 + pid)
+    first = await social_timeline.page(None, redis, 1, limit=10)
+    second = await social_timeline.page(None, redis, 1, limit=10, cursor=first[9])
+    ids_first = [pid for _, pid in first[:10]]
+    ids_second = [pid for _, pid in second[:10]]
+    assert not set(ids_first) & set(ids_second)
+    assert ids_second[0] == ids_first[-1] - 1
+
+
+async def test_timeline_is_capped(world, monkeypatch):
+    repo, redis = world
+    monkeypatch.setattr(social_timeline.get_settings(), "SOCIAL_TIMELINE_MAX", 3)
+    await social_timeline.page(None, redis, 1, limit=10)
+    for pid in range(200, 205):
+        repo.posts[pid] = (20, 9000 + pid)
+        await social_timeline.fan_out(None, redis, pid)
+    members = redis.zsets["tl:1"]
+    assert len(members) == 4  # cap + sentinel
+    assert social_timeline.SENTINEL in members
+
+
+async def test_celebrity_posts_are_merged_on_read(world, monkeypatch):
+    repo, redis = world
+    monkeypatch.setattr(social_timeline.get_settings(), "SOCIAL_FANOUT_MAX_FOLLOWERS", 1)
+    await social_timeline.page(None, redis, 1, limit=10)
+    repo.posts[5] = (10, 6000)  # user 10 has two followers -> celebrity
+    assert await social_timeline.fan_out(None, redis, 5) == 0
+    assert redis.sets["tl:celebs"] == {"10"}
+    assert "5" not in redis.zsets["tl:1"]
+    entries = await social_timeline.page(None, redis, 1, limit=10)
+    assert entries[0] == (6000, 5)
+
+
+async def test_former_celebrity_posts_stay_visible(world, monkeypatch):
+    repo, redis = world
+    monkeypatch.setattr(social_timeline.get_settings(), "SOCIAL_FANOUT_MAX_FOLLOWERS", 1)
+    await social_timeline.page(None, redis, 1, limit=10)
+    repo.posts[5] = (10, 6000)
+    await social_timeline.fan_out(None, redis, 5)
+    repo.follows.discard((2, 10))  # back under the threshold
+    repo.posts[6] = (10, 7000)
+    await social_timeline.fan_out(None, redis, 6)
+    assert not redis.sets.get("tl:celebs")
+    assert "tl:1" not in redis.zsets
+    entries = await social_timeline.page(None, redis, 1, limit=10)
+    assert entries[:2] == [(7000, 6), (6000, 5)]
+
+
+async def test_remove_drops_post_from_timelines(world):
+    repo, redis = world
+    await social_timeline.page(None, redis, 1, limit=10)
+    await social_timeline.remove(None, redis, 2, 20)
+    assert "2" not in redis.zsets["tl:1"]
+
+
+async def test_without_redis_reads_postgres(world):
+    repo, _ = world
+    entries = await social_timeline.page(None, None, 1, limit=1)
+    assert entries == [(2000, 2), (1000, 1)]
@@ -0,0 +1,134 @@
+"""Tests for the counter-driven badge engine in ``app.services.streak_service``."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.services import streak_service
+from app.services.streak_service import badges_to_grant
+
+
+def _state(**overrides) -> dict:
+    state = {
+        "has_streak": True,
+        "current_streak": 1,
+        "longest_streak": 1,
+        "last_active_date": date.today() - timedelta(days=1),
+        "freezes_available": 1,
+        "last_freeze_reset": streak_service._monday(date.today()),  # noqa: SLF001
+        "food_entries": 0,
+        "workouts": 0,
+        "water_glasses": 0,
+        "water_today": 0,
+        "kcal_today": 0,
+        "protein_today": 0,
+        "fat_today": 0,
+        "carbs_today": 0,
+        "water_goal_days": 0,
+        "workouts_week": 0,
+        "daily_cal": None,
+        "earned": set(),
+    }
+    state.update(overrides)
+    return state
+
+
+def test_new_user_with_nothing_logged_earns_nothing():
+    assert badges_to_grant(_state(), set()) == []
+
+
+def test_first_glass_of_water():
+    assert badges_to_grant(_state(water_glasses=1, water_today=1), set()) == ["water_first"]
+
+
+def test_streak_tiers_accumulate():
+    assert badges_to_grant(_state(current_streak=30), set()) == ["streak_3", "streak_7", "streak_30"]
+
+
+def test_already_earned_rules_are_not_evaluated(monkeypatch):
+    def explode(_state):
+        raise AssertionError("rule for an earned badge was evaluated")
+
+    rules = [("food_first", explode), ("workout_first", lambda s: s["workouts"] >= 1)]
+    monkeypatch.setattr(streak_service, "BADGE_RULES", rules)
+    assert badges_to_grant(_state(workouts=2), {"food_first"}) == ["workout_first"]
+
+
+def test_water_7_needs_a_full_week_of_goal_days():
+    assert "water_7" not in badges_to_grant(_state(water_goal_days=6), set())
+    assert "water_7" in badges_to_grant(_state(water_goal_days=7), set())
+
+
+def test_balanced_macros():
+    # 2000 kcal target -> 150 g protein, ~55.6 g fat, 225 g carbs
+    balanced = _state(kcal_today=1900, protein_today=145, fat_today=57, carbs_today=230, daily_cal=2000)
+    assert "food_balance" in badges_to_grant(balanced, set())
+    skewed = _state(kcal_today=1900, protein_today=60, fat_today=57, carbs_today=230, daily_cal=2000)
+    assert "food_balance" not in badges_to_grant(skewed, set())
+    assert "food_balance" not in badges_to_grant(_state(kcal_today=1900, daily_cal=None), set())
+
+
+class _FakeRepo:
+    def __init__(self, state: dict) -> None:
+        self.state = state
+        self.calls: list[str] = []
+
+    async def badge_state(self, user_id, today, week_start, water_target):
+        self.calls.append("badge_state")
+        return dict(self.state)
+
+    async def upsert_streak(self, **kwargs):
+        self.calls.append("upsert_streak")
+        self.upserted = kwargs
+
+    async def grant_badges(self, user_id, codes):
+        self.calls.append("grant_badges")
+        return [
+            {"id": i, "code": c, "title": c, "description": "", "icon": "", "tier": "bronze",
+             "category": "x", "earned_at": datetime(2026, 10, 17)}
+            for i, c in enumerate(codes)
+        ]
+
+
+@pytest.fixture
+def fake_repo(monkeypatch):
+    holder: dict = {}
+
+    def factory(pool):
+        return holder["repo"]
+
+    monkeypatch.setattr(streak_service, "StreakRepository", factory)
+    return holder
+
+
+async def test_touch_without_new_badges_is_two_queries(fake_repo):
+    fake_repo["repo"] = repo = _FakeRepo(_state(water_glasses=5, earned={"water_first"}))
+    update = await streak_service.touch_activity(None, 7)
+    assert repo.calls == ["badge_state", "upsert_streak"]
+    assert update.current == 2
+    assert update.newly_earned_badges == []
+
+
+async def test_touch_grants_new_badges_in_one_query(fake_repo):
+    fake_repo["repo"] = repo = _FakeRepo(_state(current_streak=2, food_entries=1))
+    update = await streak_service.touch_activity(None, 7)
+    assert repo.calls == ["badge_state", "upsert_streak", "grant_badges"]
+    assert [b["code"] for b in update.newly_earned_badges] == ["streak_3", "food_first"]
+    assert update.newly_earned_badges[0]["earned_at"] == "2026-10-17T00:00:00"
+
+
+async def test_first_touch_starts_streak_and_freeze(fake_repo):
+    fake_repo["repo"] = repo = _FakeRepo(_state(has_streak=False, current_streak=None))
+    update = await streak_service.touch_activity(None, 7)
+    assert (update.current, update.longest, update.freezes_available) == (1, 1, 1)
+    assert repo.upserted["last_freeze_reset"] == streak_service._monday(date.today())  # noqa: SLF001
+
+
+async def test_missed_day_uses_freeze(fake_repo):
+    fake_repo["repo"] = _FakeRepo(_state(
+        current_streak=4, longest_streak=4, last_active_date=date.today() - timedelta(days=2),
+    ))
+    update = await streak_service.touch_activity(None, 7)
+    assert (update.current, update.freezes_available) == (5, 0)
@@ -0,0 +1,131 @@
+"""Tests for ``telegram_bot.update_queue`` — webhook update queue."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from telegram_bot.update_queue import UpdateQueue, chat_key
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def _update(update_id: int, chat_id: int):
+    message = SimpleNamespace(chat=SimpleNamespace(id=chat_id), from_user=None)
+    return SimpleNamespace(update_id=update_id, event=message)
+
+
+async def test_per_chat_order_is_preserved_across_workers():
+    seen: dict[int, list[int]] = {}
+
+    async def handler(update):
+        # Later updates finish faster — a naive pool would reorder them.
+        await asyncio.sleep(0.01 / (update.update_id % 5 + 1))
+        seen.setdefault(update.event.chat.id, []).append(update.update_id)
+
+    queue = UpdateQueue(handler, workers=4, maxsize=100)
+    queue.start()
+    for i in range(40):
+        assert await queue.put(_update(i, chat_id=i % 6))
+    await queue.stop()
+
+    assert queue.processed == 40
+    for chat_id, ids in seen.items():
+        assert ids == sorted(ids), chat_id
+
+
+async def test_full_queue_rejects_after_timeout():
+    release = asyncio.Event()
+
+    async def handler(update):
+        await release.wait()
+
+    queue = UpdateQueue(handler, workers=1, maxsize=1, enqueue_timeout=0.05)
+    queue.start()
+    assert await queue.put(_update(1, 1))
+    await asyncio.sleep(0)  # worker takes #1 and blocks
+    assert await queue.put(_update(2, 1))
+    assert await queue.put(_update(3, 1)) is False
+    assert queue.rejected == 1
+
+    release.set()
+    await queue.stop()
+    assert queue.processed == 2
+
+
+async def test_handler_errors_do_not_kill_worker():
+    async def handler(update):
+        if update.update_id == 1:
+            raise RuntimeError("boom")
+
+    queue = UpdateQueue(handler, workers=1)
+    queue.start()
+    for i in range(3):
+        await queue.put(_update(i, 7))
+    await queue.stop()
+    assert (queue.processed, queue.failed) == (2, 1)
+
+
+async def test_chat_key_falls_back_to_user_then_update_id():
+    callback = SimpleNamespace(
+        message=SimpleNamespace(chat=SimpleNamespace(id=42)), from_user=SimpleNamespace(id=5)
+    )
+    assert chat_key(SimpleNamespace(update_id=1, event=callback)) == 42
+
+    inline = SimpleNamespace(from_user=SimpleNamespace(id=5))
+    assert chat_key(SimpleNamespace(update_id=1, event=inline)) == 5
+    assert chat_key(SimpleNamespace(update_id=9, event=None)) == 9
+
+
+async def test_chat_key_of_an_update_without_a_known_event():
+    from aiogram.types import Update
+
+    assert chat_key(Update.model_validate({"update_id": 7})) == 7
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    import httpx
+    from fastapi import FastAPI
+
+    from app.config import get_settings
+    from app.routers import telegram_webhook
+    from telegram_bot import bot as tg
+
+    queued: list = []
+
+    class _Queue:
+        async def put(self, update):
+            queued.append(update)
+            return True
+
+    monkeypatch.setattr(tg, "bot", SimpleNamespace())
+    monkeypatch.setattr(tg, "update_queue", _Queue())
+    monkeypatch.setattr(get_settings(), "TELEGRAM_WEBHOOK_SECRET", "s3cret")
+    app = FastAPI()
+    app.include_router(telegram_webhook.router)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    return client, queued
+
+
+async def test_webhook_requires_the_secret(webhook, monkeypatch):
+    from app.config import get_settings
+
+    client, queued = webhook
+    body = {"update_id": 1}
+    assert (await client.post("/webhook", json=body)).status_code == 401
+    monkeypatch.setattr(get_settings(), "TELEGRAM_WEBHOOK_SECRET", "")
+    assert (await client.post("/webhook", json=body)).status_code == 401
+    assert queued == []
+
+
+async def test_webhook_rejects_malformed_updates_with_400(webhook):
+    client, queued = webhook
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+    assert (await client.post("/webhook", content=b"{not json", headers=headers)).status_code == 400
+    assert (await client.post("/webhook", json={"update_id": "x"}, headers=headers)).status_code == 400
+    assert (await client.post("/webhook", json={"update_id": 3}, headers=headers)).status_code == 200
+    assert [u.update_id for u in queued] == [3]
@@ -0,0 +1,166 @@
+"""Tests for ``app.services.user_export`` — the personal data archive."""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import zipfile
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.services import user_export
+from tests.conftest import FakeConn, FakePool
+
+
+class _ExportConn(FakeConn):
+    def __init__(self, tables: dict[str, list[dict]]) -> None:
+        super().__init__()
+        self._tables = tables
+
+    async def cursor(self, sql, user_id, prefetch):
+        table = sql.split(" FROM ")[1].split()[0]
+        for row in self._tables.get(table, []):
+            yield row
+
+
+def _pool(tables: dict[str, list[dict]]) -> FakePool:
+    return FakePool(_ExportConn(tables))
+
+
+TABLES = {
+    "user_main": [{"user_id": 7, "user_name": "Ann"}],
+    "food": [
+        {"user_id": 7, "date": date(2026, 10, i), "name_of_food": f"meal {i}", "cal": 100 * i}
+        for i in range(1, 6)
+    ],
+    "chat_history": [
+        {"user_id": 7, "message_text": "привет", "created_at": datetime(2026, 10, 1, tzinfo=timezone.utc)},
+    ],
+}
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+async def test_zip_has_one_member_per_table_and_a_manifest():
+    pool = _pool(TABLES)
+    body = await _collect(user_export.stream(pool, 7, "zip"))
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    assert archive.testzip() is None
+    assert sorted(archive.namelist()) == [
+        "chat_history.ndjson", "food.ndjson", "manifest.json", "user_main.ndjson",
+    ]
+    food = [json.loads(line) for line in archive.read("food.ndjson").splitlines()]
+    assert [r["date"] for r in food] == [f"2026-10-0{i}" for i in range(1, 6)]
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["tables"]["food"] == 5 and manifest["tables"]["water"] == 0
+    assert {"isolation": "repeatable_read", "readonly": True} in pool.conn.transactions
+
+
+async def test_zip_is_emitted_incrementally():
+    async def many():
+        for i in range(20_000):
+            yield "food", {"id": i, "name_of_food": f"meal number {i}"}
+
+    chunks = [c async for c in user_export.zip_stream(many(), 7, chunk_bytes=4096)]
+    assert len(chunks) > 2
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert len(archive.read("food.ndjson").splitlines()) == 20_000
+
+
+async def test_ndjson_lines_are_tagged_with_their_table():
+    body = await _collect(user_export.stream(_pool(TABLES), 7, "ndjson", compress=True))
+    lines = [json.loads(line) for line in gzip.decompress(body).splitlines()]
+    assert [line["table"] for line in lines] == ["user_main"] + ["food"] * 5 + ["chat_history"]
+    assert lines[-1]["row"]["message_text"] == "привет"
+
+
+class _FakeRepo:
+    rows: dict[int, dict] = {}
+    expired: list[int] = []
+    limited = 0
+
+    def __init__(self, pool) -> None:
+        pass
+
+    async def create(self, user_id, fmt, mode, token, limit, window_hours):
+        if _FakeRepo.limited:
+            return None, _FakeRepo.limited
+        row = {"id": len(self.rows) + 1, "user_id": user_id, "format": fmt, "mode": mode,
+               "status": "queued", "token": token, "path": None, "size_bytes": None,
+               "created_at": datetime.now(timezone.utc), "finished_at": None, "expires_at": None}
+        self.rows[row["id"]] = row
+        return row, 0
+
+    async def mark_running(self, export_id):
+        return self.rows.get(export_id)
+
+    async def mark_ready(self, export_id, path, size_bytes, ttl_hours):
+        self.rows[export_id].update(status="ready", path=path, size_bytes=size_bytes)
+
+    async def discard(self, export_id):
+        del self.rows[export_id]
+
+    async def mark_failed(self, export_id, error):
+        self.rows[export_id].update(status="failed", error=error)
+
+    async def expired_files(self):
+        return [{"id": i, "path": r["path"]} for i, r in self.rows.items() if r["status"] == "ready"]
+
+    async def mark_expired(self, export_ids):
+        _FakeRepo.expired.extend(export_ids)
+
+    async def prune(self, days):
+        return 0
+
+
+@pytest.fixture
+def repo(monkeypatch, tmp_path):
+    _FakeRepo.rows, _FakeRepo.expired, _FakeRepo.limited = {}, [], 0
+    monkeypatch.setattr(user_export, "DataExportRepository", _FakeRepo)
+    monkeypatch.setattr(user_export, "export_dir", lambda: tmp_path)
+    return _FakeRepo
+
+
+async def test_background_build_writes_file_and_prune_removes_it(repo, monkeypatch):
+    queued = []
+
+    async def enqueue(pool, kind, payload, **kw):
+        queued.append((kind, payload))
+    monkeypatch.setattr(user_export.job_queue, "enqueue", enqueue)
+
+    pool = _pool(TABLES)
+    row = await user_export.request(pool, 7, "zip")
+    assert queued == [("user_export.build", {"export_id": row["id"]})]
+
+    await user_export.build(pool, row["id"])
+    built = repo.rows[row["id"]]
+    assert built["status"] == "ready"
+    with zipfile.ZipFile(built["path"]) as archive:
+        assert "food.ndjson" in archive.namelist()
+    assert user_export.describe(built)["download_url"] == f"/api/users/me/export/{built['token']}"
+    assert user_export.download_name(built).endswith(".zip")
+
+    assert await user_export.prune(pool) == 1
+    assert repo.expired == [row["id"]]
+    assert not list(user_export.export_dir().iterdir())
+
+
+async def test_failed_enqueue_gives_the_slot_back(repo, monkeypatch):
+    async def enqueue(pool, kind, payload, **kw):
+        raise ConnectionError("db went away")
+    monkeypatch.setattr(user_export.job_queue, "enqueue", enqueue)
+
+    with pytest.raises(ConnectionError):
+        await user_export.request(_pool(TABLES), 7, "zip")
+    assert repo.rows == {}
+
+
+async def test_rate_limit_is_raised_with_retry_after(repo):
+    repo.limited = 120
+    with pytest.raises(user_export.ExportRateLimited) as exc:
+        await user_export.download(_pool(TABLES), 7, "zip")
+    assert exc.value.retry_after == 120
@@ -0,0 +1,125 @@
+"""
+Бенчмарк доступа бота к БД: общий psycopg2-курсор против пула asyncpg.
+
+Моделирует поток апдейтов «выпил стакан воды» (upsert в water + чтение
+суммы калорий еды за день, как в хэндлерах main.py). Старый вариант —
+все апдейты делят одно синхронное соединение, и каждый запрос блокирует
+event loop; новый — запросы идут через пул app.database и выполняются
+конкурентно.
+
+Запуск из корня репозитория (нужен Postgres со схемой backend/init_schema.sql):
+
+    python -m benchmarks.bench_bot_db --updates 2000 --concurrency 50
+
+Используются user_id из диапазона --base-user-id.. (по умолчанию 900000000),
+записи в water за сегодня для них удаляются в конце.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import psycopg2
+
+from app.database import init_db, close_db, get_pool
+from config import config
+
+
+WATER_UPSERT_PG = """
+    INSERT INTO water (user_id, data, count)
+    VALUES (%s, CURRENT_DATE, 1)
+    ON CONFLICT (user_id, data)
+    DO UPDATE SET count = water.count + 1
+    RETURNING count;
+"""
+WATER_UPSERT_ASYNC = WATER_UPSERT_PG.replace('%s', '$1')
+
+FOOD_SUM_PG = "SELECT COALESCE(SUM(cal), 0) FROM food WHERE date = CURRENT_DATE AND user_id = %s"
+FOOD_SUM_ASYNC = FOOD_SUM_PG.replace('%s', '$1')
+
+
+async def _run_shared_cursor(user_ids: list[int], concurrency: int) -> list[float]:
+    conn = psycopg2.connect(**config.get_db_config())
+    cursor = conn.cursor()
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def update(user_id: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            cursor.execute(WATER_UPSERT_PG, (user_id,))
+            cursor.fetchone()
+            conn.commit()
+            cursor.execute(FOOD_SUM_PG, (user_id,))
+            cursor.fetchone()
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0)
+
+    try:
+        await asyncio.gather(*(update(user_id) for user_id in user_ids))
+    finally:
+        cursor.close()
+        conn.close()
+    return latencies
+
+
+async def _run_pool(user_ids: list[int], concurrency: int) -> list[float]:
+    pool = await get_pool()
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def update(user_id: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await pool.fetchval(WATER_UPSERT_ASYNC, user_id)
+            await pool.fetchval(FOOD_SUM_ASYNC, user_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(update(user_id) for user_id in user_ids))
+    return latencies
+
+
+def _report(name: str, latencies: list[float], elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(
+        f"{name:<14} {len(latencies) / elapsed:8.0f} upd/s  "
+        f"p50={statistics.median(latencies):7.2f}ms p99={p99:7.2f}ms"
+    )
+
+
+async def _cleanup(base_user_id: int, users: int) -> None:
+    pool = await get_pool()
+    await pool.execute(
+        "DELETE FROM water WHERE data = CURRENT_DATE AND user_id >= $1 AND user_id < $2",
+        base_user_id, base_user_id + users,
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--base-user-id', type=int, default=900_000_000)
+    args = parser.parse_args()
+
+    user_ids = [args.base_user_id + i % args.users for i in range(args.updates)]
+    await init_db()
+    try:
+        started = time.perf_counter()
+        legacy = await _run_shared_cursor(user_ids, args.concurrency)
+        _report('shared cursor', legacy, time.perf_counter() - started)
+
+        await _cleanup(args.base_user_id, args.users)
+
+        started = time.perf_counter()
+        pooled = await _run_pool(user_ids, args.concurrency)
+        _report('asyncpg pool', pooled, time.perf_counter() - started)
+    finally:
+        await _cleanup(args.base_user_id, args.users)
+        await close_db()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Нагрузочный тест FSM-хранилища бота на Redis.
+
+Каждая «реплика» — отдельный процесс со своим RedisStorage (как
+app.fsm_storage.create_fsm_storage()), который прогоняет сценарии,
+похожие на регистрацию: лок изоляции на чат → get_state → update_data →
+set_state, и в конце clear. Пользователи делятся между репликами так
+же, как апдейты в webhook-режиме, и суммарный поток сравнивается для
+1, 2, 4… реплик.
+
+Запуск из корня репозитория (нужен Redis из config.get_redis_url()):
+
+    python -m benchmarks.bench_fsm_storage --replicas 1 2 4 --flows 2000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from aiogram.fsm.storage.base import DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from app.fsm_storage import dumps, loads
+from config import config
+
+BOT_ID = 1
+STEPS = ('REG:height', 'REG:age', 'REG:sex', 'REG:want', 'REG:weight')
+
+
+async def _run_flows(user_ids: list[int], concurrency: int) -> int:
+    storage = RedisStorage.from_url(
+        config.get_redis_url(),
+        key_builder=DefaultKeyBuilder(prefix='bench_fsm'),
+        state_ttl=config.FSM_STATE_TTL,
+        data_ttl=config.FSM_DATA_TTL,
+        json_dumps=dumps,
+        json_loads=loads,
+    )
+    isolation = storage.create_isolation()
+    semaphore = asyncio.Semaphore(concurrency)
+    operations = 0
+
+    async def flow(user_id: int) -> None:
+        nonlocal operations
+        key = StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id)
+        async with semaphore:
+            for step_no, step in enumerate(STEPS):
+                async with isolation.lock(key):
+                    await storage.get_state(key)
+                    await storage.update_data(key, {f'step{step_no}': 'значение', 'weight': 72.5})
+                    await storage.set_state(key, step)
+                operations += 1
+            await storage.set_state(key, None)
+            await storage.set_data(key, {})
+
+    try:
+        await asyncio.gather(*(flow(user_id) for user_id in user_ids))
+    finally:
+        await isolation.close()
+        await storage.close()
+    return operations
+
+
+def _replica(user_ids: list[int], concurrency: int, start_event, result_queue) -> None:
+    start_event.wait()
+    result_queue.put(asyncio.run(_run_flows(user_ids, concurrency)))
+
+
+def _run(replicas: int, flows: int, concurrency: int) -> float:
+    user_ids = list(range(1_000_000, 1_000_000 + flows))
+    ctx = multiprocessing.get_context('spawn')
+    start_event = ctx.Event()
+    result_queue = ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=_replica,
+            args=(user_ids[i::replicas], concurrency, start_event, result_queue),
+        )
+        for i in range(replicas)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(1.0)  # даём процессам импортироваться до старта замера
+    started = time.perf_counter()
+    start_event.set()
+    operations = sum(result_queue.get() for _ in processes)
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    return operations / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--flows', type=int, default=2000, help='число пользователей со сценарием')
+    parser.add_argument('--concurrency', type=int, default=100, help='одновременных сценариев на реплику')
+    args = parser.parse_args()
+
+    baseline = None
+    for replicas in args.replicas:
+        throughput = _run(replicas, args.flows, args.concurrency)
+        baseline = baseline or throughput
+        print(f"replicas={replicas:<3} {throughput:9.0f} steps/s  x{throughput / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
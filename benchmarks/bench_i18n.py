@@ -0,0 +1,83 @@
+"""
+Бенчмарк локализации бота: старый путь main_mo.printer против кэширующего.
+
+Старый путь на каждый вызов открывал psycopg2-соединение, читал user_lang и
+заново парсил `.mo` через gettext.translation(). Новый берёт язык из LRU и
+каталог из памяти.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_i18n            # без БД: только gettext
+    python -m benchmarks.bench_i18n --with-db  # плюс подключение к Postgres
+"""
+import argparse
+import gettext
+import statistics
+import time
+
+import main_mo
+
+
+KEYS = ('kbmain1', 'svoDAY', 'TrenCal', 'TrenCalDay', 'gram', 'InfoInBase')
+
+
+def _legacy_printer(user_id, com, with_db: bool):
+    leng = 'ru'
+    if with_db:
+        import psycopg2
+        from config import config
+        conn = psycopg2.connect(**config.get_db_config())
+        cursor = conn.cursor()
+        cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (user_id,))
+        result = cursor.fetchone()
+        leng = result[0] if result else 'ru'
+        conn.commit()
+        cursor.close()
+        conn.close()
+    lenguag = gettext.translation('messages', localedir=main_mo.LOCALES_DIR, languages=[leng], fallback=True)
+    return lenguag.gettext(com)
+
+
+def _measure(fn, iterations: int) -> list[float]:
+    samples = []
+    for i in range(iterations):
+        key = KEYS[i % len(KEYS)]
+        started = time.perf_counter()
+        fn(key)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+def _report(name: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(
+        f"{name:<22} mean={statistics.mean(samples):10.1f}µs "
+        f"p50={statistics.median(samples):10.1f}µs p99={p99:10.1f}µs"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--with-db', action='store_true', help='мерить и чтение user_lang из Postgres')
+    args = parser.parse_args()
+
+    legacy_iterations = min(args.iterations, 200) if args.with_db else args.iterations
+    legacy = _measure(lambda k: _legacy_printer(args.user_id, k, args.with_db), legacy_iterations)
+
+    main_mo.preload_translations()
+    if args.with_db:
+        main_mo.get_user_lang(args.user_id)  # прогреваем кэш одним запросом
+    else:
+        main_mo.set_user_lang(args.user_id, 'ru')
+    cached = _measure(lambda k: main_mo.printer(args.user_id, k), args.iterations)
+
+    _report('legacy printer', legacy)
+    _report('cached printer', cached)
+    print(f"speedup: x{statistics.mean(legacy) / statistics.mean(cached):.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,17 @@ class Config:
     # ============================================
     TELEGRAM_TOKEN: str = os.getenv('TOKEN', '')
     
+    # Webhook mode: with TELEGRAM_WEBHOOK_URL set the bot listens on
+    # TELEGRAM_WEBHOOK_HOST:PORT (proxied to the URL) instead of long polling,
+    # so several replicas can share the Redis FSM. The secret is required.
+    TELEGRAM_WEBHOOK_URL: str = os.getenv('TELEGRAM_WEBHOOK_URL', '')
+    TELEGRAM_WEBHOOK_SECRET: str = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+    TELEGRAM_WEBHOOK_HOST: str = os.getenv('TELEGRAM_WEBHOOK_HOST', '0.0.0.0')
+    TELEGRAM_WEBHOOK_PORT: int = int(os.getenv('TELEGRAM_WEBHOOK_PORT', '8081'))
+    TELEGRAM_WEBHOOK_WORKERS: int = int(os.getenv('TELEGRAM_WEBHOOK_WORKERS', '8'))
+    TELEGRAM_WEBHOOK_QUEUE_SIZE: int = int(os.getenv('TELEGRAM_WEBHOOK_QUEUE_SIZE', '1000'))
+    TELEGRAM_WEBHOOK_ENQUEUE_TIMEOUT: float = float(os.getenv('TELEGRAM_WEBHOOK_ENQUEUE_TIMEOUT', '2.0'))
+    
     # ============================================
     # AI Services Configuration (Google Gemini only)
     # ============================================
@@ -34,6 +45,8 @@ class Config:
     DB_SSLMODE: str = os.getenv('DB_SSLMODE', 'prefer')
     DB_SSL_ENABLED: bool = os.getenv('DB_SSL_ENABLED', 'false').lower() == 'true'
     DB_SSL_CERT_PATH: Optional[str] = os.getenv('DB_SSL_CERT_PATH')
+    DB_POOL_MIN: int = int(os.getenv('DB_POOL_MIN', '2'))
+    DB_POOL_MAX: int = int(os.getenv('DB_POOL_MAX', '10'))
     
     # ============================================
     # Redis Configuration (for caching)
@@ -43,6 +56,11 @@ class Config:
     REDIS_PASSWORD: Optional[str] = os.getenv('REDIS_PASSWORD')
     REDIS_DB: int = int(os.getenv('REDIS_DB', '0'))
     
+    # Bot FSM storage: 'redis' (shared by replicas) or 'memory'
+    FSM_STORAGE: str = os.getenv('FSM_STORAGE', 'redis').lower()
+    FSM_STATE_TTL: int = int(os.getenv('FSM_STATE_TTL', str(24 * 60 * 60)))
+    FSM_DATA_TTL: int = int(os.getenv('FSM_DATA_TTL', str(24 * 60 * 60)))
+    
     # ============================================
     # Admin Panel Configuration
     # ============================================
@@ -139,6 +157,28 @@ class Config:
         
         return config
     
+    @classmethod
+    def get_pool_config(cls) -> dict:
+        """
+        Get asyncpg pool configuration (same knobs as backend/app/database.py)
+        
+        Returns:
+            Dictionary of asyncpg.create_pool keyword arguments
+        """
+        pool_config = {
+            'host': cls.DB_HOST,
+            'port': int(cls.DB_PORT),
+            'user': cls.DB_USER,
+            'password': cls.DB_PASSWORD,
+            'database': cls.DB_NAME,
+            'min_size': cls.DB_POOL_MIN,
+            'max_size': cls.DB_POOL_MAX,
+            'command_timeout': cls.DB_TIMEOUT,
+        }
+        if cls.DB_SSL_ENABLED:
+            pool_config['ssl'] = cls.DB_SSLMODE
+        return pool_config
+    
     @classmethod
     def get_redis_url(cls) -> str:
         """Get Redis connection URL"""
@@ -166,6 +206,12 @@ class Config:
         print(f"  - Database: {cls.DB_NAME}")
         print(f"  - User: {cls.DB_USER}")
         print(f"  - SSL: {cls.DB_SSL_ENABLED}")
+        print(f"  - Pool: {cls.DB_POOL_MIN}-{cls.DB_POOL_MAX}")
+        print()
+        print("Bot FSM:")
+        print(f"  - Storage: {cls.FSM_STORAGE}")
+        print(f"  - TTL: state={cls.FSM_STATE_TTL}s, data={cls.FSM_DATA_TTL}s")
+        print(f"  - Updates: {'webhook ' + cls.TELEGRAM_WEBHOOK_URL if cls.TELEGRAM_WEBHOOK_URL else 'long polling'}")
         print()
         if not hide_secrets:
             print("Secrets:")
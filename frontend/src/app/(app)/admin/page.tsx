@@ -1170,8 +1170,9 @@ interface TableData {
   columns: { column_name: string }[] | string[];
   rows: Record<string, unknown>[];
   total: number;
-  page: number;
+  total_exact: boolean;
   per_page: number;
+  next_cursor: string | null;
 }
 
 interface TablePolicy {
@@ -1185,7 +1186,8 @@ function TablesPanel() {
   const [tables, setTables] = useState<string[]>([]);
   const [active, setActive] = useState("");
   const [data, setData] = useState<TableData | null>(null);
-  const [page, setPage] = useState(1);
+  // Keyset paging: cursors[i] loads page i + 1 (null = first page).
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
   const [loading, setLoading] = useState(false);
   const [editing, setEditing] = useState<{ pkCol: string; pkVal: string } | null>(
     null,
@@ -1198,15 +1200,18 @@ function TablesPanel() {
     );
   }, []);
 
-  const load = useCallback(async (tableName: string, p: number) => {
+  const load = useCallback(async (tableName: string, stack: (string | null)[]) => {
     setLoading(true);
     try {
+      const cursor = stack[stack.length - 1];
       const r = await api<TableData>(
-        `/api/admin/tables/${tableName}?page=${p}&per_page=20`,
+        `/api/admin/tables/${tableName}?per_page=20${
+          cursor ? `&cursor=${encodeURIComponent(cursor)}` : ""
+        }`,
       );
       setData(r);
       setActive(tableName);
-      setPage(p);
+      setCursors(stack);
       // Pull the policy so the row click can decide whether to open the
       // editor (editable table) or just show a read-only drawer banner.
       const firstRow = r.rows[0];
@@ -1247,7 +1252,7 @@ function TablesPanel() {
         {tables.map((tableName) => (
           <button
             key={tableName}
-            onClick={() => load(tableName, 1)}
+            onClick={() => load(tableName, [null])}
             className={`text-[11px] px-3 py-1.5 rounded-full font-mono transition active:scale-95 ${
               active === tableName
                 ? "bg-[var(--accent)] text-white"
@@ -1333,22 +1338,25 @@ function TablesPanel() {
               })}
             </tbody>
           </table>
-          {data.total > data.per_page && (
+          {(cursors.length > 1 || data.next_cursor) && (
             <div className="flex items-center justify-between p-3 text-xs border-t border-[var(--border)]">
               <span className="text-[var(--muted)]">
-                {t("admin_table_records_count", { total: data.total, page })}
+                {t("admin_table_records_count", {
+                  total: `${data.total_exact ? "" : "~"}${data.total}`,
+                  page: cursors.length,
+                })}
               </span>
               <div className="flex gap-1">
                 <button
-                  disabled={page <= 1}
-                  onClick={() => load(active, page - 1)}
+                  disabled={cursors.length <= 1}
+                  onClick={() => load(active, cursors.slice(0, -1))}
                   className="px-3 py-1 border border-[var(--border)] rounded-full disabled:opacity-30 active:scale-95"
                 >
                   ←
                 </button>
                 <button
-                  disabled={page * data.per_page >= data.total}
-                  onClick={() => load(active, page + 1)}
+                  disabled={!data.next_cursor}
+                  onClick={() => load(active, [...cursors, data.next_cursor])}
                   className="px-3 py-1 border border-[var(--border)] rounded-full disabled:opacity-30 active:scale-95"
                 >
                   →
@@ -1371,8 +1379,8 @@ function TablesPanel() {
             pkColumn={editing.pkCol}
             pkValue={editing.pkVal}
             onClose={() => setEditing(null)}
-            onSaved={() => load(active, page)}
-            onDeleted={() => load(active, page)}
+            onSaved={() => load(active, cursors)}
+            onDeleted={() => load(active, cursors)}
           />
         )}
       </AnimatePresence>
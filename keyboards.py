@@ -1,18 +1,44 @@
+"""
+Reply-клавиатуры бота.
+
+Клавиатуры зависят только от (языка, имени), поэтому каждая собирается один
+раз на язык и дальше отдаётся из кэша. Язык пользователя берётся из общего
+кэша main_mo (без подключения к БД). Объекты aiogram неизменяемы (frozen),
+но списки кнопок внутри — нет: возвращённую клавиатуру нельзя модифицировать.
+"""
+from functools import lru_cache
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 import main_mo as l
-from enum import Enum
-import psycopg2
-from aiogram import types
-import gettext
-from config import config
 
 
 lenguages = {'Русский 🇷🇺':'ru', 'English 🇬🇧':'en', 'Deutsch 🇩🇪':'de','Française 🇫🇷':'fr', 'Spanish 🇪🇸':'es'}
 
-
-
-def starter(k):
-    lenguage = ReplyKeyboardMarkup(
+# Раскладка кнопок: имя клавиатуры -> ряды ключей перевода
+KEYBOARD_LAYOUTS = {
+    'startMenu': (("kbENTRANCE", "kbREG"),),
+    'entranse': (("kbENTRANCE2PROG",),),
+    'reRig': (("kbreREG",),),
+    'sex': (("kbMAN", "kbWOMAN"),),
+    'food': (("kbfood1", "kbfood2"),),
+    'want': (("kbwant1", "kbwant2", "kbwant3"),),
+    'main_menu': (
+        ("kbmain1", "kbmain2", "kbmain3"),
+        ("kbmain4", "kbmain5"),
+        ("kbmain6",),
+        ("kbmain7",),
+        ("kbmain8",),
+        ("kbmain9",),
+    ),
+    'meals': (("kbmeal1", "kbmeal2", "kbmeal3"),),
+    'svo': (("kbsvo1", "kbsvo2", "kbsvo3"),),
+    'tren_type': (("kbtype1", "kbtype2", "kbtype3"),),
+    'tren_choise': (("kbchoise1", "kbchoise2"),),
+}
+
+@lru_cache(maxsize=None)
+def _language_keyboard():
+    return ReplyKeyboardMarkup(
         keyboard=[
             [
                 KeyboardButton(text='Русский 🇷🇺'),
@@ -29,9 +55,13 @@ def starter(k):
         resize_keyboard=True,
         one_time_keyboard=True,
     )
-    kb = {'lenguage': lenguage}
+
+
+def starter(k):
+    kb = {'lenguage': _language_keyboard()}
     return kb[k]
 
+@lru_cache(maxsize=None)
 def privacy_consent_keyboard(lang_code='ru'):
     """Creates an inline keyboard for privacy consent in different languages."""
     
@@ -70,206 +100,37 @@ def privacy_consent_keyboard(lang_code='ru'):
     )
     return keyboard
 
-def keyboard(user_id, k):
-    conn = psycopg2.connect(**config.get_db_config())
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT lang FROM user_lang WHERE user_id = {}".format(int(user_id))
-    )
-    result = cursor.fetchone()
-    
-    # Если язык не найден, используем русский по умолчанию
-    if result is None:
-        leng1 = 'ru'
-    else:
-        leng1 = result[0]
-    
-    conn.commit()
-    cursor.close()
-
-    leng = gettext.translation('messages', localedir='locales', languages=[leng1], fallback=False)
-    leng.install()
-
-    startMenu = ReplyKeyboardMarkup(
+@lru_cache(maxsize=256)
+def build_keyboard(lang, k):
+    """
+    Собирает клавиатуру для языка (результат кэшируется на весь процесс).
+
+    Args:
+        lang: Код языка (ru, en, de, fr, es)
+        k: Имя клавиатуры из KEYBOARD_LAYOUTS или 'lenguage'
+
+    Returns:
+        ReplyKeyboardMarkup
+    """
+    if k == 'lenguage':
+        return _language_keyboard()
+    translation = l.get_translation(lang)
+    return ReplyKeyboardMarkup(
         keyboard=[
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbENTRANCE")),
-                KeyboardButton(text=l.printer_with_given(leng, 'kbREG')),
-
-            ]
-
+            [KeyboardButton(text=translation.gettext(key)) for key in row]
+            for row in KEYBOARD_LAYOUTS[k]
         ],
         resize_keyboard=True,
         one_time_keyboard=True,
-
     )
 
-    entranse = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text = l.printer_with_given( leng, "kbENTRANCE2PROG")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-
-    reRig = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text= l.printer_with_given(leng,"kbreREG")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    sex = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text=l.printer_with_given( leng, "kbMAN")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbWOMAN")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    food = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbfood1")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbfood2")),
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
-    want = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbwant1")),
-                KeyboardButton(text=l.printer_with_given(leng,"kbwant2")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbwant3")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    main_menu = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbmain1")),
-                KeyboardButton(text=l.printer_with_given( leng,"kbmain2")),
-                KeyboardButton(text=l.printer_with_given( leng,"kbmain3")),
-            ],
-            [
-                KeyboardButton(text=l.printer_with_given( leng,"kbmain4")),
-                KeyboardButton(text=l.printer_with_given( leng, "kbmain5")),
-            ],
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbmain6")),
-            ],
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbmain7")),
-            ],
-            [
-                KeyboardButton(text = l.printer_with_given(leng, "kbmain8")),
-            ],
-            [
-                KeyboardButton(text=l.printer_with_given( leng,"kbmain9")),
-            ]
-
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-
-    meals = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbmeal1")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbmeal2")),
-                KeyboardButton(text=l.printer_with_given( leng,"kbmeal3")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    svo = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbsvo1")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbsvo2")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbsvo3")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    tren_type = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbtype1")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbtype2")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbtype3")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    tren_choise = ReplyKeyboardMarkup(
-        keyboard = [
-            [
-                KeyboardButton(text=l.printer_with_given(leng, "kbchoise1")),
-                KeyboardButton(text=l.printer_with_given(leng, "kbchoise2")),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-    lenguage = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text='Русский 🇷🇺'),
-                KeyboardButton(text='English 🇬🇧'),
-                KeyboardButton(text='Deutsch 🇩🇪'),
-            ],
-            [
-                KeyboardButton(text='Française 🇫🇷'),
-                KeyboardButton(text='Spanish 🇪🇸'),
-
-            ]
-
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True,
-    )
-
-    kb = {'startMenu': startMenu, 'lenguage': lenguage, 'entranse': entranse,  'reRig': reRig, 'sex': sex, 'food': food,
-          'want': want, 'main_menu': main_menu, 'meals': meals, 'svo': svo, 'tren_type': tren_type,
-          'tren_choise': tren_choise}
-    return kb[k]
-
-
-
-
 
+def preload_keyboards():
+    """Собирает все клавиатуры для всех поддерживаемых языков (вызывается при старте)."""
+    for lang in l.SUPPORTED_LANGUAGES:
+        for k in KEYBOARD_LAYOUTS:
+            build_keyboard(lang, k)
 
 
+def keyboard(user_id, k):
+    return build_keyboard(l.get_user_lang(user_id), k)
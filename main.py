@@ -1,4 +1,3 @@
-import psycopg2
 from aiogram.filters import CommandStart
 from aiogram.client.bot import DefaultBotProperties
 from aiogram.enums import ParseMode
@@ -9,16 +8,26 @@ from config import config
 import keyboards as kb
 import asyncio
 import datetime
+import time
 from datetime import date
 from aiogram import Bot, Dispatcher, types, F, Router
 from aiogram.types import Message, FSInputFile, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
+# Пул подключений asyncpg (та же настройка, что в backend/app/database.py)
+from app.database import init_db, close_db, get_pool
+from app.fsm_storage import create_fsm_storage
+from app.domain.food.photo_service import recognize_food_photo
+
 # Импорты для новой системы тренировок
-from app.domain.workouts.workout_service import get_workout_service
+from app.domain.workouts.workout_service import (
+    get_workout_service,
+    listen_for_training_type_changes,
+    stop_listening_for_training_type_changes,
+)
 from app.presentation.bot.routers.workout_handlers import get_workout_router, WorkoutStates
-from aiogram.fsm.storage.memory import MemoryStorage
+from app.presentation.bot.webhook import run_webhook
 from aiogram.filters import Command
 import main_mo as l
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -142,10 +151,12 @@ class PrivacyConsentMiddleware(BaseMiddleware):
             return await handler(event, data)
 
         # Проверяем согласие в базе данных
-        cursor.execute("SELECT privacy_consent_given FROM user_main WHERE user_id = %s", (user_id,))
-        result = cursor.fetchone()
+        pool = await get_pool()
+        consent_given = await pool.fetchval(
+            "SELECT privacy_consent_given FROM user_main WHERE user_id = $1", user_id
+        )
 
-        if not result or not result[0]:
+        if not consent_given:
             # Если согласия нет, отправляем напоминание
             await bot.send_message(
                 user_id,
@@ -176,12 +187,16 @@ TOKEN = config.TELEGRAM_TOKEN
 # ============================================
 
 class DatabaseMiddleware(BaseMiddleware):
-    """Middleware для передачи db_connection и workout_service в обработчики"""
+    """
+    Middleware для передачи db_pool и workout_service в обработчики.
+    
+    Заодно прогревает кэш языка пользователя, чтобы синхронные l.printer()
+    и kb.keyboard() внутри хэндлера не ходили в БД.
+    """
     
-    def __init__(self, db_connection, workout_service):
+    def __init__(self):
         super().__init__()
-        self.db_connection = db_connection
-        self.workout_service = workout_service
+        self.workout_service = None
     
     async def __call__(
         self,
@@ -189,23 +204,23 @@ class DatabaseMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        data["db_connection"] = self.db_connection
+        pool = await get_pool()
+        if self.workout_service is None:
+            self.workout_service = get_workout_service(pool)
+        data["db_pool"] = pool
         data["workout_service"] = self.workout_service
+        
+        user = data.get("event_from_user")
+        if user is not None:
+            try:
+                await l.load_user_lang(user.id)
+            except Exception as e:
+                bot_logger.warning(f"Could not preload language for user {user.id}: {e}")
         return await handler(event, data)
 
-
-# Подключение к БД и создание сервисов
-conn = psycopg2.connect(**config.get_db_config())
-conn.autocommit = True  # Включаем автокоммит для немедленного сохранения данных
-cursor = conn.cursor()
-
-# Создание сервиса тренировок
-workout_service = get_workout_service(conn)
-bot_logger.info("Database connection established with autocommit enabled")
-
 bot = Bot(TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
+storage, events_isolation = create_fsm_storage()
+dp = Dispatcher(storage=storage, events_isolation=events_isolation)
 
 # Регистрация роутера тренировок
 workout_router = get_workout_router()
@@ -213,7 +228,34 @@ dp.include_router(workout_router)
 
 # Register middleware
 dp.update.middleware(PrivacyConsentMiddleware())
-dp.update.middleware(DatabaseMiddleware(conn, workout_service))
+dp.update.middleware(DatabaseMiddleware())
+
+
+_training_types_listener = None
+
+
+async def on_startup():
+    """Создаёт пул подключений, грузит каталоги переводов и собирает клавиатуры"""
+    global _training_types_listener
+    pool = await init_db()
+    l.preload_translations()
+    kb.preload_keyboards()
+    try:
+        _training_types_listener = await listen_for_training_type_changes(pool)
+    except Exception as e:
+        bot_logger.warning(f"training_types change listener not started, cache relies on TTL: {e}")
+
+
+async def on_shutdown():
+    global _training_types_listener
+    if _training_types_listener is not None:
+        await stop_listening_for_training_type_changes(await get_pool(), _training_types_listener)
+        _training_types_listener = None
+    await close_db()
+
+
+dp.startup.register(on_startup)
+dp.shutdown.register(on_shutdown)
 
 # ВАЖНО: Регистрируем AI chat router ПОСЛЕДНИМ, чтобы он обрабатывал
 # только те сообщения, которые не обработали другие хэндлеры
@@ -271,31 +313,31 @@ async def command_start(message: Message, state: FSMContext):
             utm_campaign = params[3]
 
     # Создаем или обновляем пользователя в БД
-    cursor.execute("SELECT privacy_consent_given, ref_code FROM user_main WHERE user_id = %s", (user_id,))
-    result = cursor.fetchone()
+    pool = await get_pool()
+    result = await pool.fetchrow(
+        "SELECT privacy_consent_given, ref_code FROM user_main WHERE user_id = $1", user_id
+    )
     
     if result and (ref_code and not result[1]):
-        cursor.execute(
+        await pool.execute(
             """
             UPDATE user_main 
-            SET utm_source = %s, utm_medium = %s, utm_campaign = %s, ref_code = %s
-            WHERE user_id = %s;
+            SET utm_source = $1, utm_medium = $2, utm_campaign = $3, ref_code = $4
+            WHERE user_id = $5;
             """,
-            (utm_source, utm_medium, utm_campaign, ref_code, user_id)
+            utm_source, utm_medium, utm_campaign, ref_code, user_id
         )
-        conn.commit()
     
     if not result:
         # Если пользователь новый, создаем запись
-        cursor.execute(
+        await pool.execute(
             """
             INSERT INTO user_main (user_id, user_name, utm_source, utm_medium, utm_campaign, ref_code)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            VALUES ($1, $2, $3, $4, $5, $6)
             ON CONFLICT (user_id) DO NOTHING;
             """,
-            (user_id, message.from_user.first_name, utm_source, utm_medium, utm_campaign, ref_code)
+            user_id, message.from_user.first_name, utm_source, utm_medium, utm_campaign, ref_code
         )
-        conn.commit()
 
     # Всегда показываем выбор языка (независимо от того, новый пользователь или вернувшийся)
     welcome_text = (
@@ -329,21 +371,19 @@ async def handle_privacy_consent(callback_query: CallbackQuery, state: FSMContex
     user_id = callback_query.from_user.id
     
     # Получаем язык пользователя
-    cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (user_id,))
-    result = cursor.fetchone()
-    lang_code = result[0] if result else 'en'
+    pool = await get_pool()
+    lang_code = await pool.fetchval("SELECT lang FROM user_lang WHERE user_id = $1", user_id) or 'en'
     
     if callback_query.data == 'accept_privacy':
         # Пользователь согласился
-        cursor.execute(
+        await pool.execute(
             """
             UPDATE user_main 
             SET privacy_consent_given = TRUE, privacy_consent_at = NOW() 
-            WHERE user_id = %s;
+            WHERE user_id = $1;
             """,
-            (user_id,)
+            user_id
         )
-        conn.commit()
         bot_logger.info(f"User {user_id} accepted privacy policy")
         
         # Удаляем старое сообщение с политикой
@@ -405,23 +445,25 @@ async def handle_language_selection(message: Message, state: FSMContext):
     bot_logger.info(f"User {user_id} selected language: {lang_code}")
 
     # Сохраняем язык в БД
-    cursor.execute(
+    pool = await get_pool()
+    await pool.execute(
         """
         INSERT INTO user_lang (user_id, lang)
-        VALUES (%s, %s)
+        VALUES ($1, $2)
         ON CONFLICT (user_id)
         DO UPDATE SET lang = EXCLUDED.lang;
         """,
-        (user_id, lang_code)
+        user_id, lang_code
     )
-    conn.commit()
+    l.set_user_lang(user_id, lang_code)
     bot_logger.info(f"Language {lang_code} saved for user {user_id}")
     
     # Проверяем, давал ли пользователь согласие на политику конфиденциальности
-    cursor.execute("SELECT privacy_consent_given FROM user_main WHERE user_id = %s", (user_id,))
-    result = cursor.fetchone()
+    consent_given = await pool.fetchval(
+        "SELECT privacy_consent_given FROM user_main WHERE user_id = $1", user_id
+    )
     
-    if result and result[0]:
+    if consent_given:
         # Если уже давал согласие, переходим сразу к меню регистрации
         bot_logger.info(f"User {user_id} already gave consent, showing registration menu")
         await show_registration_menu(message, lang_code)
@@ -669,22 +711,20 @@ async def entrance(message: Message, state: FSMContext):
     
     try:
         # Используем параметризованный запрос для безопасности
-        cursor.execute("""
+        pool = await get_pool()
+        user_data = await pool.fetchrow("""
             SELECT imt, imt_str, cal, weight, height 
             FROM user_health 
-            WHERE user_id = %s
+            WHERE user_id = $1
             ORDER BY date DESC
             LIMIT 1
-        """, (user_id,))
-        user_data = cursor.fetchone()
+        """, user_id)
         
         if not user_data:
             bot_logger.warning(f"User {user_id} tried to login but no data found in user_health")
             
             # Получаем язык пользователя для правильного сообщения
-            cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (user_id,))
-            lang_result = cursor.fetchone()
-            lang_code = lang_result[0] if lang_result else 'ru'
+            lang_code = l.get_user_lang(user_id)
             
             # Сообщения на разных языках
             no_data_messages = {
@@ -771,9 +811,7 @@ async def height(message: Message, state: FSMContext):
         await state.set_state(REG.age_calendar)
         
         # Получаем язык пользователя для календаря
-        cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (message.from_user.id,))
-        lang_result = cursor.fetchone()
-        lang_code = lang_result[0] if lang_result else 'ru'
+        lang_code = l.get_user_lang(message.from_user.id)
         
         # Показываем выбор года (новый UX)
         # Минимальная дата: 1950 год (фиксированный)
@@ -985,34 +1023,36 @@ async def wei(message: Message, state: FSMContext):
         cal = float(calculate_calories(sex, weight, height, age, message))
 
         # Сохраняем данные о здоровье
-        bot_logger.info(f"Inserting user_health: user_id={message.from_user.id}, imt={imt}, cal={cal}, weight={weight}, height={height}")
-        cursor.execute("""
-            INSERT INTO user_health (user_id, imt, imt_str, cal, date, weight, height) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (message.from_user.id, imt, imt_using_words, cal, datetime.datetime.now().strftime('%Y-%m-%d'), weight, height))
-        bot_logger.info("user_health inserted successfully")
-        
-        # Сохраняем данные пользователя в user_main (дата рождения в формате ДД-ММ-ГГГГ)
-        bot_logger.info(f"Inserting/updating user_main: user_id={message.from_user.id}, sex={sex}, birthdate={birthdate}")
-        cursor.execute("""
-            INSERT INTO user_main (user_id, user_name, user_sex, date_of_birth)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (user_id)
-            DO UPDATE SET user_sex = EXCLUDED.user_sex, date_of_birth = EXCLUDED.date_of_birth;
-            """, (message.from_user.id, message.from_user.first_name, sex, birthdate))
-        bot_logger.info("user_main inserted/updated successfully")
-        
-        # Сохраняем цели пользователя в user_aims
-        bot_logger.info(f"Inserting/updating user_aims: user_id={message.from_user.id}, aim={aim}, cal={cal}")
-        cursor.execute("""
-            INSERT INTO user_aims (user_id, user_aim, daily_cal)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (user_id)
-            DO UPDATE SET user_aim = EXCLUDED.user_aim, daily_cal = EXCLUDED.daily_cal;
-            """, (message.from_user.id, aim, cal))
-        bot_logger.info("user_aims inserted/updated successfully")
-
-        conn.commit()
+        pool = await get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            bot_logger.info(f"Inserting user_health: user_id={message.from_user.id}, imt={imt}, cal={cal}, weight={weight}, height={height}")
+            await conn.execute("""
+                INSERT INTO user_health (user_id, imt, imt_str, cal, date, weight, height) 
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                """, message.from_user.id, imt, imt_using_words, cal, datetime.date.today(), weight, height)
+            bot_logger.info("user_health inserted successfully")
+            
+            # Сохраняем данные пользователя в user_main (дата рождения приходит в формате ДД-ММ-ГГГГ)
+            bot_logger.info(f"Inserting/updating user_main: user_id={message.from_user.id}, sex={sex}, birthdate={birthdate}")
+            await conn.execute("""
+                INSERT INTO user_main (user_id, user_name, user_sex, date_of_birth)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (user_id)
+                DO UPDATE SET user_sex = EXCLUDED.user_sex, date_of_birth = EXCLUDED.date_of_birth;
+                """, message.from_user.id, message.from_user.first_name, sex,
+                datetime.datetime.strptime(birthdate, '%d-%m-%Y').date())
+            bot_logger.info("user_main inserted/updated successfully")
+            
+            # Сохраняем цели пользователя в user_aims
+            bot_logger.info(f"Inserting/updating user_aims: user_id={message.from_user.id}, aim={aim}, cal={cal}")
+            await conn.execute("""
+                INSERT INTO user_aims (user_id, user_aim, daily_cal)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (user_id)
+                DO UPDATE SET user_aim = EXCLUDED.user_aim, daily_cal = EXCLUDED.daily_cal;
+                """, message.from_user.id, aim, cal)
+            bot_logger.info("user_aims inserted/updated successfully")
+
         bot_logger.info(f"User {message.from_user.id} registered successfully: sex={sex}, birthdate={birthdate}, age={age}, weight={weight}, height={height}, all data committed to DB")
         await bot.send_message(
             message.chat.id,
@@ -1084,8 +1124,7 @@ def markdown_to_telegram_html(text):
 
 def split_message(text, user_id):
     a = list(text.split("\n"))
-    cursor.execute("SELECT lang FROM user_lang WHERE user_id = {}".format(user_id))
-    ll = cursor.fetchone()[0]
+    ll = l.get_user_lang(user_id)
     b = ''
     translator = Translator(from_lang='ru', to_lang=ll)
     for i in range(len(a)):
@@ -1098,23 +1137,26 @@ def split_message(text, user_id):
     return [formatted_text[i:i + max_length] for i in range(0, len(formatted_text), max_length)]
 
 
-def calculate_age_from_birthdate(birthdate: str) -> int:
+def calculate_age_from_birthdate(birthdate) -> int:
     """
     Вычисляет текущий возраст из даты рождения в формате ДД-ММ-ГГГГ
     
     Args:
-        birthdate: Дата рождения в формате 'ДД-ММ-ГГГГ' (строка)
+        birthdate: Дата рождения в формате 'ДД-ММ-ГГГГ' (строка) или date из БД
     
     Returns:
         Текущий возраст в годах
     """
     try:
         # Парсим дату рождения
-        birth_day, birth_month, birth_year = map(int, birthdate.split('-'))
-        birth_date = datetime.datetime(birth_year, birth_month, birth_day)
+        if isinstance(birthdate, datetime.date):
+            birth_date = birthdate
+        else:
+            birth_day, birth_month, birth_year = map(int, birthdate.split('-'))
+            birth_date = datetime.date(birth_year, birth_month, birth_day)
         
         # Получаем текущую дату
-        today = datetime.datetime.now()
+        today = datetime.date.today()
         
         # Вычисляем возраст
         age = today.year - birth_date.year
@@ -1142,9 +1184,7 @@ def validate_birthdate(birthdate_str: str, user_id: int) -> tuple[bool, str]:
     """
     try:
         # Получаем язык пользователя
-        cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (user_id,))
-        lang_result = cursor.fetchone()
-        lang_code = lang_result[0] if lang_result else 'ru'
+        lang_code = l.get_user_lang(user_id)
         
         # Словари с сообщениями об ошибках
         error_messages = {
@@ -1277,13 +1317,13 @@ async def set_weight_and_continue(message: Message, state: FSMContext):
         return
 
     # Сохраняем вес в БД
-    cursor.execute(
+    pool = await get_pool()
+    await pool.execute(
         """INSERT INTO user_health (user_id, date, weight)
-           VALUES (%s, CURRENT_DATE, %s)
+           VALUES ($1, CURRENT_DATE, $2)
            ON CONFLICT (user_id, date) DO UPDATE SET weight = EXCLUDED.weight""",
-        (message.from_user.id, weight)
+        message.from_user.id, weight
     )
-    conn.commit()
 
     # Возвращаемся в обычный сценарий
     await state.set_state(REG.length)
@@ -1308,24 +1348,18 @@ async def tren_len(message: Message, state: FSMContext):
             await message.answer("Введите число — ваш вес в кг (например, 72.5).")
             return
 
-        # 2) Пишем вес в БД через SELECT/UPDATE/INSERT (без ON CONFLICT)
-        cursor.execute(
-            "SELECT 1 FROM user_health WHERE user_id = %s AND date = CURRENT_DATE",
-            (user_id,)
-        )
-        exists = cursor.fetchone() is not None
-
-        if exists:
-            cursor.execute(
-                "UPDATE user_health SET weight = %s WHERE user_id = %s AND date = CURRENT_DATE",
-                (weight, user_id)
-            )
-        else:
-            cursor.execute(
-                "INSERT INTO user_health (user_id, date, weight) VALUES (%s, CURRENT_DATE, %s)",
-                (user_id, weight)
+        # 2) Пишем вес в БД через UPDATE/INSERT (без ON CONFLICT)
+        pool = await get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            updated = await conn.execute(
+                "UPDATE user_health SET weight = $1 WHERE user_id = $2 AND date = CURRENT_DATE",
+                weight, user_id
             )
-        conn.commit()
+            if updated == "UPDATE 0":
+                await conn.execute(
+                    "INSERT INTO user_health (user_id, date, weight) VALUES ($1, CURRENT_DATE, $2)",
+                    user_id, weight
+                )
 
         # 3) Сбрасываем флаг ожидания веса и продолжаем расчёт
         await state.update_data(waiting_for_weight=False)
@@ -1356,17 +1390,15 @@ async def tren_len(message: Message, state: FSMContext):
 
         tren_cal = round((weight * intensivity * time_min / 24), 3)
 
-        cursor.execute(
-            "INSERT INTO user_training (user_id, date, training_cal, tren_time) VALUES (%s, CURRENT_DATE, %s, %s)",
-            (user_id, tren_cal, time_min)
+        await pool.execute(
+            "INSERT INTO user_training (user_id, date, training_cal, tren_time) VALUES ($1, CURRENT_DATE, $2, $3)",
+            user_id, tren_cal, time_min
         )
-        conn.commit()
 
-        cursor.execute(
-            "SELECT COALESCE(SUM(training_cal), 0) FROM user_training WHERE date = CURRENT_DATE AND user_id = %s",
-            (user_id,)
+        result = await pool.fetchval(
+            "SELECT COALESCE(SUM(training_cal), 0) FROM user_training WHERE date = CURRENT_DATE AND user_id = $1",
+            user_id
         )
-        result = cursor.fetchone()[0]
 
         await bot.send_message(message.chat.id, text=l.printer(user_id, 'TrenCal').format(tren_cal))
         await bot.send_message(
@@ -1393,11 +1425,11 @@ async def tren_len(message: Message, state: FSMContext):
         return
 
     # 2) Пробуем получить вес на сегодня
-    cursor.execute(
-        "SELECT weight FROM user_health WHERE user_id = %s AND date = CURRENT_DATE",
-        (user_id,)
+    pool = await get_pool()
+    row = await pool.fetchrow(
+        "SELECT weight FROM user_health WHERE user_id = $1 AND date = CURRENT_DATE",
+        user_id
     )
-    row = cursor.fetchone()
 
     if not row or row[0] is None:
         # Запрашиваем вес и ждём новое сообщение в этом же состоянии
@@ -1417,17 +1449,15 @@ async def tren_len(message: Message, state: FSMContext):
 
     tren_cal = round((weight * intensivity * time_min / 24), 3)
 
-    cursor.execute(
-        "INSERT INTO user_training (user_id, date, training_cal, tren_time) VALUES (%s, CURRENT_DATE, %s, %s)",
-        (user_id, tren_cal, time_min)
+    await pool.execute(
+        "INSERT INTO user_training (user_id, date, training_cal, tren_time) VALUES ($1, CURRENT_DATE, $2, $3)",
+        user_id, tren_cal, time_min
     )
-    conn.commit()
 
-    cursor.execute(
-        "SELECT COALESCE(SUM(training_cal), 0) FROM user_training WHERE date = CURRENT_DATE AND user_id = %s",
-        (user_id,)
+    result = await pool.fetchval(
+        "SELECT COALESCE(SUM(training_cal), 0) FROM user_training WHERE date = CURRENT_DATE AND user_id = $1",
+        user_id
     )
-    result = cursor.fetchone()[0]
 
     await bot.send_message(message.chat.id, text=l.printer(user_id, 'TrenCal').format(tren_cal))
     await bot.send_message(
@@ -1492,48 +1522,37 @@ async def handle_photo(message: Message, state: FSMContext):
             await message.answer("⚠️ Пожалуйста, отправьте фото еды.")
             return
         
-    await state.update_data(food_photo=message.photo)
+    # В FSM храним только file_id самого большого размера (данные сериализуются в JSON)
+    await state.update_data(food_photo=message.photo[-1].file_id)
     data = await state.get_data()
-    photo = data['food_photo'][-1]
+    photo_file_id = data['food_photo']
+    started = time.perf_counter()
 
         # Показываем что обрабатываем
     processing_msg = await message.answer("🔍 Анализирую фото еды...")
         
-        # Скачиваем фото
-    file_info = await bot.get_file(photo.file_id)
-    
-    @async_retry(max_attempts=config.API_RETRY_ATTEMPTS, delay=config.API_RETRY_DELAY, exceptions=(Exception,))
-    async def download_file_with_retry(file_info):
-        return await bot.download_file(file_info.file_path)
-
-    downloaded_file = await download_file_with_retry(file_info)
-    save_path = f'photo_{user_id}.jpg'
-        
-        # Сохраняем файл
-    with open(save_path, 'wb') as photo_file:
-            photo_file.write(downloaded_file.read())
-        
-    bot_logger.info(f"Photo saved for user {user_id}: {save_path}")
-        
-        # Загружаем фото в Gemini
     try:
-            # Используем новый API Gemini для загрузки файла
-            import google.generativeai as genai
-            import json
-            import re
-            
-            uploaded_file = genai.upload_file(save_path)
-            bot_logger.info(f"Photo uploaded to Gemini: {uploaded_file.uri}")
-            
-            # Создаём промпт для распознавания
+            # Скачиваем фото в память (на диск ничего не пишем)
+            file_info = await bot.get_file(photo_file_id)
+
+            @async_retry(max_attempts=config.API_RETRY_ATTEMPTS, delay=config.API_RETRY_DELAY, exceptions=(Exception,))
+            async def download_file_with_retry(file_info):
+                return await bot.download_file(file_info.file_path)
+
+            downloaded_file = await download_file_with_retry(file_info)
+            download_ms = (time.perf_counter() - started) * 1000
+
+            # Уменьшаем фото вне event loop и отправляем в Gemini инлайн
             prompt = l.printer(user_id, 'food_recognition_prompt')
-            
-            # Генерируем ответ с фото
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            response = model.generate_content([prompt, uploaded_file])
-            
-            if response and response.text:
-                ai_response = response.text
+            recognition = await recognize_food_photo(downloaded_file.getvalue(), prompt)
+            bot_logger.info(
+                f"Food photo latency for user {user_id}: download={download_ms:.0f}ms "
+                f"prepare={recognition.timings['prepare']:.0f}ms gemini={recognition.timings['gemini']:.0f}ms "
+                f"total={(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+
+            if recognition.text:
+                ai_response = recognition.text
                 bot_logger.info(f"Food recognition successful for user {user_id}")
                 
                 # Удаляем сообщение "Анализирую..."
@@ -1580,7 +1599,8 @@ async def handle_photo(message: Message, state: FSMContext):
                             food_cal = round(cal_per_100 * weight / 100, 3)
                             
                             # Сохраняем в БД
-                            cursor.execute("""
+                            pool = await get_pool()
+                            await pool.execute("""
                                 INSERT INTO food (
                                     user_id,
                                     date,
@@ -1590,17 +1610,16 @@ async def handle_photo(message: Message, state: FSMContext):
                                     u,
                                     cal
                                 )
-                                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                            """, (
+                                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                            """,
                                 user_id,
-                                datetime.datetime.now().strftime('%Y-%m-%d'),
+                                datetime.date.today(),
                                 name,
                                 b,
                                 g,
                                 u,
                                 food_cal
-                            ))
-                            conn.commit()
+                            )
                             
                             total_cal += food_cal
                             dishes_count += 1
@@ -1633,11 +1652,6 @@ async def handle_photo(message: Message, state: FSMContext):
                     "⚠️ Не удалось распознать еду на фото. Попробуйте сделать фото поближе и чётче.",
                     reply_markup=kb.keyboard(user_id, 'main_menu')
                 )
-            
-            # Удаляем файл
-            import os
-            if os.path.exists(save_path):
-                os.remove(save_path)
                 
     except Exception as e:
         bot_logger.error(f"Error recognizing food photo for user {user_id}: {e}")
@@ -1674,15 +1688,14 @@ async def chat(message: Message):
 @dp.message(F.text.in_({'Добавить выпитый стаканчик воды', "Añade un vaso de agua", "Ajoutez un verre d'eau potable",
                         "Add a drunken glass of water", 'Ein getrunkenes Glas Wasser hinzufügen'}))
 async def chating(message: Message):
-    cursor.execute("""
+    pool = await get_pool()
+    drank = await pool.fetchval("""
         INSERT INTO water (user_id, data, count)
-        VALUES (%s, CURRENT_DATE, 1)
+        VALUES ($1, CURRENT_DATE, 1)
         ON CONFLICT (user_id, data)
         DO UPDATE SET count = water.count + 1
         RETURNING count;
-    """, (message.from_user.id,))
-    drank = cursor.fetchone()[0]
-    conn.commit()
+    """, message.from_user.id)
 
     await message.answer(text=l.printer(message.from_user.id, 'cup'),
                          reply_markup=kb.keyboard(message.from_user.id, 'main_menu'))
@@ -1695,8 +1708,7 @@ async def grams1(message: Message, state: FSMContext):
         data = await state.get_data()
         raw_grams = data.get('grams1')
         name_a = data['food_list']
-        cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (message.from_user.id,))
-        ll = cursor.fetchone()[0]
+        ll = l.get_user_lang(message.from_user.id)
         translator = Translator(from_lang="ru", to_lang=ll)
 
         grams_list = [item.strip() for item in raw_grams.split(',') if item.strip()]
@@ -1767,7 +1779,8 @@ async def grams1(message: Message, state: FSMContext):
                 except Exception:
                     translated_name = dish_name
                 print(b, g, u, food_cal, translated_name)
-                cursor.execute(
+                pool = await get_pool()
+                await pool.execute(
                     """
                     INSERT INTO food (
                         user_id,
@@ -1778,19 +1791,16 @@ async def grams1(message: Message, state: FSMContext):
                         u,
                         cal
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7)
                     """,
-                    (
-                        message.from_user.id,
-                        datetime.datetime.now().strftime('%Y-%m-%d'),
-                        translated_name.title(),
-                        b,
-                        g,
-                        u,
-                        food_cal,
-                    ),
+                    message.from_user.id,
+                    datetime.date.today(),
+                    translated_name.title(),
+                    b,
+                    g,
+                    u,
+                    food_cal,
                 )
-                conn.commit()
             else:
                 await message.answer(f"⚠️ Не удалось найти информацию о продукте: {dish_name}")
 
@@ -1809,8 +1819,7 @@ async def grams(message: Message, state: FSMContext):
         data = await state.get_data()
         raw_grams = data['grams']
         name_a = [dish.strip() for dish in data['food_list']]
-        cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (message.from_user.id,))
-        ll = cursor.fetchone()[0]
+        ll = l.get_user_lang(message.from_user.id)
         translator = Translator(from_lang=ll, to_lang="ru")
 
         grams_list = [item.strip() for item in raw_grams.split(',') if item.strip()]
@@ -1892,7 +1901,8 @@ async def grams(message: Message, state: FSMContext):
                 except Exception:
                     translated_name = original_name
                 print(b, g, u, food_cal, translated_name)
-                cursor.execute(
+                pool = await get_pool()
+                await pool.execute(
                     """
                     INSERT INTO food (
                         user_id,
@@ -1903,19 +1913,16 @@ async def grams(message: Message, state: FSMContext):
                         u,
                         cal
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7)
                     """,
-                    (
-                        message.from_user.id,
-                        datetime.datetime.now().strftime('%Y-%m-%d'),
-                        translated_name.title(),
-                        b,
-                        g,
-                        u,
-                        food_cal,
-                    ),
+                    message.from_user.id,
+                    datetime.date.today(),
+                    translated_name.title(),
+                    b,
+                    g,
+                    u,
+                    food_cal,
                 )
-                conn.commit()
             else:
                 # Если продукт не найден ни в AI, ни в fallback
                 await message.answer(f"⚠️ Не удалось найти информацию о продукте: {original_name}")
@@ -1934,23 +1941,18 @@ async def grams(message: Message, state: FSMContext):
                         'Plan semanal de dieta y entrenamiento'}))
 async def ai(message: Message, state: FSMContext):
     await message.answer(text=l.printer(message.from_user.id, 'InProcess'))
-    cursor.execute(
-        "SELECT lang FROM user_lang WHERE user_id = {}".format(message.from_user.id)
-    )
-    ll = cursor.fetchone()[0]
+    ll = l.get_user_lang(message.from_user.id)
     translator = Translator(from_lang=ll, to_lang='ru')
-    cursor.execute(
-        "SELECT user_aim, daily_cal FROM user_aims WHERE user_id = {}".format(message.from_user.id)
+    pool = await get_pool()
+    aim, cal = await pool.fetchrow(
+        "SELECT user_aim, daily_cal FROM user_aims WHERE user_id = $1", message.from_user.id
     )
-    aim, cal = cursor.fetchone()
-    cursor.execute(
-        f"SELECT user_sex, date_of_birth FROM user_main WHERE user_id = {message.from_user.id} "
+    sex, birthdate = await pool.fetchrow(
+        "SELECT user_sex, date_of_birth FROM user_main WHERE user_id = $1", message.from_user.id
     )
-    sex, birthdate = cursor.fetchone()
-    cursor.execute(
-        f"SELECT imt, weight, height FROM user_health WHERE user_id = {message.from_user.id}"
+    imt, weight, height = await pool.fetchrow(
+        "SELECT imt, weight, height FROM user_health WHERE user_id = $1", message.from_user.id
     )
-    imt, weight, height = cursor.fetchone()
     
     # Вычисляем текущий возраст из даты рождения
     age = calculate_age_from_birthdate(birthdate)
@@ -2002,10 +2004,7 @@ async def ai_food(message: Message, state: FSMContext):
 async def ai_food_meals(message: Message, state: FSMContext):
     await state.update_data(food_meals=message.text)
     data = await state.get_data()
-    cursor.execute(f"SELECT lang FROM user_lang WHERE user_id = {message.from_user.id}",
-                   )
-
-    ll = cursor.fetchone()[0]
+    ll = l.get_user_lang(message.from_user.id)
     translator = Translator(from_lang=ll, to_lang="ru")
     meal = translator.translate(data['food_meals'])
     zap = l.printer(message.from_user.id, 'mealai').format(meal)
@@ -2042,17 +2041,15 @@ async def ai_food(message: Message, state: FSMContext):
 async def train(message: Message, state: FSMContext):
     await state.update_data(train=message.text)
     data = await state.get_data()
-    cursor.execute(f"SELECT lang FROM user_lang WHERE user_id = {message.from_user.id}",
-                   )
-
-    ll = cursor.fetchone()[0]
+    ll = l.get_user_lang(message.from_user.id)
     translator = Translator(from_lang=ll, to_lang="ru")
     type_tren = translator.translate(data['train'])
     await state.clear()
     await message.answer(text=l.printer(message.from_user.id, 'InProcess'))
-    cursor.execute(
-        f"SELECT imt FROM user_health WHERE date = '{datetime.datetime.now().strftime('%Y-%m-%d')}' AND user_id = {message.from_user.id}")
-    imt = float(cursor.fetchone()[0])
+    pool = await get_pool()
+    imt = float(await pool.fetchval(
+        "SELECT imt FROM user_health WHERE date = $1 AND user_id = $2",
+        datetime.date.today(), message.from_user.id))
     zap = l.printer(message.from_user.id, 'trenai').format(type_tren, imt)
     
     cache_key = f"training:{type_tren.replace(' ', '_').lower()}:{round(imt)}"
@@ -2137,13 +2134,12 @@ async def leng2(message: Message, state: FSMContext):
 async def start2(message: Message, state: FSMContext):
     await state.update_data(leng2=message.text)
     data = await state.get_data()
-    cursor.execute(f"""
-
-    UPDATE user_lang SET lang='{languages[data['leng2']]}' WHERE user_id = {message.from_user.id};
-
-            """
-                   )
-    conn.commit()
+    pool = await get_pool()
+    await pool.execute(
+        "UPDATE user_lang SET lang = $1 WHERE user_id = $2",
+        languages[data['leng2']], message.from_user.id
+    )
+    l.set_user_lang(message.from_user.id, languages[data['leng2']])
     await message.answer(text=data['leng2'], reply_markup=kb.keyboard(message.from_user.id, 'main_menu'))
     await state.clear()
 
@@ -2160,12 +2156,12 @@ async def svod(message: Message, state: FSMContext):
     await message.answer("⏳", reply_markup=types.ReplyKeyboardRemove())
     
     # Проверяем, есть ли данные о весе и росте за сегодня
-    cursor.execute("""
+    pool = await get_pool()
+    today_data = await pool.fetchrow("""
         SELECT weight, height FROM user_health 
-        WHERE user_id = %s AND date = %s
+        WHERE user_id = $1 AND date = $2
         ORDER BY date DESC LIMIT 1
-    """, (user_id, datetime.datetime.now().strftime('%Y-%m-%d')))
-    today_data = cursor.fetchone()
+    """, user_id, datetime.date.today())
     
     if today_data and today_data[0] and today_data[1]:
         # Если есть данные за сегодня, используем их
@@ -2176,12 +2172,11 @@ async def svod(message: Message, state: FSMContext):
         await state.set_state(REG.svo)
     else:
         # Если нет данных за сегодня, проверяем данные за текущий месяц
-        cursor.execute("""
+        month_data = await pool.fetchrow("""
             SELECT weight, height FROM user_health 
-            WHERE user_id = %s AND date >= DATE_TRUNC('month', CURRENT_DATE)
+            WHERE user_id = $1 AND date >= DATE_TRUNC('month', CURRENT_DATE)
             ORDER BY date DESC LIMIT 1
-        """, (user_id,))
-        month_data = cursor.fetchone()
+        """, user_id)
         
         if month_data and month_data[0] and month_data[1]:
             # Есть данные за месяц, используем их
@@ -2228,10 +2223,10 @@ async def svodka(message: Message, state: FSMContext):
             new_weight = float(new_weight)
         
         # Получаем пол и возраст пользователя
-        cursor.execute("""
-            SELECT user_sex, date_of_birth FROM user_main WHERE user_id = %s
-        """, (message.from_user.id,))
-        result = cursor.fetchone()
+        pool = await get_pool()
+        result = await pool.fetchrow("""
+            SELECT user_sex, date_of_birth FROM user_main WHERE user_id = $1
+        """, message.from_user.id)
         
         if not result:
             bot_logger.error(f"User {message.from_user.id} not found in user_main")
@@ -2260,11 +2255,10 @@ async def svodka(message: Message, state: FSMContext):
         imt_using_words = calculate_imt_description(imt, message)
         cal = float(calculate_calories(sex, new_weight, new_height, age, message))
 
-        cursor.execute(f"""
-                        INSERT INTO user_health (user_id,imt,imt_str,cal,date, weight, height) VALUES ({message.from_user.id},{imt},'{imt_using_words}',{cal},'{datetime.datetime.now().strftime('%Y-%m-%d')}', {new_weight}, {new_height} )
-                        ;
-        """)
-        conn.commit()
+        await pool.execute("""
+                        INSERT INTO user_health (user_id, imt, imt_str, cal, date, weight, height)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        """, message.from_user.id, imt, imt_using_words, cal, datetime.date.today(), new_weight, new_height)
     except Exception as e:
         bot_logger.error(f"Error in svodka for user {message.from_user.id}: {e}")
         await message.answer("⚠️ Произошла ошибка. Попробуйте снова или вернитесь в главное меню.",
@@ -2276,13 +2270,13 @@ async def svodka(message: Message, state: FSMContext):
         if mes == 'День' or mes == "Day" or mes == "Jour" or mes == "Tag" or mes == "Día":
             # ===== ТРЕНИРОВКИ =====
             # Получаем список тренировок за день
-            cursor.execute("""
+            today = datetime.date.today()
+            trainings_today = await pool.fetch("""
                 SELECT training_name, tren_time, training_cal 
                 FROM user_training 
-                WHERE date = %s AND user_id = %s
+                WHERE date = $1 AND user_id = $2
                 ORDER BY id
-            """, (datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
-            trainings_today = cursor.fetchall()
+            """, today, message.from_user.id)
             
             # Форматируем список тренировок
             trainings_text = ""
@@ -2294,34 +2288,28 @@ async def svodka(message: Message, state: FSMContext):
                     ) + "\n"
             
             # Сумма калорий от тренировок (используем старое поле training_cal)
-            cursor.execute("SELECT SUM(training_cal) FROM user_training WHERE date = '{}' AND user_id = {}".format(
-                datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
-            result_tren = cursor.fetchone()
-            col_call_tren = result_tren[0] if result_tren[0] else 0
-            cursor.execute("SELECT SUM(cal) FROM food WHERE date = '{}' AND user_id = {}".format(
-                datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
-            result_cal_food = cursor.fetchone()
-            col_cal_food = result_cal_food[0] if result_cal_food[0] else 0
-            cursor.execute("SELECT SUM(b) FROM food WHERE date = '{}' AND user_id = {}".format(
-                datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
-            result_b = cursor.fetchone()
-            col_b = round(result_b[0], 3) if result_b[0] else 0
-            cursor.execute("SELECT SUM(g) FROM food WHERE date = '{}' AND user_id = {}".format(
-                datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
-            result_g = cursor.fetchone()
-            col_g = round(result_g[0], 3) if result_g[0] else 0
-            cursor.execute("SELECT SUM(u) FROM food WHERE date = '{}' AND user_id = {}".format(
-                datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
-            result_u = cursor.fetchone()
-            col_u = round(result_u[0], 3) if result_u[0] else 0
-            cursor.execute("SELECT SUM(count) FROM water WHERE data = '{}' AND user_id = {}".format(
-                datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
-            result_wat = cursor.fetchone()
-            col_wat = round(result_wat[0], 3) if result_wat[0] else 0
-            cursor.execute("SELECT name_of_food FROM food WHERE date = '{}' AND user_id = {}".format(
-                datetime.datetime.now().strftime('%Y-%m-%d'), message.from_user.id))
+            result_tren = await pool.fetchval(
+                "SELECT SUM(training_cal) FROM user_training WHERE date = $1 AND user_id = $2",
+                today, message.from_user.id)
+            col_call_tren = result_tren if result_tren else 0
+            result_cal_food = await pool.fetchval(
+                "SELECT SUM(cal) FROM food WHERE date = $1 AND user_id = $2", today, message.from_user.id)
+            col_cal_food = result_cal_food if result_cal_food else 0
+            result_b = await pool.fetchval(
+                "SELECT SUM(b) FROM food WHERE date = $1 AND user_id = $2", today, message.from_user.id)
+            col_b = round(result_b, 3) if result_b else 0
+            result_g = await pool.fetchval(
+                "SELECT SUM(g) FROM food WHERE date = $1 AND user_id = $2", today, message.from_user.id)
+            col_g = round(result_g, 3) if result_g else 0
+            result_u = await pool.fetchval(
+                "SELECT SUM(u) FROM food WHERE date = $1 AND user_id = $2", today, message.from_user.id)
+            col_u = round(result_u, 3) if result_u else 0
+            result_wat = await pool.fetchval(
+                "SELECT SUM(count) FROM water WHERE data = $1 AND user_id = $2", today, message.from_user.id)
+            col_wat = round(result_wat, 3) if result_wat else 0
             ff = ''
-            result_ff = cursor.fetchall()
+            result_ff = await pool.fetch(
+                "SELECT name_of_food FROM food WHERE date = $1 AND user_id = $2", today, message.from_user.id)
             for i in result_ff:
                 ff += str(i[0])
                 ff += ', '
@@ -2349,79 +2337,69 @@ async def svodka(message: Message, state: FSMContext):
             sr_tren = []
             sr_food_cal = []  # Добавляем калории еды
             
-            # Получаем количество дней в текущем месяце
-            import calendar
+            # Границы текущего месяца: полуоткрытый интервал [начало; начало следующего),
+            # чтобы запросы шли по индексам (user_id, date), а не перебирали все строки
             current_year = datetime.datetime.now().year
             current_month = datetime.datetime.now().month
-            _, days_in_month = calendar.monthrange(current_year, current_month)
-            
-            for i in range(1, days_in_month + 1):
-                datee = f'{str(current_year)}-{str(current_month).zfill(2)}-{str(i).zfill(2)}'
-                
-                # Вес (только один раз берём данные)
-                cursor.execute(
-                    "SELECT weight FROM user_health WHERE user_id = {} AND date = '{}' ".format(message.from_user.id, datee))
-                weight_data = cursor.fetchall()
-                if weight_data:
-                    weight_month.append(weight_data)
-                
-                # БЖУ
-                cursor.execute(
-                    "SELECT sum(b) FROM food WHERE user_id = {} AND date = '{}'".format(message.from_user.id, datee))
-                b_data = cursor.fetchone()
-                if b_data and b_data[0] is not None:
-                    sr_b.append(b_data[0])
-                    
-                cursor.execute(
-                    "SELECT sum(g) FROM food WHERE user_id = {} AND date = '{}'".format(message.from_user.id, datee))
-                g_data = cursor.fetchone()
-                if g_data and g_data[0] is not None:
-                    sr_g.append(g_data[0])
-                    
-                cursor.execute(
-                    "SELECT sum(u) FROM food WHERE user_id = {} AND date = '{}'".format(message.from_user.id, datee))
-                u_data = cursor.fetchone()
-                if u_data and u_data[0] is not None:
-                    sr_u.append(u_data[0])
-                
-                # Калории еды
-                cursor.execute(
-                    "SELECT sum(cal) FROM food WHERE user_id = {} AND date = '{}'".format(message.from_user.id, datee))
-                food_cal_data = cursor.fetchone()
-                if food_cal_data and food_cal_data[0] is not None:
-                    sr_food_cal.append(food_cal_data[0])
-                
-                # Вода
-                cursor.execute(
-                    "SELECT sum(count) FROM water WHERE user_id = {} AND data = '{}'".format(message.from_user.id, datee))
-                w_data = cursor.fetchone()
-                if w_data and w_data[0] is not None:
-                    sr_w.append(w_data[0])
-                    bot_logger.info(f"User {message.from_user.id} - water for {datee}: {w_data[0]} glasses")
-                
-                # Калории тренировок
-                cursor.execute(
-                    "SELECT sum(training_cal) FROM user_training WHERE user_id = {} AND date = '{}'".format(
-                    message.from_user.id, datee))
-                cal_data = cursor.fetchone()
-                if cal_data and cal_data[0] is not None:
-                    sr_cal.append(cal_data[0])
-                
-                # Время тренировок
-                cursor.execute(
-                    "SELECT sum(tren_time) FROM user_training WHERE user_id = {} AND date = '{}'".format(
-                    message.from_user.id, datee))
-                time_data = cursor.fetchone()
-                if time_data and time_data[0] is not None:
-                    sr_tren.append(time_data[0])
-            
+            month_start = datetime.date(current_year, current_month, 1)
+            if current_month == 12:
+                next_month_start = datetime.date(current_year + 1, 1, 1)
+            else:
+                next_month_start = datetime.date(current_year, current_month + 1, 1)
+
+            # Вес по дням (в порядке дат)
+            weight_rows = await pool.fetch("""
+                SELECT date, weight FROM user_health
+                WHERE user_id = $1 AND date >= $2 AND date < $3
+                ORDER BY date, id
+            """, message.from_user.id, month_start, next_month_start)
+            weight_by_day = {}
+            for row in weight_rows:
+                weight_by_day.setdefault(row['date'], []).append((row['weight'],))
+            weight_month = list(weight_by_day.values())
+
+            # БЖУ и калории еды по дням
+            food_days = await pool.fetch("""
+                SELECT date, SUM(b), SUM(g), SUM(u), SUM(cal)
+                FROM food
+                WHERE user_id = $1 AND date >= $2 AND date < $3
+                GROUP BY date ORDER BY date
+            """, message.from_user.id, month_start, next_month_start)
+            for _, day_b, day_g, day_u, day_cal in food_days:
+                sr_b.append(day_b)
+                sr_g.append(day_g)
+                sr_u.append(day_u)
+                sr_food_cal.append(day_cal)
+
+            # Вода по дням
+            water_days = await pool.fetch("""
+                SELECT data, SUM(count)
+                FROM water
+                WHERE user_id = $1 AND data >= $2 AND data < $3
+                GROUP BY data ORDER BY data
+            """, message.from_user.id, month_start, next_month_start)
+            for day, glasses in water_days:
+                sr_w.append(glasses)
+                bot_logger.info(f"User {message.from_user.id} - water for {day}: {glasses} glasses")
+
+            # Калории и время тренировок по дням
+            training_days = await pool.fetch("""
+                SELECT date, SUM(training_cal), SUM(tren_time)
+                FROM user_training
+                WHERE user_id = $1 AND date >= $2 AND date < $3
+                GROUP BY date ORDER BY date
+            """, message.from_user.id, month_start, next_month_start)
+            for _, day_cal, day_time in training_days:
+                sr_cal.append(day_cal)
+                sr_tren.append(day_time)
+
             # Фильтруем None значения
-                new_sr_b = list(filter(is_not_none, sr_b))
-                new_sr_g = list(filter(is_not_none, sr_g))
-                new_sr_u = list(filter(is_not_none, sr_u))
-                new_sr_w = list(filter(is_not_none, sr_w))
-                new_sr_cal = list(filter(is_not_none, sr_cal))
-                new_sr_tren = list(filter(is_not_none, sr_tren))
+            new_sr_b = list(filter(is_not_none, sr_b))
+            new_sr_g = list(filter(is_not_none, sr_g))
+            new_sr_u = list(filter(is_not_none, sr_u))
+            new_sr_w = list(filter(is_not_none, sr_w))
+            new_sr_cal = list(filter(is_not_none, sr_cal))
+            new_sr_tren = list(filter(is_not_none, sr_tren))
             new_sr_food_cal = list(filter(is_not_none, sr_food_cal))
             
             # Вычисляем средние значения (только по дням когда были данные)
@@ -2448,17 +2426,15 @@ async def svodka(message: Message, state: FSMContext):
                 weig_2 = new_weight
             
             # ===== ТОП-5 ТРЕНИРОВОК ЗА МЕСЯЦ =====
-            cursor.execute("""
+            top_trainings = await pool.fetch("""
                 SELECT training_name, COUNT(*) as count, ROUND(AVG(tren_time), 1) as avg_duration
                 FROM user_training
-                WHERE user_id = %s 
-                    AND EXTRACT(YEAR FROM date) = %s
-                    AND EXTRACT(MONTH FROM date) = %s
+                WHERE user_id = $1
+                    AND date >= $2 AND date < $3
                 GROUP BY training_name
                 ORDER BY count DESC, avg_duration DESC
                 LIMIT 5
-            """, (message.from_user.id, current_year, current_month))
-            top_trainings = cursor.fetchall()
+            """, message.from_user.id, month_start, next_month_start)
             
             trainings_top_text = ""
             if top_trainings:
@@ -2497,29 +2473,23 @@ async def svodka(message: Message, state: FSMContext):
 
                 first_day_of_month = datetime.date(current_year, current_month, 1)
                 if current_month == 12:
-                    last_day_of_month = datetime.date(current_year + 1, 1, 1) - datetime.timedelta(days=1)
+                    next_month_start = datetime.date(current_year + 1, 1, 1)
                 else:
-                    last_day_of_month = datetime.date(current_year, current_month + 1, 1) - datetime.timedelta(days=1)
+                    next_month_start = datetime.date(current_year, current_month + 1, 1)
 
-                cursor.execute("""
+                result_food = await pool.fetchrow("""
                         SELECT SUM(cal), SUM(b), SUM(g), SUM(u)
                         FROM food 
-                        WHERE date >= '{}' AND date <= '{}' AND user_id = {}
-                    """.format(
-                    first_day_of_month.strftime('%Y-%m-%d'), last_day_of_month.strftime('%Y-%m-%d'),
-                    message.from_user.id))
-                result_food = cursor.fetchone()
+                        WHERE user_id = $3 AND date >= $1 AND date < $2
+                    """, first_day_of_month, next_month_start, message.from_user.id)
                 
                 # Считаем воду по дням, а не общую сумму за месяц
-                cursor.execute("""
+                water_days = await pool.fetch("""
                     SELECT data, SUM(count) 
                               FROM water
-                              WHERE data >= '{}' AND data <= '{}' AND user_id = {}
+                              WHERE user_id = $3 AND data >= $1 AND data < $2
                     GROUP BY data
-                          """.format(
-                    first_day_of_month.strftime('%Y-%m-%d'), last_day_of_month.strftime('%Y-%m-%d'),
-                    message.from_user.id))
-                water_days = cursor.fetchall()
+                          """, first_day_of_month, next_month_start, message.from_user.id)
                 
                 if result_food and result_food[0]:
                     all_data.append(result_food)
@@ -2535,14 +2505,12 @@ async def svodka(message: Message, state: FSMContext):
                         total_w_glasses += day_water[1]  # Сумма стаканов
                         water_days_count += 1  # Количество дней
 
-                cursor.execute("""
+                weight_data = await pool.fetch("""
                         SELECT weight 
                         FROM user_health
-                        WHERE date >= '{}' AND date <= '{}' AND user_id = {}
+                        WHERE user_id = $3 AND date >= $1 AND date < $2
                         ORDER BY date ASC
-                    """.format(first_day_of_month.strftime('%Y-%m-%d'), last_day_of_month.strftime('%Y-%m-%d'),
-                               message.from_user.id))
-                weight_data = cursor.fetchall()
+                    """, first_day_of_month, next_month_start, message.from_user.id)
 
                 if weight_data:
                     weight_data_all.extend(weight_data)
@@ -2555,12 +2523,11 @@ async def svodka(message: Message, state: FSMContext):
                 start_weight = 'no info'
                 end_weight = 'no info'
 
-            cursor.execute("""
+            result_train = await pool.fetchrow("""
                     SELECT AVG(training_cal) 
                     FROM user_training 
-                    WHERE user_id = {}
-                """.format(message.from_user.id, ))
-            result_train = cursor.fetchone()
+                    WHERE user_id = $1
+                """, message.from_user.id)
             avg_train_cal = result_train[0] if result_train and result_train[0] else 0
 
             avg_food_cal = total_food_cal / len(food_months_with_data) if food_months_with_data else 0
@@ -2591,16 +2558,16 @@ async def svodka(message: Message, state: FSMContext):
                 first_b = first_g = first_u = 0
             
             # ===== ТОП-5 ТРЕНИРОВОК ЗА ГОД =====
-            cursor.execute("""
+            top_trainings_year = await pool.fetch("""
                 SELECT training_name, COUNT(*) as count, ROUND(AVG(tren_time), 1) as avg_duration
                 FROM user_training
-                WHERE user_id = %s 
-                    AND EXTRACT(YEAR FROM date) = %s
+                WHERE user_id = $1
+                    AND date >= $2 AND date < $3
                 GROUP BY training_name
                 ORDER BY count DESC, avg_duration DESC
                 LIMIT 5
-            """, (message.from_user.id, datetime.datetime.now().year))
-            top_trainings_year = cursor.fetchall()
+            """, message.from_user.id, datetime.date(current_date.year, 1, 1),
+                datetime.date(current_date.year + 1, 1, 1))
             
             trainings_year_text = ""
             if top_trainings_year:
@@ -2646,11 +2613,11 @@ async def save_message_to_history(user_id: int, message_type: str, message_text:
         message_text: Текст сообщения
     """
     try:
-        cursor.execute("""
+        pool = await get_pool()
+        await pool.execute("""
             INSERT INTO chat_history (user_id, message_type, message_text)
-            VALUES (%s, %s, %s)
-        """, (user_id, message_type, message_text))
-        conn.commit()
+            VALUES ($1, $2, $3)
+        """, user_id, message_type, message_text)
     except Exception as e:
         bot_logger.error(f"Error saving message to history for user {user_id}: {e}")
 
@@ -2667,15 +2634,14 @@ async def get_chat_context(user_id: int, limit: int = 10) -> str:
         Отформатированная строка с историей сообщений
     """
     try:
-        cursor.execute("""
+        pool = await get_pool()
+        messages = await pool.fetch("""
             SELECT message_type, message_text, created_at
             FROM chat_history
-            WHERE user_id = %s
+            WHERE user_id = $1
             ORDER BY created_at DESC
-            LIMIT %s
-        """, (user_id, limit))
-        
-        messages = cursor.fetchall()
+            LIMIT $2
+        """, user_id, limit)
         
         if not messages:
             return "История сообщений пуста."
@@ -2711,12 +2677,12 @@ async def get_user_info_for_ai(user_id: int) -> str:
         info_parts = []
         
         # Получаем основные данные
-        cursor.execute("""
+        pool = await get_pool()
+        user_main = await pool.fetchrow("""
             SELECT user_sex, date_of_birth 
             FROM user_main 
-            WHERE user_id = %s
-        """, (user_id,))
-        user_main = cursor.fetchone()
+            WHERE user_id = $1
+        """, user_id)
         
         if user_main:
             sex, birthdate = user_main
@@ -2727,14 +2693,13 @@ async def get_user_info_for_ai(user_id: int) -> str:
                 info_parts.append(f"• Пол: {sex}")
         
         # Получаем данные о здоровье
-        cursor.execute("""
+        health = await pool.fetchrow("""
             SELECT imt, weight, height
             FROM user_health
-            WHERE user_id = %s
+            WHERE user_id = $1
             ORDER BY date DESC
             LIMIT 1
-        """, (user_id,))
-        health = cursor.fetchone()
+        """, user_id)
         
         if health:
             imt, weight, height = health
@@ -2746,12 +2711,11 @@ async def get_user_info_for_ai(user_id: int) -> str:
                 info_parts.append(f"• Рост: {height} см")
         
         # Получаем цели
-        cursor.execute("""
+        aims = await pool.fetchrow("""
             SELECT user_aim, daily_cal
             FROM user_aims
-            WHERE user_id = %s
-        """, (user_id,))
-        aims = cursor.fetchone()
+            WHERE user_id = $1
+        """, user_id)
         
         if aims:
             aim, cal = aims
@@ -2864,8 +2828,8 @@ async def catch_all_text_messages(message: Message, state: FSMContext):
     
     # Проверяем что пользователь зарегистрирован
     try:
-        cursor.execute("SELECT user_id FROM user_main WHERE user_id = %s", (message.from_user.id,))
-        if not cursor.fetchone():
+        pool = await get_pool()
+        if not await pool.fetchval("SELECT user_id FROM user_main WHERE user_id = $1", message.from_user.id):
             bot_logger.info(f"User {message.from_user.id} sent message but not registered, ignoring")
             return
     except Exception as e:
@@ -2892,8 +2856,12 @@ bot_logger.info("AI Chat router registered as catch-all (last priority)")
 # ============================================
 
 async def main():
-    # Register middleware
-    dp.update.middleware(PrivacyConsentMiddleware())
+    if config.TELEGRAM_WEBHOOK_URL:
+        if config.TELEGRAM_WEBHOOK_SECRET:
+            await run_webhook(dp, bot)
+            return
+        # Без секрета кто угодно мог бы слать на эндпоинт поддельные апдейты.
+        bot_logger.error("TELEGRAM_WEBHOOK_SECRET is not set, falling back to long polling")
     await dp.start_polling(bot)
 
 
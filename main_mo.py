@@ -1,37 +1,193 @@
+"""
+Локализация сообщений бота.
+
+Каталоги `.mo` из `locales/` загружаются один раз на язык и живут в памяти
+процесса. Язык пользователя кэшируется в ограниченном LRU с TTL: при смене
+языка в боте запись обновляется сразу (`set_user_lang`), а изменения,
+сделанные в веб-приложении, подхватываются не позже чем через
+`LANG_CACHE_TTL` секунд.
+
+Бот прогревает кэш асинхронно (`load_user_lang`) в middleware, поэтому
+синхронный `printer()` ходит в БД только вне контекста апдейта.
+"""
 import gettext
+import os
+import threading
+import time
+from collections import OrderedDict
+
 import psycopg2
 from config import config
 
 
+SUPPORTED_LANGUAGES = ('ru', 'en', 'de', 'fr', 'es')
+DEFAULT_LANGUAGE = 'ru'
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locales')
+
+# Размер и время жизни кэша user_id -> язык
+LANG_CACHE_MAX_SIZE = 50_000
+LANG_CACHE_TTL = 600.0  # секунд
+
+_catalogs: dict = {}
+_catalogs_lock = threading.Lock()
+
+_lang_cache: "OrderedDict[int, tuple[float, str]]" = OrderedDict()
+_lang_cache_lock = threading.Lock()
+
+_conn = None
+
+
+def get_translation(lang: str):
+    """
+    Возвращает каталог переводов для языка (загружается один раз).
+
+    Args:
+        lang: Код языка (ru, en, de, fr, es)
+
+    Returns:
+        Объект gettext.NullTranslations / GNUTranslations
+    """
+    catalog = _catalogs.get(lang)
+    if catalog is not None:
+        return catalog
+    with _catalogs_lock:
+        catalog = _catalogs.get(lang)
+        if catalog is None:
+            catalog = gettext.translation(
+                'messages', localedir=LOCALES_DIR, languages=[lang], fallback=True
+            )
+            _catalogs[lang] = catalog
+    return catalog
+
+
+def preload_translations() -> None:
+    """Загружает каталоги всех поддерживаемых языков (вызывается при старте)."""
+    for lang in SUPPORTED_LANGUAGES:
+        get_translation(lang)
+
+
+def _get_connection():
+    """Ленивое общее подключение для чтения user_lang при промахе кэша."""
+    global _conn
+    if _conn is None or _conn.closed:
+        _conn = psycopg2.connect(**config.get_db_config())
+        _conn.autocommit = True
+    return _conn
+
+
+def _fetch_user_lang(user_id) -> str:
+    try:
+        with _get_connection().cursor() as cursor:
+            cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (user_id,))
+            result = cursor.fetchone()
+    except psycopg2.Error:
+        # Соединение могло умереть — в следующий раз переподключимся
+        global _conn
+        _conn = None
+        raise
+    return result[0] if result and result[0] else DEFAULT_LANGUAGE
+
+
+def _cached_lang(user_id: int, now: float):
+    with _lang_cache_lock:
+        cached = _lang_cache.get(user_id)
+        if cached and cached[0] > now:
+            _lang_cache.move_to_end(user_id)
+            return cached[1]
+    return None
+
+
+def get_user_lang(user_id) -> str:
+    """
+    Возвращает код языка пользователя, обращаясь к БД только при промахе кэша.
+
+    Args:
+        user_id: ID пользователя Telegram
+
+    Returns:
+        Код языка (по умолчанию 'ru')
+    """
+    user_id = int(user_id)
+    now = time.monotonic()
+    cached = _cached_lang(user_id, now)
+    if cached is not None:
+        return cached
+    lang = _fetch_user_lang(user_id)
+    _remember(user_id, lang, now)
+    return lang
+
+
+async def load_user_lang(user_id) -> str:
+    """
+    Асинхронный вариант get_user_lang: при промахе читает user_lang через пул asyncpg.
+
+    Вызывается из middleware бота перед хэндлером, чтобы последующие
+    синхронные printer() попадали в кэш и не блокировали event loop.
+    """
+    user_id = int(user_id)
+    now = time.monotonic()
+    cached = _cached_lang(user_id, now)
+    if cached is not None:
+        return cached
+    from app.database import get_pool
+    pool = await get_pool()
+    lang = await pool.fetchval("SELECT lang FROM user_lang WHERE user_id = $1", user_id)
+    lang = lang or DEFAULT_LANGUAGE
+    _remember(user_id, lang, now)
+    return lang
+
+
+def set_user_lang(user_id, lang: str) -> None:
+    """
+    Обновляет язык пользователя в кэше (вызывать после записи в user_lang).
+
+    Args:
+        user_id: ID пользователя Telegram
+        lang: Новый код языка
+    """
+    _remember(int(user_id), lang, time.monotonic())
+
+
+def invalidate_user_lang(user_id=None) -> None:
+    """Сбрасывает кэш языка для пользователя (или целиком, если user_id=None)."""
+    with _lang_cache_lock:
+        if user_id is None:
+            _lang_cache.clear()
+        else:
+            _lang_cache.pop(int(user_id), None)
+
+
+def _remember(user_id: int, lang: str, now: float) -> None:
+    with _lang_cache_lock:
+        _lang_cache[user_id] = (now + LANG_CACHE_TTL, lang)
+        _lang_cache.move_to_end(user_id)
+        while len(_lang_cache) > LANG_CACHE_MAX_SIZE:
+            _lang_cache.popitem(last=False)
+
+
 def printer(user_id, com):
     """
     Возвращает локализованную строку для пользователя на основе его языковых настроек.
-    
+
     Args:
         user_id: ID пользователя Telegram
         com: Ключ строки для перевода
-    
+
     Returns:
         Локализованная строка
     """
-    conn = psycopg2.connect(**config.get_db_config())
-    cursor = conn.cursor()
-    cursor.execute("SELECT lang FROM user_lang WHERE user_id = %s", (user_id,))
-    result = cursor.fetchone()
-    leng = result[0] if result else 'ru'
-    conn.commit()
-    cursor.close()
-    
-    lenguag = gettext.translation('messages', localedir='locales', languages=[leng], fallback=True)
-    lenguag.install()
-    _ = lenguag.gettext
-    ngettext = lenguag.ngettext
-    return _(com)
+    return get_translation(get_user_lang(user_id)).gettext(com)
 
 
 def printer_with_given(leng, com):
- #   lengu = gettext.translation('messages', localedir='locales', languages=[leng], fallback=False)
- #   lengu.install()
-    _ = leng.gettext  # Greek
-    ngettext = leng.ngettext
-    return _(com)
+    """
+    Возвращает перевод ключа для уже выбранного каталога или кода языка.
+
+    Args:
+        leng: Каталог gettext или код языка
+        com: Ключ строки для перевода
+    """
+    if isinstance(leng, str):
+        leng = get_translation(leng)
+    return leng.gettext(com)